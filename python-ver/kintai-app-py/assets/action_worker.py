@@ -0,0 +1,98 @@
+"""打刻処理をワーカースレッドで実行する QThread
+
+出勤・退勤・一括記入は Excel の読込・保存や Teams 投稿で数秒かかることがあるため、
+GUI スレッドでは実行しない。処理中に必要なダイアログ（遅刻理由・備考・確認）は
+dialog_requested シグナルで GUI スレッドに表示を依頼し、reply() で返された値を
+ワーカースレッド側で受け取る。
+
+    def action(worker):
+        return ta.clock_in(..., late_reason_cb=worker.dialog_cb("late_reason"),
+                           status_cb=worker.report, cancel_cb=worker.is_cancelled)
+
+    worker = ActionWorker(action, parent)
+    worker.dialog_requested.connect(lambda kind, args: worker.reply(show_dialog(kind, *args)))
+    worker.succeeded.connect(on_done)
+    worker.failed.connect(on_error)
+    worker.start()
+
+取消（cancel()）は処理側が cancel_cb を確認した時点で有効になる。
+timesheet_actions は書込・投稿を始める前にだけ確認するため、書込開始後の取消は無視される。
+ダイアログの結果を待っている間に取消された場合は、結果を待たずにキャンセル扱い（None）で戻る。
+"""
+import queue
+import threading
+from typing import Any, Callable
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from assets.app_logger import get_logger
+
+_log = get_logger("kintai.actions")
+
+# 取消時に reply() の代わりに返す値（ダイアログのキャンセルと同じ扱いになる）
+_CANCELLED = None
+# cancel() が待機中の ask() を起こすために入れる印（reply() の値とは区別する）
+_WAKE = object()
+
+
+class ActionWorker(QThread):
+    """action(worker) をワーカースレッドで実行する"""
+
+    status = pyqtSignal(str, str)             # (メッセージ, 色)
+    dialog_requested = pyqtSignal(str, object)  # (ダイアログ種別, 引数タプル)
+    succeeded = pyqtSignal(object)            # action の戻り値
+    failed = pyqtSignal(object)               # action が送出した例外
+
+    def __init__(self, action: Callable[["ActionWorker"], Any], parent=None):
+        super().__init__(parent)
+        self._action = action
+        self._replies: "queue.Queue[Any]" = queue.Queue()
+        self._cancel = threading.Event()
+
+    def run(self) -> None:
+        try:
+            result = self._action(self)
+        except Exception as e:
+            self.failed.emit(e)
+            return
+        self.succeeded.emit(result)
+
+    # ── ワーカースレッドから呼ぶ ──
+
+    def ask(self, kind: str, *args) -> Any:
+        """
+        GUI スレッドにダイアログ表示を依頼し、結果が返るまで待つ。
+        取消済み、または待っている間に取消されたら None
+        """
+        if self._cancel.is_set():
+            return _CANCELLED
+        self.dialog_requested.emit(kind, args)
+        value = self._replies.get()
+        if value is _WAKE or self._cancel.is_set():
+            return _CANCELLED
+        return value
+
+    def dialog_cb(self, kind: str) -> Callable:
+        """timesheet_actions に渡すダイアログ用コールバックを返す"""
+        return lambda *args: self.ask(kind, *args)
+
+    def report(self, msg: str, color: str = "black") -> None:
+        """status_cb として渡す"""
+        self.status.emit(msg, color)
+
+    def is_cancelled(self) -> bool:
+        """cancel_cb として渡す"""
+        return self._cancel.is_set()
+
+    # ── GUI スレッドから呼ぶ ──
+
+    def reply(self, value: Any) -> None:
+        """dialog_requested に対するダイアログの結果を返す（必ず 1 回呼ぶ）"""
+        self._replies.put(value)
+
+    def cancel(self) -> None:
+        """取消を要求する（書込・投稿の開始前に確認された場合のみ有効）。ダイアログの結果待ちも解除する"""
+        if not self._cancel.is_set():
+            _log.info("打刻処理の取消を要求")
+        self._cancel.set()
+        self._replies.put(_WAKE)
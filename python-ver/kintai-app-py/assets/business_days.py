@@ -0,0 +1,120 @@
+"""営業日（土日・祝日を除く日）の計算
+
+年ごとに営業日の通し番号の表（日付の序数を昇順に並べたもの）を 1 回だけ作ってキャッシュし、
+次・前の営業日や範囲の件数を二分探索で求める。祝日は jp_holidays の表を使う。
+
+    from assets.business_days import next_working_day, working_days_in_month
+    next_working_day(date(2026, 5, 1))          # 2026-05-07（土日・5/3〜5/6 を飛ばす）
+    working_days_in_month(2026, 3)              # 3 月の営業日のリスト
+    nth_working_day(2026, 3, -1)                # 3 月の最終営業日
+    count_working_days(date(2026, 1, 1), date(2026, 12, 31))   # 両端を含む
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Dict, List, Tuple
+
+from assets.jp_holidays import is_holiday
+
+
+class _YearIndex:
+    """1 年分の営業日の序数（昇順）と、各月の先頭の位置"""
+
+    __slots__ = ("days", "month_start")
+
+    def __init__(self, year: int):
+        first = date(year, 1, 1).toordinal()
+        last = date(year, 12, 31).toordinal()
+        days: List[int] = []
+        # month_start[m] 〜 month_start[m + 1] が m 月の営業日（m = 1〜12）
+        month_start = [0] * 14
+        for o in range(first, last + 1):
+            d = date.fromordinal(o)
+            if d.day == 1:
+                month_start[d.month] = len(days)
+            if d.weekday() < 5 and not is_holiday(d):
+                days.append(o)
+        month_start[13] = len(days)
+        self.days: Tuple[int, ...] = tuple(days)
+        self.month_start: Tuple[int, ...] = tuple(month_start)
+
+
+_indexes: Dict[int, _YearIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def _index(year: int) -> _YearIndex:
+    index = _indexes.get(year)
+    if index is None:
+        with _indexes_lock:
+            index = _indexes.get(year)
+            if index is None:
+                index = _indexes[year] = _YearIndex(year)
+    return index
+
+
+def is_working_day(d: date) -> bool:
+    """d が営業日（平日かつ祝日でない）なら True"""
+    return d.weekday() < 5 and not is_holiday(d)
+
+
+def next_working_day(d: date) -> date:
+    """d より後の最初の営業日（d 自身は含まない）"""
+    year, o = d.year, d.toordinal()
+    while True:
+        days = _index(year).days
+        i = bisect_right(days, o)
+        if i < len(days):
+            return date.fromordinal(days[i])
+        year += 1
+
+
+def prev_working_day(d: date) -> date:
+    """d より前の最後の営業日（d 自身は含まない）"""
+    year, o = d.year, d.toordinal()
+    while True:
+        days = _index(year).days
+        i = bisect_left(days, o)
+        if i > 0:
+            return date.fromordinal(days[i - 1])
+        year -= 1
+
+
+def count_working_days(start: date, end: date) -> int:
+    """start から end まで（両端を含む）の営業日の数。start > end なら 0"""
+    lo, hi = start.toordinal(), end.toordinal()
+    total = 0
+    for year in range(start.year, end.year + 1):
+        days = _index(year).days
+        total += max(bisect_right(days, hi) - bisect_left(days, lo), 0)
+    return total
+
+
+def working_days(start: date, end: date) -> List[date]:
+    """start から end まで（両端を含む）の営業日のリスト（昇順）"""
+    lo, hi = start.toordinal(), end.toordinal()
+    result: List[date] = []
+    for year in range(start.year, end.year + 1):
+        days = _index(year).days
+        result.extend(date.fromordinal(o) for o in days[bisect_left(days, lo):bisect_right(days, hi)])
+    return result
+
+
+def working_days_in_month(year: int, month: int) -> List[date]:
+    """指定した年月の営業日のリスト（昇順）"""
+    index = _index(year)
+    return [date.fromordinal(o) for o in index.days[index.month_start[month]:index.month_start[month + 1]]]
+
+
+def nth_working_day(year: int, month: int, n: int) -> date:
+    """
+    指定した年月の第 n 営業日。n は 1 始まりで、負の数なら月末から数える（-1 = 最終営業日）。
+    その月の営業日が n 日に満たない場合は ValueError。
+    """
+    index = _index(year)
+    begin, end = index.month_start[month], index.month_start[month + 1]
+    if n > 0 and begin + n - 1 < end:
+        return date.fromordinal(index.days[begin + n - 1])
+    if n < 0 and end + n >= begin:
+        return date.fromordinal(index.days[end + n])
+    raise ValueError(f"{year}年{month}月の営業日は {end - begin} 日です（n={n}）")
@@ -1,7 +1,7 @@
 """カスタムカレンダーウィジェット"""
 import calendar
 from datetime import date, timedelta
-from typing import Optional, Set
+from typing import Optional, Set, Tuple
 
 from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
@@ -324,6 +324,10 @@ class CalendarWidget(QWidget):
         self._month = month
         self._build_grid()
 
+    def get_month(self) -> Tuple[int, int]:
+        """表示中の (年, 月) を返す"""
+        return self._year, self._month
+
     def get_selected_date(self) -> Optional[date]:
         """選択中の日付を返す"""
         return self._selected_date
@@ -0,0 +1,345 @@
+"""ヘッドレス CLI（GUI を起動せずに出勤・退勤・一括記入を行う）
+
+    python -m kintai cli clock-in  --shift 日勤 --style リモート [--late-reason 電車遅延]
+    python -m kintai cli clock-out --shift 日勤 [--next-workday 2026-02-04 --next-shift 日勤]
+    python -m kintai cli batch     --shift シフト休 --date 2026-02-03 --date 2026-02-04
+    python -m kintai cli batch     --shift 日勤 --workdays 202603   （3 月の営業日すべて）
+    python -m kintai cli flush-queue   （書込待ちの打刻を書込む）
+    python -m kintai cli flush-outbox  （再送待ちの Teams 投稿を送る）
+    python -m kintai cli reconcile [--month 202602] [--dry-run]
+
+ログインスクリプトや cron から呼ぶためのもの。PyQt5 は import しない
+（timesheet_actions のダイアログ用コールバックはすべてコマンドライン引数で置き換える）。
+ダイアログで入力する値（遅刻理由・備考・カスタム時刻）が必要なのに指定されていない場合は
+何も書込まずに終了コード 2 で終わる。
+
+終了コード:
+    0 … 成功（書込待ちキューに登録した場合を含む）
+    1 … 失敗（タイムシート未検出・書込エラー・ヘッダー不一致など）
+    2 … 引数不足・取消
+"""
+import argparse
+import os
+import re
+import sys
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from assets.app_logger import get_logger, setup_logging
+
+_log = get_logger("kintai.cli")
+
+_APP_DIR = Path(__file__).parent.parent
+_DEFAULT_SETTINGS = _APP_DIR / "configs" / "settings.json"
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+
+
+class _CliTime:
+    """custom_input_cb の戻り値用。QTime と同じ hour() / minute() を持つ"""
+
+    def __init__(self, t: time):
+        self._t = t
+
+    def hour(self) -> int:
+        return self._t.hour
+
+    def minute(self) -> int:
+        return self._t.minute
+
+
+def _parse_date(text: str) -> date:
+    try:
+        return date.fromisoformat(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"日付は YYYY-MM-DD 形式で指定してください: {text}")
+
+
+def _parse_month(text: str) -> Tuple[int, int]:
+    if not re.fullmatch(r"\d{6}", text) or not 1 <= int(text[4:]) <= 12:
+        raise argparse.ArgumentTypeError(f"月は YYYYMM 形式で指定してください: {text}")
+    return int(text[:4]), int(text[4:])
+
+
+def _parse_time(text: str) -> time:
+    try:
+        return datetime.strptime(text, "%H:%M").time()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"時刻は HH:MM 形式で指定してください: {text}")
+
+
+def _build_parser() -> argparse.ArgumentParser:
+    from assets.timesheet_constants import WORK_STYLE_OFFICE, WORK_STYLE_REMOTE
+
+    parser = argparse.ArgumentParser(prog="python -m kintai cli", description="勤怠打刻（GUI なし）")
+    parser.add_argument("--settings", default=str(_DEFAULT_SETTINGS), help="settings.json のパス")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    def _common(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--shift", required=True, help="出勤形態（例: 日勤）")
+        p.add_argument("--style", default=WORK_STYLE_REMOTE, choices=[WORK_STYLE_REMOTE, WORK_STYLE_OFFICE],
+                       help="出勤形式（デフォルト: リモート）")
+        p.add_argument("--force", action="store_true",
+                       help="タイムシートの年月セルが対象月と一致しなくても書込む")
+
+    def _inputs(p: argparse.ArgumentParser) -> None:
+        p.add_argument("--remark", help="備考（備考入力が必要な休暇・カスタム入力で使用）")
+        p.add_argument("--start", type=_parse_time, metavar="HH:MM", help="カスタム入力の始業時刻")
+        p.add_argument("--end", type=_parse_time, metavar="HH:MM", help="カスタム入力の終業時刻")
+
+    p_in = sub.add_parser("clock-in", help="出勤")
+    _common(p_in)
+    _inputs(p_in)
+    p_in.add_argument("--date", type=_parse_date, help="対象日（デフォルト: 今日）")
+    p_in.add_argument("--assumed", action="store_true", help="想定記入（固定の始業・終業時刻を書込む）")
+    p_in.add_argument("--no-post", action="store_true", help="Teams に投稿しない")
+    p_in.add_argument("--late-reason", help="遅刻理由（遅刻と判定された場合に必須）")
+
+    p_out = sub.add_parser("clock-out", help="退勤")
+    _common(p_out)
+    p_out.add_argument("--cross-day", action="store_true", help="日付を跨いだ退勤")
+    p_out.add_argument("--no-post", action="store_true", help="Teams に投稿しない")
+    p_out.add_argument("--next-workday", type=_parse_date, help="次回出勤日")
+    p_out.add_argument("--next-shift", default="", help="次回の出勤形態")
+    p_out.add_argument("--next-work-mode", default="", help="次回の出勤形式")
+    p_out.add_argument("--mention", default="", help="メンション先（Teams ID）")
+    p_out.add_argument("--comment", default="", help="Teams 投稿のコメント")
+
+    p_batch = sub.add_parser("batch", help="一括記入")
+    _common(p_batch)
+    _inputs(p_batch)
+    p_batch.add_argument("--date", dest="dates", type=_parse_date, action="append", default=[],
+                         help="対象日（複数指定可）")
+    p_batch.add_argument("--workdays", type=_parse_month, action="append", default=[], metavar="YYYYMM",
+                         help="その月の営業日（土日・祝日を除く）をすべて対象日にする（複数指定可）")
+
+    sub.add_parser("flush-queue", help="書込待ちの打刻を書込む（Excel が開かれたままなら残す）")
+    sub.add_parser("flush-outbox", help="再送待ちの Teams 投稿を送る（届かなければ残す）")
+
+    p_rec = sub.add_parser("reconcile", help="打刻ジャーナルの値をタイムシートの空セルに再適用する")
+    p_rec.add_argument("--month", action="append", metavar="YYYYMM", help="対象月（複数指定可）")
+    p_rec.add_argument("--dry-run", action="store_true", help="書込まずに結果だけ表示する")
+    return parser
+
+
+def _status_cb(msg: str, color: str = "black") -> None:
+    print(msg, file=sys.stderr)
+
+
+def _strip_html(text: str) -> str:
+    return re.sub(r"<[^>]+>", "", text.replace("<br>", "\n"))
+
+
+class _Inputs:
+    """ダイアログ用コールバックを引数の値で置き換える。足りない入力は missing に記録する"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.missing: List[str] = []
+
+    def late_reason_cb(self) -> Optional[str]:
+        if not getattr(self.args, "late_reason", None):
+            self.missing.append("遅刻と判定されました。--late-reason で遅刻理由を指定してください。")
+            return None
+        return self.args.late_reason
+
+    def remark_cb(self, title: str = "備考入力", placeholder: str = "備考（任意）") -> Optional[str]:
+        # 空文字は休暇種別ごとのデフォルト備考になる
+        return getattr(self.args, "remark", None) or ""
+
+    def custom_input_cb(self) -> Optional[dict]:
+        if getattr(self.args, "start", None) is None or getattr(self.args, "end", None) is None:
+            self.missing.append("カスタム入力には --start と --end が必要です。")
+            return None
+        return {
+            "start": _CliTime(self.args.start),
+            "end": _CliTime(self.args.end),
+            "remark": getattr(self.args, "remark", None) or "",
+        }
+
+
+def _flush_queue(config) -> int:
+    import assets.timesheet_actions as ta
+    from assets.punch_queue import get_punch_queue
+
+    queue = get_punch_queue()
+    failed = False
+    for path in queue.pending_paths():
+        try:
+            written = ta.replay_punch_queue(path, config)
+            print(f"{path.name}: {written} 件書込みました")
+        except ta.TimesheetLockedError:
+            failed = True
+            _status_cb(f"{path.name}: Excelが開かれているため書込めません")
+        except ta.TimesheetWriteError as e:
+            # ファイルが見つからない等。打刻は書込待ちのまま残る
+            failed = True
+            _status_cb(f"{path.name}: {e}")
+    print(f"書込待ち: 残り {queue.pending_count()} 件")
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def _flush_outbox(config) -> int:
+    from assets.webhook_outbox import create_outbox_worker
+
+    worker = create_outbox_worker(config)
+    outbox = worker.outbox
+    sent = worker.run_once(force=True)
+    print(f"{sent} 件送信しました")
+    print(f"再送待ち: 残り {outbox.pending_count()} 件")
+    return EXIT_FAILED if outbox.pending_count() else EXIT_OK
+
+
+def _reconcile(args: argparse.Namespace, config) -> int:
+    from assets.punch_journal import reconcile, report
+
+    return report(reconcile(config, months=args.month, dry_run=args.dry_run))
+
+
+def _batch_dates(args: argparse.Namespace) -> List[date]:
+    """--date と --workdays の対象日（重複なし・昇順）"""
+    from assets.business_days import working_days_in_month
+
+    dates = set(args.dates)
+    for year, month in args.workdays:
+        dates.update(working_days_in_month(year, month))
+    return sorted(dates)
+
+
+def _run(args: argparse.Namespace, config) -> int:
+    import assets.timesheet_actions as ta
+    from assets.timesheet_helpers import get_today
+
+    if args.command == "flush-queue":
+        return _flush_queue(config)
+    if args.command == "flush-outbox":
+        return _flush_outbox(config)
+    if args.command == "reconcile":
+        return _reconcile(args, config)
+
+    inputs = _Inputs(args)
+    if args.command == "clock-in":
+        check_date = args.date or get_today()
+    elif args.command == "clock-out":
+        check_date = ta.clock_out_target_date(args.shift, args.cross_day)
+    else:
+        dates = _batch_dates(args)
+        check_date = dates[0]
+
+    if not args.force:
+        mismatch = ta.verify_timesheet_header(config, check_date)
+        if mismatch:
+            _status_cb(_strip_html(mismatch))
+            _status_cb("書込む場合は --force を指定してください。")
+            return EXIT_FAILED
+
+    if args.command == "clock-in":
+        ok, teams_error = ta.clock_in(
+            config=config, shift=args.shift, work_style=args.style, target_date=check_date,
+            is_assumed=args.assumed, no_post=args.no_post,
+            late_reason_cb=inputs.late_reason_cb, custom_input_cb=inputs.custom_input_cb,
+            remark_cb=inputs.remark_cb, status_cb=_status_cb,
+        )
+        done = f"出勤打刻が完了しました: {check_date:%Y/%m/%d} {args.shift}"
+    elif args.command == "clock-out":
+        ok, teams_error = ta.clock_out(
+            config=config, shift=args.shift, work_style=args.style, target_date=check_date,
+            no_post=args.no_post,
+            clock_out_info={
+                "next_workday": args.next_workday,
+                "next_shift": args.next_shift,
+                "next_work_mode": args.next_work_mode,
+                "mention": args.mention,
+                "comment": args.comment,
+            },
+            status_cb=_status_cb, is_cross_day=args.cross_day,
+        )
+        done = f"退勤打刻が完了しました: {check_date:%Y/%m/%d} {args.shift}"
+    else:
+        success, fail, queued = ta.batch_write(
+            config=config, dates=dates, shift=args.shift, work_style=args.style,
+            custom_input_cb=inputs.custom_input_cb, remark_cb=inputs.remark_cb,
+            status_cb=_status_cb,
+        )
+        if inputs.missing:
+            for msg in inputs.missing:
+                _status_cb(msg)
+            return EXIT_USAGE
+        summary = f"一括記入: 成功 {success} 件 / 失敗 {fail} 件"
+        if queued:
+            summary += f" / 書込待ち {queued} 件"
+        print(summary)
+        return EXIT_OK if fail == 0 else EXIT_FAILED
+
+    if not ok:
+        for msg in inputs.missing:
+            _status_cb(msg)
+        return EXIT_USAGE if inputs.missing else EXIT_FAILED
+    print(done)
+    if teams_error:
+        _status_cb(f"⚠ {teams_error}")
+    return EXIT_OK
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "batch" and not (args.dates or args.workdays):
+        parser.error("batch には --date または --workdays で対象日を指定してください")
+
+    os.chdir(_APP_DIR)
+    setup_logging()
+    _log.info("=== CLI 起動: %s ===", args.command)
+
+    from assets.config import Config
+
+    config = Config.load(args.settings)
+    # テスト日付オーバーライド（GUI と同じく環境変数が優先）
+    if config.test_date and not os.environ.get("KINTAI_TEST_DATE"):
+        os.environ["KINTAI_TEST_DATE"] = config.test_date
+
+    from assets.punch_journal import prune_for_config
+
+    # 保持月数より古い打刻ジャーナルを削除する
+    prune_for_config(config)
+    try:
+        return _run_and_report(args, config)
+    finally:
+        _finish_teams_posts()
+
+
+def _run_and_report(args, config) -> int:
+    """サブコマンドを実行し、打刻処理の例外をメッセージと終了コードにする"""
+    import assets.timesheet_actions as ta
+
+    try:
+        return _run(args, config)
+    except ta.TimesheetQueuedError as e:
+        print(f"{e}\nExcelを閉じてから `cli flush-queue` を実行するか、GUI を起動すると書込まれます。")
+        if e.teams_error:
+            _status_cb(f"⚠ {e.teams_error}")
+        return EXIT_OK
+    except ta.TimesheetNotFoundError as e:
+        _status_cb(f"タイムシートが見つかりません: {e.folder} {e.year:04d}{e.month:02d}{e.name}.xlsx")
+    except (ta.TimesheetLockedError, ta.TimesheetWriteError, ta.UnknownShiftTypeError) as e:
+        _status_cb(str(e))
+    except Exception as e:
+        _log.error("CLI 予期しないエラー: %s", e, exc_info=True)
+        _status_cb(f"エラーが発生しました: {e}")
+    return EXIT_FAILED
+
+
+def _finish_teams_posts() -> None:
+    """
+    送信待ちの Teams 投稿を送り終えてから終了する（デーモンスレッドのため待たないと失われる）。
+    送り切れなかった投稿は再送待ちに登録されるので、その旨を表示する
+    """
+    from assets.teams_dispatcher import shutdown_dispatcher
+
+    saved = shutdown_dispatcher()
+    if saved:
+        _status_cb(f"⚠ 送り切れなかった Teams 投稿 {saved} 件を再送待ちに登録しました。"
+                   "`cli flush-outbox` で送れます")
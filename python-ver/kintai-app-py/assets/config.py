@@ -14,6 +14,10 @@ class Config:
         "shift_display_name": "",
         "timesheet_display_name": "",
         "webhook_url": "",
+        # webhook_url に加えて同じ投稿を送る送信先（設定タブには表示しない）
+        # [{"name": "manager", "url": "...", "proxy_sh": "...", "webhook_io": {"read_timeout_sec": 20}}]
+        # proxy_sh を省略すると proxy_sh を、webhook_io は省略したキーを webhook_io の値を使う
+        "webhook_targets": [],
         "timesheet_folder": "",
         "output_folder": "attendance_data",
         "theme": "light",
@@ -21,6 +25,7 @@ class Config:
         "managers": [],
         "proxy_sh": "",
         "test_date": "",  # テスト用日付オーバーライド (YYYY-MM-DD)。空文字で無効
+        "ui_font": "",  # 初回起動時に検出した日本語フォント名（空文字で次回起動時に再検出）
         "timesheet_layout": {
             "year_cell": "C6",
             "month_cell": "C7",
@@ -31,6 +36,32 @@ class Config:
             "overtime_type_col": "K",
             "remark_col": "L",
         },
+        # タイムシート入出力の動作設定（設定タブには表示しない）
+        "timesheet_io": {
+            "dir_index_ttl_sec": 0,  # フォルダ一覧の強制再取得間隔（秒）。0 でフォルダの mtime 変化時のみ
+            "write_engine": "openpyxl",  # "openpyxl" / "direct"（シートXMLの対象セルだけを書換）
+            "atomic_save": False,  # 一時ファイルに保存して fsync 後に置き換える
+            "keep_backup": False,  # atomic_save 時に置換前のファイルを .bak として残す
+            "offline_queue": True,  # 保存時にファイルが開かれていたら打刻を書込待ちキューに登録する
+            "journal": True,  # 保存前後に打刻ジャーナル (assets/journal/YYYYMM.jsonl) へ記録する
+            "journal_keep_months": 13,  # 起動時にこの月数より古いジャーナルを削除する。0 以下で削除しない
+        },
+        # Teams Webhook 送信の動作設定（設定タブには表示しない）
+        "webhook_io": {
+            "connect_timeout_sec": 5.0,  # 接続（プロキシ CONNECT を含む）のタイムアウト
+            "read_timeout_sec": 10.0,  # 応答待ちのタイムアウト
+            "pool_maxsize": 4,  # 使い回す接続の上限数
+            "outbox": True,  # 送信に失敗した投稿を再送待ち (assets/outbox/) に登録して再送する
+            "outbox_max_attempts": 8,  # この回数送っても届かなければデッドレターに移す
+            "rate_limit_per_sec": 1.0,  # webhook_url ごとの送信レート（件/秒）。0 以下で制限しない
+            "rate_limit_burst": 4,  # 続けて送れる件数（トークンバケットの容量）
+            "rate_limits": {},  # webhook_url ごとの上書き {"<url>": {"per_sec": 0.5, "burst": 2}}
+            "coalesce_clock_in": False,  # 同じチャンネルへの出勤投稿をまとめて 1 枚のカードにする
+            "coalesce_window_sec": 2.0,  # まとめる出勤投稿を待つ秒数
+            "debug_capture": False,  # 送信したペイロードを timesheet/teams_debug/ に保存する（調査用）
+            "debug_capture_keep": 20,  # メモリ上に保持する直近の件数
+            "debug_capture_max_kb": 1024,  # teams_debug/ の合計サイズの上限。超えたら古いものから消す
+        },
     }
 
     def __init__(self, data: Dict[str, Any] = None):
@@ -41,6 +72,7 @@ class Config:
         self.shift_display_name: str = d.get("shift_display_name", self.DEFAULTS["shift_display_name"])
         self.timesheet_display_name: str = d.get("timesheet_display_name", self.DEFAULTS["timesheet_display_name"])
         self.webhook_url: str = d.get("webhook_url", self.DEFAULTS["webhook_url"])
+        self.webhook_targets: List[Dict[str, Any]] = d.get("webhook_targets", list(self.DEFAULTS["webhook_targets"]))
         self.timesheet_folder: str = d.get("timesheet_folder", self.DEFAULTS["timesheet_folder"])
         self.output_folder: str = d.get("output_folder", self.DEFAULTS["output_folder"])
         self.theme: str = d.get("theme", self.DEFAULTS["theme"])
@@ -48,8 +80,13 @@ class Config:
         self.managers: List[Dict[str, str]] = d.get("managers", list(self.DEFAULTS["managers"]))
         self.proxy_sh: str = d.get("proxy_sh", self.DEFAULTS["proxy_sh"])
         self.test_date: str = d.get("test_date", self.DEFAULTS["test_date"])
+        self.ui_font: str = d.get("ui_font", self.DEFAULTS["ui_font"])
         _default_layout = dict(self.DEFAULTS["timesheet_layout"])
         self.timesheet_layout: Dict[str, str] = {**_default_layout, **d.get("timesheet_layout", {})}
+        _default_io = dict(self.DEFAULTS["timesheet_io"])
+        self.timesheet_io: Dict[str, Any] = {**_default_io, **d.get("timesheet_io", {})}
+        _default_webhook_io = dict(self.DEFAULTS["webhook_io"])
+        self.webhook_io: Dict[str, Any] = {**_default_webhook_io, **d.get("webhook_io", {})}
 
     @classmethod
     def load(cls, path: str = "settings.json") -> "Config":
@@ -80,6 +117,7 @@ class Config:
             "shift_display_name": self.shift_display_name,
             "timesheet_display_name": self.timesheet_display_name,
             "webhook_url": self.webhook_url,
+            "webhook_targets": self.webhook_targets,
             "timesheet_folder": self.timesheet_folder,
             "output_folder": self.output_folder,
             "theme": self.theme,
@@ -87,5 +125,8 @@ class Config:
             "managers": self.managers,
             "proxy_sh": self.proxy_sh,
             "test_date": self.test_date,
+            "ui_font": self.ui_font,
             "timesheet_layout": self.timesheet_layout,
+            "timesheet_io": self.timesheet_io,
+            "webhook_io": self.webhook_io,
         }
@@ -0,0 +1,155 @@
+"""Teams 投稿ペイロードのデバッグ保存（webhook_io.debug_capture で有効にする）
+
+送信経路にディスク書込を挟まないよう、capture() はペイロードをメモリ上のリングバッファ
+（直近 debug_capture_keep 件）と書出し待ちに積むだけで戻る。書出しはデーモンスレッド
+（kintai-debug-capture）が行い、1 投稿 1 ファイルで timesheet/teams_debug/ に保存する。
+    {YYYYMMDD-HHMMSS-ffffff}-{message_type}.json
+    {"captured_at": ..., "message_type": ..., "payload": {...}}
+フォルダの合計が debug_capture_max_kb を超えたら古いファイルから消す。
+無効（既定）のときは何も保持・保存しない。
+"""
+import collections
+import json
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from assets.app_logger import get_logger
+from assets.config import Config
+
+_log = get_logger("kintai.webhook")
+
+_CAPTURE_DIR = Path(__file__).parent.parent / "timesheet" / "teams_debug"
+
+
+class DebugCapture:
+    """直近 keep 件のペイロードを保持し、バックグラウンドで directory に書出す"""
+
+    def __init__(self, directory: Path, keep: int = 20, max_bytes: int = 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._ring: Deque[Dict[str, Any]] = collections.deque(maxlen=max(int(keep), 1))
+        # 書出し待ち（書出しが追いつかなくてもリングと同じ件数までしか溜めない）
+        self._pending: Deque[Dict[str, Any]] = collections.deque(maxlen=max(int(keep), 1))
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def resize(self, keep: int) -> None:
+        """保持件数を変える（新しい方から keep 件を残す）"""
+        keep = max(int(keep), 1)
+        with self._lock:
+            if self._ring.maxlen != keep:
+                self._ring = collections.deque(self._ring, maxlen=keep)
+                self._pending = collections.deque(self._pending, maxlen=keep)
+
+    def capture(self, message_type: str, payload: Dict[str, Any]) -> None:
+        """ペイロードを積んで書出しスレッドを起こす（ディスクには書かずに戻る）"""
+        now = datetime.now()
+        entry = {"captured_at": now.isoformat(timespec="microseconds"),
+                 "message_type": message_type, "payload": payload}
+        with self._lock:
+            self._ring.append(entry)
+            self._pending.append(entry)
+        self.start()
+        self._wake.set()
+
+    def recent(self) -> List[Dict[str, Any]]:
+        """保持しているペイロード（古い順）"""
+        with self._lock:
+            return list(self._ring)
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="kintai-debug-capture", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """書出し待ちを書き終えてからスレッドを止める"""
+        self._stop.set()
+        self._wake.set()
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            self.flush()
+            if self._stop.is_set():
+                return
+
+    def flush(self) -> int:
+        """書出し待ちをファイルに書き、容量を超えた古いファイルを消す。書いた件数を返す"""
+        with self._lock:
+            entries = list(self._pending)
+            self._pending.clear()
+        if not entries:
+            return 0
+        with self._write_lock:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                for entry in entries:
+                    stamp = datetime.fromisoformat(entry["captured_at"]).strftime("%Y%m%d-%H%M%S-%f")
+                    path = self.directory / f"{stamp}-{entry['message_type']}.json"
+                    with open(path, "w", encoding="utf-8") as f:
+                        json.dump(entry, f, ensure_ascii=False, indent=2)
+                self._rotate()
+            except OSError as e:
+                _log.warning("デバッグ用ペイロードを保存できません: %s", e)
+                return 0
+        return len(entries)
+
+    def _rotate(self) -> None:
+        files = sorted(self.directory.glob("*.json"))
+        sizes = [p.stat().st_size for p in files]
+        total = sum(sizes)
+        # 最新の 1 件は上限を超えていても残す
+        for path, size in zip(files[:-1], sizes[:-1]):
+            if total <= self.max_bytes:
+                break
+            path.unlink()
+            total -= size
+
+
+_capture: Optional[DebugCapture] = None
+_capture_lock = threading.Lock()
+
+
+def get_capture(config) -> Optional[DebugCapture]:
+    """webhook_io.debug_capture が有効ならプロセス共通の DebugCapture を返す（無効なら None）"""
+    global _capture
+    io = {**Config.DEFAULTS["webhook_io"], **(getattr(config, "webhook_io", None) or {})}
+    if not io.get("debug_capture"):
+        return None
+    with _capture_lock:
+        if _capture is None:
+            _capture = DebugCapture(_CAPTURE_DIR)
+        _capture.resize(int(io["debug_capture_keep"]))
+        _capture.max_bytes = int(float(io["debug_capture_max_kb"]) * 1024)
+        return _capture
+
+
+def capture(config, message_type: str, payload: Dict[str, Any]) -> None:
+    """送信直前のペイロードを記録する（無効なら何もしない）"""
+    cap = get_capture(config)
+    if cap is not None:
+        cap.capture(message_type, payload)
+
+
+def recent_payloads() -> List[Dict[str, Any]]:
+    """直近に記録したペイロード（無効・未記録なら空リスト）"""
+    return _capture.recent() if _capture is not None else []
+
+
+def shutdown_capture(timeout: float = 2.0) -> None:
+    """アプリ終了時に書出し待ちを書き終える（最大 timeout 秒）"""
+    if _capture is not None:
+        _capture.stop(timeout)
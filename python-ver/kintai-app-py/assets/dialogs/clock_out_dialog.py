@@ -8,6 +8,12 @@ except ImportError:
     def get_today():
         return date.today()
 
+try:
+    from assets.business_days import next_working_day
+except ImportError:
+    def next_working_day(d: date) -> date:
+        return d + timedelta(days=1)
+
 from PyQt5.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QFormLayout, QLabel,
     QDateEdit, QComboBox, QLineEdit, QDialogButtonBox,
@@ -44,11 +50,11 @@ class ClockOutDialog(QDialog):
         form = QFormLayout()
         form.setSpacing(8)
 
-        # 次回出勤日
-        tomorrow = get_today() + timedelta(days=1)
+        # 次回出勤日（初期値は翌営業日。土日・祝日を飛ばす）
+        next_day = next_working_day(get_today())
         self.next_workday_edit = QDateEdit()
         self.next_workday_edit.setCalendarPopup(True)
-        self.next_workday_edit.setDate(QDate(tomorrow.year, tomorrow.month, tomorrow.day))
+        self.next_workday_edit.setDate(QDate(next_day.year, next_day.month, next_day.day))
         self.next_workday_edit.setDisplayFormat("yyyy/MM/dd")
         form.addRow("次回出勤日：", self.next_workday_edit)
 
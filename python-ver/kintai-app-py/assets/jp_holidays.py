@@ -0,0 +1,216 @@
+"""日本の祝日（年ごとの祝日表）
+
+祝日法の規則で 1 年分の祝日を 1 回だけ計算し、年ごとにキャッシュする。
+
+    from assets.jp_holidays import is_holiday, holidays_in_month, count_holidays
+    is_holiday(date(2026, 9, 22))                              # True（国民の休日）
+    holidays_in_month(2026, 5)                                 # {5/3, 5/4, 5/5, 5/6（振替休日）}
+    count_holidays(date(2026, 1, 1), date(2026, 12, 31))       # 両端を含む
+
+年ごとの表は「1 月 1 日からの日数」をビット位置にしたビットマップ（int）と月ごとの
+frozenset で持つ。is_holiday() は 1 ビットの参照、count_holidays() は範囲のビット数を
+数えるだけで、日付を 1 日ずつ調べない。
+
+対象は 1949 年以降（それより前の年は祝日なし）。次の規則を反映する。
+- 祝日の新設・廃止・日付の変更（天皇誕生日・ハッピーマンデー等）
+- 東京オリンピック・パラリンピック特措法による 2020・2021 年の移動
+- 皇室の慶弔などで 1 回だけ休日になった日
+- 振替休日（1973 年 4 月 12 日以降。2007 年以降は祝日でない最も近い日）
+- 国民の休日（1985 年 12 月 27 日以降。前日と翌日が祝日の日）
+春分・秋分の日は近似式による（官報で公表される前の年は予測値）。
+"""
+import threading
+from datetime import date, timedelta
+from typing import Dict, FrozenSet, Optional, Tuple
+
+_FIRST_YEAR = 1949
+
+# 特措法で移動した祝日（年, 名前）→ (月, 日)
+_MOVED: Dict[Tuple[int, str], Tuple[int, int]] = {
+    (2020, "海の日"): (7, 23),
+    (2020, "スポーツの日"): (7, 24),
+    (2020, "山の日"): (8, 10),
+    (2021, "海の日"): (7, 22),
+    (2021, "スポーツの日"): (7, 23),
+    (2021, "山の日"): (8, 8),
+}
+
+# 1 回だけの休日（振替休日・国民の休日の判定では祝日として扱う）
+_ONE_OFF: Dict[date, str] = {
+    date(1959, 4, 10): "皇太子明仁親王の結婚の儀",
+    date(1989, 2, 24): "昭和天皇の大喪の礼",
+    date(1990, 11, 12): "即位礼正殿の儀",
+    date(1993, 6, 9): "皇太子徳仁親王の結婚の儀",
+    date(2019, 5, 1): "天皇の即位の日",
+    date(2019, 10, 22): "即位礼正殿の儀",
+}
+
+_SUBSTITUTE_FROM = date(1973, 4, 12)
+_SANDWICH_FROM = date(1985, 12, 27)
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """
+    指定した年月の第 n 回目の曜日 (0=月曜...6=日曜) を返す。
+    """
+    first = date(year, month, 1)
+    # first.weekday() が weekday より大きい場合は翌週に補正
+    diff = (weekday - first.weekday()) % 7
+    first_occurrence = first + timedelta(days=diff)
+    return first_occurrence + timedelta(weeks=n - 1)
+
+
+def _vernal_equinox(year: int) -> int:
+    """春分の日（3月）の日を返す（近似計算）"""
+    if year <= 1979:
+        return int(20.8357 + 0.242194 * (year - 1980) - int((year - 1983) / 4))
+    elif year <= 2099:
+        return int(20.8431 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
+    else:
+        return int(21.851 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
+
+
+def _autumnal_equinox(year: int) -> int:
+    """秋分の日（9月）の日を返す（近似計算）"""
+    if year <= 1979:
+        return int(23.2588 + 0.242194 * (year - 1980) - int((year - 1983) / 4))
+    elif year <= 2099:
+        return int(23.2488 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
+    else:
+        return int(24.2488 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
+
+
+def _national_holidays(year: int) -> Dict[date, str]:
+    """その年の「国民の祝日」（と 1 回だけの休日）。振替休日・国民の休日は含まない"""
+    days: Dict[date, str] = {}
+
+    def add(name: str, d: date) -> None:
+        moved = _MOVED.get((year, name))
+        days[date(year, *moved) if moved else d] = name
+
+    add("元日", date(year, 1, 1))
+    add("成人の日", date(year, 1, 15) if year <= 1999 else _nth_weekday(year, 1, 0, 2))
+    if year >= 1967:
+        add("建国記念の日", date(year, 2, 11))
+    if year >= 2020:
+        add("天皇誕生日", date(year, 2, 23))
+    add("春分の日", date(year, 3, _vernal_equinox(year)))
+    if year <= 1988:
+        add("天皇誕生日", date(year, 4, 29))
+    else:
+        add("みどりの日" if year <= 2006 else "昭和の日", date(year, 4, 29))
+    add("憲法記念日", date(year, 5, 3))
+    if year >= 2007:
+        add("みどりの日", date(year, 5, 4))
+    add("こどもの日", date(year, 5, 5))
+    if 1996 <= year <= 2002:
+        add("海の日", date(year, 7, 20))
+    elif year >= 2003:
+        add("海の日", _nth_weekday(year, 7, 0, 3))
+    if year >= 2016:
+        add("山の日", date(year, 8, 11))
+    if 1966 <= year <= 2002:
+        add("敬老の日", date(year, 9, 15))
+    elif year >= 2003:
+        add("敬老の日", _nth_weekday(year, 9, 0, 3))
+    add("秋分の日", date(year, 9, _autumnal_equinox(year)))
+    if 1966 <= year <= 1999:
+        add("体育の日", date(year, 10, 10))
+    elif 2000 <= year <= 2019:
+        add("体育の日", _nth_weekday(year, 10, 0, 2))
+    else:
+        add("スポーツの日", _nth_weekday(year, 10, 0, 2))
+    add("文化の日", date(year, 11, 3))
+    add("勤労感謝の日", date(year, 11, 23))
+    if 1989 <= year <= 2018:
+        add("天皇誕生日", date(year, 12, 23))
+    days.update({d: name for d, name in _ONE_OFF.items() if d.year == year})
+    return days
+
+
+def _compute_holidays(year: int) -> Dict[date, str]:
+    """その年の休日（国民の祝日・振替休日・国民の休日）と名前"""
+    if year < _FIRST_YEAR:
+        return {}
+    national = _national_holidays(year)
+    days = dict(national)
+    one_day = timedelta(days=1)
+
+    # 振替休日: 祝日が日曜日なら、2007 年以降は祝日でない最も近い日、それより前は翌日
+    for d in sorted(national):
+        if d.weekday() != 6 or d < _SUBSTITUTE_FROM:
+            continue
+        candidate = d + one_day
+        if year >= 2007:
+            while candidate in national:
+                candidate += one_day
+        if candidate not in national and candidate.year == year:
+            days.setdefault(candidate, "振替休日")
+
+    # 国民の休日: 前日と翌日が祝日の日（2006 年までは日曜日を除く）
+    for d in sorted(national):
+        candidate = d + one_day
+        if (candidate >= _SANDWICH_FROM and candidate + one_day in national
+                and candidate not in days and candidate.year == year
+                and (year >= 2007 or candidate.weekday() != 6)):
+            days[candidate] = "国民の休日"
+    return days
+
+
+class _YearTable:
+    """1 年分の休日表（ビットマップ・月ごとの集合・名前）"""
+
+    __slots__ = ("start", "bits", "months", "names")
+
+    def __init__(self, year: int):
+        self.start = date(year, 1, 1).toordinal()
+        self.names = _compute_holidays(year)
+        self.bits = 0
+        months = [set() for _ in range(13)]
+        for d in self.names:
+            self.bits |= 1 << (d.toordinal() - self.start)
+            months[d.month].add(d)
+        self.months: Tuple[FrozenSet[date], ...] = tuple(frozenset(m) for m in months)
+
+
+_tables: Dict[int, _YearTable] = {}
+_tables_lock = threading.Lock()
+
+
+def _table(year: int) -> _YearTable:
+    table = _tables.get(year)
+    if table is None:
+        with _tables_lock:
+            table = _tables.get(year)
+            if table is None:
+                table = _tables[year] = _YearTable(year)
+    return table
+
+
+def is_holiday(d: date) -> bool:
+    """d が祝日（振替休日・国民の休日を含む）なら True。土日は含まない"""
+    table = _table(d.year)
+    return bool(table.bits >> (d.toordinal() - table.start) & 1)
+
+
+def holiday_name(d: date) -> Optional[str]:
+    """祝日の名前（"春分の日"・"振替休日"・"国民の休日" 等）。祝日でなければ None"""
+    return _table(d.year).names.get(d)
+
+
+def holidays_in_month(year: int, month: int) -> FrozenSet[date]:
+    """指定した年月の祝日の集合（キャッシュした frozenset をそのまま返す）"""
+    return _table(year).months[month]
+
+
+def count_holidays(start: date, end: date) -> int:
+    """start から end まで（両端を含む）の祝日の数。start > end なら 0"""
+    total = 0
+    for year in range(start.year, end.year + 1):
+        table = _table(year)
+        lo = max(start.toordinal(), table.start) - table.start
+        hi = min(end.toordinal(), date(year, 12, 31).toordinal()) - table.start
+        if hi >= lo:
+            total += (table.bits >> lo & ((1 << (hi - lo + 1)) - 1)).bit_count()
+    return total
+
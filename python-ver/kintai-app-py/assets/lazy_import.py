@@ -0,0 +1,51 @@
+"""重いモジュールの遅延 import"""
+import importlib
+import importlib.util
+import sys
+import threading
+from types import ModuleType
+from typing import Optional
+
+
+class _LazyModule(ModuleType):
+    """属性に最初にアクセスした時点で本体を import し、以降は本体に委譲する"""
+
+    def __getattr__(self, attr: str):
+        # インスタンスに無い属性だけがここに来る（patch で差替えた属性はそのまま使われる）
+        module = self.__dict__.get("_module")
+        if module is None:
+            # import 自体はモジュール単位のロックで保護されるため複数スレッドから呼んでもよい
+            module = importlib.import_module(self.__name__)
+            self.__dict__["_module"] = module
+        return getattr(module, attr)
+
+
+def lazy_import(name: str) -> Optional[ModuleType]:
+    """
+    モジュールを属性に最初にアクセスした時点で読込む形で import する。
+    import 済みならそのモジュールを、インストールされていなければ None を返す。
+
+        openpyxl = lazy_import("openpyxl")   # ここではまだ読込まない
+        openpyxl.load_workbook(path)         # ここで初めて読込む
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    if importlib.util.find_spec(name) is None:
+        return None
+    return _LazyModule(name)
+
+
+def warm_up(*names: str) -> None:
+    """遅延 import したモジュールを読込んでおく。読込めないモジュールは無視する"""
+    for name in names:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def warm_up_in_background(*names: str) -> threading.Thread:
+    """warm_up をデーモンスレッドで実行する（最初の描画後に呼び、最初の打刻の待ち時間をなくす）"""
+    t = threading.Thread(target=warm_up, args=names, name="kintai-warm-up", daemon=True)
+    t.start()
+    return t
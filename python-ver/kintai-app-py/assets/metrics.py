@@ -0,0 +1,145 @@
+"""プロセス内の計測値（ヒストグラム・カウンター）
+
+Teams 投稿の所要時間や応答コードを、ログを検索しなくても確認できるように集計する。
+
+    from assets import metrics
+    metrics.observe("webhook.post_ms", 123.4)       # ヒストグラムに 1 件追加（ミリ秒）
+    metrics.increment("webhook.status", "202")      # カウンターのラベルごとに +1
+    with metrics.timer("proxy.resolve_ms"):
+        ...
+
+値はメモリ上だけに持ち、snapshot() で dict、format_summary() で表示用の文字列、
+dump(path) で JSON ファイルにする（設定タブの「Teams 送信統計」から表示・保存できる）。
+ヒストグラムは固定のバケット境界（BUCKETS_MS）ごとの件数で持ち、パーセンタイルは
+バケットの上限値で近似する。
+"""
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# ヒストグラムのバケット上限（ミリ秒）。最後のバケットは上限なし
+BUCKETS_MS: Tuple[float, ...] = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class Histogram:
+    """固定バケットのヒストグラム（ロックは MetricsRegistry が持つ）"""
+
+    def __init__(self, bounds: Tuple[float, ...] = BUCKETS_MS):
+        self.bounds = bounds
+        self.counts: List[int] = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float) -> None:
+        i = next((i for i, bound in enumerate(self.bounds) if value <= bound), len(self.bounds))
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """p パーセンタイル（0〜100）をそのバケットの上限値で返す（max を超える場合・最後のバケットは max）"""
+        if not self.count:
+            return None
+        rank = self.count * p / 100
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if n and seen >= rank:
+                return min(self.bounds[i], self.max) if i < len(self.bounds) else self.max
+        return self.max
+
+    def to_dict(self) -> Dict[str, Any]:
+        labels = [f"<={b:g}" for b in self.bounds] + [f">{self.bounds[-1]:g}"]
+        return {
+            "count": self.count,
+            "sum": round(self.total, 3),
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": {label: n for label, n in zip(labels, self.counts) if n},
+        }
+
+
+class MetricsRegistry:
+    """名前ごとのヒストグラムとカウンターを持つ（スレッドセーフ）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+        self._since = datetime.now()
+
+    def observe(self, name: str, value_ms: float) -> None:
+        with self._lock:
+            self._histograms.setdefault(name, Histogram()).observe(value_ms)
+
+    def increment(self, name: str, label: str = "", n: int = 1) -> None:
+        with self._lock:
+            counter = self._counters.setdefault(name, {})
+            counter[label] = counter.get(label, 0) + n
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """with ブロックの所要時間（ミリ秒）を name に記録する（例外でも記録する）"""
+        t = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, (time.perf_counter() - t) * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "since": self._since.isoformat(timespec="seconds"),
+                "histograms": {name: h.to_dict() for name, h in sorted(self._histograms.items())},
+                "counters": {name: dict(sorted(c.items())) for name, c in sorted(self._counters.items())},
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self._since = datetime.now()
+
+    def dump(self, path) -> Path:
+        """snapshot() を JSON ファイルに書く"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        return path
+
+    def format_summary(self) -> str:
+        """表示用の文字列（ヒストグラムは件数・p50/p90/p99・最大、カウンターはラベルごとの件数）"""
+        snap = self.snapshot()
+        lines = [f"集計開始: {snap['since']}"]
+        if not snap["histograms"] and not snap["counters"]:
+            lines.append("（まだ記録がありません）")
+        for name, h in snap["histograms"].items():
+            lines.append(f"{name:<22} n={h['count']:<5} p50≤{h['p50']:g}  p90≤{h['p90']:g}  "
+                         f"p99≤{h['p99']:g}  max={h['max']:.1f}")
+        for name, counts in snap["counters"].items():
+            lines.append(f"{name:<22} " + "  ".join(f"{label}={n}" for label, n in counts.items()))
+        return "\n".join(lines)
+
+
+registry = MetricsRegistry()
+
+observe = registry.observe
+increment = registry.increment
+timer = registry.timer
+snapshot = registry.snapshot
+format_summary = registry.format_summary
+dump = registry.dump
+reset = registry.reset
@@ -0,0 +1,281 @@
+"""打刻ジャーナル（タイムシート保存前に書く追記専用の記録）と照合・再適用
+
+打刻ごとに、タイムシートを保存する前に「何をどのファイルに書くか」を
+assets/journal/{YYYYMM}.jsonl（打刻対象日の年月）に追記し、保存後に結果を追記する。
+    {"op": "intent",  "id": ..., "ts": ..., "action": ..., "shift": ..., "path": ..., "row": {...}}
+    {"op": "outcome", "id": ..., "ts": ..., "outcome": "ok" | "queued" | "locked" | "error", "error": ...}
+
+reconcile() はジャーナルを月ごとに1回読み、タイムシート1ファイルにつき1回だけ
+読込・保存して、空のままになっているセルにジャーナルの値を書込む。再適用するのは
+保存できた（ok・queued）か結果が記録されていない（保存中に終了した）打刻だけで、
+失敗を通知した（locked・error）打刻は再適用せず件数を報告する。
+
+    python -m assets.punch_journal reconcile [--month 202602] [--dry-run]
+
+ジャーナルは月ごとのファイルなので、起動時に prune() で保持月数より古い月のファイルを削除する。
+"""
+import json
+import os
+import sys
+import threading
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from assets.app_logger import get_logger
+
+_log = get_logger("kintai.journal")
+
+_JOURNAL_DIR = Path(__file__).parent / "journal"
+
+_lock = threading.Lock()
+
+# reconcile() で再適用する保存結果（None = 保存中に終了して結果が未記録）
+_REAPPLY_OUTCOMES = ("ok", "queued", None)
+
+
+def _journal_file(target_date: date, journal_dir: Path) -> Path:
+    return journal_dir / f"{target_date.year:04d}{target_date.month:02d}.jsonl"
+
+
+def _append(path: Path, records: List[Dict[str, Any]]) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec="seconds")
+
+
+def record_intent(xlsx_path, rows: List[dict], action: str = "", shift: str = "",
+                  journal_dir: Optional[Path] = None) -> List[Tuple[Path, str]]:
+    """
+    保存前に rows（row_data のリスト）をジャーナルに追記する。
+    record_outcome() に渡すための (ジャーナルファイル, エントリID) のリストを返す。
+    ジャーナルに書けなくても打刻は止めない（ログに WARNING を出して空リストを返す）。
+    """
+    journal_dir = Path(journal_dir or _JOURNAL_DIR)
+    by_file: Dict[Path, List[Dict[str, Any]]] = {}
+    for row_data in rows:
+        row = dict(row_data)
+        row["date"] = row_data["date"].isoformat()
+        rec = {
+            "op": "intent", "id": uuid.uuid4().hex, "ts": _now(),
+            "action": action, "shift": shift or row_data.get("shift_label") or "",
+            "path": str(Path(xlsx_path).absolute()), "row": row,
+        }
+        by_file.setdefault(_journal_file(row_data["date"], journal_dir), []).append(rec)
+    try:
+        with _lock:
+            for path, records in by_file.items():
+                _append(path, records)
+    except OSError as e:
+        _log.warning("ジャーナルに書込めません: %s", e)
+        return []
+    return [(path, rec["id"]) for path, records in by_file.items() for rec in records]
+
+
+def record_outcome(entries: List[Tuple[Path, str]], outcome: str, error: str = "") -> None:
+    """record_intent() したエントリの保存結果を追記する"""
+    by_file: Dict[Path, List[Dict[str, Any]]] = {}
+    for path, entry_id in entries:
+        rec = {"op": "outcome", "id": entry_id, "ts": _now(), "outcome": outcome}
+        if error:
+            rec["error"] = error
+        by_file.setdefault(path, []).append(rec)
+    try:
+        with _lock:
+            for path, records in by_file.items():
+                _append(path, records)
+    except OSError as e:
+        _log.warning("ジャーナルに書込めません: %s", e)
+
+
+def read_journal(path: Path) -> List[Dict[str, Any]]:
+    """
+    ジャーナル1ファイル分の intent を記録順に返す。
+    各要素は intent レコードに "outcome"（未記録なら None）を加えたもの。
+    途中で切れた行は読み飛ばす。
+    """
+    intents: Dict[str, Dict[str, Any]] = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                _log.warning("ジャーナルの不正な行を無視: %s %r", path.name, line[:80])
+                continue
+            if rec.get("op") == "intent":
+                rec["outcome"] = None
+                intents[rec["id"]] = rec
+            elif rec.get("op") == "outcome" and rec.get("id") in intents:
+                intents[rec["id"]]["outcome"] = rec.get("outcome")
+    return list(intents.values())
+
+
+def prune(keep_months: int, journal_dir: Optional[Path] = None,
+          today: Optional[date] = None) -> List[Path]:
+    """
+    今月を含めて keep_months か月より前のジャーナルファイルを削除し、削除したファイルを返す。
+    keep_months が 0 以下なら何もしない。削除できないファイルはログに WARNING を出して残す。
+    """
+    if keep_months <= 0:
+        return []
+    journal_dir = Path(journal_dir or _JOURNAL_DIR)
+    if not journal_dir.is_dir():
+        return []
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - (keep_months - 1)
+    oldest = f"{index // 12:04d}{index % 12 + 1:02d}"
+    removed = []
+    for path in sorted(journal_dir.glob("*.jsonl")):
+        if not (len(path.stem) == 6 and path.stem.isdigit()) or path.stem >= oldest:
+            continue
+        try:
+            path.unlink()
+        except OSError as e:
+            _log.warning("古いジャーナルを削除できません: %s (%s)", path.name, e)
+            continue
+        removed.append(path)
+    if removed:
+        _log.info("古いジャーナルを削除: %s", ", ".join(p.name for p in removed))
+    return removed
+
+
+def prune_for_config(config) -> List[Path]:
+    """config.timesheet_io["journal_keep_months"] に従って prune() する（起動時に 1 回）"""
+    _io = getattr(config, "timesheet_io", {}) or {}
+    try:
+        return prune(int(_io.get("journal_keep_months", 13)))
+    except Exception as e:
+        _log.warning("ジャーナルの整理に失敗: %s", e)
+        return []
+
+
+def _same_value(a: Any, b: Any) -> bool:
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return abs(a - b) < 1e-9
+    return a == b
+
+
+def reconcile(config, months: Optional[List[str]] = None, dry_run: bool = False,
+              journal_dir: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """
+    ジャーナルとタイムシートを照合し、タイムシートで空のままのセルにジャーナルの値を書込む。
+    同じセルに複数の記録があれば最後の記録を使う。値が入っていて異なるセルは
+    手修正とみなして書換えず mismatched として数える。
+    保存結果が locked・error の記録（ユーザーには失敗と通知済み）は再適用せず、
+    その行数を failed として数える。
+    months（"YYYYMM" のリスト）省略時はジャーナルの全月が対象。
+    タイムシートごとに {"path", "checked", "applied", "mismatched", "failed", "error"} を返す。
+    """
+    from assets.timesheet_actions import TimesheetSession, TimesheetWriteError, _ROW_COLUMNS
+
+    journal_dir = Path(journal_dir or _JOURNAL_DIR)
+    files = sorted(journal_dir.glob("*.jsonl")) if journal_dir.is_dir() else []
+    if months:
+        files = [p for p in files if p.stem in set(months)]
+
+    results: List[Dict[str, Any]] = []
+    for journal_path in files:
+        # タイムシートごとに (日付, 列キー) → 最後に記録された値
+        latest: Dict[str, Dict[Tuple[date, str], Any]] = {}
+        failed: Dict[str, int] = {}
+        for rec in read_journal(journal_path):
+            cells = latest.setdefault(rec["path"], {})
+            if rec["outcome"] not in _REAPPLY_OUTCOMES:
+                failed[rec["path"]] = failed.get(rec["path"], 0) + 1
+                _log.info("保存に失敗した打刻は再適用しない: %s %s outcome=%s",
+                          Path(rec["path"]).name, rec["row"].get("date"), rec["outcome"])
+                continue
+            target_date = date.fromisoformat(rec["row"]["date"])
+            for key, _ in _ROW_COLUMNS:
+                if rec["row"].get(key) is not None:
+                    cells[(target_date, key)] = rec["row"][key]
+
+        for xlsx_path, cells in latest.items():
+            result = {"path": Path(xlsx_path), "checked": 0, "applied": 0,
+                      "mismatched": 0, "failed": failed.get(xlsx_path, 0), "error": ""}
+            results.append(result)
+            if not cells:
+                continue
+            if not Path(xlsx_path).exists():
+                result["error"] = "ファイルが見つかりません"
+                continue
+            try:
+                with TimesheetSession(Path(xlsx_path), config, queue_on_lock=False) as session:
+                    for (target_date, key), value in cells.items():
+                        result["checked"] += 1
+                        try:
+                            row_num = session.require_row(target_date)
+                        except TimesheetWriteError as e:
+                            result["error"] = str(e)
+                            continue
+                        col_key = dict(_ROW_COLUMNS)[key]
+                        current = session.read_cell(row_num, col_key)
+                        if current is None or current == "":
+                            session.write_row({"date": target_date, key: value})
+                            result["applied"] += 1
+                        elif not _same_value(current, value):
+                            result["mismatched"] += 1
+                            _log.info("ジャーナルと不一致（書換えない）: %s %s %s journal=%r sheet=%r",
+                                      Path(xlsx_path).name, target_date, key, value, current)
+                    if result["applied"] and not dry_run:
+                        session.save()
+            except Exception as e:
+                result["error"] = str(e)
+                _log.warning("ジャーナル照合エラー: %s (%s)", xlsx_path, e)
+                continue
+            _log.info("ジャーナル照合: %s 確認=%d 再適用=%d 不一致=%d 保存失敗=%d%s",
+                      Path(xlsx_path).name, result["checked"], result["applied"],
+                      result["mismatched"], result["failed"], "（dry-run）" if dry_run else "")
+    return results
+
+
+def report(results: List[Dict[str, Any]]) -> int:
+    """reconcile() の結果を1ファイル1行で表示し、エラーがあれば 1 を返す"""
+    failed = False
+    for r in results:
+        line = (f"{r['path'].name}: 確認 {r['checked']} / 再適用 {r['applied']} / "
+                f"不一致 {r['mismatched']}")
+        if r.get("failed"):
+            line += f" / 保存失敗の記録 {r['failed']}（再適用しない）"
+        if r["error"]:
+            line += f" / エラー: {r['error']}"
+            failed = True
+        print(line)
+    if not results:
+        print("ジャーナルがありません")
+    return 1 if failed else 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m assets.punch_journal",
+                                     description="打刻ジャーナルとタイムシートの照合")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rec = sub.add_parser("reconcile", help="タイムシートで空のセルにジャーナルの値を再適用する")
+    rec.add_argument("--month", action="append", metavar="YYYYMM", help="対象月（複数指定可）")
+    rec.add_argument("--dry-run", action="store_true", help="書込まずに結果だけ表示する")
+    rec.add_argument("--settings", default=str(Path(__file__).parent.parent / "configs" / "settings.json"),
+                     help="settings.json のパス")
+    args = parser.parse_args(argv)
+
+    from assets.app_logger import setup_logging
+    from assets.config import Config
+
+    setup_logging()
+    config = Config.load(args.settings)
+    return report(reconcile(config, months=args.month, dry_run=args.dry_run))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,338 @@
+"""Excel書込待ちの打刻キュー（オフライン打刻キュー）
+
+タイムシートが Excel で開かれていて保存できなかった打刻の row_data を
+JSONL ファイルに追記して永続化し、バックグラウンドのワーカーがファイルが
+閉じられるまで指数バックオフで再書込する。ロック以外の理由で再書込に
+_MAX_ATTEMPTS 回失敗したエントリはデッドレターに移す。
+
+ファイル形式（1行1レコード、追記のみ）:
+    {"op": "add",    "id": ..., "path": ..., "row": {...}, "queued_at": ...}
+    {"op": "retry",  "id": ..., "attempts": ..., "error": ...}
+    {"op": "done",   "id": ...}
+    {"op": "failed", "id": ..., "error": ...}
+    {"op": "dead",   "id": ..., "error": ...}
+未処理のレコードがなくなった時点でファイルを空に戻す。
+デッドレター（punch_dead_letter.jsonl）には add レコードに attempts・error・dead_at を加えて追記する。
+"""
+import json
+import os
+import threading
+import uuid
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from assets.app_logger import get_logger
+
+_log = get_logger("kintai.queue")
+
+_QUEUE_DIR = Path(__file__).parent / "queue"
+_QUEUE_FILE = _QUEUE_DIR / "punch_queue.jsonl"
+_DEAD_LETTER_FILE = _QUEUE_DIR / "punch_dead_letter.jsonl"
+
+# 再書込の待ち時間（秒）。ロック中は失敗するたびに倍にして上限で止める
+_RETRY_BASE_SEC = 5.0
+_RETRY_MAX_SEC = 300.0
+# ロック以外のエラーで再書込に失敗できる回数（これに達したらデッドレターに移す）
+_MAX_ATTEMPTS = 8
+
+
+def _path_key(path) -> str:
+    """ファイルパスの比較用キー（絶対パス・大文字小文字を OS に合わせて正規化）"""
+    return os.path.normcase(os.path.abspath(str(path)))
+
+
+def _encode_row(row_data: dict) -> Dict[str, Any]:
+    row = dict(row_data)
+    if isinstance(row.get("date"), date):
+        row["date"] = row["date"].isoformat()
+    return row
+
+
+def _decode_row(row: Dict[str, Any]) -> dict:
+    row_data = dict(row)
+    if isinstance(row_data.get("date"), str):
+        row_data["date"] = date.fromisoformat(row_data["date"])
+    return row_data
+
+
+class PunchQueue:
+    """
+    書込待ち打刻の永続キュー。スレッドセーフ。
+    ファイルは起動時に1回だけ読込み、以降はメモリ上の内容と追記で同期する。
+    """
+
+    def __init__(self, path: Path = _QUEUE_FILE, dead_letter_path: Path = _DEAD_LETTER_FILE):
+        self.path = Path(path)
+        self.dead_letter_path = Path(dead_letter_path)
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}  # id → add レコード（登録順）
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            _log.error("打刻キューを読込めません: %s (%s)", self.path, e)
+            return
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                # 追記中に終了した場合の途中行は読み飛ばす
+                _log.warning("打刻キューの不正な行を無視: %r", line[:80])
+                continue
+            if rec.get("op") == "add":
+                self._entries[rec["id"]] = rec
+            elif rec.get("op") == "retry":
+                if rec.get("id") in self._entries:
+                    self._entries[rec["id"]].update(attempts=rec["attempts"], error=rec.get("error"))
+            else:
+                self._entries.pop(rec.get("id"), None)
+        if self._entries:
+            _log.info("打刻キュー読込: 未処理=%d件", len(self._entries))
+
+    def _append(self, records: List[Dict[str, Any]], path: Optional[Path] = None) -> None:
+        path = self.path if path is None else path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self) -> None:
+        """未処理がなくなったらファイルを空にする"""
+        try:
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+        except OSError as e:
+            _log.warning("打刻キューを空にできません: %s (%s)", self.path, e)
+
+    def enqueue(self, xlsx_path, row_data: dict) -> str:
+        """row_data を書込待ちとして登録し、エントリIDを返す"""
+        rec = {
+            "op": "add",
+            "id": uuid.uuid4().hex,
+            "path": str(Path(xlsx_path).absolute()),
+            "row": _encode_row(row_data),
+            "queued_at": datetime.now().isoformat(timespec="seconds"),
+        }
+        with self._lock:
+            self._append([rec])
+            self._entries[rec["id"]] = rec
+        _log.info("打刻キュー登録: %s date=%s", Path(xlsx_path).name, rec["row"].get("date"))
+        return rec["id"]
+
+    def pending(self, xlsx_path=None) -> List[Dict[str, Any]]:
+        """
+        未処理エントリを登録順に返す（xlsx_path 指定時はそのファイル分のみ）。
+        各要素は {"id", "path", "row_data", "queued_at"}。
+        """
+        key = _path_key(xlsx_path) if xlsx_path is not None else None
+        with self._lock:
+            recs = list(self._entries.values())
+        return [
+            {"id": r["id"], "path": Path(r["path"]), "row_data": _decode_row(r["row"]),
+             "queued_at": r["queued_at"]}
+            for r in recs
+            if key is None or _path_key(r["path"]) == key
+        ]
+
+    def pending_paths(self) -> List[Path]:
+        """未処理エントリのあるファイルを登録順（重複なし）に返す"""
+        seen: Dict[str, Path] = {}
+        with self._lock:
+            for r in self._entries.values():
+                seen.setdefault(_path_key(r["path"]), Path(r["path"]))
+        return list(seen.values())
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def has_pending(self, xlsx_path) -> bool:
+        key = _path_key(xlsx_path)
+        with self._lock:
+            return any(_path_key(r["path"]) == key for r in self._entries.values())
+
+    def mark_done(self, ids: List[str]) -> None:
+        """書込済みのエントリを取除く"""
+        self._finish([{"op": "done", "id": i} for i in ids])
+
+    def mark_failed(self, entry_id: str, error: str) -> None:
+        """再書込しても成功しないエントリ（行がない等）を取除く"""
+        self._finish([{"op": "failed", "id": entry_id, "error": error}])
+
+    def mark_retry(self, entry_id: str, error: Exception, max_attempts: int = _MAX_ATTEMPTS) -> bool:
+        """
+        ロック以外のエラーで再書込に失敗したエントリの失敗回数を数える。
+        max_attempts 回に達したらデッドレターに移して False を返す（キューに残れば True）
+        """
+        with self._lock:
+            rec = self._entries.get(entry_id)
+            if rec is None:
+                return False
+            attempts = rec.get("attempts", 0) + 1
+            if attempts >= max_attempts:
+                rec["attempts"] = attempts
+                self.mark_dead(entry_id, f"{attempts}回失敗: {error}")
+                return False
+            rec.update(attempts=attempts, error=str(error))
+            self._append([{"op": "retry", "id": entry_id, "attempts": attempts, "error": str(error)}])
+        return True
+
+    def mark_dead(self, entry_id: str, error: str) -> None:
+        """エントリをデッドレターに移す"""
+        with self._lock:
+            rec = self._entries.get(entry_id)
+            if rec is None:
+                return
+            dead = {k: v for k, v in rec.items() if k != "op"}
+            dead.update(error=str(error), dead_at=datetime.now().isoformat(timespec="seconds"))
+            self._append([dead], self.dead_letter_path)
+            self._finish([{"op": "dead", "id": entry_id, "error": str(error)}])
+        _log.error("打刻の再書込を断念しデッドレターに保存: %s date=%s (%s)",
+                   Path(rec["path"]).name, rec["row"].get("date"), error)
+
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        """デッドレターの打刻を古い順に返す"""
+        try:
+            lines = self.dead_letter_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return []
+        result = []
+        for line in lines:
+            try:
+                result.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return result
+
+    def _finish(self, records: List[Dict[str, Any]]) -> None:
+        with self._lock:
+            records = [r for r in records if r["id"] in self._entries]
+            if not records:
+                return
+            for r in records:
+                self._entries.pop(r["id"])
+            if self._entries:
+                self._append(records)
+            else:
+                self._compact()
+
+
+_queue: Optional[PunchQueue] = None
+_queue_lock = threading.Lock()
+
+
+def get_punch_queue() -> PunchQueue:
+    """プロセス共通の打刻キューを返す（初回呼出時にファイルを読込む）"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = PunchQueue()
+        return _queue
+
+
+class ReplayWorker:
+    """
+    書込待ちの打刻をバックグラウンドで再書込するワーカー（デーモンスレッド）。
+    replay(path) が失敗する間は待ち時間を _RETRY_BASE_SEC から倍々で延ばし
+    （上限 _RETRY_MAX_SEC）、全件成功したら戻す。TimesheetLockedError（ファイル使用中）は
+    何回でも待つが、それ以外のエラーはそのファイルのエントリごとに失敗回数を数え、
+    max_attempts 回に達したエントリはデッドレターに移す。
+    """
+
+    def __init__(self, queue: PunchQueue, replay: Callable[[Path], None],
+                 max_attempts: int = _MAX_ATTEMPTS):
+        self.queue = queue
+        self.replay = replay
+        self.max_attempts = max_attempts
+        self.failures = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="kintai-punch-replay", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def notify(self) -> None:
+        """キューへの登録を知らせる（空で待機中なら再試行の待ちに入る）"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            if not self.queue.pending_count():
+                # 空の間は登録されるまで待つ
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            if self._stop.wait(self.delay()):
+                break
+            self.run_once()
+
+    def run_once(self) -> bool:
+        """未処理のファイルを1回ずつ再書込する。再書込できなかったファイルが残れば False"""
+        from assets.timesheet_actions import TimesheetLockedError
+
+        locked = False
+        failed = False
+        for path in self.queue.pending_paths():
+            try:
+                self.replay(path)
+            except TimesheetLockedError:
+                locked = True
+            except Exception as e:
+                _log.error("打刻キュー再書込エラー: %s (%s)", path.name, e, exc_info=True)
+                for entry in self.queue.pending(path):
+                    if self.queue.mark_retry(entry["id"], e, self.max_attempts):
+                        failed = True
+        if locked or failed:
+            self.failures += 1
+            reason = "ファイル使用中" if locked else "再書込エラー"
+            _log.info("打刻キュー: %sのため %.0f 秒後に再試行 (未処理=%d件)",
+                      reason, self.delay(), self.queue.pending_count())
+        else:
+            self.failures = 0
+        return not (locked or failed)
+
+    def delay(self) -> float:
+        """次の再試行までの待ち時間（秒）"""
+        if self.failures <= 0:
+            return _RETRY_BASE_SEC
+        return min(_RETRY_BASE_SEC * 2 ** (self.failures - 1), _RETRY_MAX_SEC)
+
+
+_worker: Optional[ReplayWorker] = None
+
+
+def start_replay_worker(config) -> ReplayWorker:
+    """
+    再書込ワーカーを起動する（2回目以降は起動済みのワーカーを返す）。
+    config は起動後に設定タブで変更された内容もそのまま参照する。
+    """
+    global _worker
+    if _worker is None:
+        from assets.timesheet_actions import replay_punch_queue
+
+        _worker = ReplayWorker(get_punch_queue(), lambda path: replay_punch_queue(path, config))
+        _worker.start()
+    return _worker
+
+
+def notify_replay_worker() -> None:
+    """ワーカー起動済みならキューへの登録を知らせる"""
+    if _worker is not None:
+        _worker.notify()
@@ -0,0 +1,67 @@
+"""起動時間の計測
+
+kintai.py の先頭で import し、起動の各段階で mark() を呼ぶ。最初の描画後に
+report() を呼ぶと合計時間をログに出し、予算（STARTUP_BUDGET_MS）を超えていれば WARNING にする。
+環境変数 KINTAI_STARTUP_TRACE=1 で段階ごとの内訳を標準エラー出力にも表示する。
+予算は KINTAI_STARTUP_BUDGET_MS で上書きできる。
+
+標準ライブラリだけを使う（PyQt5 や assets 配下の重いモジュールより先に import するため）。
+"""
+import os
+import sys
+import time
+from typing import List, Tuple
+
+# 起動時間の基準（このモジュールの import 時刻。インタプリタ自体の起動時間は含まない）
+_T0 = time.perf_counter()
+
+# 起動からメインウィンドウの最初の描画までの目標時間（ミリ秒）
+STARTUP_BUDGET_MS = 800.0
+
+_marks: List[Tuple[str, float]] = []
+
+
+def mark(label: str) -> None:
+    """起動の段階の終わりを記録する"""
+    _marks.append((label, time.perf_counter()))
+
+
+def enabled() -> bool:
+    return os.environ.get("KINTAI_STARTUP_TRACE", "") not in ("", "0")
+
+
+def budget_ms() -> float:
+    try:
+        return float(os.environ.get("KINTAI_STARTUP_BUDGET_MS", STARTUP_BUDGET_MS))
+    except ValueError:
+        return STARTUP_BUDGET_MS
+
+
+def breakdown() -> List[Tuple[str, float]]:
+    """[(段階, 所要ミリ秒)] を記録順に返す"""
+    result = []
+    prev = _T0
+    for label, t in _marks:
+        result.append((label, (t - prev) * 1000))
+        prev = t
+    return result
+
+
+def total_ms() -> float:
+    return ((_marks[-1][1] if _marks else time.perf_counter()) - _T0) * 1000
+
+
+def report(log) -> float:
+    """合計時間をログに出し（予算超過は WARNING）、トレース有効時は内訳も表示する。合計ミリ秒を返す"""
+    total = total_ms()
+    budget = budget_ms()
+    detail = " / ".join(f"{label}={ms:.0f}ms" for label, ms in breakdown())
+    if total > budget:
+        log.warning("起動時間 %.0fms が予算 %.0fms を超過: %s", total, budget, detail)
+    else:
+        log.info("起動時間 %.0fms（予算 %.0fms）: %s", total, budget, detail)
+    if enabled():
+        print(f"[startup] total {total:7.1f} ms  (budget {budget:.0f} ms)", file=sys.stderr)
+        for label, ms in breakdown():
+            print(f"[startup]   {label:<24} {ms:7.1f} ms", file=sys.stderr)
+    return total
@@ -1,6 +1,6 @@
 """打刻タブ"""
 import random
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 from pathlib import Path
 from typing import List, Optional
 
@@ -21,28 +21,89 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QGroupBox,
     QPushButton, QComboBox, QRadioButton, QCheckBox,
     QLabel, QTextEdit, QButtonGroup, QSizePolicy, QFrame,
-    QMessageBox, QApplication, QDialog
+    QMessageBox, QDialog
 )
-from PyQt5.QtCore import Qt
-from PyQt5.QtGui import QColor, QPainter, QFont, QPixmap
+from PyQt5.QtCore import Qt, QTimer, QRectF, pyqtSignal
+from PyQt5.QtGui import QColor, QPainter, QFont, QPixmap, QPen
 
 
 class LoadingOverlay(QWidget):
-    """処理中オーバーレイ: 親ウィンドウ全体を半透明で暗くして「処理中...」を表示する"""
+    """
+    処理中オーバーレイ: 親ウィンドウ全体を半透明で暗くして「処理中...」とスピナーを表示する。
+    処理はワーカースレッドで動くため、表示中もスピナーは回り続ける。
+    set_cancel_handler() で取消ボタンを表示する。
+    """
+
+    _SPINNER_STEPS = 12
 
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAttribute(Qt.WA_TransparentForMouseEvents, False)
+        self._step = 0
+        self._message = "処理中..."
+        self._cancel_handler = None
+        self._timer = QTimer(self)
+        self._timer.setInterval(80)
+        self._timer.timeout.connect(self._advance)
+        self.cancel_btn = QPushButton("取消", self)
+        self.cancel_btn.setFixedWidth(100)
+        self.cancel_btn.clicked.connect(self._on_cancel)
+        self.cancel_btn.hide()
+
+    def set_cancel_handler(self, handler) -> None:
+        """取消ボタンの処理を設定する（None で取消ボタンを隠す）"""
+        self._cancel_handler = handler
+        self._message = "処理中..."
+        self.cancel_btn.setEnabled(True)
+        self.cancel_btn.setText("取消")
+        self.cancel_btn.setVisible(handler is not None)
+
+    def _on_cancel(self) -> None:
+        if self._cancel_handler:
+            self._cancel_handler()
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.setText("取消中...")
+        self._message = "取消しています...\n（書込開始後は最後まで実行します）"
+        self.update()
+
+    def _advance(self) -> None:
+        self._step = (self._step + 1) % self._SPINNER_STEPS
+        self.update()
+
+    def showEvent(self, event):
+        self._timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self._timer.stop()
+        super().hideEvent(event)
+
+    def resizeEvent(self, event):
+        self.cancel_btn.move((self.width() - self.cancel_btn.width()) // 2, self.height() // 2 + 60)
+        super().resizeEvent(event)
 
     def paintEvent(self, event):
         p = QPainter(self)
+        p.setRenderHint(QPainter.Antialiasing)
         p.fillRect(self.rect(), QColor(0, 0, 0, 150))
+
+        # スピナー: 12 本の線を、現在位置から遠いものほど薄く描く
+        cx, cy = self.width() / 2, self.height() / 2 - 40
+        p.save()
+        p.translate(cx, cy)
+        for i in range(self._SPINNER_STEPS):
+            alpha = 255 - ((self._step - i) % self._SPINNER_STEPS) * 18
+            p.setPen(QPen(QColor(255, 255, 255, max(alpha, 40)), 3, Qt.SolidLine, Qt.RoundCap))
+            p.drawLine(0, -10, 0, -18)
+            p.rotate(360 / self._SPINNER_STEPS)
+        p.restore()
+
         p.setPen(QColor(255, 255, 255))
         font = QFont()
         font.setPointSize(16)
         font.setBold(True)
         p.setFont(font)
-        p.drawText(self.rect(), Qt.AlignCenter, "処理中...")
+        p.drawText(QRectF(0, cy + 24, self.width(), 60), Qt.AlignHCenter | Qt.AlignTop, self._message)
         p.end()
 
 try:
@@ -53,16 +114,23 @@ except ImportError:
 try:
     import assets.timesheet_actions as ta
     from assets.timesheet_actions import (
-        TimesheetNotFoundError, TimesheetLockedError, TimesheetWriteError,
-        UnknownShiftTypeError
+        TimesheetNotFoundError, TimesheetLockedError, TimesheetQueuedError,
+        TimesheetWriteError, UnknownShiftTypeError
     )
+    from assets.punch_queue import get_punch_queue
     from assets.timesheet_constants import REALTIME_SHIFTS, SHIFT_DEFINITIONS
+    from assets.action_worker import ActionWorker
+    from assets.business_days import working_days_in_month
 except ImportError:
     ta = None
     TimesheetNotFoundError = None
     TimesheetLockedError = None
+    TimesheetQueuedError = None
     TimesheetWriteError = None
+    get_punch_queue = None
     UnknownShiftTypeError = None
+    ActionWorker = None
+    working_days_in_month = None
     REALTIME_SHIFTS = []
     SHIFT_DEFINITIONS = {}
 
@@ -72,10 +140,16 @@ _BATCH_ALLOWED_SHIFTS = set(REALTIME_SHIFTS) | {"シフト休", "1.0日有給"}
 class AttendanceTab(QWidget):
     """打刻タブ"""
 
+    # Teams 投稿の結果（teams_error、成功なら ""）。送信スレッドから発行される
+    teams_posted = pyqtSignal(str)
+
     def __init__(self, config, parent=None):
         super().__init__(parent)
         self.config = config
         self._batch_dates: List[date] = []
+        self._worker = None  # 実行中の ActionWorker（同時に1つだけ）
+        self._teams_errors: List[str] = []  # 打刻処理中に届いた Teams 投稿エラー
+        self.teams_posted.connect(self._on_teams_posted)
         self._init_ui()
 
     def _init_ui(self) -> None:
@@ -196,6 +270,13 @@ class AttendanceTab(QWidget):
         btn_row.addWidget(self.clock_out_btn, stretch=1)
         ctrl_layout.addLayout(btn_row)
 
+        # 書込待ち件数（Excelが開かれていて保存できなかった打刻）
+        self.queue_label = QLabel()
+        self.queue_label.setWordWrap(True)
+        self.queue_label.setStyleSheet("color: #F59E0B; font-size: 12px;")
+        self.queue_label.setVisible(False)
+        ctrl_layout.addWidget(self.queue_label)
+
         right_layout.addWidget(ctrl_group)
         right_layout.addStretch()
 
@@ -221,6 +302,10 @@ class AttendanceTab(QWidget):
         add_btn = QPushButton("追加")
         add_btn.setObjectName("info_btn")
         add_btn.clicked.connect(self._add_to_batch)
+        workdays_btn = QPushButton("月の営業日")
+        workdays_btn.setObjectName("info_btn")
+        workdays_btn.setToolTip("表示中の月の営業日（土日・祝日を除く）をすべて追加")
+        workdays_btn.clicked.connect(self._add_month_workdays)
         clear_btn = QPushButton("クリア")
         clear_btn.setObjectName("secondary_btn")
         clear_btn.clicked.connect(self._clear_batch)
@@ -229,6 +314,7 @@ class AttendanceTab(QWidget):
         self.batch_write_btn.clicked.connect(self.on_batch_write)
         self.batch_write_btn.setEnabled(False)
         batch_btn_row.addWidget(add_btn)
+        batch_btn_row.addWidget(workdays_btn)
         batch_btn_row.addWidget(clear_btn)
         batch_btn_row.addWidget(self.batch_write_btn)
         batch_layout.addLayout(batch_btn_row)
@@ -239,6 +325,12 @@ class AttendanceTab(QWidget):
 
         self._on_shift_changed("")  # 全ウィジェット生成後に初期状態を設定
 
+        # 書込待ち件数はバックグラウンドで減るので定期的に表示を更新する
+        self._queue_timer = QTimer(self)
+        self._queue_timer.timeout.connect(self._refresh_queue_label)
+        self._queue_timer.start(2000)
+        self._refresh_queue_label()
+
     # ─────────────── スロット ───────────────
 
     def _on_shift_changed(self, shift: str) -> None:
@@ -300,9 +392,18 @@ class AttendanceTab(QWidget):
             if d:
                 self._add_date_to_batch(d)
 
+    def _add_month_workdays(self) -> None:
+        """カレンダーに表示中の月の営業日をまとめて一括記入リストに追加する"""
+        if self.calendar and working_days_in_month:
+            self._add_dates_to_batch(working_days_in_month(*self.calendar.get_month()))
+
     def _add_date_to_batch(self, d: date) -> None:
-        if d not in self._batch_dates:
-            self._batch_dates.append(d)
+        self._add_dates_to_batch([d])
+
+    def _add_dates_to_batch(self, dates: List[date]) -> None:
+        added = [d for d in dates if d not in self._batch_dates]
+        if added:
+            self._batch_dates.extend(added)
             self._batch_dates.sort()
             self._refresh_batch_display()
             self._update_batch_ui_state()
@@ -383,6 +484,8 @@ class AttendanceTab(QWidget):
             QMessageBox.critical(self, "モジュールエラー",
                 "timesheet_actions モジュールが読み込めません。")
             return
+        if self._worker is not None:
+            return
 
         shift = self.shift_combo.currentText()
         if not shift:
@@ -393,86 +496,28 @@ class AttendanceTab(QWidget):
         is_assumed = self.assumed_check.isChecked()
         no_post = self.no_post_check.isChecked()
 
-        if not self._confirm_if_header_mismatch(target_date):
-            return
-
-        def late_reason_cb():
-            from assets.dialogs.late_reason_dialog import LateReasonDialog
-            dlg = LateReasonDialog(self)
-            if dlg.exec_():
-                return dlg.get_reason()
-            return None
-
-        def custom_input_cb():
-            from assets.dialogs.custom_input_dialog import CustomInputDialog
-            _label = SHIFT_DEFINITIONS.get(shift, {}).get("shift_label", shift)
-            dlg = CustomInputDialog(_label, self)
-            if dlg.exec_():
-                return {
-                    "start": dlg.get_start_time(),
-                    "end": dlg.get_end_time(),
-                    "remark": dlg.get_remark(),
-                }
-            return None
-
-        def remark_cb(title="備考入力", placeholder="備考（任意）"):
-            from assets.dialogs.remark_dialog import RemarkDialog
-            dlg = RemarkDialog(title=title, placeholder=placeholder, parent=self)
-            if dlg.exec_():
-                return dlg.get_remark()
-            return None
-
-        def confirm_cb(info):
-            shift_label = info.get("shift_label") or info.get("shift") or "-"
-            # 出勤形式: リアルタイムシフトかつ非想定のみ意味がある
-            is_rt_non_assumed = (
-                info.get("shift") in REALTIME_SHIFTS and not info.get("is_assumed")
-            )
-            work_style_str = info.get("work_style") or "-" if is_rt_non_assumed else "-"
-            # オプション
-            opts = []
-            if info.get("no_post"):
-                opts.append("TeamsPostなし")
-            if info.get("is_assumed"):
-                opts.append("想定入力")
-            opt_str = " / ".join(opts) if opts else "-"
-            # 備考
-            remark_str = info.get("remark") or "-"
-
-            msg = (
-                f"以下内容で出勤します。\n\n"
-                f"出勤形態　：{shift_label}\n"
-                f"出勤形式　：{work_style_str}\n"
-                f"オプション：{opt_str}\n"
-                f"備考　　　：{remark_str}"
+        def action(worker):
+            if not self._check_header(worker, target_date):
+                return False, ""
+            return ta.clock_in(
+                config=self.config,
+                shift=shift,
+                work_style=work_style,
+                target_date=target_date,
+                is_assumed=is_assumed,
+                no_post=no_post,
+                late_reason_cb=worker.dialog_cb("late_reason"),
+                custom_input_cb=lambda: worker.ask("custom_input", shift),
+                remark_cb=worker.dialog_cb("remark"),
+                status_cb=worker.report,
+                confirm_cb=worker.dialog_cb("confirm_clock_in"),
+                cancel_cb=worker.is_cancelled,
+                teams_cb=self.teams_posted.emit,
             )
-            result = QMessageBox.question(
-                self, "出勤確認", msg,
-                QMessageBox.Ok | QMessageBox.Cancel,
-                QMessageBox.Ok,
-            )
-            if result == QMessageBox.Ok:
-                self._show_loading()
-                return True
-            return False
 
-        try:
-            try:
-                ok, teams_error = ta.clock_in(
-                    config=self.config,
-                    shift=shift,
-                    work_style=work_style,
-                    target_date=target_date,
-                    is_assumed=is_assumed,
-                    no_post=no_post,
-                    late_reason_cb=late_reason_cb,
-                    custom_input_cb=custom_input_cb,
-                    remark_cb=remark_cb,
-                    status_cb=self.set_status,
-                    confirm_cb=confirm_cb,
-                )
-            finally:
-                self._hide_loading()
+        def done(result):
+            ok, teams_error = result
+            teams_error = teams_error or self._take_teams_error()
             if ok:
                 shift_line = shift
                 if shift in REALTIME_SHIFTS and not is_assumed:
@@ -485,27 +530,8 @@ class AttendanceTab(QWidget):
                 if teams_error:
                     msg += f"\n\n⚠ {teams_error}"
                 QMessageBox.information(self, "出勤完了", msg)
-        except TimesheetNotFoundError as e:
-            QMessageBox.warning(
-                self, "タイムシート未検出",
-                f"タイムシートが見つかりません。\n\n"
-                f"検索パス：{e.folder}\n"
-                f"検索タイムシート：{e.year:04d}{e.month:02d}{e.name}.xlsx"
-            )
-        except TimesheetLockedError as e:
-            QMessageBox.critical(
-                self, "ファイル書込エラー",
-                f"Excelファイルが別のプロセス（Excelなど）によって\n"
-                f"開かれているため更新できませんでした。\n\n"
-                f"ファイル名: {e.path.name}\n\n"
-                f"Excelを閉じてから再度お試しください。"
-            )
-        except UnknownShiftTypeError as e:
-            QMessageBox.warning(self, "未定義の出勤形態", str(e))
-        except TimesheetWriteError as e:
-            QMessageBox.critical(self, "Excel書込エラー", str(e))
-        except Exception as e:
-            QMessageBox.critical(self, "エラー", f"エラーが発生しました:\n{e}")
+
+        self._run_action(action, done)
 
     def on_clock_out(self) -> None:
         """退勤ボタン押下"""
@@ -513,6 +539,8 @@ class AttendanceTab(QWidget):
             QMessageBox.critical(self, "モジュールエラー",
                 "timesheet_actions モジュールが読み込めません。")
             return
+        if self._worker is not None:
+            return
 
         shift = self.shift_combo.currentText()
         if not shift:
@@ -541,107 +569,87 @@ class AttendanceTab(QWidget):
             "comment": dlg.get_comment(),
         }
 
-        # 退勤処理で実際に書き込まれる対象日を算出してヘッダー照合
-        from assets.timesheet_helpers import get_now as _get_now
-        _now = _get_now()
-        _is_night = (shift == "深夜")
-        if is_cross_day:
-            _actual = _now - timedelta(days=2) if _is_night else _now - timedelta(days=1)
-        else:
-            _actual = _now - timedelta(days=1) if _is_night else _now
-        _check_date = _actual.date() if hasattr(_actual, 'date') else _actual
-        if not self._confirm_if_header_mismatch(_check_date):
-            return
+        def action(worker):
+            # 退勤処理で実際に書き込まれる対象日を算出してヘッダー照合
+            _check_date = ta.clock_out_target_date(shift, is_cross_day)
+            if not self._check_header(worker, _check_date):
+                return False, ""
+            return ta.clock_out(
+                config=self.config,
+                shift=shift,
+                work_style=work_style,
+                target_date=target_date,
+                no_post=no_post,
+                clock_out_info=clock_out_info,
+                status_cb=worker.report,
+                is_cross_day=is_cross_day,
+                cancel_cb=worker.is_cancelled,
+                teams_cb=self.teams_posted.emit,
+            )
 
-        try:
-            self._show_loading()
-            try:
-                ok, teams_error = ta.clock_out(
-                    config=self.config,
-                    shift=shift,
-                    work_style=work_style,
-                    target_date=target_date,
-                    no_post=no_post,
-                    clock_out_info=clock_out_info,
-                    status_cb=self.set_status,
-                    is_cross_day=is_cross_day,
-                )
-            finally:
-                self._hide_loading()
+        def done(result):
+            ok, teams_error = result
+            teams_error = teams_error or self._take_teams_error()
             if ok:
-                from assets.timesheet_helpers import get_now, round_time as _round_time
-                _rounded = _round_time(get_now())
-                clock_out_time_str = _rounded.strftime('%Y/%m/%d %H:%M')
-
-                next_workday  = clock_out_info.get("next_workday")
-                next_shift    = clock_out_info.get("next_shift", "")
-                next_work_mode = clock_out_info.get("next_work_mode", "")
-                if next_workday:
-                    next_date_str = f"{next_workday.month}/{next_workday.day}({_WEEKDAY_JA[next_workday.weekday()]})"
-                    next_line = f"{next_date_str} {next_shift}{next_work_mode}"
-                else:
-                    next_line = f"{next_shift}{next_work_mode}"
-
-                msg = (
-                    f"退勤打刻が完了しました。お疲れさまでした。\n\n"
-                    f"退勤時刻: {clock_out_time_str}\n"
-                    f"次回の出勤：{next_line}"
-                )
-                if teams_error:
-                    msg += f"\n\n⚠ {teams_error}"
+                self._show_clock_out_done(clock_out_info, teams_error)
+
+        self._run_action(action, done)
+
+    def _show_clock_out_done(self, clock_out_info: dict, teams_error: str) -> None:
+        """退勤完了ダイアログ（OKボタン左に画像をランダム表示）"""
+        from assets.timesheet_helpers import get_now, round_time as _round_time
+        _rounded = _round_time(get_now())
+        clock_out_time_str = _rounded.strftime('%Y/%m/%d %H:%M')
+
+        next_workday  = clock_out_info.get("next_workday")
+        next_shift    = clock_out_info.get("next_shift", "")
+        next_work_mode = clock_out_info.get("next_work_mode", "")
+        if next_workday:
+            next_date_str = f"{next_workday.month}/{next_workday.day}({_WEEKDAY_JA[next_workday.weekday()]})"
+            next_line = f"{next_date_str} {next_shift}{next_work_mode}"
+        else:
+            next_line = f"{next_shift}{next_work_mode}"
 
-                # カスタムダイアログ（OKボタン左に画像をランダム表示）
-                _images_dir = Path(__file__).parent.parent / "images"
-                _image_files = (
-                    [p for p in _images_dir.glob("*")
-                     if p.suffix.lower() in (".png", ".jpg", ".jpeg")]
-                    if _images_dir.exists() else []
-                )
-                _dlg = QDialog(self)
-                _dlg.setWindowTitle("退勤完了")
-                _dlg.setMinimumWidth(300)
-                _vlay = QVBoxLayout(_dlg)
-                _vlay.setSpacing(12)
-                _vlay.setContentsMargins(16, 16, 16, 16)
-                _text_lbl = QLabel(msg)
-                _text_lbl.setWordWrap(True)
-                _vlay.addWidget(_text_lbl)
-                _hlay = QHBoxLayout()
-                _hlay.addStretch(1)
-                if _image_files:
-                    _px = QPixmap(str(random.choice(_image_files)))
-                    _img_lbl = QLabel()
-                    _img_lbl.setPixmap(
-                        _px.scaled(75, 75, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-                    )
-                    _hlay.addWidget(_img_lbl)
-                    _hlay.addStretch(1)
-                _ok = QPushButton("OK")
-                _ok.setDefault(True)
-                _ok.setFixedWidth(80)
-                _ok.clicked.connect(_dlg.accept)
-                _hlay.addWidget(_ok)
-                _vlay.addLayout(_hlay)
-                _dlg.exec_()
-        except TimesheetNotFoundError as e:
-            QMessageBox.warning(
-                self, "タイムシート未検出",
-                f"タイムシートが見つかりません。\n\n"
-                f"検索パス：{e.folder}\n"
-                f"検索タイムシート：{e.year:04d}{e.month:02d}{e.name}.xlsx"
-            )
-        except TimesheetLockedError as e:
-            QMessageBox.critical(
-                self, "ファイル書込エラー",
-                f"Excelファイルが別のプロセス（Excelなど）によって\n"
-                f"開かれているため更新できませんでした。\n\n"
-                f"ファイル名: {e.path.name}\n\n"
-                f"Excelを閉じてから再度お試しください。"
+        msg = (
+            f"退勤打刻が完了しました。お疲れさまでした。\n\n"
+            f"退勤時刻: {clock_out_time_str}\n"
+            f"次回の出勤：{next_line}"
+        )
+        if teams_error:
+            msg += f"\n\n⚠ {teams_error}"
+
+        _images_dir = Path(__file__).parent.parent / "images"
+        _image_files = (
+            [p for p in _images_dir.glob("*")
+             if p.suffix.lower() in (".png", ".jpg", ".jpeg")]
+            if _images_dir.exists() else []
+        )
+        _dlg = QDialog(self)
+        _dlg.setWindowTitle("退勤完了")
+        _dlg.setMinimumWidth(300)
+        _vlay = QVBoxLayout(_dlg)
+        _vlay.setSpacing(12)
+        _vlay.setContentsMargins(16, 16, 16, 16)
+        _text_lbl = QLabel(msg)
+        _text_lbl.setWordWrap(True)
+        _vlay.addWidget(_text_lbl)
+        _hlay = QHBoxLayout()
+        _hlay.addStretch(1)
+        if _image_files:
+            _px = QPixmap(str(random.choice(_image_files)))
+            _img_lbl = QLabel()
+            _img_lbl.setPixmap(
+                _px.scaled(75, 75, Qt.KeepAspectRatio, Qt.SmoothTransformation)
             )
-        except TimesheetWriteError as e:
-            QMessageBox.critical(self, "Excel書込エラー", str(e))
-        except Exception as e:
-            QMessageBox.critical(self, "エラー", f"エラーが発生しました:\n{e}")
+            _hlay.addWidget(_img_lbl)
+            _hlay.addStretch(1)
+        _ok = QPushButton("OK")
+        _ok.setDefault(True)
+        _ok.setFixedWidth(80)
+        _ok.clicked.connect(_dlg.accept)
+        _hlay.addWidget(_ok)
+        _vlay.addLayout(_hlay)
+        _dlg.exec_()
 
     def on_batch_write(self) -> None:
         """一括記入ボタン押下"""
@@ -652,78 +660,142 @@ class AttendanceTab(QWidget):
             QMessageBox.critical(self, "モジュールエラー",
                 "timesheet_actions モジュールが読み込めません。")
             return
+        if self._worker is not None:
+            return
 
         shift = self.shift_combo.currentText()
         if not shift:
             QMessageBox.warning(self, "入力エラー", "業務形態を選択してください。")
             return
         work_style = self._get_work_style()
-
-        if not self._confirm_if_header_mismatch(self._batch_dates[0]):
-            return
-
-        def custom_input_cb():
-            from assets.dialogs.custom_input_dialog import CustomInputDialog
-            _label = SHIFT_DEFINITIONS.get(shift, {}).get("shift_label", shift)
-            dlg = CustomInputDialog(_label, self)
-            if dlg.exec_():
-                return {"start": dlg.get_start_time(), "end": dlg.get_end_time(), "remark": dlg.get_remark()}
-            return None
-
-        def remark_cb(title="備考入力", placeholder="備考（任意）"):
-            from assets.dialogs.remark_dialog import RemarkDialog
-            dlg = RemarkDialog(title=title, placeholder=placeholder, parent=self)
-            if dlg.exec_():
-                return dlg.get_remark()
-            return None
+        dates = list(self._batch_dates)
 
         errors: list = []
 
         def batch_status_cb(msg: str, color: str) -> None:
+            # ワーカースレッドから呼ばれる。ダイアログは完了後に GUI スレッドで出す
             if color in ("orange", "red"):
                 errors.append(msg)
-            self.set_status(msg, color)
 
-        try:
-            self._show_loading()
-            try:
-                success, fail = ta.batch_write(
-                    config=self.config,
-                    dates=list(self._batch_dates),
-                    shift=shift,
-                    work_style=work_style,
-                    custom_input_cb=custom_input_cb,
-                    remark_cb=remark_cb,
-                    status_cb=batch_status_cb,
-                )
-            finally:
-                self._hide_loading()
+        def action(worker):
+            if not self._check_header(worker, dates[0]):
+                return None
+
+            def status_cb(msg: str, color: str = "black") -> None:
+                batch_status_cb(msg, color)
+                worker.report(msg, color)
+
+            return ta.batch_write(
+                config=self.config,
+                dates=dates,
+                shift=shift,
+                work_style=work_style,
+                custom_input_cb=lambda: worker.ask("custom_input", shift),
+                remark_cb=worker.dialog_cb("remark"),
+                status_cb=status_cb,
+                cancel_cb=worker.is_cancelled,
+            )
+
+        def done(result):
+            if result is None:
+                return
+            success, fail, queued = result
             summary = f"成功: {success} 件 / 失敗: {fail} 件"
+            if queued:
+                summary += f" / 書込待ち: {queued} 件"
+            cancelled = len(dates) - success - fail - queued
+            if 0 < cancelled < len(dates):
+                summary += f" / 取消: {cancelled} 件"
             if errors:
                 detail = "\n".join(f"・{e}" for e in errors)
                 QMessageBox.warning(
                     self, "一括記入完了（一部エラー）",
                     f"{summary}\n\n{detail}"
                 )
-            else:
+            elif success or fail or queued:
                 QMessageBox.information(self, "一括記入完了",
                     f"一括記入が完了しました。\n\n{summary}")
-        except UnknownShiftTypeError as e:
-            QMessageBox.warning(self, "未定義の出勤形態", str(e))
-        except Exception as e:
-            QMessageBox.critical(self, "エラー", f"エラーが発生しました:\n{e}")
 
-    def _confirm_if_header_mismatch(self, check_date: date) -> bool:
+        self._run_action(action, done)
+
+    # ─────────────── ワーカースレッド連携 ───────────────
+
+    def _run_action(self, action, on_done) -> None:
+        """
+        action(worker) をワーカースレッドで実行する。処理中はオーバーレイ（取消ボタン付き）を表示し、
+        終了後に GUI スレッドで on_done(戻り値) または例外ダイアログを表示する。
+        """
+        worker = ActionWorker(action, self)
+        worker.status.connect(self.set_status)
+        worker.dialog_requested.connect(lambda kind, args: self._answer_dialog(worker, kind, args))
+        worker.succeeded.connect(lambda result: self._finish_action(on_done, result))
+        worker.failed.connect(lambda e: self._finish_action(self._show_action_error, e))
+        worker.finished.connect(worker.deleteLater)
+        self._worker = worker
+        self._teams_errors.clear()
+        self._show_loading(cancel=worker.cancel)
+        worker.start()
+
+    def _finish_action(self, handler, value) -> None:
+        self._hide_loading()
+        self._worker = None
+        self._refresh_queue_label()
+        handler(value)
+        # 完了ダイアログに含めなかった Teams 投稿エラー（例外ダイアログの場合など）
+        self._show_teams_error(self._take_teams_error())
+
+    def _on_teams_posted(self, teams_error: str) -> None:
+        """
+        Teams 投稿の結果を受け取る。打刻処理の実行中なら完了ダイアログに含め、
+        完了後に届いた場合は警告ダイアログで知らせる。
         """
-        タイムシートのヘッダーセル（年・月）と対象月を照合し、
-        不一致の場合はユーザーに続行確認を求める。
+        if not teams_error:
+            return
+        if self._worker is not None:
+            self._teams_errors.append(teams_error)
+        else:
+            self._show_teams_error(teams_error)
+
+    def _take_teams_error(self) -> str:
+        """打刻処理中に届いた Teams 投稿エラーを取出す（なければ ""）"""
+        teams_error = "\n".join(self._teams_errors)
+        self._teams_errors.clear()
+        return teams_error
+
+    def _show_teams_error(self, teams_error: str) -> None:
+        if teams_error:
+            QMessageBox.warning(self, "Teams投稿エラー", f"Teams投稿に失敗しました。\n\n⚠ {teams_error}")
+
+    def _check_header(self, worker, check_date: date) -> bool:
+        """
+        （ワーカースレッド）タイムシートのヘッダーセル（年・月）と対象月を照合し、
+        不一致の場合は GUI スレッドで続行確認を求める。
         Returns True: 続行OK / False: キャンセル
         """
-        if not ta:
-            return True
         msg = ta.verify_timesheet_header(self.config, check_date)
         if msg is None:
             return True
+        return bool(worker.ask("header_mismatch", msg))
+
+    def _answer_dialog(self, worker, kind: str, args: tuple) -> None:
+        """
+        ActionWorker からのダイアログ表示依頼に応える（GUI スレッド）。
+        ダイアログの表示で例外が出てもワーカーが待ち続けないよう、必ず結果（既定は None）を返す
+        """
+        handlers = {
+            "header_mismatch": self._ask_header_mismatch,
+            "late_reason": self._ask_late_reason,
+            "custom_input": self._ask_custom_input,
+            "remark": self._ask_remark,
+            "confirm_clock_in": self._ask_confirm_clock_in,
+        }
+        value = None
+        try:
+            value = handlers[kind](*args)
+        finally:
+            worker.reply(value)
+
+    def _ask_header_mismatch(self, msg: str) -> bool:
         dlg = QMessageBox(self)
         dlg.setWindowTitle("タイムシート内容の確認")
         dlg.setIcon(QMessageBox.Warning)
@@ -733,14 +805,119 @@ class AttendanceTab(QWidget):
         dlg.setDefaultButton(QMessageBox.Cancel)
         return dlg.exec_() == QMessageBox.Ok
 
-    def _show_loading(self) -> None:
+    def _ask_late_reason(self) -> Optional[str]:
+        from assets.dialogs.late_reason_dialog import LateReasonDialog
+        dlg = LateReasonDialog(self)
+        if dlg.exec_():
+            return dlg.get_reason()
+        return None
+
+    def _ask_custom_input(self, shift: str) -> Optional[dict]:
+        from assets.dialogs.custom_input_dialog import CustomInputDialog
+        _label = SHIFT_DEFINITIONS.get(shift, {}).get("shift_label", shift)
+        dlg = CustomInputDialog(_label, self)
+        if dlg.exec_():
+            return {
+                "start": dlg.get_start_time(),
+                "end": dlg.get_end_time(),
+                "remark": dlg.get_remark(),
+            }
+        return None
+
+    def _ask_remark(self, title: str = "備考入力", placeholder: str = "備考（任意）") -> Optional[str]:
+        from assets.dialogs.remark_dialog import RemarkDialog
+        dlg = RemarkDialog(title=title, placeholder=placeholder, parent=self)
+        if dlg.exec_():
+            return dlg.get_remark()
+        return None
+
+    def _ask_confirm_clock_in(self, info: dict) -> bool:
+        shift_label = info.get("shift_label") or info.get("shift") or "-"
+        # 出勤形式: リアルタイムシフトかつ非想定のみ意味がある
+        is_rt_non_assumed = (
+            info.get("shift") in REALTIME_SHIFTS and not info.get("is_assumed")
+        )
+        work_style_str = info.get("work_style") or "-" if is_rt_non_assumed else "-"
+        # オプション
+        opts = []
+        if info.get("no_post"):
+            opts.append("TeamsPostなし")
+        if info.get("is_assumed"):
+            opts.append("想定入力")
+        opt_str = " / ".join(opts) if opts else "-"
+        # 備考
+        remark_str = info.get("remark") or "-"
+
+        msg = (
+            f"以下内容で出勤します。\n\n"
+            f"出勤形態　：{shift_label}\n"
+            f"出勤形式　：{work_style_str}\n"
+            f"オプション：{opt_str}\n"
+            f"備考　　　：{remark_str}"
+        )
+        result = QMessageBox.question(
+            self, "出勤確認", msg,
+            QMessageBox.Ok | QMessageBox.Cancel,
+            QMessageBox.Ok,
+        )
+        return result == QMessageBox.Ok
+
+    def _show_action_error(self, e: Exception) -> None:
+        """打刻処理の例外をダイアログで表示する"""
+        if isinstance(e, TimesheetNotFoundError):
+            QMessageBox.warning(
+                self, "タイムシート未検出",
+                f"タイムシートが見つかりません。\n\n"
+                f"検索パス：{e.folder}\n"
+                f"検索タイムシート：{e.year:04d}{e.month:02d}{e.name}.xlsx"
+            )
+        elif isinstance(e, TimesheetQueuedError):
+            self._show_queued(e)
+        elif isinstance(e, TimesheetLockedError):
+            QMessageBox.critical(
+                self, "ファイル書込エラー",
+                f"Excelファイルが別のプロセス（Excelなど）によって\n"
+                f"開かれているため更新できませんでした。\n\n"
+                f"ファイル名: {e.path.name}\n\n"
+                f"Excelを閉じてから再度お試しください。"
+            )
+        elif isinstance(e, UnknownShiftTypeError):
+            QMessageBox.warning(self, "未定義の出勤形態", str(e))
+        elif isinstance(e, TimesheetWriteError):
+            QMessageBox.critical(self, "Excel書込エラー", str(e))
+        else:
+            QMessageBox.critical(self, "エラー", f"エラーが発生しました:\n{e}")
+
+    def _refresh_queue_label(self) -> None:
+        """書込待ち件数ラベルを更新する（0件なら非表示）"""
+        count = get_punch_queue().pending_count() if get_punch_queue else 0
+        self.queue_label.setText(
+            f"書込待ち: {count} 件（Excelが閉じられたら自動で書込みます）"
+        )
+        self.queue_label.setVisible(count > 0)
+
+    def _show_queued(self, e) -> None:
+        """書込待ちキューに登録したことを知らせる"""
+        self._refresh_queue_label()
+        msg = (
+            f"Excelファイルが別のプロセス（Excelなど）によって\n"
+            f"開かれているため、打刻を書込待ちに登録しました。\n\n"
+            f"ファイル名: {e.path.name}\n\n"
+            f"Excelが閉じられると自動で書込みます。"
+        )
+        teams_error = e.teams_error or self._take_teams_error()
+        if teams_error:
+            msg += f"\n\n⚠ {teams_error}"
+        QMessageBox.information(self, "書込待ちに登録", msg)
+
+    def _show_loading(self, cancel=None) -> None:
         win = self.window()
         if not hasattr(self, '_overlay'):
             self._overlay = LoadingOverlay(win)
+        self._overlay.set_cancel_handler(cancel)
         self._overlay.resize(win.size())
         self._overlay.raise_()
         self._overlay.show()
-        QApplication.processEvents()
 
     def _hide_loading(self) -> None:
         if hasattr(self, '_overlay'):
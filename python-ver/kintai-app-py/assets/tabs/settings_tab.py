@@ -5,7 +5,7 @@ from PyQt5.QtWidgets import (
     QWidget, QVBoxLayout, QHBoxLayout, QFormLayout, QGridLayout, QGroupBox,
     QPushButton, QLineEdit, QComboBox, QLabel,
     QTableWidget, QTableWidgetItem, QHeaderView, QScrollArea,
-    QFileDialog, QMessageBox, QFrame
+    QFileDialog, QMessageBox, QFrame, QPlainTextEdit
 )
 
 _SETTINGS_JSON = Path(__file__).parent.parent.parent / "configs" / "settings.json"
@@ -15,6 +15,10 @@ _THEME_LABELS = ["ライト", "ダーク", "グリーン", "セピア", "ハイ
 _THEME_TO_KEY  = {"ライト": "light", "ダーク": "dark", "グリーン": "green", "セピア": "sepia", "ハイコントラスト": "high_contrast"}
 _KEY_TO_THEME  = {v: k for k, v in _THEME_TO_KEY.items()}
 from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QFontDatabase
+
+from assets import metrics
+from assets.timesheet_helpers import clear_row_index_cache
 
 
 class _NoScrollComboBox(QComboBox):
@@ -199,6 +203,25 @@ class SettingsTab(QWidget):
         layout_vbox.addLayout(grid)
         main_layout.addWidget(layout_group)
 
+        # ── Teams 送信統計（保存対象外。起動してからの計測値を表示する） ──
+        metrics_group = QGroupBox("Teams 送信統計")
+        metrics_vbox = QVBoxLayout(metrics_group)
+        self.metrics_view = QPlainTextEdit()
+        self.metrics_view.setReadOnly(True)
+        self.metrics_view.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+        self.metrics_view.setFixedHeight(140)
+        metrics_vbox.addWidget(self.metrics_view)
+        metrics_btn_row = QHBoxLayout()
+        refresh_metrics_btn = QPushButton("更新")
+        refresh_metrics_btn.clicked.connect(self.refresh_metrics)
+        dump_metrics_btn = QPushButton("ファイルに保存")
+        dump_metrics_btn.clicked.connect(self._dump_metrics)
+        metrics_btn_row.addWidget(refresh_metrics_btn)
+        metrics_btn_row.addWidget(dump_metrics_btn)
+        metrics_btn_row.addStretch()
+        metrics_vbox.addLayout(metrics_btn_row)
+        main_layout.addWidget(metrics_group)
+
         # ── 保存ボタン ──
         save_btn = QPushButton("設定を保存")
         save_btn.setMinimumHeight(38)
@@ -226,6 +249,22 @@ class SettingsTab(QWidget):
         if path:
             self.proxy_sh_edit.setText(path)
 
+    def refresh_metrics(self) -> None:
+        self.metrics_view.setPlainText(metrics.format_summary())
+
+    def _dump_metrics(self) -> None:
+        path, _ = QFileDialog.getSaveFileName(self, "送信統計を保存", "teams_metrics.json", "JSON (*.json)")
+        if not path:
+            return
+        try:
+            metrics.dump(path)
+        except OSError as e:
+            QMessageBox.critical(self, "保存エラー", f"送信統計を保存できませんでした。\n{e}")
+
+    def showEvent(self, event) -> None:
+        super().showEvent(event)
+        self.refresh_metrics()
+
     def _add_manager_row(self) -> None:
         row = self.managers_table.rowCount()
         self.managers_table.insertRow(row)
@@ -310,6 +349,7 @@ class SettingsTab(QWidget):
         self.config.managers = managers
 
         # タイムシート列設定
+        old_layout = dict(getattr(self.config, 'timesheet_layout', {}) or {})
         self.config.timesheet_layout = {
             "year_cell":          self.ts_year_cell_edit.text().strip() or "C6",
             "month_cell":         self.ts_month_cell_edit.text().strip() or "C7",
@@ -320,6 +360,9 @@ class SettingsTab(QWidget):
             "overtime_type_col":  self.ts_overtime_type_col_edit.text().strip().upper() or "K",
             "remark_col":         self.ts_remark_col_edit.text().strip().upper() or "L",
         }
+        if self.config.timesheet_layout != old_layout:
+            # 日付列が変わると日→行マップが無効になる
+            clear_row_index_cache()
 
         self.config.save(str(_SETTINGS_JSON))
 
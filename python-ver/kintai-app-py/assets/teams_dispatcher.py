@@ -0,0 +1,244 @@
+"""Teams 投稿のバックグラウンド送信
+
+出勤・退勤の Teams 投稿は最大 10 秒かかることがあるため、Excel 書込とは別の
+デーモンスレッドで送信する。timesheet_actions は post_async() で送信待ちキューに
+登録してすぐに書込へ進み、投稿結果（teams_error 文字列）は Future または
+done_cb で受け取る。
+
+    future = post_async(config, "clock_in", data, done_cb=lambda err: ...)
+    teams_error = future.result()   # 成功なら ""、失敗なら "Teams投稿エラー: ..."
+
+送信待ちキューは上限（_QUEUE_SIZE）付きで、満杯のときは待たずに失敗として結果を返す。
+終了時（shutdown_dispatcher()）に送り切れなかった投稿は送信を取りやめ、再送待ち
+（webhook_outbox）に登録する。
+
+webhook_io.coalesce_clock_in が有効なら、出勤投稿を取り出したあと coalesce_window_sec の間
+同じ webhook_url への出勤投稿を待ち、2 件以上集まれば 1 枚のまとめカード
+（teams_webhook.send_clock_in_digest）で送る。まとめた投稿の Future はすべて同じ結果になる。
+"""
+import collections
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from assets.app_logger import get_logger
+from assets.config import Config
+
+_log = get_logger("kintai.webhook")
+
+# 送信待ちキューの上限（打刻が投稿待ちで止まらないよう、満杯なら失敗扱いにする）
+_QUEUE_SIZE = 32
+
+# まとめカード 1 枚に載せる出勤投稿の上限（カードが縦に長くなりすぎないように）
+_DIGEST_MAX = 10
+
+_STOP = object()
+
+# 終了時に送信を取りやめた投稿の結果（done_cb に渡す）
+_ABANDONED = "Teams投稿エラー: 送信前に終了しました"
+
+
+class PostDispatcher:
+    """
+    Teams 投稿を 1 本のデーモンスレッドで順に送信する。
+    send(config, message_type, data) / send_digest(entries) は送信時に
+    teams_webhook.send_teams_post / send_clock_in_digest を参照する
+    （テストで patch した関数がそのまま使われる）。
+    """
+
+    def __init__(self, maxsize: int = _QUEUE_SIZE,
+                 send: Optional[Callable[[Any, str, Dict[str, Any]], None]] = None,
+                 send_digest: Optional[Callable[[List[Tuple[Any, Dict[str, Any]]]], None]] = None):
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=maxsize)
+        # まとめ待ちの間に取り出した、まとめ対象外の投稿（送信スレッドだけが触る）
+        self._backlog: Deque[Any] = collections.deque()
+        self._send = send
+        self._send_digest = send_digest
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # 送信を始めていない投稿（Future → 登録内容）。abandon_pending() で取りやめる
+        self._unsent: Dict["Future[str]", Tuple[Any, str, Dict[str, Any]]] = {}
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="kintai-teams-post", daemon=True)
+            self._thread.start()
+
+    def submit(self, config, message_type: str, data: Dict[str, Any],
+               done_cb: Optional[Callable[[str], None]] = None) -> "Future[str]":
+        """
+        投稿を送信待ちキューに登録して Future を返す（送信は待たない）。
+        結果は teams_error 文字列（成功なら ""）。done_cb は送信スレッドから呼ばれる。
+        """
+        future: "Future[str]" = Future()
+        if done_cb is not None:
+            future.add_done_callback(lambda f: done_cb(_ABANDONED if f.cancelled() else f.result()))
+        self.start()
+        with self._lock:
+            self._unsent[future] = (config, message_type, data)
+        future.add_done_callback(self._forget)
+        try:
+            self._queue.put_nowait((config, message_type, data, future))
+        except queue.Full:
+            _log.warning("Teams POST 送信待ちが上限のため破棄: type=%s", message_type)
+            future.set_result(f"Teams投稿エラー: 送信待ちが上限（{self._queue.maxsize}件）に達しています")
+        return future
+
+    def _forget(self, future: "Future[str]") -> None:
+        with self._lock:
+            self._unsent.pop(future, None)
+
+    def abandon_pending(self) -> List[Tuple[Any, str, Dict[str, Any]]]:
+        """
+        送信を始めていない投稿をすべて取りやめ、(config, message_type, data) を登録順に返す。
+        取りやめた投稿は送信スレッドが取り出しても送らない（送信中の投稿はそのまま送る）
+        """
+        with self._lock:
+            items = list(self._unsent.items())
+        return [item for future, item in items if future.cancel()]
+
+    def pending_count(self) -> int:
+        return self._queue.qsize() + len(self._backlog)
+
+    def stop(self, timeout: Optional[float] = None) -> bool:
+        """
+        登録済みの投稿を送り終えてから送信スレッドを止める。timeout 内に終われば True。
+        キューの空き待ちと送信スレッドの終了待ちは同じ期限を共有し、合わせて timeout 秒を超えない
+        """
+        thread = self._thread
+        if thread is None or not thread.is_alive():
+            return True
+        deadline = None if timeout is None else time.monotonic() + timeout
+        try:
+            self._queue.put(_STOP, timeout=timeout)
+        except queue.Full:
+            return False
+        thread.join(None if deadline is None else max(deadline - time.monotonic(), 0.0))
+        return not thread.is_alive()
+
+    def _run(self) -> None:
+        while True:
+            item = self._backlog.popleft() if self._backlog else self._queue.get()
+            if item is _STOP:
+                return
+            batch = [i for i in self._coalesce(item) if i[3].set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            message_type = batch[0][1] if len(batch) == 1 else "clock_in_digest"
+            try:
+                if len(batch) == 1:
+                    config, message_type, data, _ = batch[0]
+                    self._deliver(config, message_type, data)
+                else:
+                    self._deliver_digest([(config, data) for config, _, data, _ in batch])
+            except Exception as e:
+                _log.warning("Teams POST エラー: type=%s %s", message_type, e)
+                result = f"Teams投稿エラー: {e}"
+            else:
+                result = ""
+            for *_, future in batch:
+                future.set_result(result)
+
+    def _coalesce(self, item) -> List[Any]:
+        """item が出勤投稿でまとめ送信が有効なら、同じ送信先（webhook_url・webhook_targets）への出勤投稿を集めて返す"""
+        config, message_type = item[0], item[1]
+        io = {**Config.DEFAULTS["webhook_io"], **(getattr(config, "webhook_io", None) or {})}
+        if message_type != "clock_in" or not io.get("coalesce_clock_in"):
+            return [item]
+
+        def _same_channel(other) -> bool:
+            return (other is not _STOP and other[1] == "clock_in"
+                    and other[0].webhook_url == config.webhook_url
+                    and getattr(other[0], "webhook_targets", None) == getattr(config, "webhook_targets", None))
+
+        batch = [item]
+        # 先に取り出してあった投稿からも拾う（順序は保つ）
+        kept: Deque[Any] = collections.deque()
+        while self._backlog:
+            other = self._backlog.popleft()
+            if len(batch) < _DIGEST_MAX and _same_channel(other):
+                batch.append(other)
+            else:
+                kept.append(other)
+        self._backlog = kept
+
+        deadline = time.monotonic() + float(io["coalesce_window_sec"])
+        while len(batch) < _DIGEST_MAX and _STOP not in self._backlog:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                other = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if _same_channel(other):
+                batch.append(other)
+            else:
+                self._backlog.append(other)
+        return batch
+
+    def _deliver(self, config, message_type: str, data: Dict[str, Any]) -> None:
+        if self._send is not None:
+            self._send(config, message_type, data)
+            return
+        from assets import teams_webhook
+
+        teams_webhook.send_teams_post(config, message_type, data)
+
+    def _deliver_digest(self, entries: List[Tuple[Any, Dict[str, Any]]]) -> None:
+        if self._send_digest is not None:
+            self._send_digest(entries)
+            return
+        from assets import teams_webhook
+
+        teams_webhook.send_clock_in_digest(entries)
+
+
+_dispatcher: Optional[PostDispatcher] = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher() -> PostDispatcher:
+    """プロセス共通の送信ディスパッチャを返す"""
+    global _dispatcher
+    with _dispatcher_lock:
+        if _dispatcher is None:
+            _dispatcher = PostDispatcher()
+        return _dispatcher
+
+
+def post_async(config, message_type: str, data: Dict[str, Any],
+               done_cb: Optional[Callable[[str], None]] = None) -> "Future[str]":
+    """Teams 投稿を送信待ちキューに登録する（get_dispatcher().submit() の短縮形）"""
+    return get_dispatcher().submit(config, message_type, data, done_cb)
+
+
+def shutdown_dispatcher(timeout: float = 5.0) -> int:
+    """
+    アプリ終了時に送信待ちの投稿を送り終えるまで待つ（最大 timeout 秒）。
+    送り切れなかった投稿は送信を取りやめて再送待ち（webhook_outbox）に登録し、登録した件数を返す
+    """
+    if _dispatcher is None or _dispatcher.stop(timeout):
+        return 0
+    from assets import teams_webhook
+
+    saved = dropped = 0
+    for config, message_type, data in _dispatcher.abandon_pending():
+        try:
+            count = teams_webhook.save_to_outbox(config, message_type, data, "送信前に終了しました")
+        except Exception as e:
+            _log.error("Teams POST 再送待ちに登録できません: type=%s %s", message_type, e, exc_info=True)
+            count = 0
+        if count:
+            saved += 1
+        else:
+            dropped += 1
+    if saved:
+        _log.warning("Teams POST 送信待ちを再送待ちに登録して終了: %d件", saved)
+    if dropped:
+        _log.warning("Teams POST 送信待ちを残して終了: %d件", dropped)
+    return saved
@@ -1,43 +1,310 @@
 """Teams Webhook 投稿"""
+import copy
+import hashlib
 import json
+import os
 import subprocess
+import threading
+import time
+import urllib.error
 import urllib.request
-from datetime import date
-from pathlib import Path
-from typing import Any, Dict, List, Optional
-
-try:
-    import requests
-    REQUESTS_AVAILABLE = True
-except ImportError:
-    REQUESTS_AVAILABLE = False
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
+from assets import debug_capture, metrics
 from assets.app_logger import get_logger
+from assets.config import Config
+from assets.lazy_import import lazy_import
+
+# requests は import に 100ms 以上かかるため、最初の投稿時に読込む（起動時間短縮）
+requests = lazy_import("requests")
+REQUESTS_AVAILABLE = requests is not None
 _log = get_logger("kintai.webhook")
 
 
-def send_teams_post(config, message_type: str, data: Dict[str, Any]) -> None:
+class WebhookHTTPError(Exception):
+    """HTTP 200/202 以外の応答。retry_after は Retry-After ヘッダーの秒数（なければ None）"""
+
+    def __init__(self, status: int, text: str = "", retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}: {text}" if text else f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+class WebhookRateLimitedError(WebhookHTTPError):
+    """
+    流量制限（429 を受けた後の停止を含む）の待ち時間が応答待ちのタイムアウトより長いため送らなかった。
+    status は 429、retry_after は送れるようになるまでの秒数（再送待ちはその時刻まで送らない）
+    """
+
+    def __init__(self, wait: float):
+        super().__init__(429, retry_after=wait)
+        self.args = (f"流量制限のため送信を見送りました（あと{wait:.0f}秒）",)
+
+    def __str__(self) -> str:
+        return self.args[0]
+
+
+class WebhookSavedError(Exception):
+    """
+    送信に失敗した投稿を保存した（webhook_io.outbox が有効な場合）。original は元の例外で、
+    status・retry_after・retryable を引継ぐ（is_retryable() でそのまま判定できる）
+    """
+
+    saved_to = ""
+
+    def __init__(self, original: Exception):
+        super().__init__(f"{original}（{self.saved_to}）")
+        self.original = original
+        self.status = getattr(original, "status", None)
+        self.retry_after = getattr(original, "retry_after", None)
+        self.retryable = getattr(original, "retryable", True)
+
+
+class WebhookQueuedError(WebhookSavedError):
+    """再送できるエラーのため再送待ちに登録した"""
+
+    saved_to = "再送待ちに登録しました"
+
+
+class WebhookDeadLetteredError(WebhookSavedError):
+    """再送しても届かないエラー（HTTP 400・404 等）のためデッドレターに保存した"""
+
+    saved_to = "再送できないため dead_letter に保存しました"
+
+    def __init__(self, original: Exception):
+        super().__init__(original)
+        self.retryable = False
+
+
+class WebhookTargetNotFoundError(Exception):
+    """再送待ちの送信先キーが設定（webhook_url / webhook_targets）にない。再送しても届かないので再送しない"""
+
+    retryable = False
+
+    def __init__(self, key: str):
+        super().__init__(f"送信先が設定にありません: {key}")
+        self.key = key
+
+
+class WebhookDeliveryError(Exception):
+    """複数の送信先のうち 1 つ以上に届かなかった。results は 送信先名 → エラー文字列（成功は ""）"""
+
+    def __init__(self, results: Dict[str, str]):
+        super().__init__("; ".join(f"{name}: {error}" for name, error in results.items() if error))
+        self.results = results
+
+
+def send_teams_post(config, message_type: str, data: Dict[str, Any]) -> Dict[str, str]:
     """
     TeamsにPOST
     message_type: "clock_in" | "clock_out"
-    webhook_url 未設定時は何もしない。失敗時はExceptionをraise
+    ペイロードは 1 回だけ組み立て、webhook_url と webhook_targets の全送信先へ同時に送る。
+    戻り値は 送信先名 → ""（成功）。送信先が 1 つもなければ何もしない（{} を返す）。
+    送信先が 1 つなら失敗時はその Exception を、複数なら WebhookDeliveryError をraise
+    webhook_io.outbox が有効なら、失敗した投稿は再送待ち（webhook_outbox）に登録してから raise する
     """
-    if not config or not config.webhook_url:
-        return
+    if not config or not _targets(config):
+        return {}
+
+    payload = _build_payload(config, message_type, data)
+    if payload is None:
+        return {}
+
+    _log.info("Teams POST 送信: type=%s user=%s", message_type, config.display_name or "")
+    debug_capture.capture(config, message_type, payload)
+    return _deliver(config, message_type, payload)
+
 
+def save_to_outbox(config, message_type: str, data: Dict[str, Any], reason: str) -> int:
+    """
+    送らなかった投稿を送信先ごとに再送待ち（webhook_outbox）に登録し、登録した件数を返す。
+    終了時に送り切れなかった投稿用。webhook_io.outbox が無効な送信先には登録しない
+    """
+    if not config or not _targets(config):
+        return 0
+    payload = _build_payload(config, message_type, data)
+    if payload is None:
+        return 0
+    from assets import webhook_outbox
+
+    saved = 0
+    for _, target in _targets(config):
+        if _webhook_io(target).get("outbox"):
+            webhook_outbox.get_outbox().enqueue(_target_key(target), message_type, payload, Exception(reason))
+            saved += 1
+    return saved
+
+
+def send_clock_in_digest(entries: List[Tuple[Any, Dict[str, Any]]]) -> Dict[str, str]:
+    """
+    同じ webhook_url への出勤投稿（(config, data) のリスト）を 1 枚のカードにまとめてPOST
+    送信先・流量制限・再送待ちは先頭の config に従う。戻り値・例外は send_teams_post() と同じ
+    """
+    if not entries:
+        return {}
+    config = entries[0][0]
+    if not config or not _targets(config):
+        return {}
+
+    payload = _build_clock_in_digest_payload(entries)
+    _log.info("Teams POST 送信: type=clock_in_digest users=%d", len(entries))
+    debug_capture.capture(config, "clock_in_digest", payload)
+    return _deliver(config, "clock_in_digest", payload)
+
+
+def _build_payload(config, message_type: str, data: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """message_type（"clock_in" | "clock_out"）のペイロード。それ以外は None"""
     user_name = config.display_name or ""
     user_id   = config.teams_user_id or ""
 
     if message_type == "clock_in":
-        payload = _build_clock_in_payload(user_name, user_id, data)
-    elif message_type == "clock_out":
-        payload = _build_clock_out_payload(config, user_name, user_id, data)
-    else:
-        return
+        return _build_clock_in_payload(user_name, user_id, data)
+    if message_type == "clock_out":
+        return _build_clock_out_payload(config, user_name, user_id, data)
+    return None
+
+
+# ─────────────────────────── 送信先 ───────────────────────────
+
+# 複数の送信先へ同時に送るスレッド（最初の複数送信時に作る）
+_fanout_pool: Optional[ThreadPoolExecutor] = None
+_fanout_lock = threading.Lock()
+_FANOUT_WORKERS = 8
 
-    _log.info("Teams POST 送信: type=%s user=%s", message_type, user_name)
-    _save_debug_json(payload)
-    _post(config, payload)
+
+# webhook_url（config 本体）の送信先キー
+_MAIN_TARGET_KEY = "webhook_url"
+
+
+def _target_config(config, target: Dict[str, Any], key: str):
+    """
+    webhook_targets の 1 件を、その送信先の url・proxy_sh・webhook_io を反映した config の複製にする。
+    key は再送待ちに保存する送信先キー（URL はトークンを含むため保存しない）
+    """
+    c = copy.copy(config)
+    c.webhook_url = target["url"]
+    c.webhook_target = key
+    if "proxy_sh" in target:
+        c.proxy_sh = target["proxy_sh"]
+    c.webhook_io = {**_webhook_io(config), **(target.get("webhook_io") or {})}
+    return c
+
+
+def _targets(config) -> List[Tuple[str, Any]]:
+    """
+    送信先の (名前, 送信先ごとの config) のリスト。
+    webhook_url（名前 "webhook_url"）が先頭、続いて webhook_targets の順。同じ URL へは 1 回だけ送る
+    """
+    targets: List[Tuple[str, Any]] = []
+    seen = set()
+    if config.webhook_url:
+        targets.append((_MAIN_TARGET_KEY, config))
+        seen.add(config.webhook_url)
+    for target in getattr(config, "webhook_targets", None) or []:
+        url = target.get("url", "")
+        if not url or url in seen:
+            continue
+        seen.add(url)
+        targets.append((target.get("name") or url, _target_config(config, target, _webhook_target_key(target))))
+    return targets
+
+
+def _webhook_target_key(target: Dict[str, Any]) -> str:
+    """
+    webhook_targets の 1 件の送信先キー。name があれば name、なければ URL の SHA-256 の先頭 16 桁
+    （並べ替え・削除で変わらず、トークンは復元できない）
+    """
+    return target.get("name") or "url-sha256:" + hashlib.sha256(target["url"].encode("utf-8")).hexdigest()[:16]
+
+
+def _target_key(config) -> str:
+    """_targets() の送信先ごとの config の送信先キー"""
+    return getattr(config, "webhook_target", _MAIN_TARGET_KEY)
+
+
+def target_config(config, url: str):
+    """url への送信に使う config（webhook_targets にあればその設定を反映した複製、なければ config）"""
+    for target in getattr(config, "webhook_targets", None) or []:
+        if target.get("url") == url:
+            return _target_config(config, target, _webhook_target_key(target))
+    return config
+
+
+def config_for_target(config, key: str):
+    """
+    再送待ちの送信先キーから、送信に使う config（webhook_url は送信時の設定から引く）を返す。
+    設定から消えた送信先は WebhookTargetNotFoundError。
+    URL そのもの（送信先キーを保存する前の再送待ち）は target_config() で引く
+    """
+    if key.startswith(("http://", "https://")):
+        return config if key == config.webhook_url else target_config(config, key)
+    if key == _MAIN_TARGET_KEY:
+        if config.webhook_url:
+            return config
+        raise WebhookTargetNotFoundError(key)
+    for target in getattr(config, "webhook_targets", None) or []:
+        if target.get("url") and _webhook_target_key(target) == key:
+            return _target_config(config, target, key)
+    raise WebhookTargetNotFoundError(key)
+
+
+def _get_fanout_pool() -> ThreadPoolExecutor:
+    global _fanout_pool
+    with _fanout_lock:
+        if _fanout_pool is None:
+            _fanout_pool = ThreadPoolExecutor(max_workers=_FANOUT_WORKERS, thread_name_prefix="kintai-webhook")
+        return _fanout_pool
+
+
+def _deliver(config, message_type: str, payload: Dict[str, Any]) -> Dict[str, str]:
+    """
+    組み立て済みのペイロードを全送信先へ送る。送信先が複数ならスレッドで同時に送り、
+    全体の所要時間は最も遅い送信先の分になる（1 つの失敗で他の送信は止めない）
+    """
+    targets = _targets(config)
+    if len(targets) == 1:
+        name, target = targets[0]
+        _deliver_one(target, message_type, payload)
+        return {name: ""}
+
+    pool = _get_fanout_pool()
+    futures = [(name, pool.submit(_deliver_one, target, message_type, payload)) for name, target in targets]
+    results: Dict[str, str] = {}
+    for name, future in futures:
+        try:
+            future.result()
+        except Exception as e:
+            results[name] = str(e)
+        else:
+            results[name] = ""
+    if any(results.values()):
+        raise WebhookDeliveryError(results)
+    return results
+
+
+def _deliver_one(config, message_type: str, payload: Dict[str, Any]) -> None:
+    """
+    config.webhook_url に送信し、失敗したら再送待ちに登録して WebhookQueuedError、
+    再送できないエラーならデッドレターに保存して WebhookDeadLetteredError を raise する
+    （webhook_io.outbox が無効なら元の例外のまま）
+    """
+    try:
+        _post(config, payload)
+    except Exception as e:
+        if not _webhook_io(config).get("outbox"):
+            raise
+        from assets import webhook_outbox
+
+        outbox = webhook_outbox.get_outbox()
+        entry_id = outbox.enqueue(_target_key(config), message_type, payload, e)
+        if not webhook_outbox.is_retryable(e):
+            outbox.mark_dead(entry_id, str(e))
+            raise WebhookDeadLetteredError(e) from e
+        webhook_outbox.notify_outbox_worker()
+        raise WebhookQueuedError(e) from e
     _log.info("Teams POST 成功: type=%s", message_type)
 
 
@@ -71,6 +338,36 @@ def _build_clock_in_payload(
     return _assemble_payload(user_id, column_obj, message_obj, comment_obj, mention_arr)
 
 
+def _build_clock_in_digest_payload(entries: List[Tuple[Any, Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    出勤まとめ用ペイロード
+    「N名が出勤しました」の見出しの下に 1 人 1 行で勤務区分を並べ、コメントはその人の行の直後に置く。
+    userId は先頭の人（Power Automate 側のアイコン表示用）
+    """
+    items: List[Dict[str, Any]] = []
+    for config, data in entries:
+        shift     = data.get("shift", "")
+        work_mode = data.get("work_style", "")
+        items.append({
+            "type":    "TextBlock",
+            "text":    f"{config.display_name or ''}: 業務を開始します。[{shift}({work_mode})]",
+            "wrap":    True,
+            "spacing": "None",
+        })
+        comment_obj = _build_comment_obj(data.get("comment", "") or "", [])
+        if comment_obj:
+            items.append(comment_obj)
+
+    column_obj  = _build_column_obj(f"{len(entries)}名", "出勤")
+    message_obj = {
+        "type":    "Container",
+        "spacing": "None",
+        "items":   items,
+    }
+    user_id = entries[0][0].teams_user_id or ""
+    return _assemble_payload(user_id, column_obj, message_obj, {}, [])
+
+
 def _build_clock_out_payload(
     config,
     user_name: str,
@@ -201,71 +498,350 @@ def _assemble_payload(
 
 # ─────────────────────────── HTTP 送信 ───────────────────────────
 
-def _post(config, payload: Dict[str, Any]) -> None:
-    """ペイロードをJSONとしてPOST。失敗時は Exceptionをraise"""
+# 投稿ごとの DNS・TCP・プロキシ CONNECT・TLS ハンドシェイクを省くため、接続を使い回す。
+# 送信先ごとにプロキシが異なることがあるため (プロキシ設定, 接続数上限) ごとに持ち、
+# _MAX_SESSIONS を超えたら古いものから閉じる（proxy.sh の変更で使われなくなった分）
+_sessions: Dict[Tuple, Any] = {}
+_openers: Dict[Tuple, urllib.request.OpenerDirector] = {}
+_session_lock = threading.Lock()
+_MAX_SESSIONS = 4
+
+
+def _webhook_io(config) -> Dict[str, Any]:
+    return {**Config.DEFAULTS["webhook_io"], **(getattr(config, "webhook_io", None) or {})}
+
+
+def _get_session(proxies: Optional[Dict[str, str]], pool_maxsize: int):
+    """(プロキシ設定, 接続数上限) ごとに使い回す requests.Session を返す"""
+    key = (tuple(sorted((proxies or {}).items())), pool_maxsize)
+    with _session_lock:
+        session = _sessions.pop(key, None)
+        if session is None:
+            while len(_sessions) >= _MAX_SESSIONS:
+                oldest = next(iter(_sessions))
+                _sessions.pop(oldest).close()
+                _log.info("Teams POST 接続を閉じます（使われなくなったプロキシ設定）")
+            session = requests.Session()
+            adapter = _timed_adapter_class()(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        # 最後に使った順に並べる（先頭が最も古い）
+        _sessions[key] = session
+        return session
+
+
+_adapter_class: Any = None
+
+
+def _timed_connection_pools() -> Dict[str, Any]:
+    """
+    新しい接続を張る時間（TCP 接続・プロキシ CONNECT・TLS ハンドシェイク）を
+    metrics の webhook.connect_ms に記録する urllib3 の接続プール（スキーム → クラス）
+    """
+    from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+    def _timed(connect):
+        def timed_connect(self):
+            with metrics.timer("webhook.connect_ms"):
+                return connect(self)
+        return timed_connect
+
+    pools = {}
+    for scheme, pool_cls in (("http", HTTPConnectionPool), ("https", HTTPSConnectionPool)):
+        conn_cls = pool_cls.ConnectionCls
+        timed_conn = type(f"Timed{conn_cls.__name__}", (conn_cls,), {"connect": _timed(conn_cls.connect)})
+        pools[scheme] = type(f"Timed{pool_cls.__name__}", (pool_cls,), {"ConnectionCls": timed_conn})
+    return pools
+
+
+def _timed_adapter_class():
+    """
+    接続時間を記録する HTTPAdapter（requests を読込んだ後に 1 回だけ作る）。
+    接続プールのクラスも 1 回だけ作り、PoolManager・プロキシごとの ProxyManager を
+    作ったときに 1 回だけ設定する（プロキシ経由の投稿のたびに設定し直さない）
+    """
+    global _adapter_class
+    if _adapter_class is None:
+        from requests.adapters import HTTPAdapter
+
+        pools = _timed_connection_pools()
+
+        class TimedHTTPAdapter(HTTPAdapter):
+            def init_poolmanager(self, *args, **kwargs):
+                super().init_poolmanager(*args, **kwargs)
+                self.poolmanager.pool_classes_by_scheme = dict(pools)
+
+            def proxy_manager_for(self, proxy, **proxy_kwargs):
+                created = proxy not in self.proxy_manager
+                manager = super().proxy_manager_for(proxy, **proxy_kwargs)
+                if created:
+                    manager.pool_classes_by_scheme = dict(pools)
+                return manager
+
+        _adapter_class = TimedHTTPAdapter
+    return _adapter_class
+
+
+def _get_opener(proxies: Optional[Dict[str, str]]) -> urllib.request.OpenerDirector:
+    """
+    urllib 用の OpenerDirector をプロキシ設定ごとに使い回す。
+    値が空のスキーム（http だけ設定された場合の https 等）は ProxyHandler に渡さない
+    （空文字を渡すと urllib は "no host given" で失敗する）
+    """
+    proxies = {k: v for k, v in (proxies or {}).items() if v}
+    key = tuple(sorted(proxies.items()))
+    with _session_lock:
+        opener = _openers.get(key)
+        if opener is None:
+            handlers = [urllib.request.ProxyHandler(proxies)] if proxies else []
+            opener = _openers[key] = urllib.request.build_opener(*handlers)
+        return opener
+
+
+def close_session() -> None:
+    """使い回している接続を閉じる（次の投稿で作り直す）"""
+    with _session_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+        _openers.clear()
+
+
+class TokenBucket:
+    """
+    トークンバケット。rate 件/秒で補充し、最大 burst 件まで続けて通す。
+    reserve() は 1 件分を予約して送信まで待つ秒数を返す（待機は呼出側で行う）。
+    429 を受けたら pause() で Retry-After の間は予約を止める
+    """
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float] = time.monotonic):
+        self.rate = rate
+        self.burst = max(int(burst), 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._not_before = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(float(self.burst), self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            # 足りなければ負の残高として予約し、後続は順に後ろへずれる
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._not_before - now)
+
+    def cancel(self) -> None:
+        """reserve() で予約した 1 件分を返す（送らなかった場合）"""
+        with self._lock:
+            self._tokens = min(float(self.burst), self._tokens + 1)
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self._not_before = max(self._not_before, self._clock() + seconds)
+
+
+# webhook_url → TokenBucket。設定（rate, burst）が変わったら作り直す
+_buckets: Dict[str, TokenBucket] = {}
+_bucket_lock = threading.Lock()
+
+# 429 に Retry-After が付いていなかったときに送信を止める秒数
+_RATE_PAUSE_SEC = 30.0
+# 429 で送信を止める上限（Retry-After が長すぎても送信スレッドを止め続けない）
+_RATE_PAUSE_MAX_SEC = 300.0
+
+
+def _get_bucket(config, url: str) -> Optional[TokenBucket]:
+    """url の流量制限を返す（rate_limit_per_sec が 0 以下なら None）"""
+    io = _webhook_io(config)
+    limit = {
+        "per_sec": io["rate_limit_per_sec"],
+        "burst":   io["rate_limit_burst"],
+        **((io.get("rate_limits") or {}).get(url) or {}),
+    }
+    rate, burst = float(limit["per_sec"]), max(int(limit["burst"]), 1)
+    if rate <= 0:
+        return None
+    with _bucket_lock:
+        bucket = _buckets.get(url)
+        if bucket is None or (bucket.rate, bucket.burst) != (rate, burst):
+            bucket = _buckets[url] = TokenBucket(rate, burst)
+        return bucket
+
+
+def _retry_after_sec(value: Optional[str]) -> Optional[float]:
+    """Retry-After ヘッダー（秒数または HTTP 日付）を秒数にする"""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max((when - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def _post(config, payload: Dict[str, Any], url: Optional[str] = None) -> None:
+    """
+    ペイロードをJSONとしてPOST（url 省略時は config.webhook_url）。
+    HTTP 200/202 以外は WebhookHTTPError、接続・タイムアウト等はそのまま Exception をraise。
+    送信前に url ごとの流量制限（webhook_io.rate_limit_*）で待ち、429 を受けたら Retry-After の間
+    （最大 _RATE_PAUSE_MAX_SEC 秒）は止める。待ち時間が read_timeout_sec より長い場合は待たずに
+    WebhookRateLimitedError を raise する（送信スレッドを止めず、再送待ちはその時刻まで送らない）。
+    所要時間（webhook.post_ms）と結果（webhook.status: 応答コードまたは例外名）を metrics に記録する
+    """
+    url = url or config.webhook_url
     proxies = _get_proxies(config)
     body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
     headers = {"Content-Type": "application/json; charset=utf-8"}
+    io = _webhook_io(config)
+
+    bucket = _get_bucket(config, url)
+    if bucket is not None:
+        wait = bucket.reserve()
+        if wait > float(io["read_timeout_sec"]):
+            bucket.cancel()
+            metrics.increment("webhook.status", "rate_limited")
+            _log.warning("Teams POST 流量制限: あと%.0f秒送れないため見送ります", wait)
+            raise WebhookRateLimitedError(wait)
+        if wait > 0:
+            _log.info("Teams POST 流量制限: %.1f秒待機", wait)
+            metrics.observe("webhook.rate_wait_ms", wait * 1000)
+            time.sleep(wait)
+    t = time.perf_counter()
+    try:
+        status = _send(url, body, headers, proxies, io)
+    except WebhookHTTPError as e:
+        metrics.increment("webhook.status", str(e.status))
+        if e.status == 429 and bucket is not None:
+            pause = min(e.retry_after if e.retry_after is not None else _RATE_PAUSE_SEC, _RATE_PAUSE_MAX_SEC)
+            _log.warning("Teams POST 429: %.0f秒送信を止めます", pause)
+            bucket.pause(pause)
+        raise
+    except Exception as e:
+        metrics.increment("webhook.status", type(e).__name__)
+        raise
+    else:
+        metrics.increment("webhook.status", str(status))
+    finally:
+        metrics.observe("webhook.post_ms", (time.perf_counter() - t) * 1000)
+
+
+def _send(url: str, body: bytes, headers: Dict[str, str],
+          proxies: Optional[Dict[str, str]], io: Dict[str, Any]) -> int:
+    """POST して応答コード（200/202）を返す。それ以外は WebhookHTTPError"""
+    connect_timeout = float(io["connect_timeout_sec"])
+    read_timeout = float(io["read_timeout_sec"])
 
     if REQUESTS_AVAILABLE:
-        resp = requests.post(
-            config.webhook_url,
+        session = _get_session(proxies, int(io["pool_maxsize"]))
+        resp = session.post(
+            url,
             data=body,
             headers=headers,
             proxies=proxies,
-            timeout=10,
+            timeout=(connect_timeout, read_timeout),
         )
         if resp.status_code not in (200, 202):
             _log.error("Teams POST 失敗: HTTP %s %s", resp.status_code, resp.text[:200])
-            raise Exception(f"HTTP {resp.status_code}: {resp.text[:200]}")
+            raise WebhookHTTPError(resp.status_code, resp.text[:200],
+                                   _retry_after_sec(resp.headers.get("Retry-After")))
+        return resp.status_code
     else:
         req = urllib.request.Request(
-            config.webhook_url,
+            url,
             data=body,
             headers=headers,
             method="POST",
         )
-        with urllib.request.urlopen(req, timeout=10) as resp:
-            if resp.status not in (200, 202):
-                _log.error("Teams POST 失敗: HTTP %s", resp.status)
-                raise Exception(f"HTTP {resp.status}")
+        # urllib は接続と応答待ちを分けられないため、長い方をソケットのタイムアウトにする
+        try:
+            with _get_opener(proxies).open(req, timeout=max(connect_timeout, read_timeout)) as resp:
+                if resp.status not in (200, 202):
+                    _log.error("Teams POST 失敗: HTTP %s", resp.status)
+                    raise WebhookHTTPError(resp.status,
+                                           retry_after=_retry_after_sec(resp.headers.get("Retry-After")))
+                return resp.status
+        except urllib.error.HTTPError as e:
+            # urllib は 4xx/5xx を例外にするため、requests と同じ WebhookHTTPError にそろえる
+            _log.error("Teams POST 失敗: HTTP %s", e.code)
+            retry_after = e.headers.get("Retry-After") if e.headers else None
+            raise WebhookHTTPError(e.code, retry_after=_retry_after_sec(retry_after)) from e
 
 
 # ─────────────────────────── ユーティリティ ───────────────────────────
 
+# proxy.sh のパス → ((mtime_ns, size), プロキシ設定)。proxy.sh が変わるまで bash を起動しない
+_proxy_cache: Dict[str, Tuple[Tuple[int, int], Optional[Dict[str, str]]]] = {}
+# 解決中に別スレッドが同じ proxy.sh で bash を起動しないよう、解決はロック内で行う
+_proxy_lock = threading.Lock()
+
+
 def _get_proxies(config) -> Optional[Dict[str, str]]:
-    """proxy.sh をsourceして環境変数からプロキシ設定を取得する"""
+    """
+    proxy.sh をsourceして環境変数からプロキシ設定を取得する。
+    結果は proxy.sh のパス・更新時刻・サイズをキーにキャッシュし、proxy.sh が変わったときだけ取得し直す。
+    キャッシュの利用（proxy.cache: hit / miss）と bash での取得時間（proxy.resolve_ms）を metrics に記録する
+    """
     proxy_sh = getattr(config, "proxy_sh", "") if config else ""
-    if not proxy_sh or not Path(proxy_sh).exists():
+    if not proxy_sh:
         return None
     try:
-        result = subprocess.run(
-            ["bash", "-c", f"source '{proxy_sh}' && env"],
-            capture_output=True, text=True, timeout=5,
-        )
-        env_vars: Dict[str, str] = {}
-        for line in result.stdout.splitlines():
-            if "=" in line:
-                key, _, val = line.partition("=")
-                env_vars[key] = val
-        http  = env_vars.get("http_proxy")  or env_vars.get("HTTP_PROXY")
-        https = env_vars.get("https_proxy") or env_vars.get("HTTPS_PROXY")
-        if http or https:
-            return {"http": http or "", "https": https or ""}
-    except Exception:
-        pass
+        st = os.stat(proxy_sh)
+    except OSError:
+        return None
+    stamp = (st.st_mtime_ns, st.st_size)
+    with _proxy_lock:
+        cached = _proxy_cache.get(proxy_sh)
+        if cached is not None and cached[0] == stamp:
+            metrics.increment("proxy.cache", "hit")
+            proxies = cached[1]
+        else:
+            metrics.increment("proxy.cache", "miss")
+            try:
+                with metrics.timer("proxy.resolve_ms"):
+                    proxies = _source_proxy_sh(proxy_sh)
+            except Exception as e:
+                # 取得できなかった場合はキャッシュせず、次の投稿で取得し直す
+                _log.warning("proxy.sh の読込に失敗: %s", e)
+                return None
+            _proxy_cache[proxy_sh] = (stamp, proxies)
+    return dict(proxies) if proxies else None
+
+
+def _source_proxy_sh(proxy_sh: str) -> Optional[Dict[str, str]]:
+    """bash で proxy.sh を source し、http(s)_proxy を返す（未設定なら None）"""
+    result = subprocess.run(
+        ["bash", "-c", f"source '{proxy_sh}' && env"],
+        capture_output=True, text=True, timeout=5,
+    )
+    env_vars: Dict[str, str] = {}
+    for line in result.stdout.splitlines():
+        if "=" in line:
+            key, _, val = line.partition("=")
+            env_vars[key] = val
+    http  = env_vars.get("http_proxy")  or env_vars.get("HTTP_PROXY")
+    https = env_vars.get("https_proxy") or env_vars.get("HTTPS_PROXY")
+    if http or https:
+        return {"http": http or "", "https": https or ""}
     return None
 
 
-def _save_debug_json(payload: Dict[str, Any]) -> None:
-    """デバッグ用にJSONを保存する"""
-    try:
-        debug_dir = Path(__file__).parent.parent / "timesheet"
-        debug_dir.mkdir(exist_ok=True)
-        with open(debug_dir / "teams_post_debug.json", "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+def prefetch_proxies(config) -> threading.Thread:
+    """
+    proxy.sh をバックグラウンドで読込んでおく（起動後に呼び、最初の投稿で bash の起動を待たない）。
+    読込中に投稿が始まった場合、投稿側は読込の完了を待ってその結果を使う。
+    """
+    t = threading.Thread(target=_get_proxies, args=(config,), name="kintai-proxy-prefetch", daemon=True)
+    t.start()
+    return t
 
 
 def _format_date_short(d: date) -> str:
@@ -1,5 +1,8 @@
 ﻿"""出退勤ロジック・Excel書込・CSV出力"""
 import csv
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from contextlib import ExitStack
 from datetime import datetime, date, timedelta
 from pathlib import Path
 
@@ -9,12 +12,11 @@ from typing import Callable, Dict, List, Optional, Any
 from assets.app_logger import get_logger
 _log = get_logger("kintai.actions")
 
-try:
-    import openpyxl
-    from openpyxl.utils.datetime import to_excel
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
+from assets.lazy_import import lazy_import
+
+# openpyxl は import に 100ms 以上かかるため、最初に使う時点で読込む（起動時間短縮）
+openpyxl = lazy_import("openpyxl")
+OPENPYXL_AVAILABLE = openpyxl is not None
 
 from assets.timesheet_constants import (
     SHIFT_DEFINITIONS,
@@ -25,8 +27,13 @@ from assets.timesheet_constants import (
 )
 from assets.timesheet_helpers import (
     round_time, round_time_night_shift, time_to_excel_serial, find_timesheet,
-    is_late, format_date_jp, get_row_for_date, get_now, get_today, col_letter_to_num
+    is_late, format_date_jp, get_row_for_date, get_now, get_today, col_letter_to_num,
+    get_day_row_map, remember_day_row_map, atomic_write
 )
+from assets.xlsx_patcher import DirectWorkbook, XlsxPatchError, read_cells
+from assets.punch_queue import get_punch_queue, notify_replay_worker, _path_key
+from assets import punch_journal
+from assets.teams_dispatcher import post_async
 
 
 class TimesheetNotFoundError(Exception):
@@ -46,6 +53,18 @@ class TimesheetLockedError(Exception):
         super().__init__(f"ファイルが別のプロセスに開かれています: {self.path.name}")
 
 
+class TimesheetQueuedError(TimesheetLockedError):
+    """ファイルが開かれていたため、打刻を書込待ちキューに登録した"""
+    teams_error: str = ""  # clock_in / clock_out で Teams 投稿に失敗していた場合のメッセージ
+
+    def __init__(self, path, count: int = 1):
+        super().__init__(path)
+        self.count = count
+        self.args = (
+            f"ファイルが別のプロセスに開かれているため書込待ちに登録しました: {self.path.name}",
+        )
+
+
 class TimesheetWriteError(Exception):
     """その他のExcel書込エラー"""
     pass
@@ -61,6 +80,335 @@ class UnknownShiftTypeError(Exception):
         )
 
 
+# timesheet_layout 未設定時のデフォルト値
+_LAYOUT_DEFAULTS = {
+    "year_cell":         "C6",
+    "month_cell":        "C7",
+    "date_col":          "C",
+    "shift_type_col":    "E",
+    "start_time_col":    "F",
+    "end_time_col":      "G",
+    "overtime_type_col": "K",
+    "remark_col":        "L",
+}
+
+
+# row_data のキー → timesheet_layout の列キー
+_ROW_COLUMNS = (
+    ("shift_label",   "shift_type_col"),     # 出勤形態
+    ("start_time",    "start_time_col"),     # 始業時刻（Excelシリアル値）
+    ("end_time",      "end_time_col"),       # 終業時刻（Excelシリアル値）
+    ("overtime_type", "overtime_type_col"),  # 残業種別
+    ("remark",        "remark_col"),         # 備考
+)
+
+# 同じファイルの TimesheetSession を直列化するロック（打刻キューのワーカーと UI スレッド用）
+_session_locks: Dict[str, threading.RLock] = {}
+_session_locks_guard = threading.Lock()
+
+
+def _session_lock(xlsx_path) -> threading.RLock:
+    with _session_locks_guard:
+        return _session_locks.setdefault(_path_key(xlsx_path), threading.RLock())
+
+
+def _layout_of(config) -> Dict[str, str]:
+    """config.timesheet_layout をデフォルト値で補完して返す"""
+    _layout = getattr(config, 'timesheet_layout', {}) if config else {}
+    return {**_LAYOUT_DEFAULTS, **(_layout or {})}
+
+
+def read_timesheet_cells(xlsx_path: Path, refs: List[str]) -> Dict[str, Any]:
+    """
+    タイムシートのアクティブシートから指定セルの値だけを読む（数式はキャッシュ値）。
+    xlsx_patcher.read_cells で必要な行までだけシートXMLを読み、
+    解釈できないブックは openpyxl の read_only モードで読む。
+    PermissionError は TimesheetLockedError、その他の読込エラーは TimesheetWriteError。
+    """
+    try:
+        return read_cells(str(xlsx_path), refs, data_only=True)
+    except PermissionError:
+        raise TimesheetLockedError(xlsx_path)
+    except Exception as e:
+        _log.debug("ストリーミング読取できないため openpyxl で読取: %s (%s)", Path(xlsx_path).name, e)
+    try:
+        wb = openpyxl.load_workbook(str(xlsx_path), read_only=True, data_only=True)
+    except PermissionError:
+        raise TimesheetLockedError(xlsx_path)
+    except Exception as e:
+        raise TimesheetWriteError(f"Excel読込エラー: {e}")
+    try:
+        ws = wb.active
+        return {ref: ws[ref].value for ref in refs}
+    finally:
+        wb.close()
+
+
+class TimesheetSession:
+    """
+    タイムシート1ファイル分の読み書きセッション（コンテキストマネージャ）。
+    with 文の開始時にワークブックを1回だけ読込み、行検索・セル読取・行書込は
+    メモリ上で行う。save() を呼んだ場合のみ1回だけ保存する。
+
+        with TimesheetSession(xlsx_path, config) as session:
+            row_num = session.find_row(target_date)
+            start_value = session.read_cell(row_num, "start_time_col")
+            session.write_row(row_data)
+            session.save()
+
+    PermissionError は TimesheetLockedError、その他の読込・保存エラーは
+    TimesheetWriteError に変換して raise する。
+
+    engine（省略時は config.timesheet_io["write_engine"]）:
+        "openpyxl" … openpyxl でブック全体を読込・保存する（デフォルト）
+        "direct"   … xlsx_patcher でシートXMLの対象セルだけを書換える。
+                     直接書換できないブック・セルでは自動的に openpyxl に切替える。
+    config.timesheet_io["atomic_save"] が True の場合は一時ファイルに保存してから
+    置き換える（keep_backup が True なら置換前のファイルを .bak として残す）。
+
+    queue_on_lock（省略時は config.timesheet_io["offline_queue"]）が True の場合、
+    保存時にファイルが開かれていれば write_row した内容を打刻キューに登録して
+    TimesheetQueuedError を raise する。また保存時には同じファイルの書込待ち打刻も
+    （このセッションで書いたセルを除いて）まとめて書込み、成功したらキューから取除く。
+    同じファイルのセッションはプロセス内で同時に1つだけ開く。
+
+    journal（{"action": ..., "shift": ...}）を渡した場合は、保存前に write_row した
+    内容を打刻ジャーナルに追記し、保存後に結果を追記する
+    （config.timesheet_io["journal"] が False なら書かない）。
+    """
+
+    def __init__(self, xlsx_path: Path, config=None, data_only: bool = False,
+                 engine: Optional[str] = None, queue_on_lock: Optional[bool] = None,
+                 journal: Optional[Dict[str, str]] = None):
+        self.xlsx_path = Path(xlsx_path)
+        self.data_only = data_only
+        self.layout: Dict[str, str] = _layout_of(config)
+        _io = (getattr(config, 'timesheet_io', {}) if config else {}) or {}
+        self.engine: str = engine or _io.get("write_engine") or "openpyxl"
+        self.atomic_save: bool = bool(_io.get("atomic_save", False))
+        self.keep_backup: bool = bool(_io.get("keep_backup", False))
+        if queue_on_lock is None:
+            queue_on_lock = bool(_io.get("offline_queue", True))
+        self.queue_on_lock: bool = queue_on_lock
+        self.journal = journal if _io.get("journal", True) else None
+        self.wb = None
+        self.ws = None
+        self._dirty = False
+        self._day_rows: Optional[Dict[int, int]] = None
+        self._written_rows: List[dict] = []
+        self.flushed_ids: List[str] = []  # save() でまとめて書込んだ書込待ち打刻のID
+        self._path_lock = _session_lock(self.xlsx_path)
+
+    def __enter__(self) -> "TimesheetSession":
+        self._path_lock.acquire()
+        try:
+            self._open()
+        except BaseException:
+            self._path_lock.release()
+            raise
+        return self
+
+    def _open(self) -> None:
+        if self.engine == "direct":
+            try:
+                self.wb = DirectWorkbook(str(self.xlsx_path), data_only=self.data_only)
+                self.ws = self.wb.active
+                return
+            except PermissionError:
+                raise TimesheetLockedError(self.xlsx_path)
+            except Exception as e:
+                _log.info("直接書換エンジンで読めないため openpyxl を使用: %s (%s)", self.xlsx_path.name, e)
+        self._load_openpyxl()
+
+    def _load_openpyxl(self) -> None:
+        try:
+            self.wb = openpyxl.load_workbook(str(self.xlsx_path), data_only=self.data_only)
+        except PermissionError:
+            raise TimesheetLockedError(self.xlsx_path)
+        except Exception as e:
+            raise TimesheetWriteError(f"Excel読込エラー: {e}")
+        self.ws = self.wb.active
+
+    def _fallback_to_openpyxl(self, reason: Exception) -> None:
+        """直接書換エンジンから openpyxl に切替え、予約済みの書換を引き継ぐ"""
+        _log.info("直接書換できないため openpyxl に切替: %s (%s)", self.xlsx_path.name, reason)
+        direct = self.wb
+        pending = self.ws.pending_values()
+        self._load_openpyxl()
+        direct.close()
+        for (row_num, col_num), value in pending.items():
+            self.ws.cell(row=row_num, column=col_num).value = value
+
+    def _set_cell(self, row_num: int, col_num: int, value: Any) -> None:
+        try:
+            self.ws.cell(row=row_num, column=col_num).value = value
+        except XlsxPatchError as e:
+            self._fallback_to_openpyxl(e)
+            self.ws.cell(row=row_num, column=col_num).value = value
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        try:
+            self.wb.close()
+        except Exception:
+            pass
+        finally:
+            self._path_lock.release()
+        return False
+
+    def col(self, key: str) -> int:
+        """timesheet_layout のキー（"start_time_col" 等）から列番号を返す"""
+        return col_letter_to_num(self.layout[key])
+
+    def find_row(self, target_date: date) -> Optional[int]:
+        """対象日の行番号を返す。見つからない場合は None"""
+        if self._day_rows is None:
+            self._day_rows = get_day_row_map(self.ws, self.col("date_col"), self.xlsx_path)
+        return self._day_rows.get(target_date.day)
+
+    def require_row(self, target_date: date) -> int:
+        """対象日の行番号を返す。見つからない場合は TimesheetWriteError を raise"""
+        row_num = self.find_row(target_date)
+        if row_num is None:
+            raise TimesheetWriteError(
+                f"「{self.xlsx_path.name}」に{target_date.month}月{target_date.day}日の行を認識できませんでした。"
+            )
+        return row_num
+
+    def read_cell(self, row_num: int, col_key: str) -> Any:
+        """指定行の layout 列（"start_time_col" 等）の値を返す"""
+        return self.ws.cell(row=row_num, column=self.col(col_key)).value
+
+    def read_address(self, address: str) -> Any:
+        """セルアドレス（"C6" 等）の値を返す"""
+        return self.ws[address].value
+
+    def write_row(self, row_data: dict) -> int:
+        """
+        row_data を対象日の行に書込む（メモリ上のみ。保存は save()）。
+        値が None の列は上書きしない。書込んだ行番号を返す。
+        """
+        row_num = self.require_row(row_data["date"])
+        for key, col_key in _ROW_COLUMNS:
+            if row_data.get(key) is not None:
+                self._set_cell(row_num, self.col(col_key), row_data[key])
+                self._dirty = True
+                if self.col(col_key) == self.col("date_col"):
+                    # 日付列と重なる layout では保存後のマップを引き継がない
+                    self._day_rows = None
+        self._written_rows.append(row_data)
+        return row_num
+
+    def _apply_queued_rows(self) -> List[str]:
+        """
+        同じファイルの書込待ち打刻を書込む（メモリ上のみ）。このセッションで
+        書込んだセルは新しい値を優先して上書きしない。書込んだエントリIDを返す。
+        """
+        queue = get_punch_queue()
+        if not queue.has_pending(self.xlsx_path):
+            return []
+        written = {
+            (row["date"], key)
+            for row in self._written_rows
+            for key, _ in _ROW_COLUMNS
+            if row.get(key) is not None
+        }
+        own_rows = self._written_rows
+        self._written_rows = []
+        applied = []
+        try:
+            for entry in queue.pending(self.xlsx_path):
+                row_data = {
+                    key: (None if (entry["row_data"]["date"], key) in written else value)
+                    for key, value in entry["row_data"].items()
+                }
+                try:
+                    self.write_row(row_data)
+                except TimesheetWriteError as e:
+                    # 行がない・レイアウト変更等。row_data はデッドレターに残して手で戻せるようにする
+                    queue.mark_dead(entry["id"], str(e))
+                    continue
+                applied.append(entry["id"])
+        finally:
+            self._written_rows = own_rows
+        return applied
+
+    def _save_wb(self) -> None:
+        try:
+            if self.atomic_save:
+                atomic_write(self.xlsx_path, self.wb.save, keep_backup=self.keep_backup)
+            else:
+                self.wb.save(str(self.xlsx_path))
+        except XlsxPatchError:
+            raise
+        except PermissionError:
+            raise TimesheetLockedError(self.xlsx_path)
+        except Exception as e:
+            raise TimesheetWriteError(f"Excel書込エラー: {e}")
+
+    def save(self) -> None:
+        """変更があれば1回だけ保存する"""
+        queued_ids = self._apply_queued_rows()
+        if not self._dirty:
+            return
+        journal_ids = []
+        if self.journal is not None and self._written_rows:
+            journal_ids = punch_journal.record_intent(
+                self.xlsx_path, self._written_rows,
+                action=self.journal.get("action", ""), shift=self.journal.get("shift", ""),
+            )
+        try:
+            try:
+                self._save_wb()
+            except XlsxPatchError as e:
+                self._fallback_to_openpyxl(e)
+                self._save_wb()
+        except TimesheetLockedError as e:
+            if not (self.queue_on_lock and self._written_rows):
+                punch_journal.record_outcome(journal_ids, "locked", str(e))
+                raise
+            queue = get_punch_queue()
+            for row_data in self._written_rows:
+                queue.enqueue(self.xlsx_path, row_data)
+            notify_replay_worker()
+            punch_journal.record_outcome(journal_ids, "queued")
+            raise TimesheetQueuedError(self.xlsx_path, len(self._written_rows))
+        except Exception as e:
+            punch_journal.record_outcome(journal_ids, "error", str(e))
+            raise
+        punch_journal.record_outcome(journal_ids, "ok")
+        self._dirty = False
+        self._written_rows = []
+        if queued_ids:
+            self.flushed_ids.extend(queued_ids)
+            get_punch_queue().mark_done(queued_ids)
+            _log.info("書込待ちの打刻を書込: %s %d件", self.xlsx_path.name, len(queued_ids))
+        # write_row は日付列を書き換えないので、保存後のファイルにも同じマップが使える
+        if self._day_rows is not None:
+            remember_day_row_map(self.xlsx_path, self.col("date_col"), self._day_rows)
+
+
+def _cancelled(cancel_cb: Optional[Callable[[], bool]]) -> bool:
+    return cancel_cb is not None and bool(cancel_cb())
+
+
+# teams_cb なしで呼ばれた場合に Teams 投稿の結果を待つ上限（秒）。POST 自体のタイムアウトは 10 秒
+_TEAMS_WAIT_SEC = 15.0
+
+
+def _teams_result(future: Optional[Future], teams_cb: Optional[Callable[[str], None]]) -> str:
+    """
+    Teams 投稿の結果（teams_error）を返す。Excel 書込の後に呼び、書込と投稿を並行させる。
+    teams_cb を渡された場合は結果を teams_cb で受け取るため、待たずに "" を返す。
+    """
+    if future is None or teams_cb is not None:
+        return ""
+    try:
+        return future.result(timeout=_TEAMS_WAIT_SEC)
+    except FutureTimeoutError:
+        _log.warning("Teams POST 応答待ちタイムアウト (%.0f秒)", _TEAMS_WAIT_SEC)
+        return "Teams投稿エラー: 応答待ちがタイムアウトしました"
+
+
 def clock_in(
     config,
     shift: str,
@@ -73,13 +421,19 @@ def clock_in(
     remark_cb: Callable,
     status_cb: Callable,
     confirm_cb: Optional[Callable] = None,
+    cancel_cb: Optional[Callable[[], bool]] = None,
+    teams_cb: Optional[Callable[[str], None]] = None,
 ) -> bool:
     """
     出勤処理。
     status_cb(msg, color) でUIへフィードバック。
+    cancel_cb() が True を返すと、CSV出力・Teams投稿・Excel書込の前であれば中止する。
+    Teams 投稿はバックグラウンドで送信する。teams_cb を渡すと投稿の完了を待たずに返り、
+    結果（teams_error）は送信スレッドから teams_cb(teams_error) で通知する。
     Returns True on success, False on failure.
     """
     _log.info("clock_in 開始: date=%s shift=%s work_style=%s is_assumed=%s", target_date, shift, work_style, is_assumed)
+    teams_future = None
     try:
         if shift in VACATION_FIXED:
             # 固定休暇: VACATION_CONFIG から各列の値を取得
@@ -206,39 +560,39 @@ def clock_in(
                 status_cb("キャンセルされました", "gray")
                 return False, ""
 
+        # ここから先は CSV出力・Teams投稿・Excel書込を行うため取消できない
+        if _cancelled(cancel_cb):
+            status_cb("キャンセルされました", "gray")
+            return False, ""
+
         # CSV出力判定
         if not is_assumed and shift in REALTIME_SHIFTS and target_date == get_today():
             output_csv(config, shift, work_style, target_date)
 
-        # Teams投稿（Excel書込より先に実行）
+        # Teams投稿（送信待ちキューに登録し、Excel書込と並行して送信する）
         # リアルタイムシフト AND 非想定 AND 本日のみ投稿
-        late_reason = row_data.get("remark") if row_data.get("shift_label") == "遅刻" else ""
-        time_str = ""
-        if row_data.get("start_time") is not None:
-            serial = row_data["start_time"]
-            minutes_total = round(serial * 24 * 60)
-            h, m = divmod(minutes_total, 60)
-            time_str = f"{h:02d}:{m:02d}"
-        teams_error = ""
         if not no_post and not is_assumed and shift in REALTIME_SHIFTS and target_date == get_today():
-            try:
-                from assets.teams_webhook import send_teams_post
-                send_teams_post(config, "clock_in", {
-                    "shift": shift,
-                    "work_style": work_style,
-                    "comment": row_data.get("remark") or "",
-                })
-            except Exception as e:
-                teams_error = f"Teams投稿エラー: {e}"
+            teams_future = post_async(config, "clock_in", {
+                "shift": shift,
+                "work_style": work_style,
+                "comment": row_data.get("remark") or "",
+            }, teams_cb)
 
         # Excel書込（エラーは呼び出し元に伝播させてダイアログ表示）
         xlsx_path = _find_xlsx_or_raise(config, target_date)
         if xlsx_path:
-            write_to_excel(xlsx_path, row_data, config)
+            write_to_excel(xlsx_path, row_data, config,
+                           journal={"action": "clock_in", "shift": shift})
 
+        teams_error = _teams_result(teams_future, teams_cb)
         _log.info("clock_in 完了: date=%s shift=%s teams_error=%s", target_date, shift, teams_error or "なし")
         return True, teams_error
 
+    except TimesheetQueuedError as e:
+        # Teams 投稿は送信済みなので、投稿結果を添えて呼び出し元に伝える
+        e.teams_error = _teams_result(teams_future, teams_cb)
+        _log.warning("clock_in 書込待ちに登録: %s", e)
+        raise
     except (TimesheetNotFoundError, TimesheetLockedError, TimesheetWriteError, UnknownShiftTypeError) as e:
         _log.warning("clock_in エラー: %s", e)
         raise
@@ -248,6 +602,17 @@ def clock_in(
         return False, ""
 
 
+def clock_out_target_date(shift: str, is_cross_day: bool, now: Optional[datetime] = None) -> date:
+    """
+    退勤で書込む対象日を返す（深夜は前日、日跨ぎはさらに1日前）。
+    now 省略時は get_now()。
+    """
+    now = now or get_now()
+    days = (1 if shift == "深夜" else 0) + (1 if is_cross_day else 0)
+    actual_target = now - timedelta(days=days)
+    return actual_target.date() if isinstance(actual_target, datetime) else actual_target
+
+
 def clock_out(
     config,
     shift: str,
@@ -257,29 +622,27 @@ def clock_out(
     clock_out_info: dict,
     status_cb: Callable,
     is_cross_day: bool = False,
+    cancel_cb: Optional[Callable[[], bool]] = None,
+    teams_cb: Optional[Callable[[str], None]] = None,
 ) -> bool:
     """
     退勤処理。
     clock_out_info keys: next_workday(date), next_shift(str), mention(str), comment(str)
     is_cross_day: 退勤時刻が日付を跨いでいる場合 True
+    cancel_cb() が True を返すと、Teams投稿・Excel書込の前であれば中止する。
+    teams_cb は clock_in() と同じ（渡すと Teams 投稿の完了を待たない）。
+    タイムシートを読込めない（ロック中・破損）場合も Teams 投稿は行い、その後に
+    TimesheetLockedError / TimesheetWriteError を raise する。対象日の行・始業時刻が
+    ない場合は投稿せずに raise する。
     """
     _log.info("clock_out 開始: shift=%s is_cross_day=%s", shift, is_cross_day)
+    teams_future = None
     try:
         now = get_now()
 
         # ターゲット日付決定
         is_night = (shift == "深夜")
-        if is_cross_day:
-            if is_night:
-                actual_target = now - timedelta(days=2)
-            else:
-                actual_target = now - timedelta(days=1)
-        else:
-            if is_night:
-                actual_target = now - timedelta(days=1)
-            else:
-                actual_target = now
-        target_date = actual_target.date() if isinstance(actual_target, datetime) else actual_target
+        target_date = clock_out_target_date(shift, is_cross_day, now)
 
         # 時刻丸め
         # ・通常シフト 通常退勤: 実時刻そのまま（24h表記）
@@ -293,88 +656,83 @@ def clock_out(
         else:
             end_serial = time_to_excel_serial(rounded_dt.hour, rounded_dt.minute)
 
-        # 残業判定: 始業時刻列を読み取り 終業時刻との差分で9h超を判定
-        overtime_type = None
+        # 始業時刻の読取（残業判定）と終業時刻の書込は同じセッションで行い、
+        # ワークブックの読込・保存をそれぞれ1回に抑える
         xlsx_path = _find_xlsx_or_raise(config, target_date)
-        if xlsx_path and OPENPYXL_AVAILABLE:
-            try:
-                _layout = getattr(config, 'timesheet_layout', {})
-                _date_col = col_letter_to_num(_layout.get("date_col", "C"))
-                _start_col = col_letter_to_num(_layout.get("start_time_col", "F"))
-                wb_check = openpyxl.load_workbook(str(xlsx_path))
-                ws_check = wb_check.active
-                row_num_check = get_row_for_date(ws_check, target_date.day, _date_col)
-                if row_num_check is None:
-                    raise TimesheetWriteError(
-                        f"「{xlsx_path.name}」に{target_date.month}月{target_date.day}日の行を認識できませんでした。"
-                    )
-                start_value = ws_check.cell(row=row_num_check, column=_start_col).value
+        use_session = bool(xlsx_path) and OPENPYXL_AVAILABLE
+        journal = {"action": "clock_out", "shift": shift}
+        with ExitStack() as stack:
+            # ブックを読込めない（ロック中・破損）場合も Teams 投稿は行い、
+            # 読込エラーは Excel 書込の時点で raise する（残業判定はスキップ）
+            session = None
+            load_error = None
+            if use_session:
+                try:
+                    session = stack.enter_context(TimesheetSession(xlsx_path, config, journal=journal))
+                except (TimesheetLockedError, TimesheetWriteError) as e:
+                    _log.warning("clock_out 読込エラー（Teams 投稿後に raise）: %s", e)
+                    load_error = e
+
+            # 残業判定: 始業時刻列を読み取り 終業時刻との差分で9h超を判定
+            overtime_type = None
+            if session is not None:
+                row_num_check = session.require_row(target_date)
+                start_value = session.read_cell(row_num_check, "start_time_col")
                 if start_value is None or start_value == "":
                     # 始業時間が記載されていない場合はエラー
                     raise TimesheetWriteError("始業時間が記載されていません。先に出勤を記録してください。")
-                # openpyxl は時刻書式セルを datetime.time / datetime.datetime で返す場合がある
-                if isinstance(start_value, (int, float)):
-                    start_serial = float(start_value)
-                elif isinstance(start_value, timedelta):
-                    start_serial = start_value.total_seconds() / (24 * 3600)
-                elif hasattr(start_value, 'hour') and hasattr(start_value, 'minute'):
-                    start_serial = (start_value.hour * 60 + start_value.minute) / (24 * 60)
-                else:
-                    start_serial = float(start_value)
-                nine_hours_serial = 9.0 / 24.0
-                work_duration = end_serial - start_serial
-                if work_duration > nine_hours_serial:
-                    overtime_type = "客先指示"
-                wb_check.close()
-            except (TimesheetWriteError, TimesheetLockedError):
-                raise
-            except Exception as e:
-                _log.warning("残業判定スキップ: %s (start_value型=%s)", e,
-                             type(start_value).__name__ if 'start_value' in dir() else "未取得",
-                             exc_info=True)
-
-        row_data = {
-            "date": target_date,
-            "shift_label": None,   # 退勤時はE列を上書きしない
-            "start_time": None,    # 退勤時はF列を上書きしない
-            "end_time": end_serial,
-            "overtime_type": overtime_type,
-            "remark": None,        # コメントはTeams投稿専用。タイムシートには書かない
-        }
+                try:
+                    start_serial = _cell_value_to_serial(start_value)
+                    nine_hours_serial = 9.0 / 24.0
+                    work_duration = end_serial - start_serial
+                    if work_duration > nine_hours_serial:
+                        overtime_type = "客先指示"
+                except Exception as e:
+                    _log.warning("残業判定スキップ: %s (start_value型=%s)", e,
+                                 type(start_value).__name__, exc_info=True)
 
-        # Teams投稿（Excel書込より先に実行）
-        # リアルタイムシフトのみ投稿
-        # Teams表示用は実時刻（24h+なし）
-        time_str = f"{rounded_dt.hour:02d}:{rounded_dt.minute:02d}"
+            row_data = {
+                "date": target_date,
+                "shift_label": None,   # 退勤時はE列を上書きしない
+                "start_time": None,    # 退勤時はF列を上書きしない
+                "end_time": end_serial,
+                "overtime_type": overtime_type,
+                "remark": None,        # コメントはTeams投稿専用。タイムシートには書かない
+            }
 
-        # 実労働時間（Teams投稿用）
-        start_str = START_TIME_MAP.get(shift, "10:00")
-        sh, sm = map(int, start_str.split(":"))
-        start_serial_est = time_to_excel_serial(sh, sm)
-        hours_worked = (end_serial - start_serial_est) * 24
+            # ここから先は Teams投稿・Excel書込を行うため取消できない
+            if _cancelled(cancel_cb):
+                status_cb("キャンセルされました", "gray")
+                return False, ""
 
-        teams_error = ""
-        if not no_post and shift in REALTIME_SHIFTS:
-            try:
-                from assets.teams_webhook import send_teams_post
-                send_teams_post(config, "clock_out", {
+            # Teams投稿（送信待ちキューに登録し、Excel書込と並行して送信する）
+            # リアルタイムシフトのみ投稿
+            if not no_post and shift in REALTIME_SHIFTS:
+                teams_future = post_async(config, "clock_out", {
                     "next_workday": clock_out_info.get("next_workday"),
                     "next_shift": clock_out_info.get("next_shift", ""),
                     "next_work_mode": clock_out_info.get("next_work_mode", ""),
                     "mention": clock_out_info.get("mention", ""),
                     "comment": clock_out_info.get("comment", ""),
-                })
-            except Exception as e:
-                teams_error = f"Teams投稿エラー: {e}"
+                }, teams_cb)
 
-        # Excel書込（エラーは呼び出し元に伝播させてダイアログ表示）
-        if xlsx_path:
-            write_to_excel(xlsx_path, row_data, config)
+            # Excel書込（エラーは呼び出し元に伝播させてダイアログ表示）
+            if load_error is not None:
+                raise load_error
+            if session is not None:
+                session.write_row(row_data)
+                session.save()
 
+        teams_error = _teams_result(teams_future, teams_cb)
         _log.info("clock_out 完了: date=%s shift=%s overtime=%s teams_error=%s",
                   target_date, shift, overtime_type or "なし", teams_error or "なし")
         return True, teams_error
 
+    except TimesheetQueuedError as e:
+        # Teams 投稿は送信済みなので、投稿結果を添えて呼び出し元に伝える
+        e.teams_error = _teams_result(teams_future, teams_cb)
+        _log.warning("clock_out 書込待ちに登録: %s", e)
+        raise
     except (TimesheetNotFoundError, TimesheetLockedError, TimesheetWriteError) as e:
         _log.warning("clock_out エラー: %s", e)
         raise
@@ -392,11 +750,21 @@ def batch_write(
     custom_input_cb: Callable,
     remark_cb: Callable,
     status_cb: Callable,
+    cancel_cb: Optional[Callable[[], bool]] = None,
 ) -> tuple:
-    """複数日付のループ記入（一括記入）。(success_count, fail_count) を返す。"""
+    """
+    複数日付のループ記入（一括記入）。(success_count, fail_count, queued_count) を返す。
+    日付はタイムシート（年月）ごとにまとめ、ファイル検索・読込・保存は
+    タイムシートごとに1回ずつ行う。成功・失敗の集計とメッセージは日付単位。
+    Excel が開かれていて打刻キューに登録した日付（TimesheetQueuedError）は
+    まだ書込まれていないので成功には含めず queued_count に数える。
+    cancel_cb() が True を返すと、まだ書込んでいないタイムシートの日付を書込まずに終える
+    （取消した日付はどの件数にも数えない）。
+    """
     _log.info("batch_write 開始: shift=%s dates=%d件", shift, len(dates))
     success_count = 0
     fail_count = 0
+    queued_count = 0
 
     # 未定義の出勤形態チェック（ループ前に検証）
     _known = set(VACATION_FIXED) | set(VACATION_INPUT) | {CUSTOM_INPUT} | set(REALTIME_SHIFTS)
@@ -411,15 +779,17 @@ def batch_write(
         shared_custom_input = custom_input_cb()
         if shared_custom_input is None:
             status_cb("キャンセルされました", "gray")
-            return 0, 0
+            return 0, 0, 0
     elif shift in VACATION_INPUT:
         input_config = VACATION_INPUT_CONFIG[shift]
         shared_remark = remark_cb(input_config["dialog_prompt"], input_config["placeholder"])
         if shared_remark is None:
             status_cb("キャンセルされました", "gray")
-            return 0, 0
+            return 0, 0, 0
         shared_remark = shared_remark or input_config["default_remark"]
 
+    # 日付ごとに row_data を構築し、(年, 月) 単位にまとめる
+    groups: Dict[tuple, List[tuple]] = {}
     for d in dates:
         try:
             if shift in VACATION_FIXED:
@@ -480,48 +850,94 @@ def batch_write(
             else:
                 raise UnknownShiftTypeError(shift)
 
-            # Excel書込（エラーはステータスラベルに表示して続行）
-            try:
-                xlsx_path = _find_xlsx_or_raise(config, d)
-                if xlsx_path:
-                    write_to_excel(xlsx_path, row_data, config)
-            except TimesheetNotFoundError as e:
+        except Exception as e:
+            _log.error("batch_write 予期しないエラー: date=%s %s", d, e, exc_info=True)
+            fail_count += 1
+            status_cb(f"{d.strftime('%Y/%m/%d')} エラー: {e}", "orange")
+            continue
+
+        # 同じ年月（= 同じタイムシート）の日付をまとめる
+        groups.setdefault((d.year, d.month), []).append((d, row_data))
+
+    # Excel書込: タイムシートごとに読込・保存を1回ずつ行う
+    # （エラーはステータスラベルに表示して続行）
+    for items in groups.values():
+        pending = [d for d, _ in items]
+        if _cancelled(cancel_cb):
+            _log.info("batch_write 取消: %d件", len(pending))
+            for d in pending:
+                status_cb(f"{d.strftime('%Y/%m/%d')} 取消しました", "gray")
+            continue
+        try:
+            xlsx_path = _find_xlsx_or_raise(config, items[0][0])
+            if xlsx_path and OPENPYXL_AVAILABLE:
+                with TimesheetSession(xlsx_path, config,
+                                      journal={"action": "batch_write", "shift": shift}) as session:
+                    for d, row_data in items:
+                        try:
+                            session.write_row(row_data)
+                        except TimesheetWriteError as e:
+                            _log.warning("batch_write 書込エラー: date=%s %s", d, e)
+                            status_cb(f"{d.strftime('%Y/%m/%d')} Excel書込エラー: {e}", "orange")
+                            fail_count += 1
+                            pending.remove(d)
+                    session.save()
+        except TimesheetNotFoundError as e:
+            for d in pending:
                 _log.warning("batch_write タイムシート未検出: date=%s %s", d, e)
                 status_cb(
                     f"{d.strftime('%Y/%m/%d')} タイムシートが見つかりませんでした。", "orange"
                 )
-                fail_count += 1
-                continue
-            except TimesheetLockedError as e:
+            fail_count += len(pending)
+            continue
+        except TimesheetQueuedError as e:
+            for d in pending:
+                _log.warning("batch_write 書込待ちに登録: date=%s %s", d, e)
+                status_cb(
+                    f"{d.strftime('%Y/%m/%d')} Excelが開かれているため書込待ちに登録しました: {e.path.name}",
+                    "orange",
+                )
+            queued_count += len(pending)
+            continue
+        except TimesheetLockedError as e:
+            for d in pending:
                 _log.warning("batch_write ファイルロック: date=%s %s", d, e)
                 status_cb(
                     f"{d.strftime('%Y/%m/%d')} Excelが開かれています: {e.path.name}", "orange"
                 )
-                fail_count += 1
-                continue
-            except TimesheetWriteError as e:
+            fail_count += len(pending)
+            continue
+        except TimesheetWriteError as e:
+            for d in pending:
                 _log.warning("batch_write 書込エラー: date=%s %s", d, e)
                 status_cb(f"{d.strftime('%Y/%m/%d')} Excel書込エラー: {e}", "orange")
-                fail_count += 1
-                continue
+            fail_count += len(pending)
+            continue
+        except Exception as e:
+            for d in pending:
+                _log.error("batch_write 予期しないエラー: date=%s %s", d, e, exc_info=True)
+                status_cb(f"{d.strftime('%Y/%m/%d')} エラー: {e}", "orange")
+            fail_count += len(pending)
+            continue
 
+        for d in pending:
             _log.debug("batch_write 書込成功: date=%s", d)
-            success_count += 1
+        success_count += len(pending)
 
-        except Exception as e:
-            _log.error("batch_write 予期しないエラー: date=%s %s", d, e, exc_info=True)
-            fail_count += 1
-            status_cb(f"{d.strftime('%Y/%m/%d')} エラー: {e}", "orange")
+    _log.info("batch_write 完了: 成功=%d 失敗=%d 書込待ち=%d", success_count, fail_count, queued_count)
+    return success_count, fail_count, queued_count
 
-    _log.info("batch_write 完了: 成功=%d 失敗=%d", success_count, fail_count)
-    return success_count, fail_count
 
-
-def write_to_excel(xlsx_path: Path, row_data: dict, config=None) -> bool:
+def write_to_excel(xlsx_path: Path, row_data: dict, config=None,
+                   journal: Optional[Dict[str, str]] = None) -> bool:
     """
     openpyxl で Excel に書込む。
     日付列を走査して target_day に一致する行を特定し、各列に値を書込む。
     列位置は config.timesheet_layout から取得する（未設定時はデフォルト値を使用）。
+    読込・保存は TimesheetSession でそれぞれ1回のみ行う。
+    保存時にファイルが開かれていれば打刻キューに登録して TimesheetQueuedError を
+    raise する（config.timesheet_io["offline_queue"] が False なら TimesheetLockedError）。
+    journal（{"action": ..., "shift": ...}）を渡すと保存前後に打刻ジャーナルへ記録する。
 
     row_data keys:
       - date: date (対象日)
@@ -535,55 +951,53 @@ def write_to_excel(xlsx_path: Path, row_data: dict, config=None) -> bool:
         return False
 
     try:
-        _layout = getattr(config, 'timesheet_layout', {}) if config else {}
-        date_col          = col_letter_to_num(_layout.get("date_col",          "C"))
-        shift_type_col    = col_letter_to_num(_layout.get("shift_type_col",    "E"))
-        start_time_col    = col_letter_to_num(_layout.get("start_time_col",    "F"))
-        end_time_col      = col_letter_to_num(_layout.get("end_time_col",      "G"))
-        overtime_type_col = col_letter_to_num(_layout.get("overtime_type_col", "K"))
-        remark_col        = col_letter_to_num(_layout.get("remark_col",        "L"))
-
-        target_date = row_data["date"]
-
-        wb = openpyxl.load_workbook(str(xlsx_path))
-        ws = wb.active
-
-        row_num = get_row_for_date(ws, target_date.day, date_col)
-        if row_num is None:
-            raise TimesheetWriteError(
-                f"「{xlsx_path.name}」に{target_date.month}月{target_date.day}日の行を認識できませんでした。"
-            )
-
-        # 出勤形態
-        if row_data.get("shift_label") is not None:
-            ws.cell(row=row_num, column=shift_type_col).value = row_data["shift_label"]
-
-        # 始業時刻（Excelシリアル値）
-        if row_data.get("start_time") is not None:
-            ws.cell(row=row_num, column=start_time_col).value = row_data["start_time"]
-
-        # 終業時刻（Excelシリアル値）
-        if row_data.get("end_time") is not None:
-            ws.cell(row=row_num, column=end_time_col).value = row_data["end_time"]
-
-        # 残業種別
-        if row_data.get("overtime_type") is not None:
-            ws.cell(row=row_num, column=overtime_type_col).value = row_data["overtime_type"]
-
-        # 備考
-        if row_data.get("remark") is not None:
-            ws.cell(row=row_num, column=remark_col).value = row_data["remark"]
-
-        wb.save(str(xlsx_path))
-        _log.debug("write_to_excel 完了: file=%s date=%s row=%d", xlsx_path.name, target_date, row_num)
+        with TimesheetSession(xlsx_path, config, journal=journal) as session:
+            row_num = session.write_row(row_data)
+            session.save()
+        _log.debug("write_to_excel 完了: file=%s date=%s row=%d", xlsx_path.name, row_data["date"], row_num)
         return True
 
+    except (TimesheetLockedError, TimesheetWriteError):
+        raise
     except PermissionError:
         raise TimesheetLockedError(xlsx_path)
     except Exception as e:
         raise TimesheetWriteError(f"Excel書込エラー: {e}")
 
 
+def replay_punch_queue(xlsx_path: Path, config=None) -> int:
+    """
+    打刻キューにある xlsx_path 宛ての書込待ち打刻をまとめて書込み、書込んだ件数を返す。
+    ファイルがまだ開かれていれば TimesheetLockedError を raise する（キューには残る）。
+    ファイルが見つからない場合（共有フォルダの一時的な切断・名前変更等）も
+    TimesheetWriteError を raise してキューに残す。ReplayWorker が失敗回数を数えて
+    再試行し、回数を使い切ったらデッドレターに移す。
+    """
+    xlsx_path = Path(xlsx_path)
+    queue = get_punch_queue()
+    if not queue.has_pending(xlsx_path):
+        return 0
+    if not xlsx_path.exists():
+        raise TimesheetWriteError(f"書込待ちの打刻のファイルが見つかりません: {xlsx_path}")
+    with TimesheetSession(xlsx_path, config, queue_on_lock=False) as session:
+        session.save()
+    return len(session.flushed_ids)
+
+
+def _cell_value_to_serial(value) -> float:
+    """
+    時刻セルの値を Excel シリアル値に変換する。
+    openpyxl は時刻書式セルを datetime.time / datetime.datetime / timedelta で返す場合がある。
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, timedelta):
+        return value.total_seconds() / (24 * 3600)
+    if hasattr(value, 'hour') and hasattr(value, 'minute'):
+        return (value.hour * 60 + value.minute) / (24 * 60)
+    return float(value)
+
+
 def output_csv(
     config,
     shift: str,
@@ -625,20 +1039,23 @@ def verify_timesheet_header(config, target_date: date) -> Optional[str]:
         return None
     try:
         xlsx_path = _find_xlsx_or_raise(config, target_date)
-        _layout = getattr(config, 'timesheet_layout', {}) if config else {}
-        year_cell  = _layout.get("year_cell",  "C6")
-        month_cell = _layout.get("month_cell", "C7")
-        wb = openpyxl.load_workbook(str(xlsx_path), data_only=True)
-        ws = wb.active
-        raw_year  = ws[year_cell].value
-        raw_month = ws[month_cell].value
-        wb.close()
+        layout = _layout_of(config)
+        year_cell  = layout["year_cell"]
+        month_cell = layout["month_cell"]
+        header = read_timesheet_cells(xlsx_path, [year_cell, month_cell])
+        raw_year  = header[year_cell]
+        raw_month = header[month_cell]
 
         def _is_empty(v) -> bool:
             return v is None or str(v).strip() == ""
 
-        def _to_int(v):
-            """数値変換。失敗時は None を返す（ValueError / TypeError を握り潰さない）"""
+        def _to_int(v, part: str):
+            """
+            数値変換。日付書式のセル（datetime）は年セルなら年、月セルなら月を取り出す。
+            失敗時は None を返す（ValueError / TypeError を握り潰さない）
+            """
+            if isinstance(v, date):
+                return getattr(v, part)
             try:
                 return int(v)
             except (ValueError, TypeError):
@@ -658,8 +1075,8 @@ def verify_timesheet_header(config, target_date: date) -> Optional[str]:
         year_empty  = _is_empty(raw_year)
         month_empty = _is_empty(raw_month)
 
-        header_year  = None if year_empty  else _to_int(raw_year)
-        header_month = None if month_empty else _to_int(raw_month)
+        header_year  = None if year_empty  else _to_int(raw_year, "year")
+        header_month = None if month_empty else _to_int(raw_month, "month")
 
         year_invalid  = not year_empty  and header_year  is None
         month_invalid = not month_empty and header_month is None
@@ -677,8 +1094,8 @@ def verify_timesheet_header(config, target_date: date) -> Optional[str]:
             return _mismatch_msg(f"{header_year}年", f"{header_month}月")
 
         return None
-    except (TimesheetNotFoundError, TimesheetLockedError):
-        return None  # ファイル未検出・ロック中はスキップ（後続処理でエラー）
+    except (TimesheetNotFoundError, TimesheetLockedError, TimesheetWriteError):
+        return None  # ファイル未検出・ロック中・読込不可はスキップ（後続処理でエラー）
     except Exception:
         return None
 
@@ -705,7 +1122,9 @@ def _find_xlsx_or_raise(config, target_date: date) -> Path:
             target_date.year, target_date.month
         )
 
-    xlsx = find_timesheet(folder, name, target_date.year, target_date.month)
+    io_opts = getattr(config, "timesheet_io", None) or {}
+    xlsx = find_timesheet(folder, name, target_date.year, target_date.month,
+                          ttl_sec=io_opts.get("dir_index_ttl_sec", 0) or 0)
     if not xlsx:
         raise TimesheetNotFoundError(folder, name, target_date.year, target_date.month)
     return xlsx
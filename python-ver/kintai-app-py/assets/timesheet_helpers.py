@@ -1,9 +1,17 @@
 ﻿"""時刻丸め・Excel シリアル値変換・祝日計算・ファイル検索ヘルパー"""
 import calendar
 import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from collections import OrderedDict
 from datetime import date, datetime, timedelta
 from pathlib import Path
-from typing import Optional, Set
+from typing import Callable, Dict, FrozenSet, List, Optional
+
+from assets.jp_holidays import holidays_in_month
 
 
 def col_letter_to_num(col: str) -> int:
@@ -40,14 +48,6 @@ def get_today() -> date:
             pass
     return date.today()
 
-try:
-    import openpyxl
-    from openpyxl.utils.datetime import from_excel as _from_excel
-    OPENPYXL_AVAILABLE = True
-except ImportError:
-    OPENPYXL_AVAILABLE = False
-    _from_excel = None
-
 from assets.timesheet_constants import START_TIME_MAP, LATE_MARGIN_MIN, ROUND_UNIT_MIN
 
 
@@ -84,118 +84,210 @@ def time_to_excel_serial(hour: int, minute: int) -> float:
     return total_minutes / (24 * 60)
 
 
-def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+def get_holidays(year: int, month: int) -> FrozenSet[date]:
     """
-    指定した年月の第 n 回目の曜日 (0=月曜...6=日曜) を返す。
+    指定した年月の日本の祝日の集合を返す。
+    振替休日・国民の休日も含む（年ごとに 1 回だけ計算する。jp_holidays 参照）。
     """
-    first = date(year, month, 1)
-    # first.weekday() が weekday より大きい場合は翌週に補正
-    diff = (weekday - first.weekday()) % 7
-    first_occurrence = first + timedelta(days=diff)
-    return first_occurrence + timedelta(weeks=n - 1)
-
-
-def _vernal_equinox(year: int) -> int:
-    """春分の日（3月）の日を返す（近似計算）"""
-    if year <= 1979:
-        return int(20.8357 + 0.242194 * (year - 1980) - int((year - 1983) / 4))
-    elif year <= 2099:
-        return int(20.8431 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
-    else:
-        return int(21.851 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
+    return holidays_in_month(year, month)
 
 
-def _autumnal_equinox(year: int) -> int:
-    """秋分の日（9月）の日を返す（近似計算）"""
-    if year <= 1979:
-        return int(23.2588 + 0.242194 * (year - 1980) - int((year - 1983) / 4))
-    elif year <= 2099:
-        return int(23.2488 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
-    else:
-        return int(24.2488 + 0.242194 * (year - 1980) - int((year - 1980) / 4))
+_YYYYMM_RE = re.compile(r"(?=(\d{6}))")
 
 
-def get_holidays(year: int, month: int) -> Set[date]:
+def _is_timesheet_name(name: str) -> bool:
     """
-    指定した年月の日本の祝日の集合を返す。
-    振替休日（日曜日が祝日の翌月曜日）も含む。
+    タイムシート検索の対象になるファイル名か。~$ で始まるのは Excel が開いている間の所有者ファイル、
+    . で始まるのは atomic_write() の一時ファイル
     """
-    # まず全祝日を計算
-    holidays: Set[date] = set()
-
-    # 固定祝日
-    fixed = [
-        (1, 1),   # 元旦
-        (2, 11),  # 建国記念日
-        (2, 23),  # 天皇誕生日（2020年以降の）
-        (4, 29),  # 昭和の日
-        (5, 3),   # 憲法記念日
-        (5, 4),   # みどりの日
-        (5, 5),   # こどもの日
-        (8, 11),  # 山の日
-        (11, 3),  # 文化の日
-        (11, 23), # 勤労感謝の日
-    ]
-    for m, d in fixed:
-        try:
-            holidays.add(date(year, m, d))
-        except ValueError:
-            pass
+    return name.lower().endswith(".xlsx") and not name.startswith(("~$", "."))
 
-    # 春分の日 (3月)
-    try:
-        holidays.add(date(year, 3, _vernal_equinox(year)))
-    except ValueError:
-        pass
 
-    # 秋分の日 (9月)
-    try:
-        holidays.add(date(year, 9, _autumnal_equinox(year)))
-    except ValueError:
-        pass
+class TimesheetDirIndex:
+    """
+    タイムシートフォルダの .xlsx 一覧インデックス。
+    os.scandir で1回だけ一覧を取り、ファイル名に含まれる6桁の数字（YYYYMM 候補）ごとに
+    ファイル名を保持する。(display_name, YYYYMM) の検索結果もメモする。
 
-    # ハッピーマンデー
-    happy_mondays = [
-        (1, 2),   # 成人の日 (1月第2月曜)
-        (7, 3),   # 海の日 (7月第3月曜)
-        (9, 3),   # 敬老の日 (9月第3月曜)
-        (10, 2),  # スポーツの日 (10月第2月曜)
-    ]
-    for m, n in happy_mondays:
+    フォルダの mtime が変わったときだけ一覧を取り直す。ttl_sec > 0 の場合は
+    mtime が変わらなくても ttl_sec 秒ごとに取り直す（mtime が更新されにくい共有フォルダ向け）。
+    atomic_write() での保存によるフォルダの mtime の変化は note_saved() で一覧に反映し、取り直さない。
+    """
+
+    def __init__(self, folder: str, ttl_sec: float = 0):
+        self.folder = folder
+        self.ttl_sec = ttl_sec
+        self._mtime_ns: Optional[int] = None
+        self._built_at = 0.0
+        self._by_yyyymm: Dict[str, List[str]] = {}
+        self._hits: Dict[tuple, Optional[str]] = {}
+        self._lock = threading.Lock()
+
+    def _rebuild(self, mtime_ns: int) -> None:
+        by_yyyymm: Dict[str, List[str]] = {}
+        with os.scandir(self.folder) as it:
+            for entry in it:
+                name = entry.name
+                if not _is_timesheet_name(name):
+                    continue
+                for yyyymm in set(_YYYYMM_RE.findall(name)):
+                    by_yyyymm.setdefault(yyyymm, []).append(name)
+        self._by_yyyymm = by_yyyymm
+        self._hits = {}
+        self._mtime_ns = mtime_ns
+        self._built_at = time.monotonic()
+
+    def _refresh(self) -> bool:
+        """必要なら一覧を取り直す。フォルダが存在しなければ False"""
         try:
-            holidays.add(_nth_weekday(year, m, 0, n))  # 0=月曜日
-        except ValueError:
-            pass
+            mtime_ns = os.stat(self.folder).st_mtime_ns
+        except OSError:
+            self._mtime_ns = None
+            self._by_yyyymm = {}
+            self._hits = {}
+            return False
+        if mtime_ns != self._mtime_ns or (
+            self.ttl_sec > 0 and time.monotonic() - self._built_at >= self.ttl_sec
+        ):
+            self._rebuild(mtime_ns)
+        return True
+
+    def note_saved(self, path, folder_mtime_before: Optional[int]) -> None:
+        """
+        path を保存した後に呼ぶ。保存前のフォルダの mtime（folder_mtime_before）が一覧を作ったときと
+        同じなら、フォルダの変化は自分の保存だけなので path を一覧に加えて今の mtime を記録する
+        （次の検索で取り直さない）。保存前から変わっていた場合は何もしない（次の検索で取り直す）。
+        """
+        name = Path(path).name
+        with self._lock:
+            if self._mtime_ns is None or folder_mtime_before != self._mtime_ns:
+                return
+            try:
+                self._mtime_ns = os.stat(self.folder).st_mtime_ns
+            except OSError:
+                self._mtime_ns = None
+                return
+            if not _is_timesheet_name(name):
+                return
+            for yyyymm in set(_YYYYMM_RE.findall(name)):
+                names = self._by_yyyymm.setdefault(yyyymm, [])
+                if name not in names:
+                    names.append(name)
+                    self._hits = {}
+
+    def lookup(self, display_name: str, year: int, month: int) -> Optional[Path]:
+        """display_name と YYYYMM を含む .xlsx のパスを返す。見つからない場合は None"""
+        yyyymm = f"{year:04d}{month:02d}"
+        with self._lock:
+            try:
+                if not self._refresh():
+                    return None
+            except OSError:
+                return None
+            key = (display_name, yyyymm)
+            if key not in self._hits:
+                self._hits[key] = next(
+                    (n for n in self._by_yyyymm.get(yyyymm, []) if display_name in n), None
+                )
+            name = self._hits[key]
+        return Path(self.folder) / name if name else None
+
+
+_dir_indexes: Dict[str, TimesheetDirIndex] = {}
+_dir_indexes_lock = threading.Lock()
+
+
+def get_dir_index(folder: str, ttl_sec: float = 0) -> TimesheetDirIndex:
+    """フォルダごとに共有される TimesheetDirIndex を返す"""
+    key = os.path.abspath(folder)
+    with _dir_indexes_lock:
+        index = _dir_indexes.get(key)
+        if index is None:
+            index = _dir_indexes[key] = TimesheetDirIndex(folder, ttl_sec)
+        index.ttl_sec = ttl_sec
+        return index
+
+
+def clear_dir_index_cache() -> None:
+    """フォルダ一覧インデックスを破棄する"""
+    with _dir_indexes_lock:
+        _dir_indexes.clear()
+
+
+def find_timesheet(folder: str, display_name: str, year: int, month: int,
+                   ttl_sec: float = 0) -> Optional[Path]:
+    """
+    folder 内から display_name と "{year:04d}{month:02d}" を含む .xlsx を検索する。
+    例: 202602宮田.xlsx
+    見つからない場合は None を返す。
+    フォルダ一覧は TimesheetDirIndex にキャッシュされ、フォルダの mtime が変わるまで再取得しない。
+    """
+    return get_dir_index(folder, ttl_sec).lookup(display_name, year, month)
 
-    # 振替休日の計算（全祝日の中から日曜日を検出）
-    substitute = set()
-    for h in holidays:
-        if h.weekday() == 6:  # 日曜日
-            candidate = h + timedelta(days=1)
-            # 振替候補が別の祝日と重なる場合は更に翌日へ
-            while candidate in holidays or candidate in substitute:
-                candidate += timedelta(days=1)
-            substitute.add(candidate)
-    holidays.update(substitute)
 
-    # 指定月のみフィルタ
-    return {h for h in holidays if h.month == month and h.year == year}
+class TempFileError(OSError):
+    """atomic_write() の一時ファイル・バックアップを作れない・書けない（置換先のロックではない）"""
 
 
-def find_timesheet(folder: str, display_name: str, year: int, month: int) -> Optional[Path]:
+def atomic_write(path, write: Callable[[str], None], keep_backup: bool = False) -> None:
     """
-    folder 内から display_name と "{year:04d}{month:02d}" を含む .xlsx を検索する。
-    例: 202602宮田.xlsx
-    見つからない場合は None を返す。
+    write(一時ファイルのパス) で path と同じフォルダの一時ファイルに書き、fsync してから
+    os.replace で path に置き換える。書込途中で失敗・中断しても path は元の内容のまま残る。
+    keep_backup=True の場合は置換前のファイルを "<ファイル名>.bak" として残す（1世代）。
+    置換前（一時ファイルの作成・書込・バックアップ）の OSError は TempFileError にする。
+    PermissionError のまま raise するのは os.replace で置き換えられなかった（path がロック中）場合だけ。
+    フォルダの TimesheetDirIndex があれば、保存後に note_saved() で一覧に反映する。
     """
-    target_prefix = f"{year:04d}{month:02d}"
-    folder_path = Path(folder)
-    if not folder_path.exists():
-        return None
-    for p in folder_path.glob("*.xlsx"):
-        if display_name in p.name and target_prefix in p.name:
-            return p
-    return None
+    path = Path(path)
+    folder = str(path.parent)
+    try:
+        mtime_before: Optional[int] = os.stat(folder).st_mtime_ns
+    except OSError:
+        mtime_before = None
+    # 一時ファイル名は . で始めて .xlsx で終わらせない（タイムシート検索の対象外にする）
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=folder)
+    except OSError as e:
+        raise TempFileError(e.errno, f"一時ファイルを作成できません: {e}") from e
+    os.close(fd)
+    try:
+        try:
+            write(tmp)
+            with open(tmp, "rb+") as f:
+                os.fsync(f.fileno())
+            if path.exists():
+                shutil.copymode(str(path), tmp)
+                if keep_backup:
+                    shutil.copy2(str(path), str(path.with_name(path.name + ".bak")))
+        except OSError as e:
+            raise TempFileError(e.errno, f"一時ファイルに書込めません: {e}") from e
+        os.replace(tmp, str(path))
+    except BaseException:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+        raise
+    _fsync_dir(path.parent)
+    index = _dir_indexes.get(os.path.abspath(folder))
+    if index is not None:
+        index.note_saved(path, mtime_before)
+
+
+def _fsync_dir(folder: Path) -> None:
+    """リネームをディスクに確定させる（POSIX のみ。Windows ではフォルダを開けないので何もしない）"""
+    if not hasattr(os, "O_DIRECTORY"):
+        return
+    try:
+        fd = os.open(str(folder), os.O_RDONLY | os.O_DIRECTORY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
 
 
 def is_late(shift: str, now: datetime) -> bool:
@@ -232,38 +324,102 @@ def format_date_jp(d: date) -> str:
     return f"{d.year}年{d.month:02d}月{d.day:02d}日（{weekdays[d.weekday()]}）"
 
 
-def get_row_for_date(ws, target_day: int, date_col: int = 3) -> Optional[int]:
+# 日付列の走査範囲（タイムシートの1日〜31日が入る行）
+_DAY_ROW_FIRST = 18
+_DAY_ROW_LAST = 48
+
+# 日→行マップのキャッシュ: (絶対パス, mtime_ns, size, date_col) → {日: 行番号}
+_ROW_INDEX_MAX = 32
+_row_index_cache: "OrderedDict[tuple, Dict[int, int]]" = OrderedDict()
+_row_index_lock = threading.Lock()
+
+
+def build_day_row_map(ws, date_col: int = 3) -> Dict[int, int]:
     """
-    date_col列を18行目〜48行目まで走査し、
-    target_day（日の数値）に一致する行番号を返す。
-    見つからない場合はNoneを返す。
+    date_col列を18行目〜48行目まで1回だけ走査し、{日: 行番号} を返す。
 
-    28日以前: 日付列の数値と直接照合（行位置に依存しない）
-    29〜31日: 28日の行を基準に +1/+2/+3 行で特定
+    28日以前: 日付列の数値と直接照合（同じ値が複数あれば最初の行）
+    29〜31日: 28日の行を基準に +1/+2/+3 行（28日の行がなければ含めない）
     """
-    # まず28日の行を探す（29〜31日の基準になる）
-    row_28 = None
-    for row_num in range(18, 49):
+    day_rows: Dict[int, int] = {}
+    for row_num in range(_DAY_ROW_FIRST, _DAY_ROW_LAST + 1):
         val = ws.cell(row=row_num, column=date_col).value
         try:
-            if int(val) == 28:
-                row_28 = row_num
-                break
+            day = int(val)
         except (ValueError, TypeError):
             continue
+        if day <= 28 and day not in day_rows:
+            day_rows[day] = row_num
+
+    row_28 = day_rows.get(28)
+    if row_28 is not None:
+        for offset in (1, 2, 3):  # 29→1, 30→2, 31→3
+            day_rows[28 + offset] = row_28 + offset
+    return day_rows
 
-    if target_day <= 28:
-        for row_num in range(18, 49):
-            val = ws.cell(row=row_num, column=date_col).value
-            try:
-                if int(val) == target_day:
-                    return row_num
-            except (ValueError, TypeError):
-                continue
-        return None
 
-    # 29〜31日: 28日行の直後
-    if row_28 is None:
+def _row_index_key(path, date_col: int) -> Optional[tuple]:
+    """キャッシュキー (絶対パス, mtime_ns, size, date_col)。stat できなければ None"""
+    try:
+        st = os.stat(path)
+    except OSError:
         return None
-    offset = target_day - 28  # 29→1, 30→2, 31→3
-    return row_28 + offset
+    return (os.path.abspath(path), st.st_mtime_ns, st.st_size, date_col)
+
+
+def get_day_row_map(ws, date_col: int = 3, path=None) -> Dict[int, int]:
+    """
+    {日: 行番号} を返す。path を指定した場合はファイルの mtime・サイズ・date_col を
+    キーにキャッシュし、同じファイルが変更されていなければ走査を省略する。
+    """
+    key = _row_index_key(path, date_col) if path else None
+    if key is not None:
+        with _row_index_lock:
+            cached = _row_index_cache.get(key)
+            if cached is not None:
+                _row_index_cache.move_to_end(key)
+                return cached
+    day_rows = build_day_row_map(ws, date_col)
+    if key is not None:
+        _store_row_index(key, day_rows)
+    return day_rows
+
+
+def remember_day_row_map(path, date_col: int, day_rows: Dict[int, int]) -> None:
+    """
+    保存直後のファイルに対して既知の {日: 行番号} を登録する。
+    日付列を書き換えていない保存の後に呼ぶと、次回の読込で再走査しない。
+    """
+    key = _row_index_key(path, date_col)
+    if key is not None:
+        _store_row_index(key, day_rows)
+
+
+def _store_row_index(key: tuple, day_rows: Dict[int, int]) -> None:
+    with _row_index_lock:
+        # 同じファイル・同じ列の古い世代は不要なので捨てる
+        for old in [k for k in _row_index_cache if k[0] == key[0] and k[3] == key[3]]:
+            del _row_index_cache[old]
+        _row_index_cache[key] = day_rows
+        while len(_row_index_cache) > _ROW_INDEX_MAX:
+            _row_index_cache.popitem(last=False)
+
+
+def clear_row_index_cache() -> None:
+    """日→行マップのキャッシュを破棄する（timesheet_layout 変更時など）"""
+    with _row_index_lock:
+        _row_index_cache.clear()
+
+
+def get_row_for_date(ws, target_day: int, date_col: int = 3, path=None) -> Optional[int]:
+    """
+    date_col列を18行目〜48行目まで走査し、
+    target_day（日の数値）に一致する行番号を返す。
+    見つからない場合はNoneを返す。
+
+    28日以前: 日付列の数値と直接照合（行位置に依存しない）
+    29〜31日: 28日の行を基準に +1/+2/+3 行で特定
+
+    path（ws の読込元ファイル）を指定すると走査結果をキャッシュする。
+    """
+    return get_day_row_map(ws, date_col, path).get(target_day)
@@ -0,0 +1,344 @@
+"""Teams 投稿の再送待ち（Webhook アウトボックス）
+
+送信に失敗した投稿のペイロード（_assemble_payload() の結果）を JSONL ファイルに
+追記して永続化し、バックグラウンドのワーカーがジッター付きの指数バックオフで再送する。
+HTTP 429 / 503 等の Retry-After は待ち時間の下限として守る。max_attempts 回送っても
+届かない投稿と、再送しても成功しない投稿（HTTP 400・404 等）はデッドレターに移す。
+ワーカーは起動時に待ち時間に関係なく全件を 1 回送る。
+
+送信先は URL（トークンを含む）ではなく送信先キー（"webhook_url"・webhook_targets の name）で
+保存し、再送時に設定から URL を引く。
+
+ファイル形式（1行1レコード、追記のみ）:
+    {"op": "add",   "id": ..., "target": ..., "message_type": ..., "payload": {...},
+                    "queued_at": ..., "attempts": 1, "next_at": <UNIX時刻>, "error": ...}
+    {"op": "retry", "id": ..., "attempts": ..., "next_at": ..., "error": ...}
+    {"op": "done",  "id": ...}
+    {"op": "dead",  "id": ..., "error": ...}
+未処理のレコードがなくなった時点でファイルを空に戻す。
+デッドレター（dead_letter.jsonl）には add レコードに error・dead_at を加えて追記する。
+"""
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from assets.app_logger import get_logger
+
+_log = get_logger("kintai.webhook")
+
+_OUTBOX_DIR = Path(__file__).parent / "outbox"
+_OUTBOX_FILE = _OUTBOX_DIR / "webhook_outbox.jsonl"
+_DEAD_LETTER_FILE = _OUTBOX_DIR / "dead_letter.jsonl"
+
+# 再送の待ち時間（秒）。失敗するたびに倍にして上限で止め、後半分をランダムにする
+_RETRY_BASE_SEC = 10.0
+_RETRY_MAX_SEC = 900.0
+_MAX_ATTEMPTS = 8
+
+
+def is_retryable(error: Exception) -> bool:
+    """
+    再送すれば届く見込みのあるエラーか（接続・タイムアウト・408・429・5xx）。
+    retryable = False の例外（送信先が設定にない等）は再送しない
+    """
+    if not getattr(error, "retryable", True):
+        return False
+    status = getattr(error, "status", None)
+    return status is None or status in (408, 429) or status >= 500
+
+
+def backoff_delay(attempts: int, retry_after: Optional[float] = None,
+                  rand: Callable[[], float] = random.random) -> float:
+    """
+    attempts 回失敗した後の待ち時間（秒）。
+    _RETRY_BASE_SEC * 2^(attempts-1)（上限 _RETRY_MAX_SEC）の半分を固定、残り半分をジッターにして、
+    プロキシ復旧直後に全端末の再送が同時に集中しないようにする。retry_after があればそれ以上待つ。
+    """
+    cap = min(_RETRY_BASE_SEC * 2 ** max(attempts - 1, 0), _RETRY_MAX_SEC)
+    delay = cap / 2 + rand() * cap / 2
+    if retry_after is not None:
+        delay = max(delay, retry_after)
+    return delay
+
+
+class WebhookOutbox:
+    """
+    再送待ち投稿の永続キュー。スレッドセーフ。
+    ファイルは起動時に1回だけ読込み、以降はメモリ上の内容と追記で同期する。
+    """
+
+    def __init__(self, path: Path = _OUTBOX_FILE, dead_letter_path: Path = _DEAD_LETTER_FILE):
+        self.path = Path(path)
+        self.dead_letter_path = Path(dead_letter_path)
+        self._lock = threading.RLock()
+        self._entries: Dict[str, Dict[str, Any]] = {}  # id → 最新の状態（登録順）
+        self._load()
+
+    def _load(self) -> None:
+        try:
+            lines = self.path.read_text(encoding="utf-8").splitlines()
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            _log.error("再送待ちを読込めません: %s (%s)", self.path, e)
+            return
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except json.JSONDecodeError:
+                # 追記中に終了した場合の途中行は読み飛ばす
+                _log.warning("再送待ちの不正な行を無視: %r", line[:80])
+                continue
+            op = rec.get("op")
+            if op == "add":
+                self._entries[rec["id"]] = rec
+            elif op == "retry" and rec.get("id") in self._entries:
+                self._entries[rec["id"]].update(
+                    attempts=rec["attempts"], next_at=rec["next_at"], error=rec.get("error", ""))
+            else:
+                self._entries.pop(rec.get("id"), None)
+        if self._entries:
+            _log.info("再送待ち読込: 未送信=%d件", len(self._entries))
+
+    def _append(self, path: Path, records: List[Dict[str, Any]]) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _compact(self) -> None:
+        """未送信がなくなったらファイルを空にする"""
+        try:
+            with open(self.path, "w", encoding="utf-8"):
+                pass
+        except OSError as e:
+            _log.warning("再送待ちを空にできません: %s (%s)", self.path, e)
+
+    def enqueue(self, target: str, message_type: str, payload: Dict[str, Any], error: Exception) -> str:
+        """1回目の送信に失敗した投稿を送信先キー target で登録し、エントリIDを返す"""
+        rec = {
+            "op": "add",
+            "id": uuid.uuid4().hex,
+            "target": target,
+            "message_type": message_type,
+            "payload": payload,
+            "queued_at": datetime.now().isoformat(timespec="seconds"),
+            "attempts": 1,
+            "next_at": time.time() + backoff_delay(1, getattr(error, "retry_after", None)),
+            "error": str(error),
+        }
+        with self._lock:
+            self._append(self.path, [rec])
+            self._entries[rec["id"]] = rec
+        _log.info("再送待ち登録: type=%s (%s)", message_type, error)
+        return rec["id"]
+
+    def pending(self) -> List[Dict[str, Any]]:
+        """未送信エントリを登録順に返す"""
+        with self._lock:
+            return [dict(r) for r in self._entries.values()]
+
+    def pending_count(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """再送時刻を過ぎたエントリを登録順に返す（now=None なら全件）"""
+        return [r for r in self.pending() if now is None or r["next_at"] <= now]
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """次の再送までの秒数（未送信がなければ None）"""
+        now = time.time() if now is None else now
+        with self._lock:
+            if not self._entries:
+                return None
+            return max(min(r["next_at"] for r in self._entries.values()) - now, 0.0)
+
+    def mark_done(self, entry_id: str) -> None:
+        self._finish(entry_id, {"op": "done", "id": entry_id})
+
+    def mark_retry(self, entry_id: str, error: Exception, max_attempts: int = _MAX_ATTEMPTS) -> Optional[float]:
+        """
+        再送に失敗したエントリの次の再送時刻を決める。max_attempts 回に達したらデッドレターに移す。
+        次の再送時刻（UNIX時刻）を返す。デッドレターに移した場合は None
+        """
+        with self._lock:
+            rec = self._entries.get(entry_id)
+            if rec is None:
+                return None
+            attempts = rec["attempts"] + 1
+            if attempts >= max_attempts:
+                self.mark_dead(entry_id, f"{attempts}回失敗: {error}")
+                return None
+            next_at = time.time() + backoff_delay(attempts, getattr(error, "retry_after", None))
+            rec.update(attempts=attempts, next_at=next_at, error=str(error))
+            self._append(self.path, [{"op": "retry", "id": entry_id, "attempts": attempts,
+                                      "next_at": next_at, "error": str(error)}])
+        _log.info("再送失敗: type=%s %d回目 次回=%.0f秒後 (%s)",
+                  rec["message_type"], attempts, next_at - time.time(), error)
+        return next_at
+
+    def mark_dead(self, entry_id: str, error: str) -> None:
+        """エントリをデッドレターに移す"""
+        with self._lock:
+            rec = self._entries.get(entry_id)
+            if rec is None:
+                return
+            dead = {k: v for k, v in rec.items() if k not in ("op", "next_at")}
+            dead.update(error=str(error), dead_at=datetime.now().isoformat(timespec="seconds"))
+            self._append(self.dead_letter_path, [dead])
+            self._finish(entry_id, {"op": "dead", "id": entry_id, "error": str(error)})
+        _log.error("再送を断念しデッドレターに保存: type=%s (%s)", rec["message_type"], error)
+
+    def dead_letters(self) -> List[Dict[str, Any]]:
+        """デッドレターの投稿を古い順に返す"""
+        try:
+            lines = self.dead_letter_path.read_text(encoding="utf-8").splitlines()
+        except OSError:
+            return []
+        result = []
+        for line in lines:
+            try:
+                result.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+        return result
+
+    def _finish(self, entry_id: str, record: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._entries.pop(entry_id, None) is None:
+                return
+            if self._entries:
+                self._append(self.path, [record])
+            else:
+                self._compact()
+
+
+_outbox: Optional[WebhookOutbox] = None
+_outbox_lock = threading.Lock()
+
+
+def get_outbox() -> WebhookOutbox:
+    """プロセス共通のアウトボックスを返す（初回呼出時にファイルを読込む）"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = WebhookOutbox()
+        return _outbox
+
+
+class OutboxWorker:
+    """
+    再送待ちの投稿をバックグラウンドで再送するワーカー（デーモンスレッド）。
+    send(target, payload) が例外を raise したら、再送できるエラーなら次の再送時刻を決め、
+    その時刻までは残りのエントリも送らない（プロキシ障害・429 の間に送り続けない）。
+    """
+
+    def __init__(self, outbox: WebhookOutbox, send: Callable[[str, Dict[str, Any]], None],
+                 max_attempts: int = _MAX_ATTEMPTS):
+        self.outbox = outbox
+        self.send = send
+        self.max_attempts = max_attempts
+        self._hold_until = 0.0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="kintai-webhook-outbox", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def notify(self) -> None:
+        """登録を知らせる（次の再送時刻を計算し直す）"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        # 起動時は前回終了時に残った投稿を待ち時間に関係なく送る
+        self.run_once(force=True)
+        while not self._stop.is_set():
+            wait = self.outbox.next_due_in()
+            if wait is None:
+                self._wake.wait()
+                self._wake.clear()
+                continue
+            wait = max(wait, self._hold_until - time.time())
+            if wait > 0 and self._wake.wait(wait):
+                self._wake.clear()
+                continue
+            if self._stop.is_set():
+                break
+            self.run_once()
+
+    def run_once(self, force: bool = False) -> int:
+        """
+        再送時刻を過ぎたエントリ（force=True なら全件）を登録順に送り、届いた件数を返す。
+        再送できるエラーが出たらそこで打ち切る。
+        """
+        sent = 0
+        for rec in self.outbox.due(None if force else time.time()):
+            try:
+                # "url" は送信先キーを保存する前の再送待ち
+                self.send(rec.get("target") or rec["url"], rec["payload"])
+            except Exception as e:
+                if not is_retryable(e):
+                    self.outbox.mark_dead(rec["id"], str(e))
+                    continue
+                next_at = self.outbox.mark_retry(rec["id"], e, self.max_attempts)
+                if next_at is not None:
+                    self._hold_until = next_at
+                    break
+                continue
+            self.outbox.mark_done(rec["id"])
+            sent += 1
+        if sent:
+            _log.info("再送成功: %d件 (未送信=%d件)", sent, self.outbox.pending_count())
+        return sent
+
+
+_worker: Optional[OutboxWorker] = None
+
+
+def create_outbox_worker(config) -> OutboxWorker:
+    """
+    config のプロキシ・タイムアウトで送る再送ワーカーを作る（起動はしない）。
+    送信先キーから送信時の設定の URL を引き、webhook_targets の送信先ならその proxy_sh・webhook_io で送る
+    """
+    from assets.teams_webhook import _post, config_for_target
+
+    max_attempts = int(config.webhook_io.get("outbox_max_attempts", _MAX_ATTEMPTS))
+    return OutboxWorker(get_outbox(), lambda target, payload: _post(config_for_target(config, target), payload),
+                        max_attempts)
+
+
+def start_outbox_worker(config) -> OutboxWorker:
+    """
+    再送ワーカーを起動する（2回目以降は起動済みのワーカーを返す）。
+    起動時に前回の未送信分を送る。config は起動後に変更された内容もそのまま参照する。
+    """
+    global _worker
+    if _worker is None:
+        _worker = create_outbox_worker(config)
+        _worker.start()
+    return _worker
+
+
+def notify_outbox_worker() -> None:
+    """ワーカー起動済みなら登録を知らせる"""
+    if _worker is not None:
+        _worker.notify()
@@ -0,0 +1,744 @@
+"""タイムシート .xlsx のセル直接書換エンジンとストリーミング読取（openpyxl を使わずシートXMLを直接扱う）"""
+import html
+import io
+import math
+import posixpath
+import re
+import struct
+import sys
+import zipfile
+import xml.etree.ElementTree as ET
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from assets.app_logger import get_logger
+from assets.timesheet_helpers import col_letter_to_num
+
+_log = get_logger("kintai.xlsx")
+
+
+class XlsxPatchError(Exception):
+    """直接書換できないブック・セル（呼出側は openpyxl にフォールバックする）"""
+    pass
+
+
+_ATTR_RE       = re.compile(rb'([\w:]+)="([^"]*)"')
+_REF_RE        = re.compile(r"^([A-Z]+)(\d+)$")
+_SHEET_DATA_RE = re.compile(rb"<sheetData\b[^>]*?(?:/>|>(.*?)</sheetData>)", re.S)
+_ROW_RE        = re.compile(rb"<row\b([^>]*?)(/>|>(.*?)</row>)", re.S)
+_CELL_RE       = re.compile(rb"<c\b([^>]*?)(/>|>(.*?)</c>)", re.S)
+_F_RE          = re.compile(rb"<f\b[^>]*?(?:/>|>(.*?)</f>)", re.S)
+_V_RE          = re.compile(rb"<v\b[^>]*?(?:/>|>(.*?)</v>)", re.S)
+_IS_RE         = re.compile(rb"<is\b[^>]*?(?:/>|>(.*?)</is>)", re.S)
+_SI_RE         = re.compile(rb"<si\b[^>]*?(?:/>|>(.*?)</si>)", re.S)
+_T_RE          = re.compile(rb"<t\b[^>]*?(?:/>|>(.*?)</t>)", re.S)
+_RPH_RE        = re.compile(rb"<rPh\b.*?</rPh>", re.S)
+_PREFIXED_RE   = re.compile(rb"<\w+:(?:sheetData|si)\b")
+_ILLEGAL_XML_RE = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_READ_CHUNK = 64 * 1024
+
+# zip のローカルファイルヘッダー（シグネチャ〜拡張フィールド長の 30 バイト）
+_LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+_LOCAL_HEADER_SIG = b"PK\x03\x04"
+# 圧縮済みデータをそのまま複製するときに引継ぐ汎用フラグ（圧縮オプション・UTF-8 ファイル名）。
+# データディスクリプタ（bit 3）は付けずにヘッダーに CRC・サイズを書く
+_RAW_COPY_FLAGS = 0x0006 | 0x0800
+# 圧縮済みデータの複製は ZipFile の非公開属性を使うため、動作を確認した Python でだけ行う。
+# 範囲外・属性が無い・複製に失敗した場合は公開 API（writestr）で再圧縮して保存する
+_RAW_COPY_PYTHON = ((3, 8), (3, 14))
+_RAW_COPY_ATTRS = ("fp", "start_dir", "_writecheck", "_didModify", "filelist", "NameToInfo")
+_RAW_COPY_SUPPORTED = (_RAW_COPY_PYTHON[0] <= sys.version_info[:2] < _RAW_COPY_PYTHON[1]
+                       and hasattr(zipfile.ZipInfo, "FileHeader"))
+
+# calcPr が無い場合の挿入位置（スキーマ上 calcPr より後ろに来る要素）
+_AFTER_CALC_PR = (
+    b"<oleSize", b"<customWorkbookViews", b"<pivotCaches", b"<smartTagPr",
+    b"<smartTagTypes", b"<webPublishing", b"<fileRecoveryPr", b"<webPublishObjects",
+    b"<extLst", b"</workbook>",
+)
+
+
+# 日付・時刻の組込み表示形式 ID（14〜22・45〜47 と、日本語ロケールの Excel が使う 27〜36・50〜58）
+_BUILTIN_DATE_FORMATS = frozenset((*range(14, 23), *range(27, 37), 45, 46, 47, *range(50, 59)))
+# 経過時間（[h]:mm:ss）の組込み表示形式 ID
+_BUILTIN_TIMEDELTA_FORMATS = frozenset((46,))
+# 表示形式コードのうち日付判定で無視する部分（"..." のリテラル、[h]・[mm]・[ss] 以外の [...]）
+_FORMAT_STRIP_RE = re.compile(r'".*?"|\[(?!hh?\]|mm?\]|ss?\])[^\]]*\]')
+_DATE_TOKEN_RE = re.compile(r"(?<![_\\])[dmhysDMHYS]")
+_TIMEDELTA_FORMAT_RE = re.compile(r"\[hh?\](:mm(:ss(\.0*)?)?)?|\[mm?\](:ss(\.0*)?)?|\[ss?\](\.0*)?", re.I)
+_WINDOWS_EPOCH = datetime(1899, 12, 30)
+_MAC_EPOCH = datetime(1904, 1, 1)
+
+
+def _attrs(raw: bytes) -> Dict[str, str]:
+    return {k.decode(): html.unescape(v.decode("utf-8")) for k, v in _ATTR_RE.findall(raw)}
+
+
+def _rich_text(fragment: Optional[bytes]) -> str:
+    """<si>/<is> の中身から文字列を取り出す（ふりがな <rPh> は除く）"""
+    if not fragment:
+        return ""
+    fragment = _RPH_RE.sub(b"", fragment)
+    return "".join(
+        html.unescape((m.group(1) or b"").decode("utf-8")) for m in _T_RE.finditer(fragment)
+    )
+
+
+def _cast_number(text: str):
+    """openpyxl と同じく小数点・指数がなければ int、あれば float"""
+    if "." in text or "E" in text or "e" in text:
+        return float(text)
+    return int(text)
+
+
+def _split_ref(ref: str) -> Tuple[int, int]:
+    m = _REF_RE.match(ref)
+    if not m:
+        raise XlsxPatchError(f"セル参照を解釈できません: {ref}")
+    return int(m.group(2)), col_letter_to_num(m.group(1))
+
+
+def _num_to_col_letter(col: int) -> str:
+    letters = ""
+    while col:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(ord("A") + rem) + letters
+    return letters
+
+
+def _resolve_target(base_dir: str, target: str) -> str:
+    """.rels の Target をパッケージ内パスに変換する"""
+    if target.startswith("/"):
+        return target.lstrip("/")
+    return posixpath.normpath(posixpath.join(base_dir, target))
+
+
+def _read_rels(zf: zipfile.ZipFile, part: str) -> Dict[str, Dict[str, str]]:
+    """part に対応する .rels を {Id: 属性} で返す"""
+    rels_path = posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+    try:
+        xml = zf.read(rels_path)
+    except KeyError:
+        raise XlsxPatchError(f"{rels_path} がありません")
+    rels = {}
+    for m in re.finditer(rb"<Relationship\b([^>]*?)/?>", xml):
+        a = _attrs(m.group(1))
+        if "Id" in a:
+            rels[a["Id"]] = a
+    return rels
+
+
+def _locate_active_sheet(zf: zipfile.ZipFile) -> Tuple[str, str]:
+    """(workbook.xml のパス, アクティブシート XML のパス) を返す"""
+    root_rels = _read_rels(zf, "")
+    workbook_part = next(
+        (_resolve_target("", r["Target"]) for r in root_rels.values()
+         if r.get("Type", "").endswith("/officeDocument")),
+        None,
+    )
+    if workbook_part is None:
+        raise XlsxPatchError("workbook パートが見つかりません")
+    wb_xml = zf.read(workbook_part)
+
+    view = re.search(rb"<workbookView\b([^>]*?)/?>", wb_xml)
+    active_tab = int(_attrs(view.group(1)).get("activeTab", "0")) if view else 0
+    sheets = [_attrs(m.group(1)) for m in re.finditer(rb"<sheet\b([^>]*?)/?>", wb_xml)]
+    if not 0 <= active_tab < len(sheets):
+        raise XlsxPatchError(f"activeTab が範囲外: {active_tab}")
+    rid = next((v for k, v in sheets[active_tab].items() if k.endswith(":id")), None)
+
+    rel = _read_rels(zf, workbook_part).get(rid or "")
+    if rel is None or not rel.get("Type", "").endswith("/worksheet"):
+        raise XlsxPatchError("アクティブシートがワークシートではありません")
+    return workbook_part, _resolve_target(posixpath.dirname(workbook_part), rel["Target"])
+
+
+def _shared_strings_part(zf: zipfile.ZipFile, workbook_part: str) -> Optional[str]:
+    return next(
+        (_resolve_target(posixpath.dirname(workbook_part), r["Target"])
+         for r in _read_rels(zf, workbook_part).values()
+         if r.get("Type", "").endswith("/sharedStrings")),
+        None,
+    )
+
+
+def _format_kind(code: str) -> Optional[str]:
+    """
+    表示形式コードの種類。日付・時刻なら "date"、経過時間（[h]:mm 等）なら "timedelta"、それ以外は None。
+    判定は openpyxl と同じく最初のセクション（; の前）だけを見る
+    """
+    first = code.split(";")[0]
+    if _TIMEDELTA_FORMAT_RE.match(first):
+        return "timedelta"
+    if _DATE_TOKEN_RE.search(_FORMAT_STRIP_RE.sub("", first)):
+        return "date"
+    return None
+
+
+def _date_styles(zf: zipfile.ZipFile, workbook_part: str) -> Dict[int, str]:
+    """
+    styles.xml の cellXfs の位置（セルの s 属性）→ "date" / "timedelta"。
+    日付・時刻・経過時間の表示形式のスタイルだけを返す
+    """
+    part = next(
+        (_resolve_target(posixpath.dirname(workbook_part), r["Target"])
+         for r in _read_rels(zf, workbook_part).values()
+         if r.get("Type", "").endswith("/styles")),
+        None,
+    )
+    if part is None:
+        return {}
+    xml = zf.read(part)
+    custom = {}
+    for m in re.finditer(rb"<numFmt\b([^>]*?)/?>", xml):
+        a = _attrs(m.group(1))
+        if "numFmtId" in a:
+            custom[int(a["numFmtId"])] = _format_kind(a.get("formatCode", ""))
+    cell_xfs = re.search(rb"<cellXfs\b[^>]*>(.*?)</cellXfs>", xml, re.S)
+    kinds: Dict[int, str] = {}
+    if cell_xfs is None:
+        return kinds
+    for index, m in enumerate(re.finditer(rb"<xf\b([^>]*?)/?>", cell_xfs.group(1))):
+        fmt_id = int(_attrs(m.group(1)).get("numFmtId", "0"))
+        if fmt_id in custom:
+            kind = custom[fmt_id]
+        elif fmt_id in _BUILTIN_TIMEDELTA_FORMATS:
+            kind = "timedelta"
+        elif fmt_id in _BUILTIN_DATE_FORMATS:
+            kind = "date"
+        else:
+            kind = None
+        if kind:
+            kinds[index] = kind
+    return kinds
+
+
+def _date_epoch(zf: zipfile.ZipFile, workbook_part: str) -> datetime:
+    """シリアル値 0 の日時（workbookPr の date1904 が有効なら 1904 年基準）"""
+    m = re.search(rb"<workbookPr\b([^>]*?)/?>", zf.read(workbook_part))
+    if m and _attrs(m.group(1)).get("date1904", "").lower() in ("1", "true"):
+        return _MAC_EPOCH
+    return _WINDOWS_EPOCH
+
+
+def _from_serial(value: float, kind: str, epoch: datetime) -> Any:
+    """
+    シリアル値を openpyxl と同じ型に変換する。経過時間は timedelta、
+    0 以上 1 未満は time、それ以外は datetime（1900 年基準の 1900/3/1 より前は Excel のうるう年の誤りを補正）
+    """
+    if kind == "timedelta":
+        td = timedelta(days=value)
+        return timedelta(seconds=td.total_seconds() // 1, microseconds=round(td.microseconds, -3))
+    day, fraction = divmod(value, 1)
+    diff = timedelta(milliseconds=round(fraction * 86400 * 1000))
+    if 0 <= value < 1 and diff.days == 0:
+        return (datetime.min + diff).time()
+    if 0 < value < 60 and epoch == _WINDOWS_EPOCH:
+        day += 1
+    return epoch + timedelta(days=day) + diff
+
+
+class _Cell:
+    """openpyxl の Cell と同じく .value で読み書きできるセル"""
+
+    __slots__ = ("_sheet", "row", "column")
+
+    def __init__(self, sheet: "DirectWorksheet", row: int, column: int):
+        self._sheet = sheet
+        self.row = row
+        self.column = column
+
+    @property
+    def value(self) -> Any:
+        return self._sheet.get_value(self.row, self.column)
+
+    @value.setter
+    def value(self, value: Any) -> None:
+        self._sheet.set_value(self.row, self.column, value)
+
+
+class DirectWorksheet:
+    """
+    アクティブシートの XML を保持し、セルの読取と書換予約を行う。
+    ws.cell(row=, column=).value / ws["C6"].value で openpyxl の Worksheet と同じように使える。
+    """
+
+    def __init__(self, workbook: "DirectWorkbook", xml: bytes):
+        self._workbook = workbook
+        self.xml = xml
+        self._rows: Dict[int, Tuple[int, int, Dict[str, str]]] = {}
+        self._cells: Dict[Tuple[int, int], Tuple[int, int, Dict[str, str], bytes]] = {}
+        self._patches: Dict[Tuple[int, int], Any] = {}
+        self._index()
+
+    def _index(self) -> None:
+        """sheetData 内の <row> と <c> の位置をバイトオフセットで索引する"""
+        if _PREFIXED_RE.search(self.xml):
+            raise XlsxPatchError("名前空間プレフィックス付きのシートには未対応")
+        m = _SHEET_DATA_RE.search(self.xml)
+        if not m:
+            raise XlsxPatchError("sheetData が見つかりません")
+        if m.group(1) is None:
+            return
+        base = m.start(1)
+        for rm in _ROW_RE.finditer(m.group(1)):
+            row_attrs = _attrs(rm.group(1))
+            if "r" not in row_attrs:
+                raise XlsxPatchError("行番号 (r) のない行には未対応")
+            row_num = int(row_attrs["r"])
+            self._rows[row_num] = (base + rm.start(), base + rm.end(), row_attrs)
+            if rm.group(3) is None:
+                continue
+            row_base = base + rm.start(3)
+            for cm in _CELL_RE.finditer(rm.group(3)):
+                cell_attrs = _attrs(cm.group(1))
+                if "r" not in cell_attrs:
+                    raise XlsxPatchError("セル参照 (r) のないセルには未対応")
+                key = _split_ref(cell_attrs["r"])
+                self._cells[key] = (
+                    row_base + cm.start(), row_base + cm.end(), cell_attrs, cm.group(3) or b""
+                )
+
+    # ── 読取 ──
+
+    def get_value(self, row: int, column: int) -> Any:
+        if (row, column) in self._patches:
+            return self._patches[(row, column)]
+        entry = self._cells.get((row, column))
+        if entry is None:
+            return None
+        _, _, attrs, inner = entry
+        t = attrs.get("t", "n")
+        fm = _F_RE.search(inner)
+        if fm is not None and not self._workbook.data_only:
+            # openpyxl（data_only=False）と同じく数式文字列を返す
+            return "=" + html.unescape((fm.group(1) or b"").decode("utf-8"))
+        if t == "inlineStr":
+            im = _IS_RE.search(inner)
+            return _rich_text(im.group(1) if im else None)
+        vm = _V_RE.search(inner)
+        text = html.unescape((vm.group(1) or b"").decode("utf-8")) if vm else ""
+        if text == "":
+            return None
+        if t == "s":
+            return self._workbook.shared_string(int(text))
+        if t == "b":
+            return text == "1"
+        if t in ("str", "e", "d"):
+            return text
+        return _cast_number(text)
+
+    def cell(self, row: int, column: int) -> _Cell:
+        return _Cell(self, row, column)
+
+    def __getitem__(self, ref: str) -> _Cell:
+        row, column = _split_ref(ref.upper())
+        return _Cell(self, row, column)
+
+    # ── 書換 ──
+
+    def set_value(self, row: int, column: int, value: Any) -> None:
+        """書換を予約する。直接書換できないセル・値なら XlsxPatchError"""
+        if value is not None and not isinstance(value, (bool, int, float, str)):
+            raise XlsxPatchError(f"未対応の値の型: {type(value).__name__}")
+        if isinstance(value, str) and _ILLEGAL_XML_RE.search(value):
+            raise XlsxPatchError("XML に書けない制御文字を含む文字列")
+        if isinstance(value, float) and not math.isfinite(value):
+            raise XlsxPatchError(f"有限でない数値: {value}")
+        entry = self._cells.get((row, column))
+        if entry is not None:
+            if _F_RE.search(entry[3]):
+                raise XlsxPatchError(f"数式セルへの書込: {entry[2]['r']}")
+        elif value is not None:
+            self._check_insertable(row, column)
+        self._patches[(row, column)] = value
+
+    def _check_insertable(self, row: int, column: int) -> None:
+        """存在しないセルを既存の行に追加できるか確認する"""
+        row_entry = self._rows.get(row)
+        if row_entry is None:
+            raise XlsxPatchError(f"{row}行目がシートXMLにありません")
+        spans = row_entry[2].get("spans")
+        if spans and ":" in spans:
+            lo, hi = (int(x) for x in spans.split(":", 1))
+            if not lo <= column <= hi:
+                raise XlsxPatchError(f"{row}行目の spans 外の列: {column}")
+
+    @property
+    def dirty(self) -> bool:
+        return bool(self._patches)
+
+    def pending_values(self) -> Dict[Tuple[int, int], Any]:
+        """予約済みの書換 {(行, 列): 値}（フォールバック時に openpyxl へ引き継ぐ）"""
+        return dict(self._patches)
+
+    @staticmethod
+    def _cell_xml(ref: str, attrs: Dict[str, str], value: Any) -> bytes:
+        keep = {k: v for k, v in attrs.items() if k not in ("r", "t", "cm", "vm")}
+        head = f'<c r="{ref}"' + "".join(
+            f' {k}="{html.escape(v, quote=True)}"' for k, v in keep.items()
+        )
+        if value is None:
+            return (head + "/>").encode("utf-8")
+        if isinstance(value, bool):
+            return (head + f' t="b"><v>{int(value)}</v></c>').encode("utf-8")
+        if isinstance(value, (int, float)):
+            return (head + f"><v>{value!r}</v></c>").encode("utf-8")
+        space = ' xml:space="preserve"' if value != value.strip() else ""
+        text = html.escape(value, quote=False)
+        return (head + f' t="inlineStr"><is><t{space}>{text}</t></is></c>').encode("utf-8")
+
+    def render(self) -> bytes:
+        """予約済みの書換を反映したシート XML を返す"""
+        edits: List[Tuple[int, int, bytes]] = []
+        inserts: Dict[int, List[Tuple[int, bytes]]] = {}
+        for (row, column), value in self._patches.items():
+            if (row, column) not in self._cells and value is not None:
+                ref = f"{_num_to_col_letter(column)}{row}"
+                inserts.setdefault(row, []).append((column, self._cell_xml(ref, {}, value)))
+        for (row, column), value in self._patches.items():
+            entry = self._cells.get((row, column))
+            if entry is not None and row not in inserts:
+                start, end, attrs, _ = entry
+                ref = f"{_num_to_col_letter(column)}{row}"
+                edits.append((start, end, self._cell_xml(ref, attrs, value)))
+        # セルを追加する行は行ごと組み直す（同じ行の既存セルの書換もここで反映）
+        for row, new_cells in inserts.items():
+            start, end, _ = self._rows[row]
+            edits.append((start, end, self._render_row(row, start, end, sorted(new_cells))))
+
+        out = self.xml
+        for start, end, data in sorted(edits, key=lambda e: e[0], reverse=True):
+            out = out[:start] + data + out[end:]
+        return out
+
+    def _render_row(self, row: int, start: int, end: int,
+                    new_cells: List[Tuple[int, bytes]]) -> bytes:
+        """既存の <row> に新しい <c> を列順で差し込んだ XML を返す"""
+        existing = sorted(
+            (col, s, e) for (r, col), (s, e, _, _) in self._cells.items() if r == row
+        )
+        row_xml = self.xml[start:end]
+        pieces: List[Tuple[int, bytes]] = []
+        for col, s, e in existing:
+            if (row, col) in self._patches:
+                ref = f"{_num_to_col_letter(col)}{row}"
+                pieces.append((col, self._cell_xml(ref, self._cells[(row, col)][2], self._patches[(row, col)])))
+            else:
+                pieces.append((col, self.xml[s:e]))
+        pieces.extend(new_cells)
+        body = b"".join(data for _, data in sorted(pieces, key=lambda p: p[0]))
+        open_tag = row_xml[:row_xml.index(b">") + 1]
+        if open_tag.endswith(b"/>"):
+            open_tag = open_tag[:-2].rstrip() + b">"
+        return open_tag + body + b"</row>"
+
+
+class DirectWorkbook:
+    """
+    .xlsx を zip として読み、アクティブシートの XML だけを書換えて保存する。
+    openpyxl のようにブック全体を解析・再構築しないため、書式の多いテンプレートでも速い。
+
+        wb = DirectWorkbook(path)
+        wb.active.cell(row=20, column=5).value = "日勤"
+        wb.save(path)
+
+    シート構造が想定外の場合は XlsxPatchError を raise する（呼出側で openpyxl にフォールバック）。
+    """
+
+    def __init__(self, path, data_only: bool = False):
+        self.path = path
+        self.data_only = data_only
+        with open(path, "rb") as f:
+            self._data = f.read()
+        try:
+            self._zip = zipfile.ZipFile(io.BytesIO(self._data))
+        except zipfile.BadZipFile as e:
+            raise XlsxPatchError(f"zip として読めません: {e}")
+        self._shared: Optional[List[str]] = None
+        self._workbook_part, self.sheet_part = _locate_active_sheet(self._zip)
+        self.active = DirectWorksheet(self, self._zip.read(self.sheet_part))
+
+    def shared_string(self, index: int) -> str:
+        if self._shared is None:
+            sst_part = _shared_strings_part(self._zip, self._workbook_part)
+            xml = self._zip.read(sst_part) if sst_part else b""
+            if _PREFIXED_RE.search(xml):
+                raise XlsxPatchError("名前空間プレフィックス付きの sharedStrings には未対応")
+            self._shared = [_rich_text(m.group(1)) for m in _SI_RE.finditer(xml)]
+        return self._shared[index]
+
+    def _workbook_xml_with_full_calc(self) -> bytes:
+        """
+        workbook.xml の calcPr に fullCalcOnLoad="1" を付ける。
+        書換えたセルを参照する数式のキャッシュ値が古いままになるため、開いたときに再計算させる。
+        """
+        xml = self._zip.read(self._workbook_part)
+        m = re.search(rb"<calcPr\b([^>]*?)(/?)>", xml)
+        if m:
+            if re.search(rb'\sfullCalcOnLoad="(?:1|true)"', m.group(1)):
+                return xml
+            attrs = re.sub(rb'\sfullCalcOnLoad="[^"]*"', b"", m.group(1))
+            new_tag = b"<calcPr" + attrs + b' fullCalcOnLoad="1"' + m.group(2) + b">"
+            return xml[:m.start()] + new_tag + xml[m.end():]
+        positions = [p for p in (xml.find(tag) for tag in _AFTER_CALC_PR) if p >= 0]
+        if not positions:
+            raise XlsxPatchError("workbook.xml に calcPr を挿入できません")
+        pos = min(positions)
+        return xml[:pos] + b'<calcPr fullCalcOnLoad="1"/>' + xml[pos:]
+
+    def save(self, path) -> None:
+        """
+        書換えたシート XML と workbook.xml だけを圧縮し直して保存する。
+        それ以外の zip メンバーは展開・再圧縮せず、圧縮済みのデータをそのまま複製する。
+        複製できない環境・複製結果の検査に通らない場合は全メンバーを writestr で書き直す
+        """
+        replaced = {self.sheet_part: self.active.render()}
+        workbook_xml = self._workbook_xml_with_full_calc()
+        if workbook_xml != self._zip.read(self._workbook_part):
+            replaced[self._workbook_part] = workbook_xml
+        data = None
+        if _RAW_COPY_SUPPORTED:
+            try:
+                data = self._build(replaced, raw_copy=True)
+                self._check_copy(data, replaced)
+            except Exception as e:
+                _log.warning("圧縮済みデータを複製できないため再圧縮して保存: %s (%s: %s)",
+                             path, type(e).__name__, e)
+                data = None
+        if data is None:
+            data = self._build(replaced, raw_copy=False)
+        with open(path, "wb") as f:
+            f.write(data)
+        _log.debug("直接書換で保存: %s (%dセル)", path, len(self.active.pending_values()))
+
+    def _build(self, replaced: Dict[str, bytes], raw_copy: bool) -> bytes:
+        """
+        保存する zip の中身を組立てる。replaced のメンバーは渡した内容で、それ以外は元のまま。
+        raw_copy=False のときは公開 API（writestr）だけを使い、元と同じ圧縮方式で書き直す
+        """
+        buf = io.BytesIO()
+        with zipfile.ZipFile(buf, "w") as zout:
+            for info in self._zip.infolist():
+                new_info = zipfile.ZipInfo(info.filename, date_time=info.date_time)
+                new_info.compress_type = info.compress_type
+                new_info.external_attr = info.external_attr
+                new_info.create_system = info.create_system
+                new_info.comment = info.comment
+                data = replaced.get(info.filename)
+                raw = self._raw_member(info) if raw_copy and data is None else None
+                if raw is not None:
+                    _write_raw(zout, new_info, info, raw)
+                    continue
+                if data is None:
+                    data = self._zip.read(info.filename)
+                zout.writestr(new_info, data)
+        return buf.getvalue()
+
+    def _check_copy(self, data: bytes, replaced: Dict[str, bytes]) -> None:
+        """
+        圧縮済みデータを複製して組立てた zip を開き直し、メンバー一覧・ローカルヘッダー・
+        CRC とサイズが元のブックと食違っていないか確かめる（食違えば XlsxPatchError）
+        """
+        with zipfile.ZipFile(io.BytesIO(data)) as z:
+            out, src = z.infolist(), self._zip.infolist()
+            if [i.filename for i in out] != [i.filename for i in src]:
+                raise XlsxPatchError("複製した zip のメンバー一覧が元と一致しません")
+            for new, old in zip(out, src):
+                header = data[new.header_offset:new.header_offset + _LOCAL_HEADER.size]
+                if len(header) < _LOCAL_HEADER.size or header[:4] != _LOCAL_HEADER_SIG:
+                    raise XlsxPatchError(f"ローカルヘッダーが読めません: {new.filename}")
+                if _LOCAL_HEADER.unpack(header)[6] != new.CRC:
+                    raise XlsxPatchError(f"ローカルヘッダーの CRC が一致しません: {new.filename}")
+                if new.filename not in replaced and \
+                        (new.CRC, new.file_size, new.compress_type) != \
+                        (old.CRC, old.file_size, old.compress_type):
+                    raise XlsxPatchError(f"複製したメンバーが元と一致しません: {new.filename}")
+
+    def _raw_member(self, info: zipfile.ZipInfo) -> Optional[bytes]:
+        """
+        メンバーの圧縮済みデータ（ローカルヘッダーの後ろ compress_size バイト）。
+        暗号化されている・ローカルヘッダーが読めない場合は None（展開して書き直す）
+        """
+        if info.flag_bits & 0x0001:
+            return None
+        header = self._data[info.header_offset:info.header_offset + _LOCAL_HEADER.size]
+        if len(header) < _LOCAL_HEADER.size:
+            return None
+        fields = _LOCAL_HEADER.unpack(header)
+        if fields[0] != _LOCAL_HEADER_SIG:
+            return None
+        start = info.header_offset + _LOCAL_HEADER.size + fields[9] + fields[10]
+        raw = self._data[start:start + info.compress_size]
+        return raw if len(raw) == info.compress_size else None
+
+    def close(self) -> None:
+        self._zip.close()
+
+
+def _write_raw(zout: zipfile.ZipFile, new_info: zipfile.ZipInfo,
+               info: zipfile.ZipInfo, raw: bytes) -> None:
+    """
+    圧縮済みのデータ raw を展開・再圧縮せずに zout へ書く。
+    ZipFile.writestr() と同じ手順（ローカルヘッダー → データ → 中央ディレクトリ用の登録）で、
+    CRC・サイズは元の ZipInfo の値をそのまま使う。
+    ZipFile の非公開属性を書換えるため、属性が無ければ AttributeError（呼出側で再圧縮に切替える）
+    """
+    missing = [a for a in _RAW_COPY_ATTRS if not hasattr(zout, a)]
+    if missing:
+        raise AttributeError(f"ZipFile に {', '.join(missing)} がありません")
+    new_info.CRC = info.CRC
+    new_info.compress_size = info.compress_size
+    new_info.file_size = info.file_size
+    new_info.flag_bits = info.flag_bits & _RAW_COPY_FLAGS
+    zip64 = max(info.file_size, info.compress_size) > zipfile.ZIP64_LIMIT
+    zout.fp.seek(zout.start_dir)
+    new_info.header_offset = zout.fp.tell()
+    zout._writecheck(new_info)
+    zout._didModify = True
+    zout.fp.write(new_info.FileHeader(zip64))
+    zout.fp.write(raw)
+    zout.start_dir = zout.fp.tell()
+    zout.filelist.append(new_info)
+    zout.NameToInfo[new_info.filename] = new_info
+
+
+# ──────────────────────────── ストリーミング読取 ────────────────────────────
+
+def _local(tag: str) -> str:
+    """タグ名から名前空間を除く（"{...}c" → "c"）"""
+    return tag.rsplit("}", 1)[-1]
+
+
+def _element_text(node) -> str:
+    """<si>/<is> 要素の文字列（ふりがな <rPh> は除く）"""
+    parts = []
+    for child in node:
+        name = _local(child.tag)
+        if name == "t":
+            parts.append(child.text or "")
+        elif name == "r":
+            parts.extend(g.text or "" for g in child if _local(g.tag) == "t")
+    return "".join(parts)
+
+
+def _element_value(elem, data_only: bool) -> Any:
+    """<c> 要素の値。共有文字列は ("s", インデックス) を返し、呼出側で解決する"""
+    children = {_local(child.tag): child for child in elem}
+    f = children.get("f")
+    if f is not None and not data_only:
+        return "=" + (f.text or "")
+    t = elem.get("t", "n")
+    if t == "inlineStr":
+        return _element_text(children["is"]) if "is" in children else ""
+    v = children.get("v")
+    text = v.text if v is not None else None
+    if not text:
+        return None
+    if t == "s":
+        return ("s", int(text))
+    if t == "b":
+        return text == "1"
+    if t in ("str", "e", "d"):
+        return text
+    return _cast_number(text)
+
+
+def _iter_end_elements(stream, *tags: str):
+    """XML を少しずつ解析し、指定ローカル名の要素の終了ごとに要素を返す"""
+    parser = ET.XMLPullParser(events=("end",))
+    while True:
+        chunk = stream.read(_READ_CHUNK)
+        if not chunk:
+            return
+        parser.feed(chunk)
+        for _, elem in parser.read_events():
+            if _local(elem.tag) in tags:
+                yield elem
+
+
+def read_cells(path, refs: List[str], data_only: bool = True) -> Dict[str, Any]:
+    """
+    アクティブシートの指定セルだけを読み、{セル参照: 値} を返す（読取専用）。
+    シート XML を先頭から少しずつ解析し、指定セルの最大行を読み終えた時点で打ち切るため、
+    ヘッダーセル（C6/C7 等）の読取ではブックの大部分を読まずに済む。
+
+    値は数値（int/float）・文字列・bool・None。data_only=True なら数式はキャッシュ値。
+    日付・時刻書式のセルは openpyxl と同じく datetime（時刻だけの値は time、経過時間書式は timedelta）に変換する。
+    zip / シート構造を解釈できない場合は XlsxPatchError（呼出側で openpyxl にフォールバック）。
+    """
+    wanted = {_split_ref(ref.upper()): ref for ref in refs}
+    if not wanted:
+        return {}
+    last_row = max(row for row, _ in wanted)
+    values: Dict[str, Any] = {ref: None for ref in refs}
+    try:
+        zf = zipfile.ZipFile(path)
+    except zipfile.BadZipFile as e:
+        raise XlsxPatchError(f"zip として読めません: {e}")
+    with zf:
+        workbook_part, sheet_part = _locate_active_sheet(zf)
+        remaining = set(wanted)
+        shared: Dict[int, List[str]] = {}
+        styled: Dict[str, int] = {}  # 書式付きの数値セル → スタイル番号
+        try:
+            with zf.open(sheet_part) as stream:
+                for elem in _iter_end_elements(stream, "c", "row"):
+                    if _local(elem.tag) == "row":
+                        row_attr = elem.get("r")
+                        elem.clear()
+                        if not remaining or (row_attr and int(row_attr) >= last_row):
+                            break
+                        continue
+                    ref = elem.get("r")
+                    if ref is None:
+                        raise XlsxPatchError("セル参照 (r) のないセルには未対応")
+                    key = _split_ref(ref)
+                    if key in remaining:
+                        remaining.discard(key)
+                        value = _element_value(elem, data_only)
+                        if isinstance(value, tuple):
+                            shared.setdefault(value[1], []).append(wanted[key])
+                        else:
+                            values[wanted[key]] = value
+                            if (isinstance(value, (int, float)) and not isinstance(value, bool)
+                                    and elem.get("s")):
+                                styled[wanted[key]] = int(elem.get("s"))
+            if shared:
+                _resolve_shared(zf, workbook_part, shared, values)
+            if styled:
+                _convert_dates(zf, workbook_part, styled, values)
+        except ET.ParseError as e:
+            raise XlsxPatchError(f"シート XML を解析できません: {e}")
+    return values
+
+
+def _convert_dates(zf: zipfile.ZipFile, workbook_part: str,
+                   styled: Dict[str, int], values: Dict[str, Any]) -> None:
+    """日付・時刻書式の数値セルの値をシリアル値から変換する"""
+    kinds = _date_styles(zf, workbook_part)
+    dated = {ref: kinds[style] for ref, style in styled.items() if style in kinds}
+    if not dated:
+        return
+    epoch = _date_epoch(zf, workbook_part)
+    for ref, kind in dated.items():
+        values[ref] = _from_serial(values[ref], kind, epoch)
+
+
+def _resolve_shared(zf: zipfile.ZipFile, workbook_part: str,
+                    shared: Dict[int, List[str]], values: Dict[str, Any]) -> None:
+    """必要な共有文字列のインデックスまでだけ sharedStrings.xml を読む"""
+    sst_part = _shared_strings_part(zf, workbook_part)
+    if sst_part is None:
+        raise XlsxPatchError("sharedStrings がありません")
+    last_index = max(shared)
+    with zf.open(sst_part) as stream:
+        for index, si in enumerate(_iter_end_elements(stream, "si")):
+            if index in shared:
+                text = _element_text(si)
+                for ref in shared[index]:
+                    values[ref] = text
+            si.clear()
+            if index >= last_index:
+                return
+    raise XlsxPatchError("共有文字列のインデックスが範囲外")
@@ -0,0 +1 @@
+"""性能計測ハーネス（python -m benchmarks.<名前> で実行する。pytest では実行しない）"""
@@ -0,0 +1,122 @@
+"""ベンチマーク共通処理（集計・ベースライン比較・結果表示）
+
+ベースライン JSON の形式:
+
+    {
+      "tolerance": 0.5,     # 許容する悪化率（0.5 → ベースラインの 1.5 倍まで）
+      "floor_ms": 5.0,      # これ以下の差は誤差として無視する（ミリ秒）
+      "metrics": {"import.assets.config": 1.2, ...}   # 各指標の中央値（ミリ秒）
+    }
+"""
+import json
+import statistics
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+DEFAULT_TOLERANCE = 0.5
+DEFAULT_FLOOR_MS = 5.0
+
+
+def percentile(values: Sequence[float], p: float) -> float:
+    """p パーセンタイル（0〜100。線形補間）"""
+    if not values:
+        raise ValueError("values が空です")
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(samples: Sequence[float]) -> Dict[str, float]:
+    """計測値（ミリ秒）を {n, min, p50, p90, p99, max} にまとめる"""
+    return {
+        "n": len(samples),
+        "min": min(samples),
+        "p50": statistics.median(samples),
+        "p90": percentile(samples, 90),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+def peak_rss_mb() -> Optional[float]:
+    """このプロセスのピーク RSS（MB）。取得できない環境では None"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KB、macOS はバイト
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def load_baseline(path: Path) -> Optional[dict]:
+    if not path.exists():
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path: Path, results: Dict[str, Dict[str, float]], baseline: Optional[dict] = None) -> None:
+    """各指標の中央値をベースラインとして保存する（許容値は既存のものを引き継ぐ）"""
+    baseline = baseline or {}
+    data = {
+        "tolerance": baseline.get("tolerance", DEFAULT_TOLERANCE),
+        "floor_ms": baseline.get("floor_ms", DEFAULT_FLOOR_MS),
+        "metrics": {name: round(r["p50"], 3) for name, r in sorted(results.items())},
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.write("\n")
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: dict,
+            tolerance: Optional[float] = None) -> List[str]:
+    """
+    中央値がベースラインの (1 + tolerance) 倍を超え、かつ差が floor_ms を超えた指標を
+    「指標名: 現在値 / ベースライン」の文字列のリストで返す。ベースラインに無い指標は比較しない。
+    """
+    tol = baseline.get("tolerance", DEFAULT_TOLERANCE) if tolerance is None else tolerance
+    floor = baseline.get("floor_ms", DEFAULT_FLOOR_MS)
+    regressions = []
+    for name, base in baseline.get("metrics", {}).items():
+        if name not in results:
+            continue
+        now = results[name]["p50"]
+        if now > base * (1 + tol) and now - base > floor:
+            regressions.append(f"{name}: {now:.1f}ms / ベースライン {base:.1f}ms（+{(now / base - 1) * 100:.0f}%）")
+    return regressions
+
+
+def print_results(results: Dict[str, Dict[str, float]], baseline: Optional[dict] = None) -> None:
+    """結果の表を表示する（peak_rss_mb がある指標はピーク RSS も表示）"""
+    base = (baseline or {}).get("metrics", {})
+    print(f"{'metric':<44} {'n':>4} {'p50':>9} {'p90':>9} {'p99':>9} {'max':>9} {'baseline':>9} {'rss_mb':>8}")
+    for name, r in results.items():
+        b = f"{base[name]:9.2f}" if name in base else f"{'-':>9}"
+        rss = f"{r['peak_rss_mb']:8.1f}" if r.get("peak_rss_mb") is not None else f"{'-':>8}"
+        print(f"{name:<44} {r['n']:>4} {r['p50']:9.2f} {r['p90']:9.2f} {r['p99']:9.2f} {r['max']:9.2f} {b} {rss}")
+
+
+def finish(results: Dict[str, Dict[str, float]], baseline_path: Path, update: bool,
+           tolerance: Optional[float] = None) -> int:
+    """結果を表示し、ベースラインを更新するか比較する。悪化があれば 1 を返す"""
+    baseline = load_baseline(baseline_path)
+    print_results(results, baseline)
+    if update:
+        save_baseline(baseline_path, results, baseline)
+        print(f"ベースラインを更新しました: {baseline_path}")
+        return 0
+    if baseline is None:
+        print(f"ベースラインがありません（--update-baseline で作成）: {baseline_path}")
+        return 0
+    regressions = compare(results, baseline, tolerance)
+    if regressions:
+        print("\n性能が悪化しています:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        return 1
+    print("\nベースラインとの比較: OK")
+    return 0
@@ -0,0 +1,159 @@
+"""起動性能のベンチマーク（Qt offscreen プラットフォームで実行する）
+
+    python -m benchmarks.startup                    # ベースラインと比較（悪化があれば終了コード 1）
+    python -m benchmarks.startup --update-baseline  # 現在の結果をベースラインとして保存
+    python -m benchmarks.startup --only import      # 指標名の前方一致で絞込み
+
+計測する指標（いずれもミリ秒）:
+    import.<モジュール>   assets 配下の各モジュール・kintai の import 時間（新しいプロセスで計測）
+    main_window          MainWindow の生成
+    apply_theme          テーマの適用（全テーマを順に）
+    calendar.build_grid  CalendarWidget._build_grid
+    first_paint          MainWindow.show() から最初の描画イベントまで
+"""
+import argparse
+import os
+import pkgutil
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+_APP_DIR = Path(__file__).parent.parent
+if str(_APP_DIR) not in sys.path:
+    sys.path.insert(0, str(_APP_DIR))
+
+from benchmarks._common import finish, summarize
+
+BASELINE = Path(__file__).parent / "baseline_startup.json"
+
+_IMPORT_SCRIPT = (
+    "import sys, time\n"
+    "t = time.perf_counter()\n"
+    "import {name}\n"
+    "sys.stdout.write(str((time.perf_counter() - t) * 1000))\n"
+)
+
+
+def _module_names() -> List[str]:
+    import assets
+
+    names = [m.name for m in pkgutil.walk_packages(assets.__path__, "assets.")]
+    return sorted(names) + ["kintai"]
+
+
+def bench_imports(repeat: int) -> Dict[str, List[float]]:
+    """各モジュールを新しいインタプリタで import し、import 文の所要時間を計る"""
+    env = {**os.environ, "QT_QPA_PLATFORM": "offscreen"}
+    samples: Dict[str, List[float]] = {}
+    for name in _module_names():
+        for _ in range(repeat):
+            out = subprocess.run(
+                [sys.executable, "-c", _IMPORT_SCRIPT.format(name=name)],
+                cwd=_APP_DIR, env=env, capture_output=True, text=True, timeout=120,
+            )
+            if out.returncode != 0:
+                raise RuntimeError(f"{name} の import に失敗しました:\n{out.stderr}")
+            samples.setdefault(f"import.{name}", []).append(float(out.stdout))
+    return samples
+
+
+def _timed(fn: Callable[[], object], repeat: int) -> List[float]:
+    result = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn()
+        result.append((time.perf_counter() - t) * 1000)
+    return result
+
+
+def bench_gui(repeat: int) -> Dict[str, List[float]]:
+    from PyQt5.QtCore import QEvent, QObject
+    from PyQt5.QtWidgets import QApplication
+
+    from assets.calendar_widget import CalendarWidget
+    from assets.config import Config
+    from assets.theme_engine import THEME_COLORS, apply_theme
+    from kintai import MainWindow
+
+    app = QApplication.instance() or QApplication([])
+    config = Config()
+    samples: Dict[str, List[float]] = {}
+
+    windows: list = []
+
+    def _new_window():
+        windows.append(MainWindow(config=config, app=app))
+
+    samples["main_window"] = _timed(_new_window, repeat)
+    for w in windows:
+        w.deleteLater()
+    app.processEvents()
+
+    themes = list(THEME_COLORS)
+    samples["apply_theme"] = [ms for theme in themes for ms in _timed(lambda: apply_theme(app, theme), repeat)]
+    apply_theme(app, config.theme)
+
+    cal = CalendarWidget()
+    samples["calendar.build_grid"] = _timed(cal._build_grid, repeat)
+    cal.deleteLater()
+
+    class _PaintWatcher(QObject):
+        painted = False
+
+        def eventFilter(self, obj, event):
+            if event.type() == QEvent.Paint:
+                self.painted = True
+            return False
+
+    paints = []
+    for _ in range(repeat):
+        w = MainWindow(config=config, app=app)
+        watcher = _PaintWatcher()
+        w.attendance_tab.installEventFilter(watcher)
+        t = time.perf_counter()
+        w.show()
+        w.apply_theme()
+        w.resize(880, 480)
+        deadline = t + 5
+        while not watcher.painted and time.perf_counter() < deadline:
+            app.processEvents()
+        if not watcher.painted:
+            raise RuntimeError("最初の描画イベントを 5 秒以内に検出できませんでした")
+        paints.append((time.perf_counter() - t) * 1000)
+        w.close()
+        w.deleteLater()
+        app.processEvents()
+    samples["first_paint"] = paints
+    return samples
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.startup", description="起動性能のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=5, help="各指標の計測回数（デフォルト: 5）")
+    parser.add_argument("--import-repeat", type=int, default=3, help="import 計測の回数（デフォルト: 3）")
+    parser.add_argument("--only", help="指標名の前方一致で絞込む（例: import / main_window）")
+    parser.add_argument("--tolerance", type=float, help="許容する悪化率（ベースラインの値を上書き）")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="ベースライン JSON のパス")
+    parser.add_argument("--update-baseline", action="store_true", help="結果をベースラインとして保存する")
+    args = parser.parse_args(argv)
+
+    if args.update_baseline and args.only:
+        parser.error("--update-baseline と --only は同時に指定できません")
+
+    os.chdir(_APP_DIR)
+    only = args.only or ""
+    samples: Dict[str, List[float]] = {}
+    if only.startswith("import") or not only:
+        samples.update(bench_imports(args.import_repeat))
+    if not only.startswith("import"):
+        samples.update(bench_gui(args.repeat))
+    results = {name: summarize(v) for name, v in samples.items() if name.startswith(only)}
+    return finish(results, args.baseline, args.update_baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+"""タイムシート入出力のベンチマーク
+
+    python -m benchmarks.timesheet_io                    # ベースラインと比較（悪化があれば終了コード 1）
+    python -m benchmarks.timesheet_io --update-baseline  # 現在の結果をベースラインとして保存
+    python -m benchmarks.timesheet_io --only find        # 処理名の前方一致で絞込み
+
+timesheet_layout（年月セル C6/C7・日付列 C の 18 行目から）に合わせ、罫線・フォント・
+塗り・表示形式・数式・入力規則を入れた合成タイムシートを作って計測する。
+フォルダ検索用に 10 / 1,000 / 10,000 ファイルのフォルダも作る（対象以外は空ファイル）。
+
+処理ごとに別プロセスで計測し、レイテンシのパーセンタイルとそのプロセスのピーク RSS を表示する。
+
+計測する指標（いずれもミリ秒）:
+    write_to_excel.<engine>          1 日分の書込（読込〜保存）。engine は openpyxl / direct
+    batch_write.<engine>.<N>d        1 か月分（N 日）の一括記入
+    get_row_for_date.scan            読込済みシートの日付列の走査
+    get_row_for_date.cached          走査結果のキャッシュを使った行の特定
+    verify_timesheet_header          ファイル検索とヘッダーセルの読取
+    find_timesheet.cold.<files>      フォルダ一覧の取得を含む検索
+    find_timesheet.warm.<files>      フォルダ一覧のキャッシュを使った検索
+"""
+import argparse
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date
+from pathlib import Path
+from typing import Callable, Dict, List
+
+_APP_DIR = Path(__file__).parent.parent
+if str(_APP_DIR) not in sys.path:
+    sys.path.insert(0, str(_APP_DIR))
+
+from benchmarks._common import finish, peak_rss_mb, summarize
+
+BASELINE = Path(__file__).parent / "baseline_timesheet_io.json"
+
+OPERATIONS = ["write_to_excel", "batch_write", "get_row_for_date", "verify_timesheet_header", "find_timesheet"]
+ENGINES = ["openpyxl", "direct"]
+FOLDER_SIZES = [10, 1_000, 10_000]
+
+_YEAR, _MONTH = 2026, 2
+_NAME = "山田"
+_TARGET = f"{_YEAR:04d}{_MONTH:02d}{_NAME}.xlsx"
+
+
+def make_timesheet(path: Path, year: int = _YEAR, month: int = _MONTH) -> Path:
+    """本番のテンプレートに近い書式付きタイムシートを作る"""
+    import calendar
+
+    import openpyxl
+    from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+    from openpyxl.worksheet.datavalidation import DataValidation
+
+    from assets.timesheet_constants import SHIFT_DEFINITIONS
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "勤務表"
+    thin = Side(style="thin")
+    border = Border(left=thin, right=thin, top=thin, bottom=thin)
+    font = Font(name="ＭＳ ゴシック", size=10)
+    header_fill = PatternFill("solid", fgColor="DDEBF7")
+    weekend_fill = PatternFill("solid", fgColor="FCE4D6")
+    center = Alignment(horizontal="center", vertical="center")
+
+    ws.merge_cells("B2:L3")
+    ws["B2"] = "勤務実績表"
+    ws["B2"].font = Font(name="ＭＳ ゴシック", size=16, bold=True)
+    ws["B2"].alignment = center
+    ws["B6"], ws["C6"] = "年", year
+    ws["B7"], ws["C7"] = "月", month
+    ws["B8"], ws["C8"] = "氏名", _NAME
+    for col, label in zip("BCDEFGHIJKL", ["No", "日", "曜", "勤務区分", "始業", "終業", "実働",
+                                           "休憩", "深夜", "残業区分", "備考"]):
+        cell = ws[f"{col}17"]
+        cell.value = label
+        cell.font = Font(name="ＭＳ ゴシック", size=10, bold=True)
+        cell.fill = header_fill
+        cell.border = border
+        cell.alignment = center
+        ws.column_dimensions[col].width = 30 if col == "L" else 9
+
+    days = calendar.monthrange(year, month)[1]
+    for i in range(31):
+        row = 18 + i
+        for col in "BCDEFGHIJKL":
+            cell = ws[f"{col}{row}"]
+            cell.border = border
+            cell.font = font
+        ws[f"B{row}"] = i + 1
+        if i < days:
+            d = date(year, month, i + 1)
+            ws[f"C{row}"] = i + 1
+            ws[f"D{row}"] = "月火水木金土日"[d.weekday()]
+            if d.weekday() >= 5:
+                for col in "BCDEFGHIJKL":
+                    ws[f"{col}{row}"].fill = weekend_fill
+        for col in "FGHIJ":
+            ws[f"{col}{row}"].number_format = "h:mm"
+        ws[f"H{row}"] = f'=IF(AND(F{row}<>"",G{row}<>""),G{row}-F{row}-I{row},"")'
+        ws[f"I{row}"] = f'=IF(F{row}<>"",TIME(1,0,0),"")'
+    ws["G50"], ws["H50"] = "合計", "=SUM(H18:H48)"
+    ws["H50"].number_format = "[h]:mm"
+
+    dv = DataValidation(type="list", formula1='"' + ",".join(list(SHIFT_DEFINITIONS)[:10]) + '"')
+    dv.add("E18:E48")
+    ws.add_data_validation(dv)
+    wb.save(str(path))
+    return path
+
+
+def make_folder(folder: Path, files: int, template: Path) -> Path:
+    """対象のタイムシート1件と、検索に引っ掛からない空の .xlsx を合わせて files 件置いたフォルダを作る"""
+    folder.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(template, folder / _TARGET)
+    for i in range(files - 1):
+        yyyymm = f"{2000 + i // 12 % 26:04d}{i % 12 + 1:02d}"
+        (folder / f"{yyyymm}社員{i:05d}.xlsx").touch()
+    return folder
+
+
+def _config(folder: Path, engine: str = "openpyxl"):
+    from assets.config import Config
+
+    config = Config()
+    config.timesheet_folder = str(folder)
+    config.timesheet_display_name = _NAME
+    config.output_folder = str(folder)
+    # 計測中にキュー・ジャーナル（assets/ 配下）へ書込まない
+    config.timesheet_io.update({"write_engine": engine, "offline_queue": False, "journal": False})
+    return config
+
+
+def _timed(fn: Callable[[int], object], repeat: int) -> List[float]:
+    result = []
+    for i in range(repeat):
+        t = time.perf_counter()
+        fn(i)
+        result.append((time.perf_counter() - t) * 1000)
+    return result
+
+
+def _bench_write_to_excel(work: Path, repeat: int) -> Dict[str, List[float]]:
+    from assets.timesheet_actions import write_to_excel
+
+    samples = {}
+    for engine in ENGINES:
+        folder = work / f"write_{engine}"
+        folder.mkdir()
+        path = Path(shutil.copyfile(work / "template.xlsx", folder / _TARGET))
+        config = _config(folder, engine)
+        samples[f"write_to_excel.{engine}"] = _timed(
+            lambda i: write_to_excel(path, {"date": date(_YEAR, _MONTH, i % 28 + 1), "end_time": 0.75}, config),
+            repeat,
+        )
+    return samples
+
+
+def _bench_batch_write(work: Path, repeat: int) -> Dict[str, List[float]]:
+    from assets.timesheet_actions import batch_write
+
+    days = [date(_YEAR, _MONTH, d) for d in range(1, 29)]
+    samples = {}
+    for engine in ENGINES:
+        folder = work / f"batch_{engine}"
+        folder.mkdir()
+        shutil.copyfile(work / "template.xlsx", folder / _TARGET)
+        config = _config(folder, engine)
+        samples[f"batch_write.{engine}.{len(days)}d"] = _timed(
+            lambda i: batch_write(config, days, "シフト休", "リモート",
+                                  custom_input_cb=None, remark_cb=None, status_cb=lambda *a: None),
+            repeat,
+        )
+    return samples
+
+
+def _bench_get_row_for_date(work: Path, repeat: int) -> Dict[str, List[float]]:
+    import openpyxl
+
+    from assets.timesheet_helpers import clear_row_index_cache, get_row_for_date
+
+    path = work / "template.xlsx"
+    ws = openpyxl.load_workbook(str(path)).active
+    clear_row_index_cache()
+    get_row_for_date(ws, 1, path=path)
+    return {
+        "get_row_for_date.scan": _timed(lambda i: get_row_for_date(ws, i % 28 + 1), repeat),
+        "get_row_for_date.cached": _timed(lambda i: get_row_for_date(ws, i % 28 + 1, path=path), repeat),
+    }
+
+
+def _bench_verify_timesheet_header(work: Path, repeat: int) -> Dict[str, List[float]]:
+    from assets.timesheet_actions import verify_timesheet_header
+
+    config = _config(work / f"folder_{FOLDER_SIZES[0]}")
+    target = date(_YEAR, _MONTH, 3)
+    return {"verify_timesheet_header": _timed(lambda i: verify_timesheet_header(config, target), repeat)}
+
+
+def _bench_find_timesheet(work: Path, repeat: int, sizes: List[int]) -> Dict[str, List[float]]:
+    from assets.timesheet_helpers import clear_dir_index_cache, find_timesheet
+
+    samples = {}
+    for n in sizes:
+        folder = str(work / f"folder_{n}")
+
+        def _cold(i):
+            clear_dir_index_cache()
+            assert find_timesheet(folder, _NAME, _YEAR, _MONTH) is not None
+
+        samples[f"find_timesheet.cold.{n}"] = _timed(_cold, repeat)
+        samples[f"find_timesheet.warm.{n}"] = _timed(lambda i: find_timesheet(folder, _NAME, _YEAR, _MONTH), repeat)
+    return samples
+
+
+def _worker(op: str, work: Path, repeat: int, sizes: List[int]) -> None:
+    """1つの処理を計測し、{"samples": {...}, "peak_rss_mb": ...} を標準出力に JSON で書く"""
+    # openpyxl は遅延 import されるため、初回の読込時間が1回目の計測に混ざらないよう先に読込む
+    import openpyxl  # noqa: F401
+
+    if op == "find_timesheet":
+        samples = _bench_find_timesheet(work, repeat, sizes)
+    else:
+        samples = globals()[f"_bench_{op}"](work, repeat)
+    json.dump({"samples": samples, "peak_rss_mb": peak_rss_mb()}, sys.stdout)
+
+
+def _prepare(work: Path, sizes: List[int]) -> None:
+    template = make_timesheet(work / "template.xlsx")
+    for n in sorted(set(sizes) | {FOLDER_SIZES[0]}):
+        make_folder(work / f"folder_{n}", n, template)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.timesheet_io",
+                                     description="タイムシート入出力のベンチマーク")
+    parser.add_argument("--repeat", type=int, default=20, help="各指標の計測回数（デフォルト: 20）")
+    parser.add_argument("--sizes", default=",".join(map(str, FOLDER_SIZES)),
+                        help="find_timesheet のフォルダのファイル数（カンマ区切り）")
+    parser.add_argument("--only", help="処理名の前方一致で絞込む（例: find / write_to_excel）")
+    parser.add_argument("--tolerance", type=float, help="許容する悪化率（ベースラインの値を上書き）")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="ベースライン JSON のパス")
+    parser.add_argument("--update-baseline", action="store_true", help="結果をベースラインとして保存する")
+    parser.add_argument("--worker", choices=OPERATIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    if args.worker:
+        _worker(args.worker, args.workdir, args.repeat, sizes)
+        return 0
+    if args.update_baseline and (args.only or args.sizes != parser.get_default("sizes")):
+        parser.error("--update-baseline は --only / --sizes と同時に指定できません")
+
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory(prefix="kintai-bench-") as tmp:
+        work = Path(tmp)
+        _prepare(work, sizes)
+        for op in OPERATIONS:
+            if args.only and not op.startswith(args.only):
+                continue
+            out = subprocess.run(
+                [sys.executable, "-m", "benchmarks.timesheet_io", "--worker", op, "--workdir", str(work),
+                 "--repeat", str(args.repeat), "--sizes", args.sizes],
+                cwd=_APP_DIR, capture_output=True, text=True, timeout=1800,
+            )
+            if out.returncode != 0:
+                raise RuntimeError(f"{op} の計測に失敗しました:\n{out.stderr}")
+            data = json.loads(out.stdout)
+            for name, values in data["samples"].items():
+                results[name] = {**summarize(values), "peak_rss_mb": data["peak_rss_mb"]}
+    return finish(results, args.baseline, args.update_baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
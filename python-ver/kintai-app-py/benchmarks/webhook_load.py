@@ -0,0 +1,301 @@
+"""Teams Webhook 送信の負荷試験（ローカルのスタブサーバーに送る。ネットワーク不要）
+
+    python -m benchmarks.webhook_load                            # ベースラインと比較（悪化があれば終了コード 1）
+    python -m benchmarks.webhook_load --update-baseline          # 現在の結果をベースラインとして保存
+    python -m benchmarks.webhook_load --only urllib              # エンジン名の前方一致で絞込み
+    python -m benchmarks.webhook_load --latency-ms 200 --error-rate 0.1 --rate-429 0.05 --outbox
+    python -m benchmarks.webhook_load --targets 3                # 1 件ごとに 3 か所へ送る（webhook_targets）
+
+条件（件数・同時数・エラー注入など）を変えた計測はベースラインと比べず、結果の表示だけにする。
+
+標準ライブラリの http.server で Webhook のスタブ（StubWebhookServer）を立て、
+send_teams_post() を N 件同時に送る。送信は本物の _post()（requests の Session、
+requests がない環境向けの urllib フォールバック）を通るため、接続の使い回し・流量制限・
+再送待ちの変更をオフラインで確かめられる。
+
+計測する指標（いずれもミリ秒）:
+    send.<engine>    send_teams_post() 1 件の所要時間。engine は requests / urllib
+
+あわせてスループット（件/秒）・サーバーが受けた接続数・応答コード・失敗の内訳と、
+assets.metrics に記録された接続時間（webhook.connect_ms）・POST 時間（webhook.post_ms）を表示する。
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from unittest import mock
+
+_APP_DIR = Path(__file__).parent.parent
+if str(_APP_DIR) not in sys.path:
+    sys.path.insert(0, str(_APP_DIR))
+
+from benchmarks._common import finish, print_results, summarize
+
+BASELINE = Path(__file__).parent / "baseline_webhook_load.json"
+
+ENGINES = ["requests", "urllib"]
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 接続を保持しない urllib が同時に接続しても取りこぼさない（既定の 5 では SYN の再送で 1 秒待つ）
+    request_queue_size = 128
+
+
+class StubWebhookServer:
+    """
+    Teams Webhook のスタブ。127.0.0.1 の空きポートで待ち受け、受け取ったペイロードを payloads に残す。
+
+    latency_ms   応答までの待ち時間
+    error_rate   HTTP 500 を返す割合（0〜1）
+    rate_429     HTTP 429 を返す割合（0〜1。error_rate より先に判定する）
+    retry_after  429 に付ける Retry-After（秒。None なら付けない）
+    """
+
+    def __init__(self, latency_ms: float = 0.0, error_rate: float = 0.0, rate_429: float = 0.0,
+                 retry_after: Optional[float] = None, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.payloads: List[Any] = []
+        self.statuses: Counter = Counter()
+        self.connections = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd = _StubHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/webhook"
+
+    def start(self) -> "StubWebhookServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="kintai-webhook-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        if self._thread is not None:
+            self._thread.join(5)
+
+    def __enter__(self) -> "StubWebhookServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _respond_status(self) -> int:
+        with self._lock:
+            r = self._random.random()
+        if r < self.rate_429:
+            return 429
+        if r < self.rate_429 + self.error_rate:
+            return 500
+        return 202
+
+    def _record(self, payload: Any, status: int) -> None:
+        with self._lock:
+            self.payloads.append(payload)
+            self.statuses[status] += 1
+
+    def _handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep-alive で接続を使い回せるようにする（接続数で Session の効果を確かめる）
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                with stub._lock:
+                    stub.connections += 1
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if stub.latency_ms:
+                    time.sleep(stub.latency_ms / 1000)
+                status = stub._respond_status()
+                try:
+                    payload = json.loads(body.decode("utf-8"))
+                except ValueError:
+                    payload = body
+                stub._record(payload, status)
+                text = b"" if status == 202 else f"stub {status}".encode()
+                self.send_response(status)
+                if status == 429 and stub.retry_after is not None:
+                    self.send_header("Retry-After", str(stub.retry_after))
+                self.send_header("Content-Length", str(len(text)))
+                self.end_headers()
+                self.wfile.write(text)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+
+def _failure_kind(error: BaseException) -> str:
+    """失敗を「HTTP 500」「ConnectionError」などの種類にまとめる（再送待ちの注記は除く）"""
+    from assets.teams_webhook import WebhookHTTPError
+
+    cause = error.__cause__ or error
+    if isinstance(cause, WebhookHTTPError):
+        return f"HTTP {cause.status}"
+    return type(cause).__name__
+
+
+def _config(url: str, io: Dict[str, Any], targets: int = 1):
+    from assets.config import Config
+
+    c = Config()
+    c.webhook_url = url
+    # 2 件目以降の送信先は同じスタブの別パスにする
+    c.webhook_targets = [{"name": f"target{i}", "url": f"{url}/{i}"} for i in range(1, targets)]
+    c.display_name = "山田 太郎"
+    c.teams_user_id = "yamada@example.com"
+    c.proxy_sh = ""
+    c.webhook_io = {**c.webhook_io, **io}
+    return c
+
+
+def run_load(url: str, requests_total: int, concurrency: int, engine: str = "requests",
+             io: Optional[Dict[str, Any]] = None, outbox_dir: Optional[Path] = None,
+             targets: int = 1) -> Dict[str, Any]:
+    """
+    send_teams_post() を concurrency 本のスレッドから合計 requests_total 件送る。
+    targets が 2 以上なら 1 件ごとに targets か所の送信先へ同時に送る（webhook_targets）。
+    io は webhook_io の上書き（既定では流量制限・再送待ちを切る）。outbox_dir を渡すと
+    再送待ちを有効にし、そのフォルダに登録する（再送ワーカーは動かさない）。
+
+    戻り値: {"latencies_ms", "elapsed_sec", "throughput", "failures", "outbox_pending", "dead_letters"}
+    """
+    from assets import teams_webhook, webhook_outbox
+
+    io = {"rate_limit_per_sec": 0, "outbox": outbox_dir is not None, **(io or {})}
+    config = _config(url, io, targets)
+    box = None
+    if outbox_dir is not None:
+        box = webhook_outbox.WebhookOutbox(outbox_dir / "webhook_outbox.jsonl", outbox_dir / "dead_letter.jsonl")
+    data = {"shift": "日勤", "work_style": "リモート", "comment": ""}
+
+    latencies: List[float] = []
+    failures: Counter = Counter()
+    lock = threading.Lock()
+
+    def _one(_):
+        t = time.perf_counter()
+        error = None
+        try:
+            teams_webhook.send_teams_post(config, "clock_in", data)
+        except Exception as e:
+            error = e
+        ms = (time.perf_counter() - t) * 1000
+        with lock:
+            latencies.append(ms)
+            if error is not None:
+                failures[_failure_kind(error)] += 1
+
+    teams_webhook.close_session()
+    # 再送待ちは一時フォルダに向ける
+    with mock.patch.object(teams_webhook, "REQUESTS_AVAILABLE", engine == "requests"), \
+         mock.patch.object(teams_webhook, "_buckets", {}), \
+         mock.patch.object(webhook_outbox, "_outbox", box):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="kintai-load") as pool:
+            list(pool.map(_one, range(requests_total)))
+        elapsed = time.perf_counter() - start
+    teams_webhook.close_session()
+
+    return {
+        "latencies_ms": latencies,
+        "elapsed_sec": elapsed,
+        "throughput": requests_total / elapsed if elapsed > 0 else 0.0,
+        "failures": dict(failures),
+        "outbox_pending": box.pending_count() if box is not None else 0,
+        "dead_letters": len(box.dead_letters()) if box is not None else 0,
+    }
+
+
+def _print_load(engine: str, report: Dict[str, Any], server: StubWebhookServer) -> None:
+    failures = ", ".join(f"{k}={v}" for k, v in sorted(report["failures"].items())) or "-"
+    statuses = ", ".join(f"{k}={v}" for k, v in sorted(server.statuses.items()))
+    print(f"{engine:<10} {report['throughput']:9.1f} req/s  connections={server.connections}  "
+          f"status: {statuses}  failures: {failures}  "
+          f"outbox: pending={report['outbox_pending']} dead={report['dead_letters']}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.webhook_load",
+                                     description="Teams Webhook 送信の負荷試験（ローカルのスタブサーバー）")
+    parser.add_argument("--requests", type=int, default=200, help="送信する件数（デフォルト: 200）")
+    parser.add_argument("--concurrency", type=int, default=8, help="同時に送るスレッド数（デフォルト: 8）")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="スタブの応答待ち（ミリ秒）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="HTTP 500 を返す割合（0〜1）")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="HTTP 429 を返す割合（0〜1）")
+    parser.add_argument("--retry-after", type=float, help="429 に付ける Retry-After（秒）")
+    parser.add_argument("--rate-limit", type=float, default=0.0,
+                        help="webhook_io.rate_limit_per_sec（デフォルト: 0 = 制限しない）")
+    parser.add_argument("--burst", type=int, default=4, help="webhook_io.rate_limit_burst（デフォルト: 4）")
+    parser.add_argument("--pool-maxsize", type=int, help="webhook_io.pool_maxsize（デフォルト: 設定値）")
+    parser.add_argument("--targets", type=int, default=1, help="1 件ごとの送信先の数（デフォルト: 1）")
+    parser.add_argument("--outbox", action="store_true", help="失敗した投稿を一時フォルダの再送待ちに登録する")
+    parser.add_argument("--seed", type=int, default=0, help="エラー注入の乱数シード")
+    parser.add_argument("--only", help="エンジン名の前方一致で絞込む（requests / urllib）")
+    parser.add_argument("--tolerance", type=float, help="許容する悪化率（ベースラインの値を上書き）")
+    parser.add_argument("--baseline", type=Path, default=BASELINE, help="ベースライン JSON のパス")
+    parser.add_argument("--update-baseline", action="store_true", help="結果をベースラインとして保存する")
+    args = parser.parse_args(argv)
+
+    defaults = {k: parser.get_default(k) for k in ("requests", "concurrency", "latency_ms", "error_rate",
+                                                   "rate_429", "rate_limit", "targets", "outbox")}
+    custom = any(getattr(args, k) != v for k, v in defaults.items())
+    if args.update_baseline and (args.only or custom):
+        parser.error("--update-baseline は既定の条件（件数・同時数・エラー注入などを指定しない）でのみ使えます")
+
+    # 環境変数のプロキシ設定で 127.0.0.1 への送信がプロキシに向かわないようにする
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+    io: Dict[str, Any] = {"rate_limit_per_sec": args.rate_limit, "rate_limit_burst": args.burst}
+    if args.pool_maxsize:
+        io["pool_maxsize"] = args.pool_maxsize
+
+    from assets import metrics
+    from assets.teams_webhook import REQUESTS_AVAILABLE
+
+    results: Dict[str, Dict[str, float]] = {}
+    for engine in ENGINES:
+        if args.only and not engine.startswith(args.only):
+            continue
+        if engine == "requests" and not REQUESTS_AVAILABLE:
+            print("requests が見つからないため requests での計測を省きます", file=sys.stderr)
+            continue
+        with StubWebhookServer(args.latency_ms, args.error_rate, args.rate_429, args.retry_after, args.seed) as server, \
+             tempfile.TemporaryDirectory(prefix="kintai-outbox-") as tmp:
+            metrics.reset()
+            report = run_load(server.url, args.requests, args.concurrency, engine, io,
+                              Path(tmp) if args.outbox else None, args.targets)
+            _print_load(engine, report, server)
+            print("  " + metrics.format_summary().replace("\n", "\n  "))
+        results[f"send.{engine}"] = summarize(report["latencies_ms"])
+    print()
+    if custom:
+        # 条件を変えた計測はベースラインと比べられないため、結果の表示だけにする
+        print_results(results)
+        return 0
+    return finish(results, args.baseline, args.update_baseline, args.tolerance)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
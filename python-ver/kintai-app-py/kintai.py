@@ -1,17 +1,30 @@
+from assets import startup_trace
+
 import os
 import sys
 from pathlib import Path
 
-from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QWidget
+if __name__ == "__main__" and sys.argv[1:2] == ["cli"]:
+    # python -m kintai cli ... … PyQt5 を import せずにヘッドレス CLI を実行する
+    from assets.cli import main as _cli_main
+    sys.exit(_cli_main(sys.argv[2:]))
+
+from PyQt5.QtWidgets import QApplication, QMainWindow, QTabWidget, QVBoxLayout, QWidget
 from PyQt5.QtGui import QFont, QFontDatabase
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer
 
 from assets.app_logger import setup_logging, get_logger
 from assets.config import Config
+from assets.lazy_import import warm_up_in_background
+from assets.punch_journal import prune_for_config
+from assets.punch_queue import start_replay_worker
+from assets.debug_capture import shutdown_capture
+from assets.teams_dispatcher import shutdown_dispatcher
+from assets.teams_webhook import prefetch_proxies
+from assets.webhook_outbox import start_outbox_worker
 from assets.theme_engine import apply_theme
 from assets.tabs.attendance_tab import AttendanceTab
-from assets.tabs.settings_tab import SettingsTab
-from assets.tabs.shift_type_tab import ShiftTypeTab
+startup_trace.mark("import")
 VER = "勤怠打刻 v3.0.0"
 
 def _apply_titlebar_theme(hwnd: int, theme: str) -> None:
@@ -65,17 +78,42 @@ class MainWindow(QMainWindow):
         self.attendance_tab = AttendanceTab(config=self.config, parent=self)
         self.tab_widget.addTab(self.attendance_tab, "打刻")
 
-        # 設定タブ
+        # 設定タブ・出勤形態タブは最初に開いたときに作る（起動時間短縮）
+        self.settings_tab = None
+        self.shift_type_tab = None
+        self._lazy_tabs = {}
+        self._add_lazy_tab("設定", self._build_settings_tab)
+        self._add_lazy_tab("出勤形態", self._build_shift_type_tab)
+        self.tab_widget.currentChanged.connect(self._ensure_tab)
+
+    def _add_lazy_tab(self, label: str, build) -> None:
+        holder = QWidget(self)
+        layout = QVBoxLayout(holder)
+        layout.setContentsMargins(0, 0, 0, 0)
+        self._lazy_tabs[self.tab_widget.addTab(holder, label)] = (holder, build)
+
+    def _ensure_tab(self, index: int) -> None:
+        """未作成のタブなら中身を作って入れる"""
+        entry = self._lazy_tabs.pop(index, None)
+        if entry:
+            holder, build = entry
+            holder.layout().addWidget(build())
+
+    def _build_settings_tab(self) -> QWidget:
+        from assets.tabs.settings_tab import SettingsTab
+
         self.settings_tab = SettingsTab(config=self.config, main_window=self, parent=self)
-        self.tab_widget.addTab(self.settings_tab, "設定")
+        return self.settings_tab
+
+    def _build_shift_type_tab(self) -> QWidget:
+        from assets.tabs.shift_type_tab import ShiftTypeTab
 
-        # 出勤形態タブ
         self.shift_type_tab = ShiftTypeTab(
             config=self.config,
             attendance_tab_ref=self.attendance_tab,
             parent=self
         )
-        self.tab_widget.addTab(self.shift_type_tab, "出勤形態")
+        return self.shift_type_tab
 
     def apply_theme(self) -> None:
         # 現在のテーマを適用
@@ -85,19 +123,42 @@ class MainWindow(QMainWindow):
         _apply_titlebar_theme(int(self.winId()), self.config.theme)
 
 
-def _setup_font(app: QApplication) -> None:
-    """日本語フォントを設定する"""
+def _setup_font(app: QApplication, config: Config, settings_path: Path) -> None:
+    """
+    日本語フォントを設定する。
+    フォント一覧の取得（QFontDatabase）は環境によって数百ms かかるため、
+    検出したフォント名を config.ui_font に保存し、次回からはそれを使う。
+    """
+    if config.ui_font:
+        app.setFont(QFont(config.ui_font, 10))
+        return
     candidates = ["Noto Sans CJK JP", "Noto Sans JP", "IPAGothic", "Yu Gothic", "Meiryo", "MS Gothic"]
     db = QFontDatabase()
     available = db.families()
     for name in candidates:
         if name in available:
-            app.setFont(QFont(name, 10))
-            return
-    # システムデフォルト
-    font = app.font()
-    font.setPointSize(10)
+            font = QFont(name, 10)
+            break
+    else:
+        # システムデフォルト
+        font = app.font()
+        font.setPointSize(10)
     app.setFont(font)
+    config.ui_font = font.family()
+    # 初回セットアップ前（settings.json 未作成）は保存しない
+    if settings_path.exists():
+        try:
+            config.save(str(settings_path))
+        except OSError as e:
+            get_logger("kintai.main").warning("フォント設定の保存に失敗: %s", e)
+
+
+def _after_first_paint(log, config) -> None:
+    """最初の描画後に起動時間を記録し、打刻で使う重いモジュールとプロキシ設定を読込んでおく"""
+    startup_trace.mark("first_paint")
+    startup_trace.report(log)
+    warm_up_in_background("openpyxl", "requests")
+    prefetch_proxies(config)
 
 
 def main() -> None:
@@ -109,28 +170,45 @@ def main() -> None:
     QApplication.setAttribute(Qt.AA_EnableHighDpiScaling, True)
     QApplication.setAttribute(Qt.AA_UseHighDpiPixmaps, True)
 
-    app = QApplication(sys.argv)
-    app.setApplicationName(VER)
-
-    _setup_font(app)
-
     # 設定読込
     settings_path = Path(__file__).parent / "configs" / "settings.json"
     config = Config.load(str(settings_path))
 
+    app = QApplication(sys.argv)
+    app.setApplicationName(VER)
+    startup_trace.mark("qapplication")
+
+    _setup_font(app, config, settings_path)
+    startup_trace.mark("font")
+
     # テスト日付オーバーライド（settings.json の test_date が優先、環境変数で上書きもできる）
     if config.test_date and not os.environ.get("KINTAI_TEST_DATE"):
         os.environ["KINTAI_TEST_DATE"] = config.test_date
 
+    # 保持月数より古い打刻ジャーナルを削除する
+    prune_for_config(config)
+    # 書込待ちの打刻があれば Excel が閉じられ次第バックグラウンドで書込む
+    start_replay_worker(config)
+    # 前回送れなかった Teams 投稿があればバックグラウンドで再送する
+    start_outbox_worker(config)
+    # 終了時は送信待ちの Teams 投稿を送り終えてから終わる（最大 5 秒）
+    app.aboutToQuit.connect(shutdown_dispatcher)
+    app.aboutToQuit.connect(shutdown_capture)
+
     # テーマ適用
     apply_theme(app, config.theme)
+    startup_trace.mark("theme")
 
     # メインウィンドウ
     window = MainWindow(config=config, app=app)
+    startup_trace.mark("main_window")
     window.show()
     # 起動時にカレンダーへもテーマを反映
     window.apply_theme()
     window.resize(880, 480)
+    startup_trace.mark("show")
+    # イベントループが最初の描画を終えた時点で計測を締める
+    QTimer.singleShot(0, lambda: _after_first_paint(log, config))
 
     sys.exit(app.exec_())
 
@@ -7,6 +7,15 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import pytest
 from assets.config import Config
+from assets import debug_capture, punch_journal, punch_queue, teams_webhook, webhook_outbox
+
+
+@pytest.fixture(autouse=True)
+def punch_queue_file(tmp_path, monkeypatch):
+    """打刻キューを tmp_path 配下のファイルに差し替える（assets/queue に書込まない）"""
+    q = punch_queue.PunchQueue(tmp_path / "punch_queue.jsonl", tmp_path / "punch_dead_letter.jsonl")
+    monkeypatch.setattr(punch_queue, "_queue", q)
+    return q
 
 
 @pytest.fixture
@@ -24,3 +33,37 @@ def base_config():
         {"name": "田中課長", "teams_id": "tanaka@example.com"},
     ]
     return c
+
+
+@pytest.fixture(autouse=True)
+def journal_dir(tmp_path, monkeypatch):
+    """打刻ジャーナルを tmp_path 配下に書く（assets/journal に書込まない）"""
+    d = tmp_path / "journal"
+    monkeypatch.setattr(punch_journal, "_JOURNAL_DIR", d)
+    return d
+
+
+@pytest.fixture(autouse=True)
+def outbox(tmp_path, monkeypatch):
+    """Teams 投稿の再送待ちを tmp_path 配下に書く（assets/outbox に書込まない）"""
+    box = webhook_outbox.WebhookOutbox(tmp_path / "outbox" / "webhook_outbox.jsonl",
+                                       tmp_path / "outbox" / "dead_letter.jsonl")
+    monkeypatch.setattr(webhook_outbox, "_outbox", box)
+    return box
+
+
+@pytest.fixture(autouse=True)
+def rate_limits(monkeypatch):
+    """webhook_url ごとの流量制限をテストごとに空にする（前のテストの送信で待たされない）"""
+    buckets = {}
+    monkeypatch.setattr(teams_webhook, "_buckets", buckets)
+    return buckets
+
+
+@pytest.fixture(autouse=True)
+def capture_dir(tmp_path, monkeypatch):
+    """Teams 投稿のデバッグ保存を tmp_path 配下に書く（timesheet/teams_debug に書込まない）"""
+    d = tmp_path / "teams_debug"
+    monkeypatch.setattr(debug_capture, "_CAPTURE_DIR", d)
+    monkeypatch.setattr(debug_capture, "_capture", None)
+    return d
@@ -0,0 +1,107 @@
+"""assets/action_worker.py（打刻処理のワーカースレッド）のユニットテスト"""
+import os
+import threading
+import time
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtCore = pytest.importorskip("PyQt5.QtCore")
+
+from assets.action_worker import ActionWorker
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+def _wait(app, cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.01)
+    assert cond()
+
+
+def _run(app, worker):
+    results, errors = [], []
+    worker.succeeded.connect(lambda r: results.append((r, threading.current_thread())))
+    worker.failed.connect(errors.append)
+    worker.start()
+    _wait(app, lambda: worker.isFinished() and (results or errors))
+    return results, errors
+
+
+def test_runs_off_gui_thread_and_reports_on_gui_thread(app):
+    worker = ActionWorker(lambda w: threading.current_thread())
+    [(action_thread, slot_thread)] = _run(app, worker)[0]
+    assert action_thread is not threading.main_thread()
+    assert slot_thread is threading.main_thread()
+
+
+def test_dialog_round_trip(app):
+    asked = []
+
+    def on_dialog(kind, args):
+        asked.append((kind, args, threading.current_thread()))
+        worker.reply(f"{kind}:{args[0]}")
+
+    worker = ActionWorker(lambda w: w.dialog_cb("remark")("タイトル", "備考"))
+    worker.dialog_requested.connect(on_dialog)
+    [(result, _)] = _run(app, worker)[0]
+    assert result == "remark:タイトル"
+    assert asked[0][:2] == ("remark", ("タイトル", "備考"))
+    assert asked[0][2] is threading.main_thread()
+
+
+def test_status_signal(app):
+    statuses = []
+    worker = ActionWorker(lambda w: w.report("保存中", "gray"))
+    worker.status.connect(lambda msg, color: statuses.append((msg, color)))
+    _run(app, worker)
+    _wait(app, lambda: statuses)
+    assert statuses == [("保存中", "gray")]
+
+
+def test_cancel_skips_dialogs(app):
+    started = threading.Event()
+    release = threading.Event()
+
+    def action(w):
+        started.set()
+        release.wait(5)
+        return w.is_cancelled(), w.ask("late_reason")
+
+    worker = ActionWorker(action)
+    worker.dialog_requested.connect(lambda kind, args: pytest.fail("取消後にダイアログを要求した"))
+    results = []
+    worker.succeeded.connect(results.append)
+    worker.start()
+    assert started.wait(5)
+    worker.cancel()
+    release.set()
+    _wait(app, lambda: results)
+    assert results == [(True, None)]
+
+
+def test_cancel_while_waiting_for_dialog(app):
+    """ダイアログの結果を待っている間に取消されたら結果を待たずに None で戻る"""
+    asked = threading.Event()
+    worker = ActionWorker(lambda w: w.ask("late_reason"))
+    worker.dialog_requested.connect(lambda kind, args: asked.set())  # 結果を返さない
+    results = []
+    worker.succeeded.connect(results.append)
+    worker.start()
+    _wait(app, asked.is_set)
+    worker.cancel()
+    _wait(app, lambda: results)
+    assert results == [None]
+
+
+def test_exception_goes_to_failed(app):
+    def action(w):
+        raise ValueError("壊れた")
+
+    results, errors = _run(app, ActionWorker(action))
+    assert results == [] and isinstance(errors[0], ValueError)
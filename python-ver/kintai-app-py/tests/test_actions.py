@@ -7,8 +7,8 @@ from unittest.mock import patch, MagicMock, call
 from assets.timesheet_helpers import time_to_excel_serial
 from assets.timesheet_actions import (
     clock_in, clock_out, batch_write, output_csv, write_to_excel,
-    TimesheetNotFoundError, TimesheetLockedError, TimesheetWriteError,
-    UnknownShiftTypeError, verify_timesheet_header,
+    TimesheetNotFoundError, TimesheetLockedError, TimesheetQueuedError, TimesheetWriteError,
+    UnknownShiftTypeError, verify_timesheet_header, TimesheetSession,
 )
 
 
@@ -132,6 +132,155 @@ class TestWriteToExcel:
             write_to_excel(tmp_path / "test.xlsx", row_data)
 
 
+# ────────── TimesheetSession ──────────
+
+def _make_real_timesheet(path, year=2026, month=2):
+    """C6/C7 に年月、C18〜C45 に 1〜28 日、C46〜C48 に数式が入る実ファイルを作成する"""
+    import openpyxl
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["C6"] = year
+    ws["C7"] = month
+    for i in range(28):
+        ws.cell(row=18 + i, column=3).value = i + 1
+    for i in range(3):
+        ws.cell(row=46 + i, column=3).value = f"=C{45 + i}+1"
+    wb.save(str(path))
+    return path
+
+
+class TestTimesheetSession:
+    def test_write_row_and_save(self, tmp_path):
+        """write_row → save で対象行に書込まれる"""
+        import openpyxl
+        xlsx = _make_real_timesheet(tmp_path / "202602山田.xlsx")
+        with TimesheetSession(xlsx) as session:
+            row_num = session.write_row({
+                "date": date(2026, 2, 3), "shift_label": "日勤",
+                "start_time": time_to_excel_serial(10, 0), "end_time": None,
+                "overtime_type": None, "remark": "テスト",
+            })
+            session.save()
+        assert row_num == 20
+        ws = openpyxl.load_workbook(str(xlsx)).active
+        assert ws["E20"].value == "日勤"
+        assert abs(ws["F20"].value - time_to_excel_serial(10, 0)) < 1e-9
+        assert ws["L20"].value == "テスト"
+        assert ws["G20"].value is None
+
+    def test_read_cell_and_address(self, tmp_path):
+        xlsx = _make_real_timesheet(tmp_path / "202602山田.xlsx")
+        with TimesheetSession(xlsx) as session:
+            assert session.read_address("C6") == 2026
+            assert session.find_row(date(2026, 3, 30)) == 47
+            assert session.read_cell(18, "date_col") == 1
+
+    def test_save_without_changes_does_not_write(self, tmp_path):
+        """書込がなければ save() は保存しない"""
+        xlsx = _make_real_timesheet(tmp_path / "202602山田.xlsx")
+        with TimesheetSession(xlsx) as session:
+            with patch.object(session.wb, "save") as mock_save:
+                session.save()
+        mock_save.assert_not_called()
+
+    def test_row_map_reused_after_save(self, tmp_path):
+        """保存後の再読込でも日付列を再走査しない"""
+        from assets.timesheet_helpers import clear_row_index_cache
+        path = tmp_path / "202602山田.xlsx"
+        _make_real_timesheet(path)
+        clear_row_index_cache()
+        with TimesheetSession(path) as session:
+            session.write_row({"date": date(2026, 2, 3), "shift_label": "日勤"})
+            session.save()
+        with patch("assets.timesheet_helpers.build_day_row_map") as mock_build, \
+             TimesheetSession(path) as session:
+            assert session.find_row(date(2026, 2, 4)) == 21
+        mock_build.assert_not_called()
+
+    @pytest.mark.parametrize("engine", ["openpyxl", "direct"])
+    def test_atomic_save(self, tmp_path, base_config, engine):
+        """atomic_save: 一時ファイル経由で保存し、keep_backup で前世代を残す"""
+        import openpyxl
+        path = tmp_path / "202602山田.xlsx"
+        _make_real_timesheet(path)
+        base_config.timesheet_io.update(write_engine=engine, atomic_save=True, keep_backup=True)
+        before = path.read_bytes()
+        with TimesheetSession(path, base_config) as session:
+            session.write_row({"date": date(2026, 2, 3), "shift_label": "日勤"})
+            session.save()
+        assert openpyxl.load_workbook(path).active["E20"].value == "日勤"
+        assert (tmp_path / "202602山田.xlsx.bak").read_bytes() == before
+        assert sorted(p.name for p in tmp_path.iterdir()) == ["202602山田.xlsx", "202602山田.xlsx.bak"]
+
+    def test_atomic_save_locked(self, tmp_path, base_config):
+        """置換時の PermissionError → TimesheetLockedError、元のファイルは変更されない"""
+        path = tmp_path / "202602山田.xlsx"
+        _make_real_timesheet(path)
+        base_config.timesheet_io["atomic_save"] = True
+        before = path.read_bytes()
+        with TimesheetSession(path, base_config) as session:
+            session.write_row({"date": date(2026, 2, 3), "shift_label": "日勤"})
+            with patch("assets.timesheet_helpers.os.replace", side_effect=PermissionError):
+                with pytest.raises(TimesheetLockedError):
+                    session.save()
+        assert path.read_bytes() == before
+
+    def test_atomic_save_tempfile_permission_is_write_error(self, tmp_path, base_config, punch_queue_file):
+        """一時ファイルを作れない（読取専用フォルダ等）PermissionError はロックではなく書込エラー。書込待ちに登録しない"""
+        path = tmp_path / "202602山田.xlsx"
+        _make_real_timesheet(path)
+        base_config.timesheet_io.update(atomic_save=True, offline_queue=True)
+        with TimesheetSession(path, base_config) as session:
+            session.write_row({"date": date(2026, 2, 3), "shift_label": "日勤"})
+            with patch("assets.timesheet_helpers.tempfile.mkstemp", side_effect=PermissionError(13, "denied")):
+                with pytest.raises(TimesheetWriteError, match="一時ファイル"):
+                    session.save()
+        assert punch_queue_file.pending_count() == 0
+
+    def test_require_row_raises(self, tmp_path):
+        import openpyxl
+        xlsx = tmp_path / "202602山田.xlsx"
+        openpyxl.Workbook().save(str(xlsx))
+        with TimesheetSession(xlsx) as session:
+            with pytest.raises(TimesheetWriteError):
+                session.require_row(date(2026, 2, 1))
+
+    @patch("assets.timesheet_actions.openpyxl")
+    def test_load_permission_error_raises_locked(self, mock_openpyxl, tmp_path):
+        mock_openpyxl.load_workbook.side_effect = PermissionError
+        with pytest.raises(TimesheetLockedError):
+            with TimesheetSession(tmp_path / "test.xlsx"):
+                pass
+
+    def test_clock_out_loads_and_saves_once(self, tmp_path, base_config):
+        """退勤処理はワークブックの読込・保存がそれぞれ1回のみ"""
+        import openpyxl
+        xlsx = _make_real_timesheet(tmp_path / "202602山田.xlsx")
+        wb = openpyxl.load_workbook(str(xlsx))
+        wb.active["F38"] = time_to_excel_serial(10, 0)   # 21日の始業
+        wb.save(str(xlsx))
+        base_config.timesheet_folder = str(tmp_path)
+
+        real_load = openpyxl.load_workbook
+        with patch("assets.timesheet_actions.get_now",
+                   return_value=datetime(2026, 2, 21, 20, 0)), \
+             patch("assets.timesheet_actions.openpyxl.load_workbook",
+                   side_effect=real_load) as mock_load, \
+             patch("openpyxl.workbook.workbook.Workbook.save",
+                   autospec=True, side_effect=openpyxl.Workbook.save) as mock_save:
+            ok, _ = clock_out(
+                config=base_config, shift="日勤", work_style="リモート",
+                target_date=date(2026, 2, 21), no_post=True, clock_out_info={},
+                status_cb=_noop_status,
+            )
+        assert ok
+        assert mock_load.call_count == 1
+        assert mock_save.call_count == 1
+        ws = real_load(str(xlsx)).active
+        assert abs(ws["G38"].value - time_to_excel_serial(20, 0)) < 1e-9
+        assert ws["K38"].value == "客先指示"
+
+
 # ────────── clock_out: ターゲット日付とシリアル値 ──────────
 
 class TestClockOutTargetAndSerial:
@@ -148,8 +297,10 @@ class TestClockOutTargetAndSerial:
                    return_value=Path("/fake/file.xlsx")), \
              patch("assets.timesheet_actions.OPENPYXL_AVAILABLE", True), \
              patch("assets.timesheet_actions.openpyxl") as mock_opx, \
-             patch("assets.timesheet_actions.get_row_for_date", return_value=25), \
-             patch("assets.timesheet_actions.write_to_excel", return_value=True) as mock_write:
+             patch("assets.timesheet_actions.get_day_row_map",
+                   return_value=MagicMock(get=MagicMock(return_value=25))), \
+             patch.object(TimesheetSession, "write_row", autospec=True,
+                          return_value=25) as mock_write:
 
             mock_opx.load_workbook.return_value = _make_mock_wb(start_serial)
 
@@ -164,6 +315,7 @@ class TestClockOutTargetAndSerial:
                 is_cross_day=is_cross_day,
             )
             assert ok
+            mock_opx.load_workbook.assert_called_once()  # 読込は1回のみ
             return mock_write.call_args[0][1]  # row_data
 
     # --- ターゲット日付 ---
@@ -418,6 +570,115 @@ class TestClockIn:
                 )
 
 
+    def test_teams_cb_does_not_wait_for_post(self, base_config):
+        """teams_cb を渡すと Teams 投稿の完了を待たずに書込・返却し、結果は teams_cb に届く"""
+        import threading
+        posting = threading.Event()
+        release = threading.Event()
+        results = []
+
+        def slow_post(config, message_type, data):
+            posting.set()
+            assert release.wait(5)
+            raise ConnectionError("proxy timeout")
+
+        with patch("assets.timesheet_actions.get_now", return_value=datetime(2026, 2, 21, 9, 0)), \
+             patch("assets.timesheet_actions.get_today", return_value=date(2026, 2, 21)), \
+             patch("assets.timesheet_actions._find_xlsx_or_raise", return_value=Path("/fake/file.xlsx")), \
+             patch("assets.timesheet_actions.write_to_excel") as mock_write, \
+             patch("assets.timesheet_actions.output_csv"), \
+             patch("assets.teams_webhook.send_teams_post", side_effect=slow_post):
+            ok, teams_error = clock_in(
+                config=base_config, shift="日勤", work_style="リモート",
+                target_date=date(2026, 2, 21), is_assumed=False, no_post=False,
+                late_reason_cb=lambda: None, custom_input_cb=lambda: None,
+                remark_cb=lambda title="", placeholder="": None,
+                status_cb=_noop_status, teams_cb=results.append,
+            )
+            assert (ok, teams_error) == (True, "")
+            mock_write.assert_called_once()
+            assert posting.wait(5) and results == []
+            release.set()
+            from assets.teams_dispatcher import get_dispatcher
+            assert get_dispatcher().stop(5)
+        assert results == ["Teams投稿エラー: proxy timeout"]
+
+    def test_cancel_before_write(self, base_config):
+        """確認後に取消されていれば CSV出力・Teams投稿・書込をしない"""
+        with patch("assets.timesheet_actions.get_now", return_value=datetime(2026, 2, 21, 9, 0)), \
+             patch("assets.timesheet_actions.get_today", return_value=date(2026, 2, 21)), \
+             patch("assets.timesheet_actions.write_to_excel") as mock_write, \
+             patch("assets.timesheet_actions.output_csv") as mock_csv, \
+             patch("assets.teams_webhook.send_teams_post") as mock_post:
+            ok, teams_error = clock_in(
+                config=base_config, shift="日勤", work_style="リモート",
+                target_date=date(2026, 2, 21), is_assumed=False, no_post=False,
+                late_reason_cb=lambda: None, custom_input_cb=lambda: None,
+                remark_cb=lambda title="", placeholder="": None,
+                status_cb=_noop_status, confirm_cb=lambda info: True,
+                cancel_cb=lambda: True,
+            )
+        assert (ok, teams_error) == (False, "")
+        mock_write.assert_not_called()
+        mock_csv.assert_not_called()
+        mock_post.assert_not_called()
+
+    def test_clock_out_cancel_before_write(self, tmp_path, base_config):
+        """退勤も取消されていれば Teams投稿・書込をしない"""
+        import openpyxl
+        xlsx = _make_real_timesheet(tmp_path / "202602山田.xlsx")
+        base_config.timesheet_folder = str(tmp_path)
+        wb = openpyxl.load_workbook(str(xlsx))
+        wb.active["F38"] = time_to_excel_serial(10, 0)
+        wb.save(str(xlsx))
+        with patch("assets.timesheet_actions.get_now", return_value=datetime(2026, 2, 21, 20, 0)), \
+             patch("assets.teams_webhook.send_teams_post") as mock_post:
+            ok, _ = clock_out(
+                config=base_config, shift="日勤", work_style="リモート",
+                target_date=date(2026, 2, 21), no_post=False, clock_out_info={},
+                status_cb=_noop_status, cancel_cb=lambda: True,
+            )
+        assert not ok
+        mock_post.assert_not_called()
+        assert openpyxl.load_workbook(str(xlsx)).active["G38"].value is None
+
+    @pytest.mark.parametrize("load_error, expected", [
+        (PermissionError, TimesheetLockedError),
+        (ValueError("broken"), TimesheetWriteError),
+    ])
+    def test_clock_out_posts_when_workbook_unreadable(self, tmp_path, base_config, load_error, expected):
+        """退勤でブックを読込めなくても（ロック中・破損）Teams 投稿はしてから読込エラーを raise する"""
+        _make_real_timesheet(tmp_path / "202602山田.xlsx")
+        base_config.timesheet_folder = str(tmp_path)
+        with patch("assets.timesheet_actions.get_now", return_value=datetime(2026, 2, 21, 20, 0)), \
+             patch("assets.timesheet_actions.openpyxl.load_workbook", side_effect=load_error), \
+             patch("assets.teams_webhook.send_teams_post") as mock_post:
+            with pytest.raises(expected):
+                clock_out(
+                    config=base_config, shift="日勤", work_style="リモート",
+                    target_date=date(2026, 2, 21), no_post=False, clock_out_info={},
+                    status_cb=_noop_status,
+                )
+            from assets.teams_dispatcher import get_dispatcher
+            assert get_dispatcher().stop(5)
+        mock_post.assert_called_once()
+        assert mock_post.call_args[0][1] == "clock_out"
+
+    def test_clock_out_without_start_time_does_not_post(self, tmp_path, base_config):
+        """始業時刻が未記入なら Teams 投稿せずに TimesheetWriteError"""
+        _make_real_timesheet(tmp_path / "202602山田.xlsx")
+        base_config.timesheet_folder = str(tmp_path)
+        with patch("assets.timesheet_actions.get_now", return_value=datetime(2026, 2, 21, 20, 0)), \
+             patch("assets.teams_webhook.send_teams_post") as mock_post:
+            with pytest.raises(TimesheetWriteError):
+                clock_out(
+                    config=base_config, shift="日勤", work_style="リモート",
+                    target_date=date(2026, 2, 21), no_post=False, clock_out_info={},
+                    status_cb=_noop_status,
+                )
+        mock_post.assert_not_called()
+
+
 # ────────── batch_write ──────────
 
 class TestBatchWrite:
@@ -430,7 +691,7 @@ class TestBatchWrite:
 
         with patch("assets.timesheet_actions._find_xlsx_or_raise",
                    return_value=Path("/fake/file.xlsx")), \
-             patch("assets.timesheet_actions.write_to_excel", return_value=True):
+             patch("assets.timesheet_actions.TimesheetSession"):
             return batch_write(
                 config=base_config,
                 dates=dates,
@@ -443,24 +704,24 @@ class TestBatchWrite:
 
     def test_batch_realtime_success(self, base_config):
         dates = [date(2026, 2, 10), date(2026, 2, 11), date(2026, 2, 12)]
-        success, fail = self._run_batch(dates, "日勤", base_config)
+        success, fail, queued = self._run_batch(dates, "日勤", base_config)
         assert success == 3 and fail == 0
 
     def test_batch_shift_rest(self, base_config):
         dates = [date(2026, 2, 10), date(2026, 2, 11)]
-        success, fail = self._run_batch(dates, "シフト休", base_config)
+        success, fail, queued = self._run_batch(dates, "シフト休", base_config)
         assert success == 2 and fail == 0
 
     def test_batch_partial_failure(self, base_config):
         """一部タイムシート未検出 → 失敗件数カウント"""
-        dates = [date(2026, 2, 10), date(2026, 2, 11)]
+        dates = [date(2026, 2, 10), date(2026, 3, 11)]
         with patch("assets.timesheet_actions._find_xlsx_or_raise",
                    side_effect=[
                        Path("/fake/file.xlsx"),
-                       TimesheetNotFoundError("/f", "山田", 2026, 2),
+                       TimesheetNotFoundError("/f", "山田", 2026, 3),
                    ]), \
-             patch("assets.timesheet_actions.write_to_excel", return_value=True):
-            success, fail = batch_write(
+             patch("assets.timesheet_actions.TimesheetSession"):
+            success, fail, queued = batch_write(
                 config=base_config,
                 dates=dates,
                 shift="日勤",
@@ -471,18 +732,123 @@ class TestBatchWrite:
             )
         assert success == 1 and fail == 1
 
+    def test_batch_groups_by_month(self, tmp_path, base_config):
+        """同じ月の日付は1回の読込・保存にまとめられる"""
+        import openpyxl
+        from assets.timesheet_actions import _find_xlsx_or_raise
+        _make_real_timesheet(tmp_path / "202602山田.xlsx", 2026, 2)
+        _make_real_timesheet(tmp_path / "202603山田.xlsx", 2026, 3)
+        base_config.timesheet_folder = str(tmp_path)
+        dates = [date(2026, 2, 10), date(2026, 2, 11), date(2026, 2, 12), date(2026, 3, 2)]
+
+        real_load = openpyxl.load_workbook
+        with patch("assets.timesheet_actions.openpyxl.load_workbook",
+                   side_effect=real_load) as mock_load, \
+             patch("assets.timesheet_actions._find_xlsx_or_raise",
+                   wraps=_find_xlsx_or_raise) as mock_find:
+            success, fail, queued = batch_write(
+                config=base_config, dates=dates, shift="シフト休", work_style="リモート",
+                custom_input_cb=lambda: None,
+                remark_cb=lambda title="", placeholder="": None,
+                status_cb=_noop_status,
+            )
+        assert success == 4 and fail == 0
+        assert mock_load.call_count == 2
+        assert mock_find.call_count == 2
+        ws = real_load(str(tmp_path / "202602山田.xlsx")).active
+        assert [ws.cell(row=r, column=5).value for r in (27, 28, 29)] == ["シフト休"] * 3
+        assert real_load(str(tmp_path / "202603山田.xlsx")).active["E19"].value == "シフト休"
+
+    def test_batch_locked_fails_all_dates_in_file(self, base_config):
+        """保存時にロック → そのタイムシートの日付がすべて失敗、日付ごとにメッセージ"""
+        messages = []
+        dates = [date(2026, 2, 10), date(2026, 2, 11)]
+        with patch("assets.timesheet_actions._find_xlsx_or_raise",
+                   return_value=Path("/fake/202602山田.xlsx")), \
+             patch("assets.timesheet_actions.TimesheetSession") as mock_session:
+            mock_session.return_value.__enter__.return_value.save.side_effect = \
+                TimesheetLockedError("/fake/202602山田.xlsx")
+            success, fail, queued = batch_write(
+                config=base_config, dates=dates, shift="シフト休", work_style="リモート",
+                custom_input_cb=lambda: None,
+                remark_cb=lambda title="", placeholder="": None,
+                status_cb=lambda msg, color: messages.append(msg),
+            )
+        assert success == 0 and fail == 2
+        assert len(messages) == 2
+        assert "2026/02/10" in messages[0] and "2026/02/11" in messages[1]
+
+    def test_batch_queued_counted_separately(self, base_config):
+        """書込待ちに登録した日付は成功に含めず queued に数える"""
+        dates = [date(2026, 2, 10), date(2026, 2, 11), date(2026, 3, 2)]
+        with patch("assets.timesheet_actions._find_xlsx_or_raise",
+                   return_value=Path("/fake/202602山田.xlsx")), \
+             patch("assets.timesheet_actions.TimesheetSession") as mock_session:
+            mock_session.return_value.__enter__.return_value.save.side_effect = [
+                TimesheetQueuedError("/fake/202602山田.xlsx", count=2), None,
+            ]
+            success, fail, queued = batch_write(
+                config=base_config, dates=dates, shift="シフト休", work_style="リモート",
+                custom_input_cb=lambda: None,
+                remark_cb=lambda title="", placeholder="": None,
+                status_cb=_noop_status,
+            )
+        assert (success, fail, queued) == (1, 0, 2)
+
+    def test_batch_row_error_fails_only_that_date(self, base_config):
+        """行未検出は該当日付のみ失敗、残りは保存される"""
+        with patch("assets.timesheet_actions._find_xlsx_or_raise",
+                   return_value=Path("/fake/202602山田.xlsx")), \
+             patch("assets.timesheet_actions.TimesheetSession") as mock_session:
+            session = mock_session.return_value.__enter__.return_value
+            session.write_row.side_effect = [25, TimesheetWriteError("行なし"), 27]
+            success, fail, queued = batch_write(
+                config=base_config,
+                dates=[date(2026, 2, 8), date(2026, 2, 9), date(2026, 2, 10)],
+                shift="日勤", work_style="リモート",
+                custom_input_cb=lambda: None,
+                remark_cb=lambda title="", placeholder="": None,
+                status_cb=_noop_status,
+            )
+        assert success == 2 and fail == 1
+        session.save.assert_called_once()
+
     def test_batch_unknown_shift_raises(self, base_config):
         with pytest.raises(UnknownShiftTypeError):
             self._run_batch([date(2026, 2, 10)], "存在しないシフト", base_config)
 
     def test_batch_vacation_input_cancel(self, base_config):
-        """振休ダイアログキャンセル → (0, 0) を返す"""
-        success, fail = self._run_batch(
+        """振休ダイアログキャンセル → (0, 0, 0) を返す"""
+        success, fail, queued = self._run_batch(
             [date(2026, 2, 10)], "振休", base_config,
             remark_cb=lambda title="", placeholder="":None,
         )
         assert success == 0 and fail == 0
 
+    def test_batch_cancel_between_timesheets(self, base_config):
+        """取消は次のタイムシートから有効。書込済みの月はそのまま、取消した日付は件数に含めない"""
+        cancelled = []
+        messages = []
+        dates = [date(2026, 2, 10), date(2026, 3, 2), date(2026, 3, 3)]
+
+        def save():
+            cancelled.append(True)  # 2月の保存中に取消ボタンが押された
+
+        with patch("assets.timesheet_actions._find_xlsx_or_raise",
+                   return_value=Path("/fake/file.xlsx")), \
+             patch("assets.timesheet_actions.TimesheetSession") as mock_session:
+            mock_session.return_value.__enter__.return_value.save.side_effect = save
+            success, fail, queued = batch_write(
+                config=base_config, dates=dates, shift="シフト休", work_style="リモート",
+                custom_input_cb=lambda: None,
+                remark_cb=lambda title="", placeholder="": None,
+                status_cb=lambda msg, color: messages.append((msg, color)),
+                cancel_cb=lambda: bool(cancelled),
+            )
+        assert (success, fail, queued) == (1, 0, 0)
+        assert mock_session.call_count == 1
+        assert messages == [("2026/03/02 取消しました", "gray"), ("2026/03/03 取消しました", "gray")]
+
 
 # ────────── _find_xlsx_or_raise ──────────
 
@@ -579,6 +945,23 @@ class TestVerifyTimesheetHeader:
             result = verify_timesheet_header(base_config, date(2026, 2, 10))
         assert result is None
 
+    def test_date_styled_cells_match(self, tmp_path, base_config):
+        """年・月セルが日付書式（=DATE(...) 等で 'yyyy"年"'・'m"月"' 表示）でも年・月を取り出して照合する"""
+        import openpyxl
+        base_config.timesheet_folder = str(tmp_path)
+        base_config.timesheet_display_name = "山田"
+        for name, header in (("202602山田.xlsx", datetime(2026, 2, 1)), ("202603山田.xlsx", datetime(2026, 2, 1))):
+            wb = openpyxl.Workbook()
+            ws = wb.active
+            ws["C6"] = ws["C7"] = header
+            ws["C6"].number_format = 'yyyy"年"'
+            ws["C7"].number_format = 'm"月"'
+            wb.save(str(tmp_path / name))
+        assert verify_timesheet_header(base_config, date(2026, 2, 10)) is None
+        result = verify_timesheet_header(base_config, date(2026, 3, 10))
+        assert result is not None
+        assert "2026年" in result and "2月" in result
+
     def test_none_cell_value_warns(self, tmp_path, base_config):
         """セル値が None（数式未解決など）→ (空) と表示した警告メッセージを返す"""
         base_config.timesheet_folder = str(tmp_path)
@@ -668,3 +1051,22 @@ class TestVerifyTimesheetHeader:
         assert "(空)" in result
         assert "無効" in result
         assert "aaaa" in result
+
+    def test_real_file_read_without_openpyxl_load(self, tmp_path, base_config):
+        """実ファイルはストリーミング読取で照合し、openpyxl でブックを読込まない"""
+        base_config.timesheet_folder = str(tmp_path)
+        _make_real_timesheet(tmp_path / "202602山田.xlsx", 2026, 2)
+        _make_real_timesheet(tmp_path / "202603山田.xlsx", 2026, 2)
+        with patch("assets.timesheet_actions.openpyxl.load_workbook") as mock_load:
+            assert verify_timesheet_header(base_config, date(2026, 2, 10)) is None
+            assert "2026/3" in verify_timesheet_header(base_config, date(2026, 3, 10))
+        mock_load.assert_not_called()
+
+    def test_unreadable_file_falls_back_to_read_only(self, tmp_path, base_config):
+        """ストリーミング読取できないファイルは openpyxl の read_only で読む"""
+        base_config.timesheet_folder = str(tmp_path)
+        (tmp_path / "202602山田.xlsx").touch()
+        wb = _make_ws_with_header(2026, 2)
+        with patch("assets.timesheet_actions.openpyxl.load_workbook", return_value=wb) as mock_load:
+            assert verify_timesheet_header(base_config, date(2026, 2, 10)) is None
+        assert mock_load.call_args.kwargs == {"read_only": True, "data_only": True}
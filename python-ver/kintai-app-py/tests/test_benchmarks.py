@@ -0,0 +1,98 @@
+"""benchmarks/（ベンチマークの集計・ベースライン比較・合成タイムシート）のユニットテスト"""
+import json
+from datetime import date
+
+import pytest
+
+import openpyxl
+
+from assets.timesheet_actions import verify_timesheet_header
+from assets.timesheet_helpers import get_row_for_date
+from benchmarks._common import compare, finish, percentile, save_baseline, summarize
+from benchmarks.timesheet_io import make_folder, make_timesheet
+from benchmarks.webhook_load import StubWebhookServer, run_load
+
+
+def _results(**p50):
+    return {name: summarize([ms]) for name, ms in p50.items()}
+
+
+class TestSummary:
+    def test_percentile_interpolates(self):
+        assert percentile([1, 2, 3, 4], 50) == 2.5
+        assert percentile([5], 99) == 5
+        assert percentile(list(range(101)), 90) == 90
+
+    def test_percentile_empty(self):
+        with pytest.raises(ValueError):
+            percentile([], 50)
+
+    def test_summarize(self):
+        s = summarize([3.0, 1.0, 2.0])
+        assert (s["n"], s["min"], s["p50"], s["max"]) == (3, 1.0, 2.0, 3.0)
+
+
+class TestCompare:
+    def test_regression_over_tolerance_and_floor(self):
+        baseline = {"tolerance": 0.5, "floor_ms": 5.0, "metrics": {"a": 10.0, "b": 10.0, "c": 1.0}}
+        # a: 1.6 倍で悪化、b: 1.4 倍は許容、c: 3 倍だが差が 2ms なので誤差扱い
+        regressions = compare(_results(a=16.0, b=14.0, c=3.0), baseline)
+        assert len(regressions) == 1 and regressions[0].startswith("a:")
+
+    def test_tolerance_override_and_unknown_metric(self):
+        baseline = {"metrics": {"a": 10.0, "gone": 1.0}}
+        assert compare(_results(a=16.0, new=999.0), baseline, tolerance=1.0) == []
+
+    def test_finish_fails_on_regression(self, tmp_path, capsys):
+        path = tmp_path / "baseline.json"
+        save_baseline(path, _results(a=10.0))
+        assert finish(_results(a=100.0), path, update=False) == 1
+        assert "a: 100.0ms" in capsys.readouterr().err
+        assert finish(_results(a=10.5), path, update=False) == 0
+
+    def test_update_keeps_tolerance(self, tmp_path):
+        path = tmp_path / "baseline.json"
+        path.write_text(json.dumps({"tolerance": 0.2, "floor_ms": 1.0, "metrics": {}}), encoding="utf-8")
+        assert finish(_results(a=12.3456), path, update=True) == 0
+        data = json.loads(path.read_text(encoding="utf-8"))
+        assert data == {"tolerance": 0.2, "floor_ms": 1.0, "metrics": {"a": 12.346}}
+
+
+class TestSyntheticTimesheet:
+    def test_matches_timesheet_layout(self, tmp_path, base_config):
+        """合成タイムシートは既定の timesheet_layout で行の特定・ヘッダー照合ができる"""
+        template = make_timesheet(tmp_path / "template.xlsx", 2026, 2)
+        ws = openpyxl.load_workbook(template).active
+        assert get_row_for_date(ws, 1) == 18 and get_row_for_date(ws, 28) == 45
+        assert ws["F18"].number_format == "h:mm" and ws["C18"].border.left.style == "thin"
+
+        folder = make_folder(tmp_path / "folder", 50, template)
+        assert len(list(folder.iterdir())) == 50
+        base_config.timesheet_folder = str(folder)
+        assert verify_timesheet_header(base_config, date(2026, 2, 3)) is None
+
+
+class TestWebhookLoad:
+    @pytest.fixture(autouse=True)
+    def no_proxy(self, monkeypatch):
+        monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+        monkeypatch.setenv("no_proxy", "127.0.0.1,localhost")
+
+    @pytest.mark.parametrize("engine", ["requests", "urllib"])
+    def test_all_posts_reach_stub(self, engine):
+        if engine == "requests":
+            pytest.importorskip("requests")
+        with StubWebhookServer() as server:
+            report = run_load(server.url, 6, 3, engine)
+        assert report["failures"] == {} and len(report["latencies_ms"]) == 6
+        assert server.statuses == {202: 6}
+        assert json.loads(server.payloads[0]["column"])["items"][0]["text"] == "山田 太郎が出勤しました"
+        if engine == "requests":
+            assert server.connections <= 3      # Session の接続を使い回す
+
+    def test_injected_errors_go_to_outbox(self, tmp_path):
+        with StubWebhookServer(error_rate=0.5, rate_429=0.5, retry_after=1, seed=1) as server:
+            report = run_load(server.url, 4, 2, "urllib", outbox_dir=tmp_path)
+        assert sum(report["failures"].values()) == 4
+        assert set(report["failures"]) <= {"HTTP 429", "HTTP 500"}
+        assert report["outbox_pending"] == 4 and report["dead_letters"] == 0
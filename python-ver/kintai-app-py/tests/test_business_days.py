@@ -0,0 +1,57 @@
+"""assets/business_days.py（営業日の計算）のユニットテスト"""
+from datetime import date, timedelta
+
+import pytest
+
+from assets.business_days import (
+    count_working_days, is_working_day, next_working_day, nth_working_day,
+    prev_working_day, working_days, working_days_in_month,
+)
+
+
+def _brute_force(start: date, end: date):
+    days = (start + timedelta(days=i) for i in range((end - start).days + 1))
+    return [d for d in days if is_working_day(d)]
+
+
+class TestNextPrev:
+    def test_skips_weekend_and_golden_week(self):
+        assert next_working_day(date(2026, 5, 1)) == date(2026, 5, 7)
+        assert prev_working_day(date(2026, 5, 7)) == date(2026, 5, 1)
+
+    def test_excludes_the_day_itself(self):
+        assert next_working_day(date(2026, 3, 2)) == date(2026, 3, 3)
+        assert prev_working_day(date(2026, 3, 3)) == date(2026, 3, 2)
+
+    def test_crosses_year(self):
+        assert next_working_day(date(2026, 12, 31)) == date(2027, 1, 4)
+        assert prev_working_day(date(2027, 1, 4)) == date(2026, 12, 31)
+
+    def test_sandwiched_holiday(self):
+        """2026/9/19〜23 は土日・敬老の日・国民の休日・秋分の日"""
+        assert next_working_day(date(2026, 9, 18)) == date(2026, 9, 24)
+
+
+class TestRanges:
+    def test_month(self):
+        days = working_days_in_month(2026, 3)
+        assert days == _brute_force(date(2026, 3, 1), date(2026, 3, 31))
+        assert date(2026, 3, 20) not in days          # 春分の日
+        assert len(days) == 21
+
+    def test_range_across_years_matches_day_by_day(self):
+        start, end = date(2025, 11, 15), date(2027, 2, 10)
+        expected = _brute_force(start, end)
+        assert working_days(start, end) == expected
+        assert count_working_days(start, end) == len(expected)
+        assert count_working_days(end, start) == 0
+        assert working_days(end, start) == []
+
+    def test_nth(self):
+        assert nth_working_day(2026, 5, 1) == date(2026, 5, 1)
+        assert nth_working_day(2026, 5, 2) == date(2026, 5, 7)
+        assert nth_working_day(2026, 3, -1) == date(2026, 3, 31)
+        with pytest.raises(ValueError):
+            nth_working_day(2026, 3, 22)
+        with pytest.raises(ValueError):
+            nth_working_day(2026, 3, 0)
@@ -0,0 +1,201 @@
+"""assets/cli.py（ヘッドレス CLI）のユニットテスト"""
+import json
+import subprocess
+import sys
+from datetime import date, datetime
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import openpyxl
+
+from assets import cli
+from assets.timesheet_actions import TimesheetNotFoundError, TimesheetQueuedError
+
+_APP_DIR = Path(__file__).parent.parent
+
+
+def _make_book(path: Path) -> Path:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["C6"] = 2026
+    ws["C7"] = 2
+    for i in range(28):
+        ws.cell(row=18 + i, column=3).value = i + 1
+    wb.save(str(path))
+    return path
+
+
+@pytest.fixture
+def settings(tmp_path):
+    folder = tmp_path / "timesheet"
+    folder.mkdir()
+    _make_book(folder / "202602山田.xlsx")
+    path = tmp_path / "settings.json"
+    path.write_text(json.dumps({
+        "timesheet_folder": str(folder),
+        "timesheet_display_name": "山田",
+        "shift_display_name": "山田",
+        "output_folder": str(tmp_path / "out"),
+    }), encoding="utf-8")
+    return path
+
+
+def _main(settings, *argv):
+    with patch("assets.cli.os.chdir"), patch("assets.cli.setup_logging"):
+        return cli.main(["--settings", str(settings), *argv])
+
+
+def test_cli_does_not_import_pyqt():
+    """python -m kintai cli は PyQt5 を import しない"""
+    code = (
+        "import sys, runpy\n"
+        "sys.argv = ['kintai', 'cli', 'clock-in', '--help']\n"
+        "try:\n"
+        "    runpy.run_module('kintai', run_name='__main__')\n"
+        "except SystemExit:\n"
+        "    pass\n"
+        "print('PyQt5' in sys.modules)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=_APP_DIR, capture_output=True,
+                         text=True, timeout=60)
+    assert out.stdout.strip().endswith("False")
+
+
+class TestClockIn:
+    def test_assumed_writes_timesheet(self, settings, tmp_path, capsys):
+        rc = _main(settings, "clock-in", "--shift", "日勤", "--date", "2026-02-03", "--assumed", "--no-post")
+        assert rc == cli.EXIT_OK
+        assert "出勤打刻が完了しました" in capsys.readouterr().out
+        ws = openpyxl.load_workbook(tmp_path / "timesheet" / "202602山田.xlsx").active
+        assert ws["E20"].value == "日勤"
+
+    def test_late_requires_reason(self, settings, tmp_path, capsys):
+        late = datetime(2026, 2, 3, 11, 0)
+        with patch("assets.timesheet_actions.get_now", return_value=late):
+            rc = _main(settings, "clock-in", "--shift", "日勤", "--date", "2026-02-03", "--no-post")
+        assert rc == cli.EXIT_USAGE
+        assert "--late-reason" in capsys.readouterr().err
+        ws = openpyxl.load_workbook(tmp_path / "timesheet" / "202602山田.xlsx").active
+        assert ws["E20"].value is None
+
+    def test_late_reason_from_flag(self, settings, tmp_path):
+        late = datetime(2026, 2, 3, 11, 0)
+        with patch("assets.timesheet_actions.get_now", return_value=late):
+            rc = _main(settings, "clock-in", "--shift", "日勤", "--date", "2026-02-03",
+                       "--no-post", "--late-reason", "電車遅延")
+        assert rc == cli.EXIT_OK
+        ws = openpyxl.load_workbook(tmp_path / "timesheet" / "202602山田.xlsx").active
+        assert ws["E20"].value == "遅刻" and ws["L20"].value == "電車遅延"
+
+    def test_header_mismatch_needs_force(self, settings, tmp_path):
+        path = tmp_path / "timesheet" / "202602山田.xlsx"
+        wb = openpyxl.load_workbook(path)
+        wb.active["C7"] = 3
+        wb.save(path)
+        args = ("clock-in", "--shift", "日勤", "--date", "2026-02-03", "--assumed", "--no-post")
+        assert _main(settings, *args) == cli.EXIT_FAILED
+        assert _main(settings, *args, "--force") == cli.EXIT_OK
+
+    def test_queued_is_success(self, settings, capsys):
+        err = TimesheetQueuedError("/x/202602山田.xlsx")
+        with patch("assets.timesheet_actions.clock_in", side_effect=err):
+            rc = _main(settings, "clock-in", "--shift", "日勤", "--date", "2026-02-03", "--force")
+        assert rc == cli.EXIT_OK
+        assert "書込待ち" in capsys.readouterr().out
+
+    def test_not_found(self, settings, capsys):
+        err = TimesheetNotFoundError("/x", "山田", 2026, 2)
+        with patch("assets.timesheet_actions.clock_in", side_effect=err):
+            rc = _main(settings, "clock-in", "--shift", "日勤", "--date", "2026-02-03", "--force")
+        assert rc == cli.EXIT_FAILED
+        assert "202602山田.xlsx" in capsys.readouterr().err
+
+
+class TestClockOut:
+    def test_clock_out_info_from_flags(self, settings):
+        with patch("assets.timesheet_actions.clock_out", return_value=(True, "")) as mock_out:
+            rc = _main(settings, "clock-out", "--shift", "日勤", "--force", "--cross-day",
+                       "--next-workday", "2026-02-04", "--next-shift", "日勤", "--comment", "お先です")
+        assert rc == cli.EXIT_OK
+        kwargs = mock_out.call_args.kwargs
+        assert kwargs["is_cross_day"] is True
+        assert kwargs["clock_out_info"]["next_workday"] == date(2026, 2, 4)
+        assert kwargs["clock_out_info"]["comment"] == "お先です"
+
+
+class TestShutdown:
+    def test_dispatcher_stopped_before_exit(self, settings, capsys):
+        """終了前に Teams 投稿の送信待ちを送り切り、再送待ちに回した件数を表示する"""
+        with patch("assets.teams_dispatcher.shutdown_dispatcher", return_value=2) as mock_shutdown:
+            rc = _main(settings, "flush-queue")
+        assert rc == cli.EXIT_OK
+        mock_shutdown.assert_called_once_with()
+        assert "Teams 投稿 2 件を再送待ちに登録しました" in capsys.readouterr().err
+
+    def test_dispatcher_stopped_on_error(self, settings):
+        with patch("assets.teams_dispatcher.shutdown_dispatcher", return_value=0) as mock_shutdown, \
+             patch("assets.cli._run", side_effect=RuntimeError("壊れた")):
+            assert _main(settings, "flush-queue") == cli.EXIT_FAILED
+        mock_shutdown.assert_called_once_with()
+
+
+class TestBatch:
+    def test_custom_input_from_flags(self, settings, tmp_path):
+        rc = _main(settings, "batch", "--shift", "0.5日有給", "--date", "2026-02-03", "--date", "2026-02-04",
+                   "--start", "09:30", "--end", "18:15", "--remark", "研修")
+        assert rc == cli.EXIT_OK
+        ws = openpyxl.load_workbook(tmp_path / "timesheet" / "202602山田.xlsx").active
+        assert ws["F20"].value == pytest.approx(9.5 / 24)
+        assert ws["G21"].value == pytest.approx(18.25 / 24)
+        assert ws["L21"].value == "研修"
+
+    def test_custom_input_missing_times(self, settings, capsys):
+        rc = _main(settings, "batch", "--shift", "0.5日有給", "--date", "2026-02-03")
+        assert rc == cli.EXIT_USAGE
+        assert "--start" in capsys.readouterr().err
+
+    def test_workdays_of_month(self, settings):
+        """--workdays は土日・祝日を除いた月の営業日に展開し、--date と重複しない"""
+        with patch("assets.timesheet_actions.batch_write", return_value=(18, 0, 0)) as mock_batch:
+            rc = _main(settings, "batch", "--shift", "シフト休", "--workdays", "202602", "--date", "2026-02-02")
+        assert rc == cli.EXIT_OK
+        dates = mock_batch.call_args.kwargs["dates"]
+        assert len(dates) == 18 and dates == sorted(set(dates))
+        assert date(2026, 2, 11) not in dates and date(2026, 2, 23) not in dates
+
+    def test_requires_dates(self, settings):
+        with pytest.raises(SystemExit) as e:
+            _main(settings, "batch", "--shift", "シフト休")
+        assert e.value.code == cli.EXIT_USAGE
+
+
+class TestQueueAndJournal:
+    def test_flush_queue(self, settings, tmp_path, punch_queue_file, capsys):
+        path = tmp_path / "timesheet" / "202602山田.xlsx"
+        punch_queue_file.enqueue(path, {"date": date(2026, 2, 3), "end_time": 0.75})
+        assert _main(settings, "flush-queue") == cli.EXIT_OK
+        assert "残り 0 件" in capsys.readouterr().out
+        assert openpyxl.load_workbook(path).active["G20"].value == 0.75
+
+    def test_flush_queue_missing_file_keeps_entry(self, settings, tmp_path, punch_queue_file, capsys):
+        """ファイルが見つからない打刻は書込待ちに残して失敗で終わる"""
+        punch_queue_file.enqueue(tmp_path / "gone" / "202602山田.xlsx", {"date": date(2026, 2, 3)})
+        assert _main(settings, "flush-queue") == cli.EXIT_FAILED
+        assert "残り 1 件" in capsys.readouterr().out
+
+    def test_flush_outbox(self, settings, outbox, capsys):
+        """再送待ちの送信先キーから送信時の設定の URL を引いて送る"""
+        data = json.loads(settings.read_text(encoding="utf-8"))
+        data["webhook_url"] = "https://example.com/hook"
+        settings.write_text(json.dumps(data), encoding="utf-8")
+        outbox.enqueue("webhook_url", "clock_in", {"userId": "u"}, ConnectionError("x"))
+        with patch("assets.teams_webhook._post") as mock_post:
+            assert _main(settings, "flush-outbox") == cli.EXIT_OK
+        assert mock_post.call_args.args[0].webhook_url == "https://example.com/hook"
+        assert "残り 0 件" in capsys.readouterr().out
+
+    def test_reconcile(self, settings, capsys):
+        assert _main(settings, "reconcile") == cli.EXIT_OK
+        assert "ジャーナルがありません" in capsys.readouterr().out
@@ -28,6 +28,7 @@ class TestConfigDefaults:
         assert c.timesheet_folder == ""
         assert c.proxy_sh == ""
         assert c.test_date == ""
+        assert c.ui_font == ""
 
 
 class TestConfigLoad:
@@ -115,9 +116,9 @@ class TestConfigToDict:
         d = Config().to_dict()
         expected_keys = {
             "ad_name", "display_name", "teams_user_id", "shift_display_name",
-            "timesheet_display_name", "webhook_url", "timesheet_folder",
-            "output_folder", "theme", "shift_types", "managers", "proxy_sh", "test_date",
-            "timesheet_layout",
+            "timesheet_display_name", "webhook_url", "webhook_targets", "timesheet_folder",
+            "output_folder", "theme", "shift_types", "managers", "proxy_sh", "test_date", "ui_font",
+            "timesheet_layout", "timesheet_io", "webhook_io",
         }
         assert expected_keys == set(d.keys())
 
@@ -171,3 +172,39 @@ class TestTimesheetLayout:
         c2 = Config.load(str(p))
         assert c2.timesheet_layout["date_col"] == "B"
         assert c2.timesheet_layout["remark_col"] == "N"
+
+
+class TestTimesheetIo:
+    def test_default_io(self):
+        assert Config().timesheet_io["dir_index_ttl_sec"] == 0
+
+    def test_partial_io_fills_defaults(self, tmp_path):
+        """未知のキーは保持し、不足キーはデフォルト値で補完される"""
+        data = {"timesheet_io": {"extra": 1}}
+        p = tmp_path / "settings.json"
+        p.write_text(json.dumps(data), encoding="utf-8")
+        c = Config.load(str(p))
+        assert c.timesheet_io["extra"] == 1
+        assert c.timesheet_io["dir_index_ttl_sec"] == 0
+
+
+class TestWebhookIo:
+    def test_default_timeouts(self):
+        io = Config().webhook_io
+        assert io["connect_timeout_sec"] == 5.0
+        assert io["read_timeout_sec"] == 10.0
+
+    def test_partial_webhook_io_fills_defaults(self, tmp_path):
+        data = {"webhook_io": {"read_timeout_sec": 30}}
+        p = tmp_path / "settings.json"
+        p.write_text(json.dumps(data), encoding="utf-8")
+        c = Config.load(str(p))
+        assert c.webhook_io["read_timeout_sec"] == 30
+        assert c.webhook_io["connect_timeout_sec"] == 5.0
+
+    def test_webhook_targets_roundtrip(self, tmp_path):
+        targets = [{"name": "audit", "url": "https://example.com/audit", "proxy_sh": ""}]
+        assert Config().webhook_targets == []
+        p = tmp_path / "settings.json"
+        Config({"webhook_targets": targets}).save(str(p))
+        assert Config.load(str(p)).webhook_targets == targets
@@ -0,0 +1,64 @@
+"""assets/debug_capture.py（Teams 投稿ペイロードのデバッグ保存）のユニットテスト"""
+import json
+from unittest.mock import patch
+
+from assets import debug_capture
+from assets.debug_capture import DebugCapture
+
+
+def _payload(n):
+    return {"userId": f"user{n}@example.com", "column": "x" * 200}
+
+
+class TestDebugCapture:
+    def test_ring_keeps_latest(self, tmp_path):
+        cap = DebugCapture(tmp_path / "debug", keep=3)
+        with patch.object(cap, "start"):      # 書出しスレッドを動かさない
+            for n in range(5):
+                cap.capture("clock_in", _payload(n))
+        assert [e["payload"]["userId"] for e in cap.recent()] == [
+            "user2@example.com", "user3@example.com", "user4@example.com"]
+        assert not (tmp_path / "debug").exists()   # capture() 自体はディスクに書かない
+
+    def test_writer_flushes_and_rotates_by_size(self, tmp_path):
+        d = tmp_path / "debug"
+        cap = DebugCapture(d, keep=50, max_bytes=2000)
+        for n in range(20):
+            cap.capture("clock_out", _payload(n))
+        cap.stop(5)
+        files = sorted(d.glob("*.json"))
+        assert 1 <= len(files) < 20
+        assert sum(p.stat().st_size for p in files) <= 2000
+        newest = json.loads(files[-1].read_text(encoding="utf-8"))
+        assert newest["message_type"] == "clock_out"
+        assert newest["payload"]["userId"] == "user19@example.com"
+        assert files[-1].name.endswith("-clock_out.json")
+
+    def test_write_error_is_logged_not_raised(self, tmp_path):
+        blocker = tmp_path / "debug"
+        blocker.write_text("not a directory", encoding="utf-8")
+        cap = DebugCapture(blocker / "sub")
+        with patch.object(cap, "start"):
+            cap.capture("clock_in", _payload(0))
+        assert cap.flush() == 0
+
+
+class TestCaptureSetting:
+    def test_disabled_by_default(self, base_config, capture_dir):
+        assert debug_capture.get_capture(base_config) is None
+        debug_capture.capture(base_config, "clock_in", _payload(0))
+        assert debug_capture.recent_payloads() == []
+        assert not capture_dir.exists()
+
+    def test_send_teams_post_captures_when_enabled(self, base_config, capture_dir):
+        from assets.teams_webhook import send_teams_post
+        base_config.webhook_url = "https://example.com/webhook"
+        base_config.webhook_io = {**base_config.webhook_io, "debug_capture": True, "debug_capture_keep": 5}
+        with patch("assets.teams_webhook._post"):
+            send_teams_post(base_config, "clock_in", {"shift": "日勤", "work_style": "出社"})
+        [entry] = debug_capture.recent_payloads()
+        assert entry["message_type"] == "clock_in"
+        assert entry["payload"]["userId"] == "yamada@example.com"
+        debug_capture.shutdown_capture(5)
+        assert len(list(capture_dir.glob("*-clock_in.json"))) == 1
+        assert debug_capture.get_capture(base_config)._ring.maxlen == 5
@@ -17,6 +17,12 @@ from assets.timesheet_helpers import (
     get_now,
     get_today,
     col_letter_to_num,
+    build_day_row_map,
+    clear_row_index_cache,
+    clear_dir_index_cache,
+    TempFileError,
+    TimesheetDirIndex,
+    atomic_write,
 )
 
 
@@ -314,6 +320,133 @@ class TestFindTimesheet:
         assert result is not None
 
 
+class TestTimesheetDirIndex:
+    """フォルダ一覧インデックス"""
+
+    def test_repeated_lookup_scans_once(self, tmp_path):
+        (tmp_path / "202602山田.xlsx").touch()
+        (tmp_path / "202603山田.xlsx").touch()
+        index = TimesheetDirIndex(str(tmp_path))
+        with patch("assets.timesheet_helpers.os.scandir", wraps=os.scandir) as mock_scan:
+            assert index.lookup("山田", 2026, 2).name == "202602山田.xlsx"
+            assert index.lookup("山田", 2026, 3).name == "202603山田.xlsx"
+            assert index.lookup("佐藤", 2026, 2) is None
+        assert mock_scan.call_count == 1
+
+    def test_refresh_on_dir_mtime_change(self, tmp_path):
+        index = TimesheetDirIndex(str(tmp_path))
+        assert index.lookup("山田", 2026, 2) is None
+        (tmp_path / "202602山田.xlsx").touch()
+        st = os.stat(tmp_path)
+        os.utime(tmp_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        assert index.lookup("山田", 2026, 2) is not None
+
+    def test_ttl_forces_rescan(self, tmp_path):
+        """mtime が変わらなくても TTL 経過で取り直す"""
+        (tmp_path / "202602山田.xlsx").touch()
+        index = TimesheetDirIndex(str(tmp_path), ttl_sec=60)
+        with patch("assets.timesheet_helpers.os.scandir", wraps=os.scandir) as mock_scan, \
+             patch("assets.timesheet_helpers.time.monotonic", side_effect=[1000.0, 1030.0, 1070.0, 1070.0]):
+            index.lookup("山田", 2026, 2)
+            index.lookup("山田", 2026, 2)
+            index.lookup("山田", 2026, 2)
+        assert mock_scan.call_count == 2
+
+    def test_excel_owner_file_ignored(self, tmp_path):
+        """~$ で始まる Excel の所有者ファイルは対象外"""
+        (tmp_path / "~$202602山田.xlsx").touch()
+        assert TimesheetDirIndex(str(tmp_path)).lookup("山田", 2026, 2) is None
+
+    def test_uppercase_extension(self, tmp_path):
+        (tmp_path / "202602山田.XLSX").touch()
+        assert TimesheetDirIndex(str(tmp_path)).lookup("山田", 2026, 2) is not None
+
+    def test_yyyymm_anywhere_in_name(self, tmp_path):
+        """YYYYMM はファイル名のどこに含まれていてもよい"""
+        (tmp_path / "勤務表_山田_20260215.xlsx").touch()
+        index = TimesheetDirIndex(str(tmp_path))
+        assert index.lookup("山田", 2026, 2) is not None
+        assert index.lookup("山田", 2026, 1) is None
+
+    def test_atomic_write_does_not_force_rescan(self, tmp_path):
+        """atomic_write での保存（一時ファイル・.bak を含む）ではフォルダを取り直さず、新しいファイルは一覧に入る"""
+        (tmp_path / "202602山田.xlsx").write_bytes(b"old")
+        clear_dir_index_cache()
+        folder = str(tmp_path)
+        assert find_timesheet(folder, "山田", 2026, 2) is not None
+        with patch("assets.timesheet_helpers.os.scandir", wraps=os.scandir) as mock_scan:
+            atomic_write(tmp_path / "202602山田.xlsx", TestAtomicWrite._write(None, b"new"), keep_backup=True)
+            atomic_write(tmp_path / "202603山田.xlsx", TestAtomicWrite._write(None, b"new"))
+            assert find_timesheet(folder, "山田", 2026, 2).name == "202602山田.xlsx"
+            assert find_timesheet(folder, "山田", 2026, 3).name == "202603山田.xlsx"
+        assert mock_scan.call_count == 0
+        clear_dir_index_cache()
+
+    def test_dot_prefixed_files_ignored(self, tmp_path):
+        """atomic_write の一時ファイル（. で始まる）は対象外"""
+        (tmp_path / ".202602山田.xlsx").touch()
+        assert TimesheetDirIndex(str(tmp_path)).lookup("山田", 2026, 2) is None
+
+
+class TestAtomicWrite:
+    """一時ファイル + fsync + os.replace による保存"""
+
+    def _write(self, data: bytes):
+        def write(tmp):
+            with open(tmp, "wb") as f:
+                f.write(data)
+        return write
+
+    def test_replaces_content(self, tmp_path):
+        target = tmp_path / "202602山田.xlsx"
+        target.write_bytes(b"old")
+        atomic_write(target, self._write(b"new"))
+        assert target.read_bytes() == b"new"
+        assert [p.name for p in tmp_path.iterdir()] == ["202602山田.xlsx"]
+
+    def test_failure_keeps_original(self, tmp_path):
+        """書込途中の例外では元のファイルが残り、一時ファイルも消える"""
+        target = tmp_path / "202602山田.xlsx"
+        target.write_bytes(b"old")
+
+        def broken(tmp):
+            with open(tmp, "wb") as f:
+                f.write(b"half")
+            raise OSError("disk full")
+
+        with pytest.raises(OSError):
+            atomic_write(target, broken)
+        assert target.read_bytes() == b"old"
+        assert [p.name for p in tmp_path.iterdir()] == ["202602山田.xlsx"]
+
+    def test_keep_backup(self, tmp_path):
+        target = tmp_path / "202602山田.xlsx"
+        target.write_bytes(b"old")
+        atomic_write(target, self._write(b"new"), keep_backup=True)
+        assert (tmp_path / "202602山田.xlsx.bak").read_bytes() == b"old"
+        assert find_timesheet(str(tmp_path), "山田", 2026, 2).name == "202602山田.xlsx"
+
+    def test_tempfile_permission_error_is_not_lock(self, tmp_path):
+        """一時ファイルを作れない PermissionError は TempFileError（ロックとは区別する）"""
+        target = tmp_path / "202602山田.xlsx"
+        target.write_bytes(b"old")
+        with patch("assets.timesheet_helpers.tempfile.mkstemp", side_effect=PermissionError(13, "denied")):
+            with pytest.raises(TempFileError) as exc:
+                atomic_write(target, self._write(b"new"))
+        assert not isinstance(exc.value, PermissionError)
+        assert target.read_bytes() == b"old"
+
+    def test_replace_permission_error_cleans_up(self, tmp_path):
+        """置換できない（ロック中）場合は PermissionError、一時ファイルは残らない"""
+        target = tmp_path / "202602山田.xlsx"
+        target.write_bytes(b"old")
+        with patch("assets.timesheet_helpers.os.replace", side_effect=PermissionError):
+            with pytest.raises(PermissionError):
+                atomic_write(target, self._write(b"new"))
+        assert target.read_bytes() == b"old"
+        assert len(list(tmp_path.iterdir())) == 1
+
+
 # ─────────────────────────── get_row_for_date ───────────────────────────
 
 def _make_ws(day_map: dict):
@@ -379,6 +512,74 @@ class TestGetRowForDate:
         assert get_row_for_date(ws, 2, date_col=2) == 19
 
 
+class TestDayRowIndex:
+    """日→行マップの1回走査とキャッシュ"""
+
+    def setup_method(self):
+        clear_row_index_cache()
+
+    def teardown_method(self):
+        clear_row_index_cache()
+
+    def _ws(self):
+        return _make_ws({18 + i: i + 1 for i in range(28)})
+
+    def test_single_pass(self):
+        """18〜48行を1回だけ読む"""
+        ws = self._ws()
+        day_rows = build_day_row_map(ws)
+        assert ws.cell.call_count == 31
+        assert day_rows[1] == 18 and day_rows[28] == 45 and day_rows[31] == 48
+
+    def test_no_day_28_excludes_29_to_31(self):
+        day_rows = build_day_row_map(_make_ws({18: 1, 19: 2}))
+        assert 29 not in day_rows and day_rows[2] == 19
+
+    def test_cached_by_path(self, tmp_path):
+        """同じファイルなら2回目以降は走査しない"""
+        f = tmp_path / "202602山田.xlsx"
+        f.write_bytes(b"x")
+        ws = self._ws()
+        assert get_row_for_date(ws, 10, path=f) == 27
+        assert get_row_for_date(ws, 29, path=f) == 46
+        assert ws.cell.call_count == 31
+
+    def test_invalidated_on_file_change(self, tmp_path):
+        """サイズ・mtime が変わると再走査する"""
+        f = tmp_path / "202602山田.xlsx"
+        f.write_bytes(b"x")
+        ws = self._ws()
+        get_row_for_date(ws, 1, path=f)
+        f.write_bytes(b"xyz")
+        get_row_for_date(ws, 1, path=f)
+        assert ws.cell.call_count == 62
+
+    def test_date_col_in_key(self, tmp_path):
+        """date_col が変わると別キャッシュ"""
+        f = tmp_path / "202602山田.xlsx"
+        f.write_bytes(b"x")
+        ws = self._ws()
+        get_row_for_date(ws, 1, path=f)
+        get_row_for_date(ws, 1, date_col=2, path=f)
+        assert ws.cell.call_count == 62
+        assert {c.kwargs["column"] for c in ws.cell.call_args_list} == {2, 3}
+
+    def test_clear_cache(self, tmp_path):
+        f = tmp_path / "202602山田.xlsx"
+        f.write_bytes(b"x")
+        ws = self._ws()
+        get_row_for_date(ws, 1, path=f)
+        clear_row_index_cache()
+        get_row_for_date(ws, 1, path=f)
+        assert ws.cell.call_count == 62
+
+    def test_missing_path_not_cached(self):
+        ws = self._ws()
+        get_row_for_date(ws, 1, path="/nonexistent/a.xlsx")
+        get_row_for_date(ws, 1, path="/nonexistent/a.xlsx")
+        assert ws.cell.call_count == 62
+
+
 # ─────────────────────────── col_letter_to_num ───────────────────────────
 
 class TestColLetterToNum:
@@ -0,0 +1,68 @@
+"""assets/jp_holidays.py（年ごとの祝日表）のユニットテスト"""
+from datetime import date
+
+import pytest
+
+from assets import jp_holidays
+from assets.jp_holidays import count_holidays, holiday_name, holidays_in_month, is_holiday
+from assets.timesheet_helpers import get_holidays
+
+
+class TestRules:
+    @pytest.mark.parametrize("d", [date(2009, 9, 22), date(2015, 9, 22), date(2026, 9, 22),
+                                   date(2019, 4, 30), date(2019, 5, 2), date(2006, 5, 4)])
+    def test_sandwiched_day_is_holiday(self, d):
+        """前日と翌日が祝日の日は国民の休日"""
+        assert holiday_name(d) == "国民の休日"
+
+    def test_olympic_moves(self):
+        """2020・2021 年は海の日・スポーツの日・山の日が移動した"""
+        assert holiday_name(date(2020, 7, 23)) == "海の日"
+        assert holiday_name(date(2020, 7, 24)) == "スポーツの日"
+        assert holiday_name(date(2020, 8, 10)) == "山の日"
+        assert not is_holiday(date(2020, 7, 20))
+        assert not is_holiday(date(2020, 8, 11))
+        assert not is_holiday(date(2020, 10, 12))
+        assert holiday_name(date(2021, 8, 8)) == "山の日"
+        assert holiday_name(date(2021, 8, 9)) == "振替休日"
+
+    def test_emperors_birthday_history(self):
+        assert is_holiday(date(2018, 12, 23))
+        assert not is_holiday(date(2019, 12, 23))
+        assert not is_holiday(date(2019, 2, 23))
+        assert is_holiday(date(2020, 2, 23))
+
+    def test_substitute_skips_following_holidays(self):
+        """5/3 が日曜日なら振替休日は 5/6（2007 年以降）"""
+        assert holiday_name(date(2026, 5, 6)) == "振替休日"
+        assert holiday_name(date(2026, 5, 4)) == "みどりの日"
+
+    def test_year_totals(self):
+        """内閣府の公表どおりの年間日数"""
+        assert count_holidays(date(2019, 1, 1), date(2019, 12, 31)) == 22
+        assert count_holidays(date(2020, 1, 1), date(2020, 12, 31)) == 18
+        assert count_holidays(date(2021, 1, 1), date(2021, 12, 31)) == 17
+        assert count_holidays(date(2026, 1, 1), date(2026, 12, 31)) == 18
+
+    def test_before_holiday_law(self):
+        assert not is_holiday(date(1948, 1, 1))
+        assert holidays_in_month(1948, 1) == frozenset()
+
+
+class TestLookups:
+    def test_count_matches_day_by_day(self):
+        """年をまたぐ範囲でも 1 日ずつ数えた結果と一致する"""
+        start, end = date(2025, 12, 20), date(2027, 1, 15)
+        expected = sum(is_holiday(date.fromordinal(o)) for o in range(start.toordinal(), end.toordinal() + 1))
+        assert count_holidays(start, end) == expected
+        assert count_holidays(date(2026, 5, 3), date(2026, 5, 3)) == 1
+        assert count_holidays(end, start) == 0
+
+    def test_month_set_is_cached(self):
+        assert holidays_in_month(2026, 5) is holidays_in_month(2026, 5)
+        assert holidays_in_month(2026, 5) == {date(2026, 5, 3), date(2026, 5, 4),
+                                              date(2026, 5, 5), date(2026, 5, 6)}
+
+    def test_get_holidays_delegates(self):
+        assert get_holidays(2026, 9) is holidays_in_month(2026, 9)
+        assert 2026 in jp_holidays._tables
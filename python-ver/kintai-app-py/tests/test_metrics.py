@@ -0,0 +1,130 @@
+"""assets/metrics.py（プロセス内の計測値）と teams_webhook の計測のユニットテスト"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from assets import metrics
+from assets.metrics import Histogram, MetricsRegistry
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """teams_webhook が記録する先を空のレジストリに差し替える"""
+    reg = MetricsRegistry()
+    for name in ("observe", "increment", "timer"):
+        monkeypatch.setattr(metrics, name, getattr(reg, name))
+    return reg
+
+
+class TestHistogram:
+    def test_buckets_and_percentiles(self):
+        h = Histogram(bounds=(10, 100))
+        for v in (1, 5, 50, 60, 500):
+            h.observe(v)
+        d = h.to_dict()
+        assert d["count"] == 5 and d["min"] == 1 and d["max"] == 500
+        assert d["buckets"] == {"<=10": 2, "<=100": 2, ">100": 1}
+        assert h.percentile(40) == 10
+        assert h.percentile(50) == 100
+        assert h.percentile(99) == 500          # 上限なしのバケットは max
+
+    def test_percentile_not_above_max(self):
+        h = Histogram(bounds=(25,))
+        h.observe(12)
+        assert h.percentile(50) == 12
+        assert Histogram().percentile(50) is None
+
+
+class TestRegistry:
+    def test_counters_timer_and_dump(self, tmp_path):
+        reg = MetricsRegistry()
+        reg.increment("webhook.status", "202")
+        reg.increment("webhook.status", "202")
+        reg.increment("webhook.status", "ConnectTimeout")
+        with pytest.raises(RuntimeError):
+            with reg.timer("proxy.resolve_ms"):
+                raise RuntimeError("x")
+        snap = json.loads(reg.dump(tmp_path / "m" / "metrics.json").read_text(encoding="utf-8"))
+        assert snap["counters"]["webhook.status"] == {"202": 2, "ConnectTimeout": 1}
+        assert snap["histograms"]["proxy.resolve_ms"]["count"] == 1      # 例外でも記録する
+        assert "webhook.status" in reg.format_summary()
+        reg.reset()
+        assert "まだ記録がありません" in reg.format_summary()
+
+
+class TestWebhookInstrumentation:
+    def _config(self):
+        from assets.config import Config
+        c = Config()
+        c.webhook_url = "https://example.com/webhook"
+        c.webhook_io = {**c.webhook_io, "rate_limit_per_sec": 0}
+        return c
+
+    def test_post_latency_and_status(self, registry):
+        from assets import teams_webhook
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("assets.teams_webhook._send", return_value=202):
+            teams_webhook._post(self._config(), {})
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("assets.teams_webhook._send", side_effect=teams_webhook.WebhookHTTPError(503)):
+            with pytest.raises(teams_webhook.WebhookHTTPError):
+                teams_webhook._post(self._config(), {})
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("assets.teams_webhook._send", side_effect=ConnectionError("down")):
+            with pytest.raises(ConnectionError):
+                teams_webhook._post(self._config(), {})
+        snap = registry.snapshot()
+        assert snap["counters"]["webhook.status"] == {"202": 1, "503": 1, "ConnectionError": 1}
+        assert snap["histograms"]["webhook.post_ms"]["count"] == 3
+
+    def test_proxy_resolution(self, registry, tmp_path):
+        from assets import teams_webhook
+        from assets.config import Config
+        script = tmp_path / "proxy.sh"
+        script.write_text("export https_proxy=http://proxy:8080\n", encoding="utf-8")
+        cfg = Config()
+        cfg.proxy_sh = str(script)
+        teams_webhook._proxy_cache.clear()
+        with patch("assets.teams_webhook._source_proxy_sh", return_value={"http": "", "https": "http://proxy:8080"}):
+            teams_webhook._get_proxies(cfg)
+            teams_webhook._get_proxies(cfg)
+        teams_webhook._proxy_cache.clear()
+        snap = registry.snapshot()
+        assert snap["counters"]["proxy.cache"] == {"hit": 1, "miss": 1}
+        assert snap["histograms"]["proxy.resolve_ms"]["count"] == 1
+
+    def test_connect_time_recorded_once_per_connection(self, registry, monkeypatch):
+        """requests の Session で新しい接続を張ったときだけ webhook.connect_ms に記録する"""
+        pytest.importorskip("requests")
+        from assets import teams_webhook
+        from benchmarks.webhook_load import StubWebhookServer
+        monkeypatch.setenv("NO_PROXY", "127.0.0.1")
+        monkeypatch.setenv("no_proxy", "127.0.0.1")
+        teams_webhook.close_session()
+        try:
+            with StubWebhookServer() as server:
+                cfg = self._config()
+                cfg.webhook_url = server.url
+                for _ in range(3):
+                    teams_webhook._post(cfg, {"a": 1})
+        finally:
+            teams_webhook.close_session()
+        snap = registry.snapshot()
+        assert snap["histograms"]["webhook.connect_ms"]["count"] == server.connections == 1
+        assert snap["counters"]["webhook.status"] == {"202": 3}
+
+    def test_proxy_manager_pools_set_once(self):
+        """プロキシごとの ProxyManager には作成時に 1 回だけ計測付きの接続プールを設定する"""
+        pytest.importorskip("requests")
+        from assets import teams_webhook
+        adapter = teams_webhook._timed_adapter_class()()
+        manager = adapter.proxy_manager_for("http://proxy.example.com:8080")
+        pools = manager.pool_classes_by_scheme
+        assert pools["https"].__name__ == "TimedHTTPSConnectionPool"
+        assert adapter.proxy_manager_for("http://proxy.example.com:8080") is manager
+        assert manager.pool_classes_by_scheme is pools
+        other = adapter.proxy_manager_for("http://proxy2.example.com:8080")
+        assert other.pool_classes_by_scheme is not pools
+        assert other.pool_classes_by_scheme["https"] is pools["https"]
+        adapter.close()
@@ -0,0 +1,180 @@
+"""assets/punch_journal.py（打刻ジャーナル）のユニットテスト"""
+import json
+from datetime import date
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import openpyxl
+
+from assets.punch_journal import (
+    main, prune, prune_for_config, read_journal, reconcile, record_intent, record_outcome,
+)
+from assets.timesheet_actions import TimesheetQueuedError, TimesheetSession
+
+
+def _make_book(path: Path) -> Path:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["C6"] = 2026
+    ws["C7"] = 2
+    for i in range(28):
+        ws.cell(row=18 + i, column=3).value = i + 1
+    wb.save(str(path))
+    return path
+
+
+_JOURNAL_TAG = {"action": "clock_out", "shift": "日勤"}
+
+
+class TestRecord:
+    def test_session_writes_intent_then_outcome(self, tmp_path, base_config, journal_dir):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with TimesheetSession(path, base_config, journal=_JOURNAL_TAG) as session:
+            session.write_row({"date": date(2026, 2, 3), "end_time": 0.75})
+            session.save()
+        lines = [json.loads(l) for l in (journal_dir / "202602.jsonl").read_text(encoding="utf-8").splitlines()]
+        assert [l["op"] for l in lines] == ["intent", "outcome"]
+        assert lines[0]["action"] == "clock_out" and lines[0]["shift"] == "日勤"
+        assert lines[0]["row"] == {"date": "2026-02-03", "end_time": 0.75}
+        assert lines[0]["path"] == str(path.absolute())
+        assert lines[1] == {"op": "outcome", "id": lines[0]["id"], "ts": lines[1]["ts"], "outcome": "ok"}
+
+    def test_locked_save_recorded_as_queued(self, tmp_path, base_config, journal_dir):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with patch("openpyxl.workbook.workbook.Workbook.save", side_effect=PermissionError("locked")):
+            with pytest.raises(TimesheetQueuedError):
+                with TimesheetSession(path, base_config, journal=_JOURNAL_TAG) as session:
+                    session.write_row({"date": date(2026, 2, 3), "end_time": 0.75})
+                    session.save()
+        [entry] = read_journal(journal_dir / "202602.jsonl")
+        assert entry["outcome"] == "queued"
+
+    def test_no_journal_without_tag_or_when_disabled(self, tmp_path, base_config, journal_dir):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with TimesheetSession(path, base_config) as session:
+            session.write_row({"date": date(2026, 2, 3), "end_time": 0.75})
+            session.save()
+        base_config.timesheet_io["journal"] = False
+        with TimesheetSession(path, base_config, journal=_JOURNAL_TAG) as session:
+            session.write_row({"date": date(2026, 2, 4), "end_time": 0.75})
+            session.save()
+        assert not journal_dir.exists()
+
+    def test_read_journal_without_outcome_and_truncated_line(self, tmp_path, journal_dir):
+        """保存中に終了した打刻は outcome が None、途中で切れた行は読み飛ばす"""
+        ids = record_intent(tmp_path / "a.xlsx", [{"date": date(2026, 2, 3), "end_time": 0.75},
+                                                   {"date": date(2026, 2, 4), "end_time": 0.8}])
+        record_outcome(ids[:1], "ok")
+        with open(journal_dir / "202602.jsonl", "a", encoding="utf-8") as f:
+            f.write('{"op": "outcome", "id": "')
+        assert [e["outcome"] for e in read_journal(journal_dir / "202602.jsonl")] == ["ok", None]
+
+    def test_unwritable_journal_does_not_raise(self, tmp_path):
+        blocker = tmp_path / "blocker"
+        blocker.touch()
+        assert record_intent(tmp_path / "a.xlsx", [{"date": date(2026, 2, 3)}],
+                             journal_dir=blocker / "journal") == []
+
+
+class TestReconcile:
+    def test_reapplies_missing_cells_only(self, tmp_path, base_config):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        wb = openpyxl.load_workbook(path)
+        wb.active["G21"] = 0.7  # 2/4 は手修正済み
+        wb.save(path)
+        record_intent(path, [{"date": date(2026, 2, 3), "shift_label": "日勤", "end_time": 0.75},
+                             {"date": date(2026, 2, 4), "end_time": 0.8}])
+
+        [result] = reconcile(base_config)
+        assert (result["checked"], result["applied"], result["mismatched"]) == (3, 2, 1)
+        ws = openpyxl.load_workbook(path).active
+        assert ws["E20"].value == "日勤" and ws["G20"].value == 0.75
+        assert ws["G21"].value == 0.7
+
+        [again] = reconcile(base_config)
+        assert again["applied"] == 0
+
+    def test_latest_record_wins(self, tmp_path, base_config):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        record_intent(path, [{"date": date(2026, 2, 3), "end_time": 0.75}])
+        record_intent(path, [{"date": date(2026, 2, 3), "end_time": 0.8}])
+        [result] = reconcile(base_config)
+        assert result["applied"] == 1
+        assert openpyxl.load_workbook(path).active["G20"].value == 0.8
+
+    def test_failed_saves_not_reapplied(self, tmp_path, base_config, capsys):
+        """locked・error の打刻は再適用せず数えるだけ。ok・queued・結果なし（保存中に終了）は再適用する"""
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        for day, outcome in ((3, "ok"), (4, "queued"), (5, None), (6, "locked"), (7, "error")):
+            ids = record_intent(path, [{"date": date(2026, 2, day), "end_time": 0.75}])
+            if outcome:
+                record_outcome(ids, outcome, "" if outcome in ("ok", "queued") else "失敗")
+        [result] = reconcile(base_config)
+        assert (result["applied"], result["failed"]) == (3, 2)
+        ws = openpyxl.load_workbook(path).active
+        assert [ws[f"G{r}"].value for r in range(20, 25)] == [0.75, 0.75, 0.75, None, None]
+
+    def test_only_failed_records_does_not_open_file(self, tmp_path, base_config, capsys):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        record_outcome(record_intent(path, [{"date": date(2026, 2, 3), "end_time": 0.75}]), "error", "x")
+        with patch("assets.timesheet_actions.openpyxl.load_workbook") as mock_load:
+            [result] = reconcile(base_config)
+        mock_load.assert_not_called()
+        assert (result["checked"], result["failed"]) == (0, 1)
+        from assets.punch_journal import report
+        assert report([result]) == 0
+        assert "保存失敗の記録 1（再適用しない）" in capsys.readouterr().out
+
+    def test_one_load_and_save_per_file(self, tmp_path, base_config):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        record_intent(path, [{"date": date(2026, 2, d), "end_time": 0.75} for d in range(1, 11)])
+        with patch("assets.timesheet_actions.openpyxl.load_workbook",
+                   wraps=openpyxl.load_workbook) as mock_load, \
+             patch("openpyxl.workbook.workbook.Workbook.save", autospec=True,
+                   side_effect=openpyxl.workbook.workbook.Workbook.save) as mock_save:
+            [result] = reconcile(base_config)
+        assert result["applied"] == 10
+        assert mock_load.call_count == 1 and mock_save.call_count == 1
+
+    def test_dry_run_does_not_save(self, tmp_path, base_config):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        record_intent(path, [{"date": date(2026, 2, 3), "end_time": 0.75}])
+        [result] = reconcile(base_config, dry_run=True)
+        assert result["applied"] == 1
+        assert openpyxl.load_workbook(path).active["G20"].value is None
+
+    def test_month_filter_and_missing_file(self, tmp_path, base_config):
+        record_intent(tmp_path / "202602山田.xlsx", [{"date": date(2026, 2, 3), "end_time": 0.75}])
+        record_intent(tmp_path / "202603山田.xlsx", [{"date": date(2026, 3, 3), "end_time": 0.75}])
+        [result] = reconcile(base_config, months=["202603"])
+        assert result["path"].name == "202603山田.xlsx"
+        assert result["error"]
+
+    def test_cli(self, tmp_path, capsys):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        record_intent(path, [{"date": date(2026, 2, 3), "end_time": 0.75}])
+        with patch("assets.app_logger.setup_logging"):
+            assert main(["reconcile", "--settings", str(tmp_path / "none.json")]) == 0
+        assert "202602山田.xlsx: 確認 1 / 再適用 1 / 不一致 0" in capsys.readouterr().out
+
+
+class TestPrune:
+    def test_removes_months_older_than_keep(self, journal_dir):
+        journal_dir.mkdir()
+        for stem in ("202410", "202411", "202412", "202501", "202502", "notes"):
+            (journal_dir / f"{stem}.jsonl").touch()
+        removed = prune(3, today=date(2025, 2, 14))
+        assert [p.name for p in removed] == ["202410.jsonl", "202411.jsonl"]
+        assert sorted(p.stem for p in journal_dir.glob("*.jsonl")) == ["202412", "202501", "202502", "notes"]
+
+    def test_disabled_or_missing_dir(self, journal_dir, base_config):
+        assert prune(3) == []
+        journal_dir.mkdir()
+        (journal_dir / "200001.jsonl").touch()
+        assert prune(0) == []
+        base_config.timesheet_io["journal_keep_months"] = 0
+        assert prune_for_config(base_config) == []
+        base_config.timesheet_io["journal_keep_months"] = 13
+        assert [p.name for p in prune_for_config(base_config)] == ["200001.jsonl"]
@@ -0,0 +1,216 @@
+"""assets/punch_queue.py（書込待ち打刻キュー）のユニットテスト"""
+from datetime import date
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+import openpyxl
+
+from assets import punch_queue
+from assets.punch_queue import PunchQueue, ReplayWorker
+from assets.timesheet_actions import (
+    TimesheetLockedError, TimesheetQueuedError, TimesheetSession, TimesheetWriteError,
+    replay_punch_queue,
+)
+
+
+def _make_book(path: Path) -> Path:
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["C6"] = 2026
+    ws["C7"] = 2
+    for i in range(28):
+        ws.cell(row=18 + i, column=3).value = i + 1
+    wb.save(str(path))
+    return path
+
+
+_LOCKED = PermissionError("locked")
+
+
+class TestPunchQueue:
+    def test_persisted_across_instances(self, tmp_path):
+        q = PunchQueue(tmp_path / "q.jsonl")
+        entry_id = q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3), "end_time": 0.75})
+        q.enqueue(tmp_path / "b.xlsx", {"date": date(2026, 2, 4), "remark": "備考"})
+
+        q2 = PunchQueue(tmp_path / "q.jsonl")
+        assert q2.pending_count() == 2
+        [entry] = q2.pending(tmp_path / "a.xlsx")
+        assert entry["id"] == entry_id
+        assert entry["row_data"] == {"date": date(2026, 2, 3), "end_time": 0.75}
+        assert q2.pending_paths() == [tmp_path / "a.xlsx", tmp_path / "b.xlsx"]
+
+    def test_done_and_failed_removed(self, tmp_path):
+        q = PunchQueue(tmp_path / "q.jsonl")
+        a = q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3)})
+        b = q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 4)})
+        c = q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 5)})
+        q.mark_done([a])
+        q.mark_failed(b, "row not found")
+        assert [e["id"] for e in PunchQueue(tmp_path / "q.jsonl").pending()] == [c]
+
+    def test_file_emptied_when_all_done(self, tmp_path):
+        q = PunchQueue(tmp_path / "q.jsonl")
+        q.mark_done([q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3)})])
+        assert (tmp_path / "q.jsonl").read_text(encoding="utf-8") == ""
+
+    def test_truncated_line_ignored(self, tmp_path):
+        """追記途中で終了した行があっても残りは読める"""
+        q = PunchQueue(tmp_path / "q.jsonl")
+        q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3)})
+        with open(tmp_path / "q.jsonl", "a", encoding="utf-8") as f:
+            f.write('{"op": "add", "id": "x", "pa')
+        assert PunchQueue(tmp_path / "q.jsonl").pending_count() == 1
+
+
+class TestReplayWorker:
+    def test_backoff_doubles_until_cap_and_resets(self, tmp_path):
+        q = PunchQueue(tmp_path / "q.jsonl")
+        q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3)})
+        replay = MagicMock(side_effect=TimesheetLockedError(tmp_path / "a.xlsx"))
+        worker = ReplayWorker(q, replay)
+        assert worker.delay() == 5
+        delays = []
+        for _ in range(8):
+            assert worker.run_once() is False
+            delays.append(worker.delay())
+        assert delays == [5, 10, 20, 40, 80, 160, 300, 300]
+
+        replay.side_effect = None
+        assert worker.run_once() is True
+        assert worker.delay() == 5
+
+    def test_unexpected_error_backs_off(self, tmp_path):
+        q = PunchQueue(tmp_path / "q.jsonl")
+        q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3)})
+        worker = ReplayWorker(q, MagicMock(side_effect=OSError("network")))
+        assert worker.run_once() is False
+        assert worker.failures == 1
+
+    def test_permanent_error_moves_to_dead_letter(self, tmp_path):
+        """ロック以外のエラーは回数を数え、上限に達したエントリはデッドレターへ（再起動後も回数を引継ぐ）"""
+        q = PunchQueue(tmp_path / "q.jsonl", tmp_path / "dead.jsonl")
+        entry_id = q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3), "end_time": 0.75})
+        replay = MagicMock(side_effect=ValueError("壊れたブック"))
+        worker = ReplayWorker(q, replay, max_attempts=3)
+        assert worker.run_once() is False
+        assert worker.run_once() is False
+        assert PunchQueue(tmp_path / "q.jsonl", tmp_path / "dead.jsonl").pending(tmp_path / "a.xlsx")
+
+        q = PunchQueue(tmp_path / "q.jsonl", tmp_path / "dead.jsonl")
+        worker = ReplayWorker(q, replay, max_attempts=3)
+        assert worker.run_once() is True
+        assert q.pending_count() == 0
+        [dead] = q.dead_letters()
+        assert dead["id"] == entry_id
+        assert dead["attempts"] == 3
+        assert dead["row"] == {"date": "2026-02-03", "end_time": 0.75}
+        assert "壊れたブック" in dead["error"]
+        assert replay.call_count == 3
+
+    def test_locked_never_moves_to_dead_letter(self, tmp_path):
+        q = PunchQueue(tmp_path / "q.jsonl", tmp_path / "dead.jsonl")
+        q.enqueue(tmp_path / "a.xlsx", {"date": date(2026, 2, 3)})
+        worker = ReplayWorker(q, MagicMock(side_effect=TimesheetLockedError(tmp_path / "a.xlsx")), max_attempts=2)
+        for _ in range(5):
+            assert worker.run_once() is False
+        assert q.pending_count() == 1
+        assert q.dead_letters() == []
+
+
+class TestSessionQueue:
+    """TimesheetSession 保存時のキュー登録と再書込"""
+
+    def _save_locked(self, path, config, row_data):
+        with patch("openpyxl.workbook.workbook.Workbook.save", side_effect=_LOCKED):
+            with TimesheetSession(path, config) as session:
+                session.write_row(row_data)
+                session.save()
+
+    def test_locked_save_enqueues_rows(self, tmp_path, base_config, punch_queue_file):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with pytest.raises(TimesheetQueuedError) as exc_info:
+            self._save_locked(path, base_config, {"date": date(2026, 2, 3), "end_time": 0.75})
+        assert exc_info.value.count == 1
+        [entry] = punch_queue_file.pending(path)
+        assert entry["row_data"]["end_time"] == 0.75
+
+    def test_offline_queue_disabled(self, tmp_path, base_config, punch_queue_file):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        base_config.timesheet_io["offline_queue"] = False
+        with pytest.raises(TimesheetLockedError) as exc_info:
+            self._save_locked(path, base_config, {"date": date(2026, 2, 3), "end_time": 0.75})
+        assert not isinstance(exc_info.value, TimesheetQueuedError)
+        assert punch_queue_file.pending_count() == 0
+
+    def test_replay_writes_and_clears(self, tmp_path, base_config, punch_queue_file):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with pytest.raises(TimesheetQueuedError):
+            self._save_locked(path, base_config, {"date": date(2026, 2, 3), "end_time": 0.75})
+
+        with patch("openpyxl.workbook.workbook.Workbook.save", side_effect=_LOCKED):
+            with pytest.raises(TimesheetLockedError):
+                replay_punch_queue(path, base_config)
+        assert punch_queue_file.pending_count() == 1  # 再書込失敗では二重登録しない
+
+        assert replay_punch_queue(path, base_config) == 1
+        assert punch_queue_file.pending_count() == 0
+        assert openpyxl.load_workbook(path).active["G20"].value == 0.75
+
+    def test_next_save_flushes_older_rows_without_overwriting(self, tmp_path, base_config, punch_queue_file):
+        """次の保存で書込待ちもまとめて書込み、同じセルは新しい値を優先する"""
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with pytest.raises(TimesheetQueuedError):
+            self._save_locked(path, base_config,
+                              {"date": date(2026, 2, 3), "end_time": 0.75, "overtime_type": "客先指示"})
+        with TimesheetSession(path, base_config) as session:
+            session.write_row({"date": date(2026, 2, 3), "end_time": 0.8})
+            session.save()
+        ws = openpyxl.load_workbook(path).active
+        assert ws["G20"].value == 0.8
+        assert ws["K20"].value == "客先指示"
+        assert punch_queue_file.pending_count() == 0
+
+    def test_unwritable_row_moves_to_dead_letter(self, tmp_path, base_config, punch_queue_file):
+        """書込めない行（行がない等）は破棄せず row_data ごとデッドレターに移す"""
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        wb = openpyxl.load_workbook(path)
+        wb.active["C22"] = None  # 5日の行が認識できない
+        wb.save(path)
+        punch_queue_file.enqueue(path, {"date": date(2026, 2, 3), "end_time": 0.75})
+        punch_queue_file.enqueue(path, {"date": date(2026, 2, 5), "end_time": 0.75})
+        assert replay_punch_queue(path, base_config) == 1
+        assert punch_queue_file.pending_count() == 0
+        [dead] = punch_queue_file.dead_letters()
+        assert dead["row"] == {"date": "2026-02-05", "end_time": 0.75}
+        assert "5日" in dead["error"]
+
+    def test_missing_file_stays_queued_until_attempts_run_out(self, tmp_path, base_config, punch_queue_file):
+        """ファイルが見つからない間はキューに残して再試行し、回数を使い切ったらデッドレターへ"""
+        path = tmp_path / "202602山田.xlsx"
+        punch_queue_file.enqueue(path, {"date": date(2026, 2, 3), "end_time": 0.75})
+        with pytest.raises(TimesheetWriteError):
+            replay_punch_queue(path, base_config)
+        assert punch_queue_file.pending_count() == 1
+
+        worker = ReplayWorker(punch_queue_file, lambda p: replay_punch_queue(p, base_config), max_attempts=2)
+        assert worker.run_once() is False
+        assert punch_queue_file.pending_count() == 1
+        assert punch_queue_file.dead_letters() == []
+        _make_book(path)  # 共有フォルダが戻った
+        assert worker.run_once() is True
+        assert openpyxl.load_workbook(path).active["G20"].value == 0.75
+
+        path.unlink()
+        punch_queue_file.enqueue(path, {"date": date(2026, 2, 4), "end_time": 0.75})
+        worker.run_once()
+        worker.run_once()
+        assert punch_queue_file.pending_count() == 0
+        [dead] = punch_queue_file.dead_letters()
+        assert dead["row"] == {"date": "2026-02-04", "end_time": 0.75}
+
+
+def test_get_punch_queue_uses_fixture(punch_queue_file):
+    assert punch_queue.get_punch_queue() is punch_queue_file
@@ -0,0 +1,87 @@
+"""assets/lazy_import.py・assets/startup_trace.py（起動時間短縮・計測）のユニットテスト"""
+import subprocess
+import sys
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from assets import startup_trace
+from assets.lazy_import import lazy_import, warm_up
+
+_APP_DIR = Path(__file__).parent.parent
+
+
+class TestLazyImport:
+    def test_missing_module_returns_none(self):
+        assert lazy_import("kintai_no_such_module") is None
+
+    def test_loaded_module_returned_as_is(self):
+        import json
+        assert lazy_import("json") is json
+
+    def test_loads_on_first_attribute_access(self):
+        sys.modules.pop("colorsys", None)
+        mod = lazy_import("colorsys")
+        assert "colorsys" not in sys.modules
+        assert mod.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+        assert "colorsys" in sys.modules
+
+    def test_patch_on_proxy(self):
+        sys.modules.pop("colorsys", None)
+        mod = lazy_import("colorsys")
+        with patch.object(mod, "rgb_to_hsv", return_value="patched"):
+            assert mod.rgb_to_hsv(0, 0, 0) == "patched"
+        assert mod.rgb_to_hsv(1.0, 0.0, 0.0) == (0.0, 1.0, 1.0)
+
+    def test_warm_up_ignores_missing(self):
+        sys.modules.pop("colorsys", None)
+        warm_up("kintai_no_such_module", "colorsys")
+        assert "colorsys" in sys.modules
+
+    def test_actions_import_does_not_load_openpyxl(self):
+        """打刻タブが import する timesheet_actions・teams_webhook は openpyxl / requests を読込まない"""
+        code = (
+            "import sys\n"
+            "import assets.timesheet_actions, assets.teams_webhook\n"
+            "print('openpyxl' in sys.modules, 'requests' in sys.modules)\n"
+        )
+        out = subprocess.run([sys.executable, "-c", code], cwd=_APP_DIR, capture_output=True,
+                             text=True, timeout=60)
+        assert out.stdout.strip() == "False False"
+
+
+class TestStartupTrace:
+    @pytest.fixture(autouse=True)
+    def marks(self, monkeypatch):
+        monkeypatch.setattr(startup_trace, "_T0", 100.0)
+        monkeypatch.setattr(startup_trace, "_marks", [("import", 100.2), ("first_paint", 100.5)])
+
+    def test_breakdown_and_total(self):
+        assert [label for label, _ in startup_trace.breakdown()] == ["import", "first_paint"]
+        assert [round(ms) for _, ms in startup_trace.breakdown()] == [200, 300]
+        assert round(startup_trace.total_ms()) == 500
+
+    def test_within_budget_logs_info(self, monkeypatch):
+        monkeypatch.delenv("KINTAI_STARTUP_TRACE", raising=False)
+        monkeypatch.delenv("KINTAI_STARTUP_BUDGET_MS", raising=False)
+        log = MagicMock()
+        startup_trace.report(log)
+        log.info.assert_called_once()
+        log.warning.assert_not_called()
+
+    def test_over_budget_warns(self, monkeypatch):
+        monkeypatch.setenv("KINTAI_STARTUP_BUDGET_MS", "400")
+        log = MagicMock()
+        startup_trace.report(log)
+        log.warning.assert_called_once()
+
+    def test_invalid_budget_env_uses_default(self, monkeypatch):
+        monkeypatch.setenv("KINTAI_STARTUP_BUDGET_MS", "abc")
+        assert startup_trace.budget_ms() == startup_trace.STARTUP_BUDGET_MS
+
+    def test_trace_env_prints_breakdown(self, monkeypatch, capsys):
+        monkeypatch.setenv("KINTAI_STARTUP_TRACE", "1")
+        startup_trace.report(MagicMock())
+        err = capsys.readouterr().err
+        assert "total" in err and "first_paint" in err
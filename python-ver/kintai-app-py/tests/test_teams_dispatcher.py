@@ -0,0 +1,190 @@
+"""assets/teams_dispatcher.py（Teams 投稿のバックグラウンド送信）のユニットテスト"""
+import threading
+import time
+
+from assets import teams_dispatcher
+from assets.teams_dispatcher import PostDispatcher, shutdown_dispatcher
+
+
+def _blocking_send():
+    """release がセットされるまで返らない send と、呼出記録・イベントを返す"""
+    calls = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def send(config, message_type, data):
+        calls.append((message_type, data))
+        started.set()
+        assert release.wait(5)
+
+    return send, calls, started, release
+
+
+def test_submit_returns_before_send_finishes():
+    send, calls, started, release = _blocking_send()
+    d = PostDispatcher(send=send)
+    future = d.submit(None, "clock_in", {"shift": "日勤"})
+    assert started.wait(5)
+    assert not future.done()
+    release.set()
+    assert future.result(5) == ""
+    assert calls == [("clock_in", {"shift": "日勤"})]
+    assert d.stop(5)
+
+
+def test_error_result_and_done_cb():
+    def send(config, message_type, data):
+        raise ConnectionError("proxy down")
+
+    results = []
+    d = PostDispatcher(send=send)
+    future = d.submit(None, "clock_out", {}, done_cb=results.append)
+    assert future.result(5) == "Teams投稿エラー: proxy down"
+    assert d.stop(5)
+    assert results == ["Teams投稿エラー: proxy down"]
+
+
+def test_full_queue_fails_immediately():
+    """送信待ちが上限なら待たずに失敗を返す（打刻を止めない）"""
+    send, calls, started, release = _blocking_send()
+    d = PostDispatcher(maxsize=1, send=send)
+    d.submit(None, "clock_in", {"n": 1})
+    assert started.wait(5)          # 1件目は送信中（キューは空）
+    queued = d.submit(None, "clock_in", {"n": 2})
+    dropped = d.submit(None, "clock_in", {"n": 3})
+    assert dropped.result(0).startswith("Teams投稿エラー: 送信待ちが上限")
+    release.set()
+    assert queued.result(5) == ""
+    assert d.stop(5)
+    assert [data["n"] for _, data in calls] == [1, 2]
+
+
+def test_stop_drains_pending_posts():
+    send, calls, started, release = _blocking_send()
+    d = PostDispatcher(send=send)
+    futures = [d.submit(None, "clock_in", {"n": n}) for n in range(3)]
+    release.set()
+    assert d.stop(5)
+    assert all(f.result(0) == "" for f in futures)
+    assert len(calls) == 3
+
+
+def test_uses_send_teams_post_by_default(base_config):
+    from unittest.mock import patch
+
+    d = PostDispatcher()
+    with patch("assets.teams_webhook.send_teams_post") as mock_post:
+        assert d.submit(base_config, "clock_in", {"shift": "日勤"}).result(5) == ""
+    mock_post.assert_called_once_with(base_config, "clock_in", {"shift": "日勤"})
+    assert d.stop(5)
+
+
+def _coalesce_config(url="https://example.com/webhook"):
+    from assets.config import Config
+    c = Config()
+    c.webhook_url = url
+    c.webhook_io = {**c.webhook_io, "coalesce_clock_in": True, "coalesce_window_sec": 0.2}
+    return c
+
+
+def test_coalesces_clock_in_for_same_channel():
+    """送信中に溜まった同じチャンネルへの出勤投稿は 1 枚のまとめカードで送る"""
+    send, calls, started, release = _blocking_send()
+    digests = []
+    d = PostDispatcher(send=send, send_digest=lambda entries: digests.append([data for _, data in entries]))
+    cfg, other = _coalesce_config(), _coalesce_config("https://example.com/other")
+    first = d.submit(cfg, "clock_out", {"n": 0})
+    assert started.wait(5)
+    futures = [d.submit(cfg, "clock_in", {"n": 1}),
+               d.submit(other, "clock_in", {"n": 2}),
+               d.submit(cfg, "clock_in", {"n": 3})]
+    release.set()
+    assert d.stop(5)
+    assert first.result(0) == "" and all(f.result(0) == "" for f in futures)
+    assert digests == [[{"n": 1}, {"n": 3}]]
+    assert [data["n"] for _, data in calls] == [0, 2]   # 別チャンネルは単独で送る
+
+
+def test_digest_error_goes_to_every_future():
+    def send_digest(entries):
+        raise ConnectionError("proxy down")
+
+    send, calls, started, release = _blocking_send()
+    d = PostDispatcher(send=send, send_digest=send_digest)
+    cfg = _coalesce_config()
+    d.submit(cfg, "clock_out", {})
+    assert started.wait(5)
+    futures = [d.submit(cfg, "clock_in", {"n": n}) for n in range(2)]
+    release.set()
+    assert d.stop(5)
+    assert [f.result(0) for f in futures] == ["Teams投稿エラー: proxy down"] * 2
+
+
+def test_no_coalescing_by_default(base_config):
+    send, calls, started, release = _blocking_send()
+    digests = []
+    d = PostDispatcher(send=send, send_digest=digests.append)
+    d.submit(base_config, "clock_out", {"n": 0})
+    assert started.wait(5)
+    for n in (1, 2):
+        d.submit(base_config, "clock_in", {"n": n})
+    release.set()
+    assert d.stop(5)
+    assert digests == []
+    assert [data["n"] for _, data in calls] == [0, 1, 2]
+
+
+def test_stop_waits_at_most_timeout_in_total():
+    """キューの空き待ちと送信スレッドの終了待ちを合わせて timeout 秒で戻る"""
+    send, calls, started, release = _blocking_send()
+    d = PostDispatcher(maxsize=1, send=send)
+    d.submit(None, "clock_in", {"n": 0})
+    assert started.wait(5)
+    d.submit(None, "clock_in", {"n": 1})      # キューが満杯になる
+    # 0.3 秒後にキューが 1 件空く（送信スレッドは送信中のまま）
+    timer = threading.Timer(0.3, d._queue.get_nowait)
+    begin = time.monotonic()
+    timer.start()
+    try:
+        assert d.stop(0.6) is False
+        elapsed = time.monotonic() - begin
+    finally:
+        timer.cancel()
+        release.set()
+    assert 0.5 < elapsed < 0.8
+
+
+def test_abandon_pending_skips_unsent_posts():
+    """取りやめた投稿は送らず、done_cb には送信前に終了した旨が届く"""
+    send, calls, started, release = _blocking_send()
+    d = PostDispatcher(send=send)
+    d.submit(None, "clock_out", {"n": 0})
+    assert started.wait(5)
+    results = []
+    future = d.submit(None, "clock_in", {"n": 1}, done_cb=results.append)
+    assert d.abandon_pending() == [(None, "clock_in", {"n": 1})]
+    assert future.cancelled()
+    assert results == ["Teams投稿エラー: 送信前に終了しました"]
+    release.set()
+    assert d.stop(5)
+    assert calls == [("clock_out", {"n": 0})]
+
+
+def test_shutdown_saves_unsent_posts_to_outbox(base_config, outbox, monkeypatch):
+    """終了時に送り切れなかった投稿は再送待ちに登録する（送信中の投稿はそのまま）"""
+    base_config.webhook_url = "https://example.com/webhook"
+    send, calls, started, release = _blocking_send()
+    d = PostDispatcher(send=send)
+    monkeypatch.setattr(teams_dispatcher, "_dispatcher", d)
+    d.submit(base_config, "clock_out", {"n": 0})
+    assert started.wait(5)
+    d.submit(base_config, "clock_in", {"shift": "日勤", "work_style": "リモート"})
+    try:
+        assert shutdown_dispatcher(0.2) == 1
+    finally:
+        release.set()
+    [entry] = outbox.pending()
+    assert entry["target"] == "webhook_url"
+    assert entry["message_type"] == "clock_in"
+    assert entry["error"] == "送信前に終了しました"
+    assert [message_type for message_type, _ in calls] == ["clock_out"]
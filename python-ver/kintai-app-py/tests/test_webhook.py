@@ -1,5 +1,7 @@
 """assets/teams_webhook.py のユニットテスト"""
 import json
+import urllib.request
+
 import pytest
 from datetime import date
 from unittest.mock import patch, MagicMock
@@ -308,3 +310,424 @@ class TestSendTeamsPost:
         with patch("assets.teams_webhook._post") as mock_post:
             send_teams_post(cfg, "unknown_type", {})
             mock_post.assert_not_called()
+
+
+# ─────────────────────────── _get_proxies ───────────────────────────
+
+class TestGetProxies:
+    @pytest.fixture(autouse=True)
+    def clear_cache(self):
+        from assets import teams_webhook
+        teams_webhook._proxy_cache.clear()
+        yield
+        teams_webhook._proxy_cache.clear()
+
+    def _config(self, proxy_sh):
+        from assets.config import Config
+        c = Config()
+        c.proxy_sh = str(proxy_sh)
+        return c
+
+    def _run_result(self, proxy="http://proxy.example.com:8080"):
+        return MagicMock(stdout=f"PATH=/usr/bin\nhttp_proxy={proxy}\nHTTPS_PROXY={proxy}\n")
+
+    def test_parses_env_output(self, tmp_path):
+        from assets.teams_webhook import _get_proxies
+        sh = tmp_path / "proxy.sh"
+        sh.write_text("export http_proxy=x\n")
+        with patch("assets.teams_webhook.subprocess.run", return_value=self._run_result()):
+            assert _get_proxies(self._config(sh)) == {
+                "http": "http://proxy.example.com:8080",
+                "https": "http://proxy.example.com:8080",
+            }
+
+    def test_cached_until_script_changes(self, tmp_path):
+        """proxy.sh が変わらない間は bash を起動しない。更新時刻・サイズが変わったら取得し直す"""
+        import os
+        from assets.teams_webhook import _get_proxies
+        sh = tmp_path / "proxy.sh"
+        sh.write_text("export http_proxy=x\n")
+        cfg = self._config(sh)
+        with patch("assets.teams_webhook.subprocess.run", return_value=self._run_result()) as mock_run:
+            _get_proxies(cfg)
+            _get_proxies(cfg)["http"] = "書換えてもキャッシュは変わらない"
+            assert _get_proxies(cfg)["http"] == "http://proxy.example.com:8080"
+            assert mock_run.call_count == 1
+            sh.write_text("export http_proxy=changed\n")
+            os.utime(sh, ns=(0, 0))
+            mock_run.return_value = self._run_result("http://other:3128")
+            assert _get_proxies(cfg)["http"] == "http://other:3128"
+            assert mock_run.call_count == 2
+
+    def test_failure_not_cached(self, tmp_path):
+        from assets.teams_webhook import _get_proxies
+        sh = tmp_path / "proxy.sh"
+        sh.write_text("")
+        cfg = self._config(sh)
+        with patch("assets.teams_webhook.subprocess.run",
+                   side_effect=[OSError("bash なし"), self._run_result()]) as mock_run:
+            assert _get_proxies(cfg) is None
+            assert _get_proxies(cfg) is not None
+            assert mock_run.call_count == 2
+
+    def test_missing_script_returns_none(self, tmp_path):
+        from assets.teams_webhook import _get_proxies
+        with patch("assets.teams_webhook.subprocess.run") as mock_run:
+            assert _get_proxies(self._config(tmp_path / "none.sh")) is None
+            assert _get_proxies(self._config("")) is None
+        mock_run.assert_not_called()
+
+    def test_prefetch_fills_cache(self, tmp_path):
+        from assets.teams_webhook import _get_proxies, prefetch_proxies
+        sh = tmp_path / "proxy.sh"
+        sh.write_text("export http_proxy=x\n")
+        cfg = self._config(sh)
+        with patch("assets.teams_webhook.subprocess.run", return_value=self._run_result()) as mock_run:
+            prefetch_proxies(cfg).join(5)
+            assert _get_proxies(cfg) is not None
+        assert mock_run.call_count == 1
+
+
+# ─────────────────────────── _post ───────────────────────────
+
+class TestPostSession:
+    @pytest.fixture(autouse=True)
+    def fresh_session(self):
+        from assets import teams_webhook
+        teams_webhook.close_session()
+        yield
+        teams_webhook.close_session()
+
+    def _config(self):
+        from assets.config import Config
+        c = Config()
+        c.webhook_url = "https://example.com/webhook"
+        c.webhook_io = {"connect_timeout_sec": 3, "read_timeout_sec": 20}
+        return c
+
+    def test_session_reused_with_split_timeouts(self):
+        """2回目以降の投稿は同じ Session を使い、接続・応答待ちのタイムアウトを分けて渡す"""
+        pytest.importorskip("requests")
+        from assets.teams_webhook import _post
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("requests.Session.post", return_value=MagicMock(status_code=200)) as mock_post, \
+             patch("requests.Session.close") as mock_close:
+            _post(self._config(), {"a": 1})
+            _post(self._config(), {"a": 2})
+        assert mock_post.call_count == 2
+        assert mock_post.call_args.kwargs["timeout"] == (3.0, 20.0)
+        mock_close.assert_not_called()
+
+    def test_session_recreated_when_proxy_changes(self):
+        pytest.importorskip("requests")
+        from assets import teams_webhook
+        first = teams_webhook._get_session(None, 4)
+        assert teams_webhook._get_session(None, 4) is first
+        second = teams_webhook._get_session({"https": "http://proxy:8080"}, 4)
+        assert second is not first
+        assert teams_webhook._get_session({"https": "http://proxy:8080"}, 4) is second
+
+    def test_http_error_raises(self):
+        pytest.importorskip("requests")
+        from assets.teams_webhook import _post
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("requests.Session.post", return_value=MagicMock(status_code=429, text="Too Many")):
+            with pytest.raises(Exception, match="HTTP 429"):
+                _post(self._config(), {"a": 1})
+
+    def test_urllib_fallback_reuses_opener(self):
+        from assets import teams_webhook
+        resp = MagicMock(status=200)
+        resp.__enter__.return_value = resp
+        with patch.object(teams_webhook, "REQUESTS_AVAILABLE", False), \
+             patch("assets.teams_webhook._get_proxies", return_value={"https": "http://proxy:8080"}), \
+             patch("urllib.request.OpenerDirector.open", return_value=resp) as mock_open:
+            teams_webhook._post(self._config(), {"a": 1})
+            [opener] = teams_webhook._openers.values()
+            teams_webhook._post(self._config(), {"a": 2})
+        assert list(teams_webhook._openers.values()) == [opener]
+        assert mock_open.call_args.kwargs["timeout"] == 20.0
+
+    def test_urllib_fallback_with_single_scheme_proxy(self):
+        """proxy.sh が片方のスキームだけ設定しても、空のスキームは直接接続で送れる"""
+        from assets import teams_webhook
+        from benchmarks.webhook_load import StubWebhookServer
+        teams_webhook.close_session()
+        try:
+            with StubWebhookServer() as server, \
+                 patch.object(teams_webhook, "REQUESTS_AVAILABLE", False), \
+                 patch("assets.teams_webhook._get_proxies", return_value={"http": "", "https": "http://127.0.0.1:9"}):
+                cfg = self._config()
+                cfg.webhook_url = server.url
+                teams_webhook._post(cfg, {"a": 1})
+                [opener] = teams_webhook._openers.values()
+        finally:
+            teams_webhook.close_session()
+        assert server.statuses == {202: 1}
+        [handler] = [h for h in opener.handlers if isinstance(h, urllib.request.ProxyHandler)]
+        assert handler.proxies == {"https": "http://127.0.0.1:9"}
+
+
+class TestRetryAfter:
+    def test_seconds_and_http_date(self):
+        from email.utils import format_datetime
+        from datetime import datetime, timedelta, timezone
+        from assets.teams_webhook import _retry_after_sec
+        assert _retry_after_sec("120") == 120.0
+        assert _retry_after_sec(None) is None
+        assert _retry_after_sec("soon") is None
+        when = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=90), usegmt=True)
+        assert 80 < _retry_after_sec(when) <= 90
+
+    def test_429_carries_retry_after(self):
+        pytest.importorskip("requests")
+        from assets import teams_webhook
+        from assets.config import Config
+        cfg = Config()
+        cfg.webhook_url = "https://example.com/webhook"
+        resp = MagicMock(status_code=429, text="Too Many", headers={"Retry-After": "30"})
+        teams_webhook.close_session()
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("requests.Session.post", return_value=resp):
+            with pytest.raises(teams_webhook.WebhookHTTPError) as exc:
+                teams_webhook._post(cfg, {})
+        teams_webhook.close_session()
+        assert exc.value.status == 429 and exc.value.retry_after == 30.0
+
+
+class TestRateLimit:
+    def _config(self, **io):
+        from assets.config import Config
+        c = Config()
+        c.webhook_url = "https://example.com/webhook"
+        c.webhook_io = {**c.webhook_io, **io}
+        return c
+
+    def test_bucket_allows_burst_then_spaces_out(self):
+        from assets.teams_webhook import TokenBucket
+        now = [100.0]
+        bucket = TokenBucket(rate=2.0, burst=3, clock=lambda: now[0])
+        assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+        assert bucket.reserve() == pytest.approx(0.5)
+        assert bucket.reserve() == pytest.approx(1.0)   # 予約は順に後ろへずれる
+        now[0] += 10
+        assert bucket.reserve() == 0.0                   # 補充は burst まで
+
+    def test_pause_blocks_until_retry_after(self):
+        from assets.teams_webhook import TokenBucket
+        now = [0.0]
+        bucket = TokenBucket(rate=10.0, burst=5, clock=lambda: now[0])
+        bucket.pause(30)
+        assert bucket.reserve() == pytest.approx(30.0)
+        now[0] = 31
+        assert bucket.reserve() == 0.0
+
+    def test_bucket_per_url_with_override(self):
+        from assets import teams_webhook
+        cfg = self._config(rate_limits={"https://example.com/other": {"per_sec": 0.5, "burst": 1}})
+        default = teams_webhook._get_bucket(cfg, "https://example.com/webhook")
+        other = teams_webhook._get_bucket(cfg, "https://example.com/other")
+        assert (default.rate, default.burst) == (1.0, 4)
+        assert (other.rate, other.burst) == (0.5, 1)
+        assert teams_webhook._get_bucket(cfg, "https://example.com/webhook") is default
+        assert teams_webhook._get_bucket(self._config(rate_limit_per_sec=0), "https://x") is None
+
+    def test_post_waits_for_token(self):
+        from assets import teams_webhook
+        cfg = self._config(rate_limit_per_sec=1, rate_limit_burst=1)
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("assets.teams_webhook._send") as mock_send, \
+             patch("assets.teams_webhook.time.sleep") as mock_sleep:
+            teams_webhook._post(cfg, {"a": 1})
+            teams_webhook._post(cfg, {"a": 2})
+        assert mock_send.call_count == 2
+        mock_sleep.assert_called_once()
+        assert 0 < mock_sleep.call_args.args[0] <= 1.0
+
+    def test_429_pauses_bucket(self):
+        from assets import teams_webhook
+        cfg = self._config()
+        error = teams_webhook.WebhookHTTPError(429, "Too Many", retry_after=45)
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("assets.teams_webhook._send", side_effect=error):
+            with pytest.raises(teams_webhook.WebhookHTTPError):
+                teams_webhook._post(cfg, {})
+        assert 44 < teams_webhook._get_bucket(cfg, cfg.webhook_url).reserve() <= 45
+
+    def test_long_pause_is_capped_and_never_sleeps(self, rate_limits, outbox):
+        """429 の停止は上限で切り、タイムアウトより長い待ちは眠らずに再送待ちへ回す"""
+        import time
+        from assets import teams_webhook
+        cfg = self._config(outbox=True)
+        now = [1000.0]
+        rate_limits[cfg.webhook_url] = teams_webhook.TokenBucket(1.0, 4, clock=lambda: now[0])
+        error = teams_webhook.WebhookHTTPError(429, "Too Many", retry_after=3600)
+        with patch("assets.teams_webhook._get_proxies", return_value=None), \
+             patch("assets.teams_webhook._send", side_effect=[error, 202]) as mock_send, \
+             patch("assets.teams_webhook.time.sleep") as mock_sleep:
+            with pytest.raises(teams_webhook.WebhookHTTPError):
+                teams_webhook._post(cfg, {})
+            with pytest.raises(teams_webhook.WebhookQueuedError) as exc:
+                teams_webhook._deliver_one(cfg, "clock_in", {"a": 1})
+            assert isinstance(exc.value.original, teams_webhook.WebhookRateLimitedError)
+            assert exc.value.status == 429 and exc.value.retry_after > 0
+            assert mock_send.call_count == 1           # 停止中は送らない
+            mock_sleep.assert_not_called()
+            now[0] += teams_webhook._RATE_PAUSE_MAX_SEC
+            teams_webhook._post(cfg, {})               # 上限の時間が過ぎれば送れる
+        assert mock_send.call_count == 2
+        mock_sleep.assert_not_called()
+        [entry] = outbox.pending()
+        assert entry["next_at"] >= time.time() + teams_webhook._RATE_PAUSE_MAX_SEC - 5
+
+
+class TestClockInDigest:
+    def _entry(self, name, user_id, **data):
+        from assets.config import Config
+        c = Config()
+        c.webhook_url = "https://example.com/webhook"
+        c.display_name = name
+        c.teams_user_id = user_id
+        return c, {"shift": "日勤", "work_style": "出社", **data}
+
+    def test_digest_payload(self):
+        from assets.teams_webhook import _build_clock_in_digest_payload
+        payload = _build_clock_in_digest_payload([
+            self._entry("山田 太郎", "yamada@example.com", comment="電車遅延"),
+            self._entry("佐藤 花子", "sato@example.com", work_style="リモート"),
+        ])
+        column = json.loads(payload["column"])
+        message = json.loads(payload["message"])
+        assert column["items"][0]["text"] == "2名が出勤しました"
+        assert [i["text"] for i in message["items"]] == [
+            "山田 太郎: 業務を開始します。[日勤(出社)]",
+            "コメント: 電車遅延",
+            "佐藤 花子: 業務を開始します。[日勤(リモート)]",
+        ]
+        assert payload["userId"] == "yamada@example.com"
+        assert payload["mention_data"] == []
+        assert json.loads(payload["comment"]) == {}
+
+    def test_send_digest_posts_once(self):
+        from assets.teams_webhook import send_clock_in_digest
+        with patch("assets.teams_webhook._post") as mock_post:
+            send_clock_in_digest([self._entry("A", "a@x"), self._entry("B", "b@x")])
+        mock_post.assert_called_once()
+
+
+class TestWebhookTargets:
+    def _config(self):
+        from assets.config import Config
+        c = Config()
+        c.webhook_url = "https://example.com/team"
+        c.display_name = "山田 太郎"
+        c.proxy_sh = "/opt/proxy.sh"
+        c.webhook_targets = [
+            {"name": "manager", "url": "https://example.com/manager", "webhook_io": {"read_timeout_sec": 30}},
+            {"name": "audit", "url": "http://audit.local/hook", "proxy_sh": ""},
+            {"name": "dup", "url": "https://example.com/team"},
+        ]
+        return c
+
+    def test_targets_inherit_and_override(self):
+        from assets.teams_webhook import _targets, target_config
+        cfg = self._config()
+        targets = dict(_targets(cfg))
+        assert list(targets) == ["webhook_url", "manager", "audit"]     # 同じ URL は 1 回だけ
+        assert targets["webhook_url"] is cfg
+        assert targets["manager"].proxy_sh == "/opt/proxy.sh"
+        assert targets["manager"].webhook_io["read_timeout_sec"] == 30
+        assert targets["manager"].webhook_io["connect_timeout_sec"] == 5.0
+        assert targets["audit"].proxy_sh == ""
+        assert cfg.webhook_url == "https://example.com/team"              # 元の config は変えない
+        assert target_config(cfg, "http://audit.local/hook").proxy_sh == ""
+        assert target_config(cfg, "https://other") is cfg
+
+    def test_payload_built_once_and_sent_concurrently(self):
+        import threading
+        import time
+        from assets import teams_webhook
+        sent = []
+        lock = threading.Lock()
+
+        def slow_post(config, payload):
+            time.sleep(0.3)
+            with lock:
+                sent.append((config.webhook_url, id(payload)))
+
+        with patch("assets.teams_webhook._post", side_effect=slow_post), \
+             patch("assets.teams_webhook._build_clock_in_payload",
+                   wraps=teams_webhook._build_clock_in_payload) as build:
+            t = time.perf_counter()
+            results = send_teams_post(self._config(), "clock_in", {"shift": "日勤"})
+            elapsed = time.perf_counter() - t
+        build.assert_called_once()
+        assert results == {"webhook_url": "", "manager": "", "audit": ""}
+        assert len({pid for _, pid in sent}) == 1
+        assert elapsed < 0.8                                              # 合計ではなく最も遅い送信先の分
+
+    def test_partial_failure_reports_each_target(self, outbox):
+        from assets.teams_webhook import WebhookDeliveryError, WebhookHTTPError
+
+        def post(config, payload):
+            if "manager" in config.webhook_url:
+                raise WebhookHTTPError(503, "busy")
+
+        with patch("assets.teams_webhook._post", side_effect=post):
+            with pytest.raises(WebhookDeliveryError) as exc:
+                send_teams_post(self._config(), "clock_out", {})
+        results = exc.value.results
+        assert results["webhook_url"] == "" and results["audit"] == ""
+        assert results["manager"].startswith("HTTP 503")
+        assert str(exc.value).startswith("manager: HTTP 503")
+        [rec] = outbox.pending()
+        assert rec["target"] == "manager"
+
+    def test_outbox_resolves_target_key_at_send_time(self, outbox):
+        """再送待ちには URL を保存せず、再送時に設定から引く（名前のない送信先は URL のハッシュで引く）"""
+        from assets.teams_webhook import WebhookHTTPError, WebhookTargetNotFoundError, config_for_target
+        from assets.webhook_outbox import create_outbox_worker, is_retryable
+        cfg = self._config()
+        cfg.webhook_targets.append({"url": "https://example.com/unnamed"})
+
+        with patch("assets.teams_webhook._post", side_effect=WebhookHTTPError(503, "busy")):
+            with pytest.raises(Exception):
+                send_teams_post(cfg, "clock_out", {})
+        unnamed = next(r["target"] for r in outbox.pending() if r["target"].startswith("url-sha256:"))
+        assert sorted(r["target"] for r in outbox.pending()) == sorted(
+            ["audit", "manager", unnamed, "webhook_url"])
+        saved = outbox.path.read_text(encoding="utf-8")
+        assert "example.com" not in saved and "audit.local" not in saved
+
+        cfg.webhook_targets[0]["url"] = "https://example.com/manager-rotated"
+        assert config_for_target(cfg, "manager").webhook_url == "https://example.com/manager-rotated"
+        assert config_for_target(cfg, "manager").webhook_io["read_timeout_sec"] == 30
+        assert config_for_target(cfg, unnamed).webhook_url == "https://example.com/unnamed"
+        assert config_for_target(cfg, "https://example.com/team") is cfg       # URL を保存していた再送待ち
+
+        del cfg.webhook_targets[1]                                             # audit を設定から削除
+        with pytest.raises(WebhookTargetNotFoundError) as exc:
+            config_for_target(cfg, "audit")
+        assert not is_retryable(exc.value)
+        cfg.webhook_io["outbox_max_attempts"] = 8
+        with patch("assets.teams_webhook._post") as mock_post:
+            assert create_outbox_worker(cfg).run_once(force=True) == 3
+        assert {c.args[0].webhook_url for c in mock_post.call_args_list} == {
+            "https://example.com/team", "https://example.com/manager-rotated", "https://example.com/unnamed"}
+        [dead] = outbox.dead_letters()
+        assert dead["target"] == "audit" and "送信先が設定にありません" in dead["error"]
+
+    def test_sessions_kept_per_proxy(self):
+        pytest.importorskip("requests")
+        from assets import teams_webhook
+        teams_webhook.close_session()
+        try:
+            direct = teams_webhook._get_session(None, 4)
+            proxied = teams_webhook._get_session({"https": "http://proxy:8080"}, 4)
+            assert teams_webhook._get_session(None, 4) is direct
+            with patch.object(teams_webhook, "_MAX_SESSIONS", 2):
+                teams_webhook._get_session({"https": "http://other:8080"}, 4)
+            assert proxied not in teams_webhook._sessions.values()          # 最も古いものを閉じる
+            assert direct in teams_webhook._sessions.values()
+        finally:
+            teams_webhook.close_session()
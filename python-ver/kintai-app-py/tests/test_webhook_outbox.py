@@ -0,0 +1,145 @@
+"""assets/webhook_outbox.py（Teams 投稿の再送待ち）のユニットテスト"""
+import time
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from assets import webhook_outbox
+from assets.teams_webhook import (
+    WebhookDeadLetteredError, WebhookHTTPError, WebhookQueuedError, WebhookSavedError, send_teams_post,
+)
+from assets.webhook_outbox import OutboxWorker, WebhookOutbox, backoff_delay, is_retryable
+
+
+class TestBackoff:
+    def test_exponential_with_jitter(self):
+        assert backoff_delay(1, rand=lambda: 0.0) == 5.0
+        assert backoff_delay(1, rand=lambda: 1.0) == 10.0
+        assert backoff_delay(3, rand=lambda: 0.0) == 20.0
+
+    def test_capped(self):
+        assert backoff_delay(20, rand=lambda: 1.0) == webhook_outbox._RETRY_MAX_SEC
+
+    def test_retry_after_is_lower_bound(self):
+        assert backoff_delay(1, retry_after=120, rand=lambda: 1.0) == 120
+        assert backoff_delay(1, retry_after=1, rand=lambda: 1.0) == 10.0
+
+    def test_retryable(self):
+        assert is_retryable(ConnectionError("proxy down"))
+        assert is_retryable(WebhookHTTPError(429))
+        assert is_retryable(WebhookHTTPError(503))
+        assert not is_retryable(WebhookHTTPError(400))
+        assert not is_retryable(WebhookHTTPError(404))
+
+
+class TestWebhookOutbox:
+    def test_persisted_across_reload(self, outbox):
+        entry_id = outbox.enqueue("https://example.com/hook", "clock_in", {"userId": "u"},
+                                  WebhookHTTPError(503))
+        outbox.mark_retry(entry_id, ConnectionError("timeout"))
+        reloaded = WebhookOutbox(outbox.path, outbox.dead_letter_path)
+        [rec] = reloaded.pending()
+        assert rec["payload"] == {"userId": "u"}
+        assert rec["attempts"] == 2
+        assert rec["error"] == "timeout"
+
+    def test_dead_letter_after_max_attempts(self, outbox):
+        entry_id = outbox.enqueue("https://example.com/hook", "clock_out", {}, ConnectionError("x"))
+        assert outbox.mark_retry(entry_id, ConnectionError("x"), max_attempts=3) is not None
+        assert outbox.mark_retry(entry_id, ConnectionError("x"), max_attempts=3) is None
+        assert outbox.pending_count() == 0
+        [dead] = outbox.dead_letters()
+        assert dead["attempts"] == 2 and dead["message_type"] == "clock_out"
+        assert "3回失敗" in dead["error"]
+        assert outbox.path.read_text(encoding="utf-8") == ""
+
+    def test_due_and_next_due_in(self, outbox):
+        outbox.enqueue("u", "clock_in", {}, WebhookHTTPError(429, retry_after=60))
+        now = time.time()
+        assert outbox.due(now) == []
+        assert len(outbox.due()) == 1
+        assert 55 < outbox.next_due_in(now) <= 60
+
+
+class TestOutboxWorker:
+    def _enqueue(self, outbox, n):
+        for i in range(n):
+            outbox.enqueue(f"https://example.com/{i}", "clock_in", {"n": i}, ConnectionError("x"))
+
+    def test_force_sends_all_in_order(self, outbox):
+        self._enqueue(outbox, 3)
+        sent = []
+        worker = OutboxWorker(outbox, lambda url, payload: sent.append(payload["n"]))
+        assert worker.run_once() == 0          # まだ再送時刻前
+        assert worker.run_once(force=True) == 3
+        assert sent == [0, 1, 2]
+        assert outbox.pending_count() == 0
+
+    def test_retryable_failure_stops_round(self, outbox):
+        """再送できるエラーが出たらそのラウンドは打ち切り、残りは次の再送時刻まで待つ"""
+        self._enqueue(outbox, 3)
+        send = MagicMock(side_effect=WebhookHTTPError(429, retry_after=30))
+        worker = OutboxWorker(outbox, send)
+        assert worker.run_once(force=True) == 0
+        assert send.call_count == 1
+        assert worker._hold_until >= time.time() + 29
+        assert [r["attempts"] for r in outbox.pending()] == [2, 1, 1]
+
+    def test_non_retryable_goes_to_dead_letter(self, outbox):
+        self._enqueue(outbox, 2)
+        send = MagicMock(side_effect=[WebhookHTTPError(400, "bad card"), None])
+        assert OutboxWorker(outbox, send).run_once(force=True) == 1
+        assert outbox.pending_count() == 0
+        assert [d["payload"]["n"] for d in outbox.dead_letters()] == [0]
+
+    def test_thread_flushes_on_start(self, outbox):
+        self._enqueue(outbox, 1)
+        worker = OutboxWorker(outbox, lambda url, payload: None)
+        worker.start()
+        try:
+            deadline = time.time() + 5
+            while outbox.pending_count() and time.time() < deadline:
+                time.sleep(0.01)
+            assert outbox.pending_count() == 0
+        finally:
+            worker.stop()
+
+
+class TestSendTeamsPostOutbox:
+    @pytest.fixture
+    def cfg(self, base_config):
+        base_config.webhook_url = "https://example.com/webhook"
+        return base_config
+
+    def _post(self, cfg):
+        send_teams_post(cfg, "clock_in", {"shift": "日勤", "work_style": "リモート", "comment": ""})
+
+    def test_failed_post_is_queued(self, cfg, outbox):
+        original = WebhookHTTPError(503, "busy", retry_after=30)
+        with patch("assets.teams_webhook._post", side_effect=original):
+            with pytest.raises(WebhookQueuedError, match="再送待ちに登録しました") as exc:
+                self._post(cfg)
+        assert exc.value.original is original and exc.value.__cause__ is original
+        assert (exc.value.status, exc.value.retry_after) == (503, 30)
+        assert is_retryable(exc.value)
+        [rec] = outbox.pending()
+        assert rec["target"] == "webhook_url"
+        assert cfg.webhook_url not in outbox.path.read_text(encoding="utf-8")
+        assert rec["payload"]["userId"] == cfg.teams_user_id
+
+    def test_bad_request_goes_to_dead_letter(self, cfg, outbox):
+        with patch("assets.teams_webhook._post", side_effect=WebhookHTTPError(400, "bad")):
+            with pytest.raises(WebhookDeadLetteredError, match="dead_letter") as exc:
+                self._post(cfg)
+        assert exc.value.status == 400
+        assert isinstance(exc.value, WebhookSavedError) and not isinstance(exc.value, WebhookQueuedError)
+        assert not is_retryable(exc.value)
+        assert outbox.pending_count() == 0
+        assert len(outbox.dead_letters()) == 1
+
+    def test_outbox_disabled(self, cfg, outbox):
+        cfg.webhook_io["outbox"] = False
+        with patch("assets.teams_webhook._post", side_effect=ConnectionError("down")):
+            with pytest.raises(ConnectionError):
+                self._post(cfg)
+        assert outbox.pending_count() == 0
@@ -0,0 +1,355 @@
+"""assets/xlsx_patcher.py のユニットテスト"""
+import zipfile
+from datetime import date, datetime, time, timedelta
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+
+import openpyxl
+from openpyxl.styles import Font
+
+import assets.xlsx_patcher as xp
+from assets.xlsx_patcher import DirectWorkbook, XlsxPatchError, read_cells
+from assets.timesheet_actions import TimesheetSession
+
+
+def _make_book(path: Path) -> Path:
+    """2シート・書式付きのタイムシート相当ブックを作る"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws["A1"] = "勤務表"
+    ws["C6"] = 2026
+    ws["C7"] = 2
+    for i in range(28):
+        ws.cell(row=18 + i, column=3).value = i + 1
+        ws.cell(row=18 + i, column=5).font = Font(bold=True)
+        ws.cell(row=18 + i, column=6).number_format = "h:mm"
+    ws["F20"] = 0.375
+    ws["C46"] = "=C45+1"
+    wb.create_sheet("集計")["A1"] = "other"
+    wb.save(str(path))
+    return path
+
+
+def _replace_member(path: Path, name: str, transform) -> None:
+    """zip メンバー1つを書換える（テスト用の XML を作るため）"""
+    with zipfile.ZipFile(path) as z:
+        members = [(i, z.read(i.filename)) for i in z.infolist()]
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+        for info, data in members:
+            z.writestr(info, transform(data) if info.filename == name else data)
+
+
+class TestDirectRead:
+    def test_numbers_and_shared_strings(self, tmp_path):
+        wb = DirectWorkbook(_make_book(tmp_path / "t.xlsx"))
+        ws = wb.active
+        assert ws["C6"].value == 2026
+        assert ws["A1"].value == "勤務表"
+        assert ws.cell(row=20, column=6).value == 0.375
+        assert ws.cell(row=20, column=3).value == 3
+        assert ws.cell(row=99, column=1).value is None
+
+    def test_formula_returns_formula_text(self, tmp_path):
+        """data_only=False では openpyxl と同じく "=..." を返す"""
+        ws = DirectWorkbook(_make_book(tmp_path / "t.xlsx")).active
+        assert ws["C46"].value == "=C45+1"
+
+    def test_data_only_returns_cached_value(self, tmp_path):
+        path = _make_book(tmp_path / "t.xlsx")
+        _replace_member(path, "xl/worksheets/sheet1.xml",
+                        lambda x: x.replace(b"<f>C45+1</f><v />", b"<f>C45+1</f><v>29</v>"))
+        assert DirectWorkbook(path, data_only=True).active["C46"].value == 29
+
+    def test_rich_text_skips_phonetic(self, tmp_path):
+        """ふりがな (rPh) は値に含めない"""
+        path = _make_book(tmp_path / "t.xlsx")
+        _replace_member(
+            path, "xl/sharedStrings.xml",
+            lambda x: x.replace(
+                "<t>勤務表</t>".encode(),
+                "<r><t>勤務</t></r><r><rPr><b/></rPr><t>表</t></r>"
+                "<rPh sb=\"0\" eb=\"2\"><t>キンム</t></rPh>".encode(),
+            ),
+        )
+        assert DirectWorkbook(path).active["A1"].value == "勤務表"
+
+
+class TestReadCells:
+    """read_cells ストリーミング読取"""
+
+    def test_typed_values(self, tmp_path):
+        path = _make_book(tmp_path / "t.xlsx")
+        values = read_cells(path, ["C6", "C7", "A1", "F20", "Z99"])
+        assert values == {"C6": 2026, "C7": 2, "A1": "勤務表", "F20": time(9, 0), "Z99": None}
+
+    def test_date_styled_header_cells(self, tmp_path):
+        """日付書式のヘッダーセルは openpyxl（data_only）と同じ datetime で返す"""
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = openpyxl.load_workbook(path)
+        ws = wb.active
+        ws["C6"] = datetime(2026, 2, 1)
+        ws["C6"].number_format = 'yyyy"年"'
+        ws["C7"] = datetime(2026, 2, 1)
+        ws["C7"].number_format = "m\"月\""
+        ws["D6"] = 46054
+        ws["D6"].number_format = "0.00"
+        ws["D7"] = 1.5
+        ws["D7"].number_format = "[h]:mm"
+        wb.save(path)
+        refs = ["C6", "C7", "D6", "D7", "F20"]
+        values = read_cells(path, refs)
+        assert values["C6"] == values["C7"] == datetime(2026, 2, 1)
+        assert values["D6"] == 46054
+        assert values["D7"] == timedelta(days=1, hours=12)
+        expected = openpyxl.load_workbook(path, read_only=True, data_only=True).active
+        assert values == {r: expected[r].value for r in refs}
+
+    def test_builtin_date_format_and_1904_epoch(self, tmp_path):
+        """組込みの日付書式（ID 14）と 1904 年基準のブック"""
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = openpyxl.load_workbook(path)
+        wb.active["C6"] = datetime(2026, 2, 1)
+        wb.active["C6"].number_format = "mm-dd-yy"
+        wb.save(path)
+        assert read_cells(path, ["C6"]) == {"C6": datetime(2026, 2, 1)}
+        _replace_member(path, "xl/workbook.xml",
+                        lambda x: x.replace(b"<workbookPr", b'<workbookPr date1904="1"', 1))
+        assert read_cells(path, ["C6"]) == {"C6": datetime(2030, 2, 2)}
+
+    def test_formula_text_when_not_data_only(self, tmp_path):
+        path = _make_book(tmp_path / "t.xlsx")
+        assert read_cells(path, ["C46"], data_only=False) == {"C46": "=C45+1"}
+
+    def test_stops_after_last_requested_row(self, tmp_path):
+        """指定セルの行を読み終えたらそれ以降の XML は解析しない"""
+        path = _make_book(tmp_path / "t.xlsx")
+        _replace_member(path, "xl/worksheets/sheet1.xml",
+                        lambda x: x.replace(b'<row r="30"', b'<broken <row r="30"'))
+        with patch("assets.xlsx_patcher._READ_CHUNK", 256):
+            assert read_cells(path, ["C6", "C7"]) == {"C6": 2026, "C7": 2}
+        with pytest.raises(XlsxPatchError):
+            read_cells(path, ["C40"])
+
+    def test_shared_string_rich_text(self, tmp_path):
+        path = _make_book(tmp_path / "t.xlsx")
+        _replace_member(
+            path, "xl/sharedStrings.xml",
+            lambda x: x.replace(
+                "<t>勤務表</t>".encode(),
+                "<r><t>勤務</t></r><r><t>表</t></r><rPh sb=\"0\" eb=\"2\"><t>キンム</t></rPh>".encode(),
+            ),
+        )
+        assert read_cells(path, ["A1"]) == {"A1": "勤務表"}
+
+    def test_not_a_zip(self, tmp_path):
+        path = tmp_path / "t.xlsx"
+        path.touch()
+        with pytest.raises(XlsxPatchError):
+            read_cells(path, ["C6"])
+
+
+class TestDirectWrite:
+    def test_write_keeps_style_and_other_members(self, tmp_path):
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = DirectWorkbook(path)
+        wb.active.cell(row=20, column=5).value = "日勤"
+        wb.active.cell(row=20, column=7).value = 0.75
+        wb.save(tmp_path / "out.xlsx")
+
+        ws = openpyxl.load_workbook(tmp_path / "out.xlsx").active
+        assert ws["E20"].value == "日勤"
+        assert ws["E20"].font.b is True
+        assert ws["F20"].number_format == "h:mm"
+        assert ws["C46"].value == "=C45+1"
+        with zipfile.ZipFile(path) as a, zipfile.ZipFile(tmp_path / "out.xlsx") as b:
+            assert a.namelist() == b.namelist()
+            changed = [n for n in a.namelist() if a.read(n) != b.read(n)]
+        # openpyxl 製のブックは fullCalcOnLoad 済みなので workbook.xml も変わらない
+        assert changed == ["xl/worksheets/sheet1.xml"]
+
+    def test_untouched_members_copied_without_recompressing(self, tmp_path):
+        """書換えないメンバーは圧縮済みデータのまま複製し、展開もしない"""
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = DirectWorkbook(path)
+        wb.active.cell(row=20, column=5).value = "日勤"
+        with patch("assets.xlsx_patcher.zipfile.ZipFile.read", autospec=True,
+                   side_effect=zipfile.ZipFile.read) as mock_read:
+            wb.save(tmp_path / "out.xlsx")
+        assert {c.args[1] for c in mock_read.call_args_list} <= {"xl/workbook.xml"}
+
+        src, out = DirectWorkbook(path), DirectWorkbook(tmp_path / "out.xlsx")
+        for info in src._zip.infolist():
+            if info.filename == "xl/worksheets/sheet1.xml":
+                continue
+            copied = out._zip.getinfo(info.filename)
+            assert (copied.CRC, copied.compress_type, copied.date_time) == \
+                   (info.CRC, info.compress_type, info.date_time)
+            assert out._raw_member(copied) == src._raw_member(info)
+        assert out._zip.testzip() is None
+        assert openpyxl.load_workbook(tmp_path / "out.xlsx").active["E20"].value == "日勤"
+
+    def test_raw_copy_of_members_with_data_descriptor(self, tmp_path):
+        """データディスクリプタ付きで書かれた zip（ストリーム出力）も複製できる"""
+        path = _make_book(tmp_path / "t.xlsx")
+
+        class _Stream:
+            """seek できない出力先（zipfile はデータディスクリプタを付けて書く）"""
+            def __init__(self, f):
+                self._f = f
+
+            def write(self, b):
+                return self._f.write(b)
+
+            def flush(self):
+                self._f.flush()
+
+        with zipfile.ZipFile(path) as z:
+            members = [(i, z.read(i.filename)) for i in z.infolist()]
+        streamed = tmp_path / "streamed.xlsx"
+        with open(streamed, "wb") as f, zipfile.ZipFile(_Stream(f), "w", zipfile.ZIP_DEFLATED) as z:
+            for info, data in members:
+                z.writestr(info.filename, data)
+        with zipfile.ZipFile(streamed) as z:
+            assert all(i.flag_bits & 0x08 for i in z.infolist())
+
+        wb = DirectWorkbook(streamed)
+        wb.active.cell(row=20, column=5).value = "日勤"
+        wb.save(tmp_path / "out.xlsx")
+        with zipfile.ZipFile(tmp_path / "out.xlsx") as z:
+            assert z.testzip() is None
+            assert not any(i.flag_bits & 0x08 for i in z.infolist())
+        assert openpyxl.load_workbook(tmp_path / "out.xlsx").active["E20"].value == "日勤"
+
+    @staticmethod
+    def _assert_saved_intact(src_path, out_path):
+        """保存結果が zip として壊れておらず、openpyxl で開けて中身が元と同じ"""
+        with zipfile.ZipFile(out_path) as z, zipfile.ZipFile(src_path) as src:
+            assert z.testzip() is None
+            assert [i.filename for i in z.infolist()] == [i.filename for i in src.infolist()]
+            for info in src.infolist():
+                assert z.getinfo(info.filename).compress_type == info.compress_type
+                if info.filename != "xl/worksheets/sheet1.xml":
+                    assert z.read(info.filename) == src.read(info.filename)
+        assert openpyxl.load_workbook(out_path).active["E20"].value == "日勤"
+
+    def test_falls_back_to_writestr_when_raw_copy_fails(self, tmp_path):
+        """ZipFile の非公開属性が変わって複製に失敗しても、writestr で書き直して保存する"""
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = DirectWorkbook(path)
+        wb.active.cell(row=20, column=5).value = "日勤"
+        with patch("assets.xlsx_patcher._write_raw",
+                   side_effect=AttributeError("_writecheck")) as mock_raw:
+            wb.save(tmp_path / "out.xlsx")
+        assert mock_raw.called
+        self._assert_saved_intact(path, tmp_path / "out.xlsx")
+
+    def test_falls_back_when_raw_copy_is_corrupt(self, tmp_path):
+        """複製した zip の検査に通らなければ、壊れた内容は書かずに writestr で書き直す"""
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = DirectWorkbook(path)
+        wb.active.cell(row=20, column=5).value = "日勤"
+        write_raw = xp._write_raw
+
+        def _bad_crc(zout, new_info, info, raw):
+            write_raw(zout, new_info, info, raw)
+            new_info.CRC ^= 1
+
+        with patch("assets.xlsx_patcher._write_raw", side_effect=_bad_crc):
+            wb.save(tmp_path / "out.xlsx")
+        self._assert_saved_intact(path, tmp_path / "out.xlsx")
+
+    def test_unsupported_python_uses_public_api_only(self, tmp_path):
+        """動作を確認していない Python では複製せず、公開 API だけで保存する"""
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = DirectWorkbook(path)
+        wb.active.cell(row=20, column=5).value = "日勤"
+        with patch("assets.xlsx_patcher._RAW_COPY_SUPPORTED", False), \
+                patch("assets.xlsx_patcher._write_raw") as mock_raw:
+            wb.save(tmp_path / "out.xlsx")
+        mock_raw.assert_not_called()
+        self._assert_saved_intact(path, tmp_path / "out.xlsx")
+
+    def test_inline_string_escaped(self, tmp_path):
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = DirectWorkbook(path)
+        wb.active["L20"].value = " 電車遅延 <A&B> "
+        wb.save(path)
+        assert openpyxl.load_workbook(path).active["L20"].value == " 電車遅延 <A&B> "
+        assert DirectWorkbook(path).active["L20"].value == " 電車遅延 <A&B> "
+
+    def test_inserted_cells_keep_column_order(self, tmp_path):
+        path = _make_book(tmp_path / "t.xlsx")
+        wb = DirectWorkbook(path)
+        wb.active["L21"].value = "備考"
+        wb.active["D21"].value = 1
+        wb.save(path)
+        xml = zipfile.ZipFile(path).read("xl/worksheets/sheet1.xml")
+        row = xml[xml.index(b'<row r="21"'):]
+        row = row[:row.index(b"</row>")]
+        assert row.index(b'r="C21"') < row.index(b'r="D21"') < row.index(b'r="E21"') < row.index(b'r="L21"')
+
+    def test_full_calc_on_load(self, tmp_path):
+        """書換後に数式を再計算させる"""
+        path = _make_book(tmp_path / "t.xlsx")
+        _replace_member(path, "xl/workbook.xml",
+                        lambda x: x.replace(b' fullCalcOnLoad="1"', b""))
+        wb = DirectWorkbook(path)
+        wb.active["E20"].value = "日勤"
+        wb.save(path)
+        assert b'fullCalcOnLoad="1"' in zipfile.ZipFile(path).read("xl/workbook.xml")
+
+    def test_formula_cell_not_patchable(self, tmp_path):
+        ws = DirectWorkbook(_make_book(tmp_path / "t.xlsx")).active
+        with pytest.raises(XlsxPatchError):
+            ws["C46"].value = 29
+
+    def test_missing_row_not_patchable(self, tmp_path):
+        ws = DirectWorkbook(_make_book(tmp_path / "t.xlsx")).active
+        with pytest.raises(XlsxPatchError):
+            ws["E60"].value = "日勤"
+
+    def test_unsupported_value_type(self, tmp_path):
+        ws = DirectWorkbook(_make_book(tmp_path / "t.xlsx")).active
+        with pytest.raises(XlsxPatchError):
+            ws["E20"].value = date(2026, 2, 3)
+
+
+class TestSessionDirectEngine:
+    def _config(self, base_config):
+        base_config.timesheet_io["write_engine"] = "direct"
+        return base_config
+
+    def test_session_uses_direct_engine(self, tmp_path, base_config):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with patch("assets.timesheet_actions.openpyxl.load_workbook") as mock_load:
+            with TimesheetSession(path, self._config(base_config)) as session:
+                assert session.read_cell(session.require_row(date(2026, 2, 3)), "start_time_col") == 0.375
+                session.write_row({"date": date(2026, 2, 3), "shift_label": "日勤", "end_time": 0.75})
+                session.save()
+        mock_load.assert_not_called()
+        ws = openpyxl.load_workbook(path).active
+        assert ws["E20"].value == "日勤" and ws["G20"].value == 0.75
+
+    def test_falls_back_to_openpyxl(self, tmp_path, base_config):
+        """直接書換できないセルがあれば openpyxl に切替えて書込む"""
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        wb = openpyxl.load_workbook(path)
+        wb.active["L21"] = '="備考"'  # 備考列に数式が入っている
+        wb.save(path)
+        with TimesheetSession(path, self._config(base_config)) as session:
+            session.write_row({"date": date(2026, 2, 3), "shift_label": "日勤"})
+            assert isinstance(session.wb, DirectWorkbook)
+            session.write_row({"date": date(2026, 2, 4), "remark": "x"})
+            assert not isinstance(session.wb, DirectWorkbook)
+            session.save()
+        ws = openpyxl.load_workbook(path).active
+        assert ws["E20"].value == "日勤"
+        assert ws["L21"].value == "x"
+
+    def test_unreadable_book_falls_back(self, tmp_path, base_config):
+        path = _make_book(tmp_path / "202602山田.xlsx")
+        with patch("assets.timesheet_actions.DirectWorkbook", side_effect=Exception("boom")):
+            with TimesheetSession(path, self._config(base_config)) as session:
+                assert session.read_address("C6") == 2026